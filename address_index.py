@@ -0,0 +1,119 @@
+import bisect
+import ipaddress
+import re
+import socket
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+import numpy as np
+
+# --- Address Index ---
+# Built per cache generation from VM guest IPs and host vmkernel adapters:
+#   - IPv4 addresses as a sorted uint32 array (np.searchsorted), IPv6 as a sorted list of ints (bisect),
+#     so exact lookups and CIDR range queries are two binary searches;
+#   - MAC addresses in a hash map.
+LEGACY_GUEST_IP_RE = re.compile(r"^(?P<address>\S+) \(Prefix: (?P<prefix>[^,]*), State: (?P<state>[^)]*)\)$")
+MAC_SEPARATORS_RE = re.compile(r"[^0-9a-f]")
+ADDRESS_SOURCE_FIELDS = {"VM": {"name", "instance_uuid", "network_adapters"}, "Host": {"name", "uuid_bios", "vmkernel_adapters"}}
+
+def guest_ip_addresses(nic: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Structured guest IPs of a NIC; caches collected before they were stored structured are parsed from guest_ips."""
+    if nic.get("guest_ip_addresses") is not None:
+        return nic["guest_ip_addresses"]
+    addresses = []
+    for display in nic.get("guest_ips") or []:
+        match = LEGACY_GUEST_IP_RE.match(str(display))
+        if not match: continue
+        address, prefix = match["address"], match["prefix"]
+        addresses.append({"address": address, "prefix": int(prefix) if prefix.isdigit() else None, "state": match["state"],
+                          "family": "ipv6" if ":" in address else "ipv4"})
+    return addresses
+
+def normalize_mac(mac: str) -> Optional[str]:
+    mac = str(mac).lower()
+    if len(mac) == 17 and mac[2::3] == ":::::": return mac  # vCenter's own format
+    digits = MAC_SEPARATORS_RE.sub("", mac)
+    if len(digits) != 12: return None
+    return ":".join(digits[i:i + 2] for i in range(0, 12, 2))
+
+def _iter_address_entries(data: Mapping[str, Any]) -> Iterator[Dict[str, Any]]:
+    for vm in data.get("vms") or []:
+        owner = {"owner_type": "VM", "owner_name": vm.get("name"), "owner_id": vm.get("instance_uuid") or vm.get("name")}
+        for nic in vm.get("network_adapters") or []:
+            base = {**owner, "adapter": nic.get("label"), "mac_address": nic.get("mac_address"), "network_name": nic.get("network_name")}
+            if not guest_ip_addresses(nic):
+                yield {**base, "address": None}
+            for ip in guest_ip_addresses(nic):
+                yield {**base, "address": ip.get("address"), "prefix": ip.get("prefix"), "state": ip.get("state"), "family": ip.get("family")}
+    for dc in (data.get("infrastructure") or {}).get("datacenters", []):
+        for host in [h for c in dc.get("clusters", []) for h in c.get("hosts", [])] + dc.get("standalone_hosts", []):
+            owner = {"owner_type": "Host", "owner_name": host.get("name"), "owner_id": host.get("uuid_bios") or host.get("name")}
+            for vmk in host.get("vmkernel_adapters") or []:
+                address = vmk.get("ip_address")
+                prefix = None
+                if vmk.get("subnet_mask") not in (None, "", "N/A"):
+                    try: prefix = ipaddress.IPv4Network(f"0.0.0.0/{vmk['subnet_mask']}").prefixlen
+                    except ValueError: pass
+                yield {**owner, "adapter": vmk.get("device"), "mac_address": vmk.get("mac"), "network_name": vmk.get("portgroup_name"),
+                       "address": address if address not in ("", "N/A") else None, "prefix": prefix, "state": None,
+                       "family": "ipv6" if ":" in str(address) else "ipv4"}
+
+def _address_key(address: str) -> Optional[Tuple[int, int]]:
+    """(version, integer value) of an address; inet_pton is much cheaper than ipaddress for bulk parsing."""
+    try:
+        if ":" in address:
+            return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, address.split("%", 1)[0]), "big")  # drop zone ids (fe80::1%eth0)
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+    except (OSError, ValueError):
+        return None
+
+class AddressIndex:
+    def __init__(self, entries: List[Dict[str, Any]], ipv4_keys: np.ndarray, ipv4_entries: np.ndarray,
+                 ipv6_keys: List[int], ipv6_entries: List[int], by_mac: Dict[str, List[int]]):
+        self.entries = entries
+        self.ipv4_keys = ipv4_keys
+        self.ipv4_entries = ipv4_entries
+        self.ipv6_keys = ipv6_keys
+        self.ipv6_entries = ipv6_entries
+        self.by_mac = by_mac
+
+    def _range(self, first: int, last: int, version: int) -> List[int]:
+        if version == 4:
+            start, end = np.searchsorted(self.ipv4_keys, first, "left"), np.searchsorted(self.ipv4_keys, last, "right")
+            return self.ipv4_entries[start:end].tolist()
+        start, end = bisect.bisect_left(self.ipv6_keys, first), bisect.bisect_right(self.ipv6_keys, last)
+        return self.ipv6_entries[start:end]
+
+    def lookup_ip(self, address: str) -> List[Dict[str, Any]]:
+        """Raises ValueError for an invalid address."""
+        ip = ipaddress.ip_address(address)
+        return [self.entries[i] for i in self._range(int(ip), int(ip), ip.version)]
+
+    def lookup_cidr(self, cidr: str) -> List[Dict[str, Any]]:
+        """Entries whose address falls in cidr, in address order. Raises ValueError for an invalid network."""
+        network = ipaddress.ip_network(cidr, strict=False)
+        return [self.entries[i] for i in self._range(int(network.network_address), int(network.broadcast_address), network.version)]
+
+    def lookup_mac(self, mac: str) -> List[Dict[str, Any]]:
+        return [self.entries[i] for i in self.by_mac.get(normalize_mac(mac), [])]
+
+def build_address_index(data: Mapping[str, Any]) -> AddressIndex:
+    entries: List[Dict[str, Any]] = []
+    ipv4: List[Tuple[int, int]] = []
+    ipv6: List[Tuple[int, int]] = []
+    by_mac: Dict[str, List[int]] = {}
+    for entry in _iter_address_entries(data):
+        position = len(entries)
+        entries.append(entry)
+        mac = normalize_mac(entry["mac_address"]) if entry.get("mac_address") else None
+        if mac and (not by_mac.get(mac) or entries[by_mac[mac][-1]]["owner_id"] != entry["owner_id"] or entries[by_mac[mac][-1]]["adapter"] != entry["adapter"]):
+            by_mac.setdefault(mac, []).append(position)  # one entry per adapter, not per IP
+        if not entry.get("address"): continue
+        key = _address_key(entry["address"])
+        if key is not None: (ipv4 if key[0] == 4 else ipv6).append((key[1], position))
+    ipv4.sort()
+    ipv6.sort()
+    return AddressIndex(
+        entries,
+        np.array([k for k, _ in ipv4], dtype=np.uint32), np.array([p for _, p in ipv4], dtype=np.int64),
+        [k for k, _ in ipv6], [p for _, p in ipv6],
+        by_mac,
+    )
@@ -1,12 +1,36 @@
 import asyncio
+import itertools
+import json
+import os
+import sqlite3
+import time
+from collections import deque
+from dataclasses import dataclass
 from fastapi import FastAPI, HTTPException, status, Path, Query
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 import logging
-from typing import List, Dict, Any, Optional, Union, Literal, Set
+from typing import List, Dict, Any, Optional, Union, Literal, Set, Callable, Tuple, Deque, Iterator
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 import vsphere_collector 
+from address_index import guest_ip_addresses
+from vlan_index import parse_vlan_range
+from capacity_aggregates import find_capacity_row
+from datastore_history import DATASTORE_HISTORY_PATH, datastore_key, history_from_environment
+from fast_json import FragmentCache, dumps, encode_array, encode_object
+from generation_history import GenerationHistory
+from graph_layout import LayoutCache, compute_layout, graph_signature
+from scene_aggregation import (AGGREGATE_TYPE, MEMBER_PREVIEW, AggregateGroup, expand_token, parse_expand_token, plan_aggregation, rewrite_edges,
+                               summarize_members)
+from performance_metrics import METRIC_NAMES, MetricRingStore, MetricsPoller, entity_key_for
+from collection_worker import CollectionWorker
+from request_tracing import TraceExporter, TracingMiddleware, count, set_attributes, span, timer
+from inventory_store import OBJECT_TABLES, STORE_TABLES, InventoryStore, StaleGenerationError
+from inventory_snapshot import (OBJECT_KEY_FIELDS, InventorySnapshot, apply_collection_result, apply_object_refresh, compute_generation_delta,
+                                find_cached_object, object_key)
+from shared_snapshot import SharedSnapshotReader, read_collector_status, request_collection_cancel, submit_collector_request
 
 # --- Logging Configuration ---
 logging.basicConfig(
@@ -17,37 +41,235 @@ logger = logging.getLogger(__name__)
 
 # --- Application State ---
 app_state = {
-    "cached_data": None,
+    "snapshot": None,
     "last_collection_timestamp_utc": None,
     "last_collection_status": "Not yet run",
     "last_collection_message": "",
     "is_collecting": False,
+    "collection_task": None,
+    "collection_control": None,
+    "last_collection_phases": None,
+    "shared_reader": None,
+    "history": None,
+    "metrics_poller": None,
 }
 
+# --- Cache Mode ---
+# "local": this process collects from vCenter and holds its own cache (single uvicorn worker).
+# "shared": collector_service.py owns collection and publishes each generation to SNAPSHOT_PATH;
+# every API worker maps that file read-only and reloads it when the generation changes.
+CACHE_MODE = os.getenv("VLENS_CACHE_MODE", "local")
+SNAPSHOT_PATH = os.getenv("VLENS_SNAPSHOT_PATH", "data/inventory.snapshot")
+SNAPSHOT_POLL_S = float(os.getenv("VLENS_SNAPSHOT_POLL_S", "2"))
+SHARED_REQUEST_TIMEOUT_S = float(os.getenv("VLENS_SHARED_REQUEST_TIMEOUT_S", "15"))
+# Generations kept for /api/v1/diff, bounded by count and by the memory their changed records pin.
+HISTORY_MAX_GENERATIONS = int(os.getenv("VLENS_HISTORY_GENERATIONS", "48"))
+HISTORY_MAX_MB = float(os.getenv("VLENS_HISTORY_MAX_MB", "256"))
+app_state["history"] = GenerationHistory(HISTORY_MAX_GENERATIONS, int(HISTORY_MAX_MB * 1024 * 1024))
+# Performance metrics sampled from vCenter into in-memory ring buffers (local cache mode only; 0 disables them).
+METRICS_INTERVAL_S = float(os.getenv("VLENS_METRICS_INTERVAL_S", "0"))
+METRICS_SAMPLES = int(os.getenv("VLENS_METRICS_SAMPLES", "90"))
+METRICS_MAX_ENTITIES = int(os.getenv("VLENS_METRICS_MAX_ENTITIES", "20000"))
+METRICS_BATCH_SIZE = int(os.getenv("VLENS_METRICS_BATCH_SIZE", "250"))
+METRICS_INCLUDE_VMS = os.getenv("VLENS_METRICS_INCLUDE_VMS", "true").lower() == "true"
+metrics_store = MetricRingStore(METRICS_SAMPLES, METRICS_MAX_ENTITIES)
+# Datastore capacity samples kept across restarts for fill-date forecasts (written by the collector process in shared mode).
+datastore_history = history_from_environment()
+# Scene-graph layouts computed server-side, cached per graph (same nodes and edges give the same coordinates).
+LAYOUT_CACHE_ENTRIES = int(os.getenv("VLENS_LAYOUT_CACHE_ENTRIES", "256"))
+layout_cache = LayoutCache(LAYOUT_CACHE_ENTRIES)
+# Default node budget of scene graphs: above it, sibling nodes collapse into aggregates whose members are paged in by
+# token. 0 (the default) disables it, since clients must render Aggregate nodes; requests can still set max_nodes.
+SCENE_MAX_NODES = int(os.getenv("VLENS_SCENE_MAX_NODES", "0"))
+SCENE_STREAM_CHUNK_RECORDS = 256  # NDJSON records sent per chunk by the streaming scene graph
+# Encoded JSON of cache records (by content hash) and of DAT documents (by generation), reused across responses.
+JSON_FRAGMENT_CACHE_MB = float(os.getenv("VLENS_JSON_FRAGMENT_CACHE_MB", "128"))
+json_fragments = FragmentCache(int(JSON_FRAGMENT_CACHE_MB * 1024 * 1024))
+# Optional SQLite store of each generation (written by the collector process in shared mode): serves /api/v1/inventory
+# queries and the find_* lookups of scene graphs and DATs, so shared-mode workers resolve objects without decoding the
+# object sections of the snapshot.
+INVENTORY_DB_PATH = os.getenv("VLENS_INVENTORY_DB_PATH", "")
+INVENTORY_DB_HOT_OBJECTS = int(os.getenv("VLENS_INVENTORY_DB_HOT_OBJECTS", "4096"))
+inventory_store = InventoryStore(INVENTORY_DB_PATH, INVENTORY_DB_HOT_OBJECTS) if INVENTORY_DB_PATH else None
+# Local cache mode collects in a child process ("process"), so pyVmomi's CPU-bound parsing does not hold this process's
+# GIL; the result comes back through a handoff file. "thread" collects in this process.
+COLLECTION_WORKER_MODE = os.getenv("VLENS_COLLECTION_WORKER", "process")
+COLLECTION_HANDOFF_PATH = os.getenv("VLENS_COLLECTION_HANDOFF_PATH", "data/collection.handoff")
+collection_worker = CollectionWorker(COLLECTION_HANDOFF_PATH) if COLLECTION_WORKER_MODE == "process" and CACHE_MODE == "local" else None
+# Backstop for a collection thread that neither finishes nor notices its time budget (e.g. stuck below the HTTP timeout).
+COLLECTION_WATCHDOG_S = (vsphere_collector.COLLECTION_TIMEOUT_S + vsphere_collector.VCENTER_HTTP_TIMEOUT_S + 60
+                         if vsphere_collector.COLLECTION_TIMEOUT_S > 0 else None)
+# Per-request spans, counters and Server-Timing headers; traces are exported (OTLP/JSON) to a file and/or an OTLP/HTTP
+# collector when one is set, only for requests slower than VLENS_TRACE_MIN_MS.
+TRACING_ENABLED = os.getenv("VLENS_TRACING", "true").lower() == "true"
+TRACE_FILE_PATH = os.getenv("VLENS_TRACE_FILE", "")
+TRACE_OTLP_ENDPOINT = os.getenv("VLENS_OTLP_TRACES_ENDPOINT", os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", ""))
+TRACE_MIN_MS = float(os.getenv("VLENS_TRACE_MIN_MS", "0"))
+trace_exporter = (TraceExporter(TRACE_FILE_PATH, TRACE_OTLP_ENDPOINT, os.getenv("OTEL_SERVICE_NAME", "vlens-api"))
+                  if TRACING_ENABLED and (TRACE_FILE_PATH or TRACE_OTLP_ENDPOINT) else None)
+# Serializes snapshot writers (collections and targeted refreshes) so none of them loses another's update.
+snapshot_install_lock = asyncio.Lock()
+
+# --- Event Stream ---
+# Server-sent events for /api/v1/events: collection lifecycle and per-phase progress, then one "generation" event
+# with the per-object delta each time a new cache generation is installed.
+EVENT_KEEPALIVE_S = 15
+EVENT_QUEUE_SIZE = 256
+event_subscribers: Set[asyncio.Queue] = set()
+event_sequence = itertools.count(1)
+
+def publish_event(event_type: str, payload: Dict[str, Any]):
+    """Queues an event for every subscriber. Must run on the event loop (use call_soon_threadsafe from threads).
+    A subscriber too slow to keep up loses its backlog and gets a "resync" event telling it to reload the full graph."""
+    event = {"id": next(event_sequence), "type": event_type, "data": payload}
+    for queue in list(event_subscribers):
+        if queue.full():
+            while not queue.empty(): queue.get_nowait()
+            queue.put_nowait({"id": event["id"], "type": "resync", "data": {"reason": "Subscriber fell behind; reload the scene graph."}})
+        else:
+            queue.put_nowait(event)
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+def format_generation_delta(delta: Dict[str, Any]) -> Dict[str, Any]:
+    """Adds the scene-graph node id to each delta entry."""
+    for entry in delta["added"] + delta["removed"] + delta["changed"]:
+        entry["id"] = create_graph_node_id(entry["type"], entry.pop("primary_id"))
+    return delta
+
+def write_inventory_store(snapshot: InventorySnapshot, previous: Optional[InventorySnapshot], changes: Optional[Dict[str, Any]]):
+    try:
+        result = inventory_store.write_snapshot(snapshot, previous, changes)
+        logger.info(f"Wrote cache generation {snapshot.generation} to {INVENTORY_DB_PATH} ({result['objects_written']} objects, incremental: {result['incremental']}).")
+    except Exception as e:
+        logger.error(f"Failed to write inventory store {INVENTORY_DB_PATH}: {e}", exc_info=True)
+
+def record_datastore_capacity(snapshot: InventorySnapshot):
+    try:
+        if datastore_history.record_snapshot(snapshot): datastore_history.save()
+    except Exception as e:
+        logger.error(f"Failed to record datastore capacity history to {DATASTORE_HISTORY_PATH}: {e}", exc_info=True)
+
+async def record_generation(previous: Optional[InventorySnapshot], new_snapshot: InventorySnapshot,
+                            known_changes: Optional[Dict[str, Dict[Tuple[str, str], Any]]] = None):
+    """Appends the new generation to the history and streams its delta to event subscribers. known_changes, when the
+    collector published them, spares decoding and diffing both generations."""
+    def record():
+        changes = app_state["history"].record(previous, new_snapshot, known_changes)
+        if CACHE_MODE == "local": record_datastore_capacity(new_snapshot)
+        if CACHE_MODE == "local" and inventory_store is not None: write_inventory_store(new_snapshot, previous, changes)
+        return compute_generation_delta(previous, new_snapshot, changes) if event_subscribers else None
+    delta = await asyncio.to_thread(record)
+    if delta is not None: publish_event("generation", format_generation_delta(delta))
+
+def get_snapshot() -> InventorySnapshot:
+    """Returns the current cache generation. Take it once per request and read only from it."""
+    snapshot = app_state["snapshot"]
+    if snapshot is None:
+        logger.warning("Attempted to access cache, but it's not initialized.")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Data cache not initialized. Please try refreshing data.",
+        )
+    return snapshot
+
+async def install_snapshot(transform: Callable[[Optional[InventorySnapshot]], InventorySnapshot]) -> InventorySnapshot:
+    """Builds the next generation from the current one off the event loop, then swaps it in atomically."""
+    async with snapshot_install_lock:
+        previous = app_state["snapshot"]
+        new_snapshot = await asyncio.to_thread(transform, previous)
+        app_state["snapshot"] = new_snapshot
+        # Recorded under the lock so the history and subscribers receive generations in order.
+        await record_generation(previous, new_snapshot)
+    logger.info(f"Installed cache generation {new_snapshot.generation}.")
+    return new_snapshot
+
+async def sync_shared_snapshot():
+    """Loads the generation last published by the collector process, if this worker does not have it yet."""
+    async with snapshot_install_lock:
+        reader = app_state["shared_reader"]
+        new_snapshot = await asyncio.to_thread(reader.read_if_changed)
+        if new_snapshot is not None:
+            previous = app_state["snapshot"]
+            app_state["snapshot"] = new_snapshot
+            known_changes = await asyncio.to_thread(reader.read_changes, previous.generation) if previous is not None else None
+            await record_generation(previous, new_snapshot, known_changes)
+            logger.info(f"Loaded shared cache generation {new_snapshot.generation} from {SNAPSHOT_PATH}.")
+
+async def follow_shared_snapshot():
+    while True:
+        try:
+            await sync_shared_snapshot()
+        except Exception as e:
+            logger.error(f"Failed to load shared snapshot {SNAPSHOT_PATH}: {e}", exc_info=True)
+        await asyncio.sleep(SNAPSHOT_POLL_S)
+
+async def wait_for_collector_request(request_id: str) -> Optional[Dict[str, Any]]:
+    """Waits until the collector process reports request_id as done and this worker has loaded the resulting generation."""
+    deadline = time.monotonic() + SHARED_REQUEST_TIMEOUT_S
+    while time.monotonic() < deadline:
+        collector_status = await asyncio.to_thread(read_collector_status, SNAPSHOT_PATH)
+        result = (collector_status or {}).get("completed_requests", {}).get(request_id)
+        if result:
+            await sync_shared_snapshot()
+            return result
+        await asyncio.sleep(0.1)
+    return None
+
 # --- Data Collection Logic ---
-async def collect_and_cache_data():
+def claim_collection() -> bool:
+    """Check-and-set of is_collecting. It never yields to the event loop, so two requests cannot both claim it."""
     if app_state["is_collecting"]:
+        return False
+    app_state["is_collecting"] = True
+    return True
+
+async def collect_and_cache_data(profile: str = "full", datacenters: Optional[List[str]] = None, clusters: Optional[List[str]] = None, already_claimed: bool = False):
+    if not already_claimed and not claim_collection():
         logger.warning("Data collection attempt while another is in progress.")
         return False, "Data collection is already in progress."
-    app_state["is_collecting"] = True
-    logger.info("Starting data collection from vSphere...")
+    logger.info(f"Starting data collection from vSphere (profile '{profile}', datacenters={datacenters}, clusters={clusters})...")
     start_time = datetime.now(timezone.utc)
+    loop = asyncio.get_running_loop()
+    publish_event("collection_started", {"profile": profile, "datacenters": datacenters, "clusters": clusters})
+    report_progress = lambda progress: loop.call_soon_threadsafe(publish_event, "collection_progress", progress)
+    control = collection_worker or vsphere_collector.CollectionControl()
+    app_state["collection_control"] = control
     try:
-        _, collected_data = await asyncio.to_thread(vsphere_collector.main)
+        try:
+            if collection_worker is not None:
+                # Past the watchdog the worker process is killed and restarted.
+                collected_data = await asyncio.to_thread(collection_worker.collect, profile, datacenters, clusters, report_progress, COLLECTION_WATCHDOG_S)
+            else:
+                _, collected_data = await asyncio.wait_for(asyncio.to_thread(
+                    vsphere_collector.main, profile, datacenters, clusters, report_progress, control,
+                ), COLLECTION_WATCHDOG_S)
+        except (asyncio.TimeoutError, TimeoutError):
+            # A collection thread cannot be killed: ask it to stop and release the collection slot; its result will be ignored.
+            control.cancel()
+            app_state["last_collection_status"] = "Failed (Timeout)"
+            app_state["last_collection_message"] = f"Data collection did not finish within {COLLECTION_WATCHDOG_S:.0f}s and was abandoned."
+            logger.error(app_state["last_collection_message"])
+            return False, app_state["last_collection_message"]
         end_time = datetime.now(timezone.utc)
         duration = end_time - start_time
         logger.info(
             f"Data collection attempt finished in {duration.total_seconds():.2f} seconds."
         )
         if collected_data:
-            app_state["cached_data"] = collected_data
+            await install_snapshot(lambda current: apply_collection_result(current, collected_data, end_time))
+            outcome, incomplete_phases = vsphere_collector.collection_outcome(collected_data["collection_meta"])
             app_state["last_collection_timestamp_utc"] = end_time
-            app_state["last_collection_status"] = "Success"
-            app_state[
-                "last_collection_message"
-            ] = f"Data collected successfully at {end_time.isoformat()} (took {duration.total_seconds():.2f}s)"
-            logger.info(app_state["last_collection_message"])
-            return True, app_state["last_collection_message"]
+            app_state["last_collection_status"] = outcome
+            app_state["last_collection_phases"] = collected_data["collection_meta"].get("phases")
+            if incomplete_phases:
+                app_state["last_collection_message"] = f"Data collection {outcome.lower()} at {end_time.isoformat()} (took {duration.total_seconds():.2f}s): {incomplete_phases}; those sections keep their previous data"
+                logger.warning(app_state["last_collection_message"])
+            else:
+                app_state["last_collection_message"] = f"Data collected successfully at {end_time.isoformat()} (took {duration.total_seconds():.2f}s)"
+                logger.info(app_state["last_collection_message"])
+            return outcome == "Success", app_state["last_collection_message"]
         else:
             app_state["last_collection_status"] = "Failed"
             app_state[
@@ -65,13 +287,46 @@ async def collect_and_cache_data():
         return False, error_message
     finally:
         app_state["is_collecting"] = False
+        app_state["collection_control"] = None
+        publish_event("collection_finished", {
+            "status": app_state["last_collection_status"],
+            "message": app_state["last_collection_message"],
+            "cache_generation": app_state["snapshot"].generation if app_state["snapshot"] else None,
+        })
 
 # --- Application Lifespan ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if CACHE_MODE == "shared":
+        # The samples live in this process's ring buffers: each worker would poll vCenter for its own copy.
+        if METRICS_INTERVAL_S > 0:
+            raise RuntimeError("VLENS_METRICS_INTERVAL_S is only supported in local cache mode; unset it with VLENS_CACHE_MODE=shared.")
+        logger.info(f"API Server starting up in shared cache mode, following {SNAPSHOT_PATH}...")
+        app_state["shared_reader"] = SharedSnapshotReader(SNAPSHOT_PATH)
+        follow_task = asyncio.create_task(follow_shared_snapshot())
+        yield
+        follow_task.cancel()
+        if trace_exporter: trace_exporter.stop()
+        logger.info("API Server shutting down...")
+        return
+    try:
+        datastore_history.load_if_changed()
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable datastore history {DATASTORE_HISTORY_PATH}: {e}")
+    if collection_worker is not None:
+        await asyncio.to_thread(collection_worker.start)
     logger.info("API Server starting up, initiating first data collection...")
     await collect_and_cache_data()
+    if METRICS_INTERVAL_S > 0:
+        logger.info(f"Starting performance metrics sampling every {METRICS_INTERVAL_S}s...")
+        app_state["metrics_poller"] = MetricsPoller(metrics_store, lambda: app_state["snapshot"], METRICS_INTERVAL_S, METRICS_BATCH_SIZE, METRICS_INCLUDE_VMS)
+        app_state["metrics_poller"].start()
     yield
+    if app_state["metrics_poller"]: app_state["metrics_poller"].stop()
+    if collection_worker is not None: await asyncio.to_thread(collection_worker.stop)
+    # Session of the targeted refreshes and the metrics poller (after the poller has stopped using it)
+    await asyncio.to_thread(vsphere_collector.close_persistent_service_instance)
+    if trace_exporter: trace_exporter.stop()
     logger.info("API Server shutting down...")
 
 # --- FastAPI Application Setup ---
@@ -99,7 +354,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware, exporter=trace_exporter, min_export_ms=TRACE_MIN_MS)
 
 # --- Pydantic Models for Visualization ---
 class VisualizationNode(BaseModel):
@@ -108,6 +366,8 @@ class VisualizationNode(BaseModel):
     label: str
     status: Optional[str] = None
     data: Dict[str, Any]
+    metrics: Optional[Dict[str, Any]] = None
+    position: Optional[List[float]] = None
 
 class VisualizationEdge(BaseModel):
     id: str
@@ -115,9 +375,40 @@ class VisualizationEdge(BaseModel):
     target: str
     label: str
 
+# Graph elements built per request from trusted cache records. They are plain dataclasses, not the models above:
+# the fast JSON path encodes them directly, and VisualizationNode/VisualizationEdge only document the response schema.
+@dataclass
+class SceneNode:
+    id: str
+    type: str
+    label: str
+    status: Optional[str]
+    data: Dict[str, Any]
+    metrics: Optional[Dict[str, Any]] = None
+    position: Optional[List[float]] = None
+
+@dataclass
+class SceneEdge:
+    id: str
+    source: str
+    target: str
+    label: str
+
 class SceneGraphResponse(BaseModel):
     nodes: List[VisualizationNode]
     edges: List[VisualizationEdge]
+    layout: Optional[Dict[str, Any]] = None
+    aggregation: Optional[Dict[str, Any]] = None
+    roots: List[str] = Field(default_factory=list, description="Node ids of the starting objects.")
+    unresolved_start_objects: List[str] = Field(default_factory=list, description="Requested starting objects not found in the cache.")
+
+class AggregateMembersResponse(BaseModel):
+    aggregate_id: str
+    member_type: str
+    cache_generation: int
+    total: int
+    nodes: List[VisualizationNode]
+    edges: List[VisualizationEdge]
 
 class VMDependencyInclusionConfig(BaseModel):
     include_host: bool = Field(True, description="Include the host the VM is running on.")
@@ -128,11 +419,25 @@ class VMDependencyInclusionConfig(BaseModel):
 class HostDepth2InclusionConfig(BaseModel):
     include_vms_on_host: bool = Field(True, description="If exploring a host at depth 2, include other VMs on this host.")
 
+class SceneGraphSelector(BaseModel):
+    custom_attribute: Optional[str] = Field(default=None, description="Select the VMs whose custom attribute with this name...")
+    custom_attribute_value: Optional[str] = Field(default=None, description="...has this value (any value if omitted).")
+    resource_pool: Optional[str] = Field(default=None, description="Select the VMs of this resource pool (name or MOR id) and of its child pools.")
+    cluster_name: Optional[str] = Field(default=None, description="Cluster of the resource pool, if its name is ambiguous (e.g. 'Resources').")
+
 class VisualizationConfig(BaseModel):
-    start_object_identifier: str = Field(
-        ...,
+    start_object_identifier: Optional[str] = Field(
+        default=None,
         description="Identifier (e.g., name or Instance UUID) of the starting object for the graph."
     )
+    start_objects: List[str] = Field(
+        default_factory=list,
+        description="Additional starting objects (names or Instance UUIDs), explored together into one deduplicated graph."
+    )
+    selector: Optional[SceneGraphSelector] = Field(
+        default=None,
+        description="Select the starting VMs by custom attribute or resource pool, e.g. every VM of an application."
+    )
     start_object_type: Literal["VM"] = Field(
         default="VM",
         description="Type of the starting object. Currently, only 'VM' is fully supported as a start type."
@@ -151,6 +456,23 @@ class VisualizationConfig(BaseModel):
         le=2,
         description="Exploration depth: 1 for direct dependencies, 2 for dependencies of direct dependencies."
     )
+    include_metrics: bool = Field(
+        default=False,
+        description="Attach the latest performance metrics to VM, Host and Datastore nodes (requires VLENS_METRICS_INTERVAL_S)."
+    )
+    max_nodes: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description="Node budget: above it, sibling nodes of the same type are collapsed into Aggregate nodes (default: VLENS_SCENE_MAX_NODES, 0 disables; off unless set)."
+    )
+    layout: Optional[Literal["force", "layered"]] = Field(
+        default=None,
+        description="Compute node positions server-side: 'force' (force-directed) or 'layered' (one layer per object type). None leaves layout to the client."
+    )
+    layout_dimensions: Literal[2, 3] = Field(
+        default=2,
+        description="Number of coordinates in each node's position when a layout is requested: 2 ([x, y]) or 3 ([x, y, z])."
+    )
 
 # --- Pydantic Models for DAT (Document d'Architecture Technique) ---
 class DAT_VM_Identification(BaseModel):
@@ -216,6 +538,7 @@ class DAT_VM_Nic(BaseModel):
     guest_net_connected_status: Optional[bool] = None
     connected_network_info: Optional[DAT_VM_Network_ConnectedNetwork] = None
     guest_ips: List[str] = Field(default_factory=list)
+    guest_ip_addresses: List[Dict[str, Any]] = Field(default_factory=list)
 
 class DAT_Hosting_Host(BaseModel):
     name: Optional[str] = None
@@ -254,15 +577,95 @@ class VMDATResponse(BaseModel):
 class DATGenerationRequest(BaseModel):
     vm_identifier: str = Field(..., description="Nom ou Instance UUID de la VM pour laquelle générer le DAT.")
 
+# --- Pydantic Models for Collection ---
+class RefreshRequest(BaseModel):
+    profile: Literal["full", "vms-only", "placement", "storage", "network"] = Field(
+        default="full",
+        description="Collection profile: 'full', 'vms-only', 'placement' (hosts without network/storage details, VMs, pools), 'storage' or 'network'."
+    )
+    datacenters: Optional[List[str]] = Field(default=None, description="Restrict the collection to these datacenter names.")
+    clusters: Optional[List[str]] = Field(default=None, description="Restrict the collection to these cluster names.")
+
 # --- Helper Functions ---
-def get_data_from_cache(key: str) -> Optional[Any]:
-    if not app_state["cached_data"]:
-        logger.warning("Attempted to access cache, but it's not initialized.")
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Data cache not initialized. Please try refreshing data.",
+def aggregation_parameters(config: VisualizationConfig, max_nodes: int) -> Dict[str, Any]:
+    """The parts of a scene-graph request that determine its aggregates, carried by their expand tokens."""
+    return {**config.model_dump(exclude={"include_metrics", "layout", "layout_dimensions"}), "max_nodes": max_nodes}
+
+def plan_scene_aggregation(nodes_map: Dict[str, SceneNode], edges: List[SceneEdge], max_nodes: int, root_ids: Set[str]) -> List[AggregateGroup]:
+    # Roots stay visible unless they alone would use most of the budget.
+    protected = root_ids if len(root_ids) <= max_nodes // 2 else set()
+    return plan_aggregation({node_id: node.type for node_id, node in nodes_map.items()}, [(e.source, e.target, e.label) for e in edges], max_nodes, protected)
+
+def aggregate_scene_graph(generation: int, nodes_map: Dict[str, SceneNode], edges: List[SceneEdge], max_nodes: int,
+                          root_ids: Set[str], parameters: Dict[str, Any]) -> Tuple[Dict[str, SceneNode], List[SceneEdge], Optional[Dict[str, Any]]]:
+    """Collapses siblings into aggregate nodes until the graph fits max_nodes; their members are paged in by expand token."""
+    groups = plan_scene_aggregation(nodes_map, edges, max_nodes, root_ids)
+    if not groups: return nodes_map, edges, None
+    edge_tuples = [(e.source, e.target, e.label) for e in edges]
+    aggregated = {member for group in groups for member in group.member_ids}
+    reduced_nodes = {node_id: node for node_id, node in nodes_map.items() if node_id not in aggregated}
+    for group in groups:
+        members = [nodes_map[member] for member in group.member_ids]
+        label, stats = summarize_members(group.member_type, [m.data for m in members])
+        token = expand_token(generation, group.aggregate_id, parameters)
+        reduced_nodes[group.aggregate_id] = SceneNode(
+            id=group.aggregate_id, type=AGGREGATE_TYPE, label=label, status=None,
+            data={"member_type": group.member_type, "stats": stats, "expand_token": token, "members_preview": [m.label for m in members[:MEMBER_PREVIEW]]},
         )
-    data = app_state["cached_data"].get(key)
+    original_edges = {(e.source, e.target, e.label): e for e in edges}
+    reduced_edges = []
+    for source, target, label, multiplicity in rewrite_edges(edge_tuples, groups):
+        if source in nodes_map and target in nodes_map:
+            reduced_edges.append(original_edges[(source, target, label)])
+            continue
+        safe_label_for_id = "".join(c if c.isalnum() else "_" for c in label)
+        reduced_edges.append(SceneEdge(id=f"edge-{source}-to-{target}-{safe_label_for_id}", source=source, target=target,
+                                               label=label if multiplicity == 1 else f"{label} ({multiplicity})"))
+    return reduced_nodes, reduced_edges, {
+        "max_nodes": max_nodes, "original_nodes": len(nodes_map), "original_edges": len(edges), "aggregates": len(groups),
+        "aggregated_nodes": len(aggregated),
+    }
+
+async def apply_scene_layout(nodes: List[SceneNode], edges: List[SceneEdge], algorithm: str, dimensions: int) -> Dict[str, Any]:
+    """Sets each node's position, from the layout cache when the same graph was laid out before."""
+    start_time = time.perf_counter()
+    node_ids, node_types = [n.id for n in nodes], [n.type for n in nodes]
+    edge_pairs = [(e.source, e.target) for e in edges]
+    signature = graph_signature(node_ids, node_types, edge_pairs, algorithm, dimensions)
+    positions = layout_cache.get(signature)
+    cached = positions is not None
+    if not cached:
+        positions = await asyncio.to_thread(compute_layout, node_ids, node_types, edge_pairs, algorithm, dimensions)
+        layout_cache.put(signature, positions)
+    for node in nodes: node.position = positions.get(node.id)
+    return {"algorithm": algorithm, "dimensions": dimensions, "signature": signature, "cached": cached,
+            "duration_ms": round((time.perf_counter() - start_time) * 1000, 1)}
+
+def json_response(body: bytes) -> Response:
+    """Response for a body encoded by the fast path; the endpoint's response_model then only documents the schema."""
+    return Response(content=body, media_type="application/json")
+
+def encode_record(snapshot: Optional[InventorySnapshot], object_type: str, record: Dict[str, Any]) -> bytes:
+    """JSON of a cache record, reused while the record is unchanged (records without a content hash are encoded each time)."""
+    # Records read from the inventory store are never the object table's: do not build the table just to find out.
+    if inventory_store is not None and snapshot is not None and "object_table" not in snapshot.built_indexes(): return dumps(record)
+    key = object_key(object_type, record) if snapshot is not None and object_type in OBJECT_KEY_FIELDS else None
+    entry = snapshot.object_table.get(key) if key else None
+    if entry is None or entry[0] is not record: return dumps(record)
+    return json_fragments.get_or_encode(("record", entry[1]), lambda: dumps(record))
+
+def encode_scene_nodes(snapshot: Optional[InventorySnapshot], nodes: List[SceneNode]) -> bytes:
+    return encode_array(
+        encode_object({"id": node.id, "type": node.type, "label": node.label, "status": node.status}, "data",
+                      encode_record(snapshot, node.type, node.data), {"metrics": node.metrics, "position": node.position})
+        for node in nodes
+    )
+
+def scene_edge_fields(edges: List[SceneEdge]) -> List[Dict[str, Any]]:
+    return [{"id": e.id, "source": e.source, "target": e.target, "label": e.label} for e in edges]
+
+def get_data_from_cache(snapshot: InventorySnapshot, key: str) -> Optional[Any]:
+    data = snapshot.get(key)
     if data is None:
         logger.warning(f"Key '{key}' not found in cached data.")
     return data
@@ -304,42 +707,79 @@ def project_fields(item: Dict[str, Any], fields: Optional[str] = None) -> Dict[s
     selected_fields = [field.strip() for field in fields.split(",")]
     return {field: item.get(field) for field in selected_fields if field in item}
 
-def find_vm_by_identifier(vm_identifier: str) -> Optional[Dict[str, Any]]:
-    vms = get_data_from_cache("vms")
-    if vms:
-        for vm in vms:
-            if vm.get("name") == vm_identifier or vm.get("instance_uuid") == vm_identifier:
-                return vm
+def from_inventory_store(snapshot: InventorySnapshot, lookup: Callable[[InventoryStore, int], Any], fallback: Callable[[], Any]) -> Any:
+    """lookup's result when the inventory store holds the snapshot's generation, else fallback's (the lookup indexes)."""
+    if inventory_store is not None:
+        try:
+            result = lookup(inventory_store, snapshot.generation)
+            count("store_lookups")
+            return result
+        except StaleGenerationError:
+            count("store_fallbacks")  # written after the generation was installed, or already replaced by the next one
+        except sqlite3.Error as e:
+            logger.warning(f"Inventory store lookup failed, using the cache indexes: {e}")
+    return fallback()
+
+def find_vm_by_identifier(snapshot: InventorySnapshot, vm_identifier: str) -> Optional[Dict[str, Any]]:
+    with timer("lookup.vm"):
+        vm = from_inventory_store(snapshot, lambda store, generation: store.find("vms", ("name", "instance_uuid"), vm_identifier, generation),
+                                  lambda: snapshot.lookup_indexes["vm_by_name"].get(vm_identifier) or snapshot.lookup_indexes["vm_by_uuid"].get(vm_identifier))
+    if vm: return vm
     logger.warning(f"VM with identifier '{vm_identifier}' not found in cache.")
     return None
 
-def find_host_by_name(host_name: str) -> Optional[Dict[str, Any]]:
-    infra = get_data_from_cache("infrastructure")
-    if infra and infra.get("datacenters"):
-        for dc in infra["datacenters"]:
-            for cluster in dc.get("clusters", []):
-                for host in cluster.get("hosts", []):
-                    if host.get("name") == host_name: return host
-            for host in dc.get("standalone_hosts", []):
-                if host.get("name") == host_name: return host
+def select_scene_vms(snapshot: InventorySnapshot, selector: SceneGraphSelector) -> List[Dict[str, Any]]:
+    vms = list(snapshot.get("vms") or [])
+    count("cache_scans")
+    count("records_scanned", len(vms))
+    if selector.custom_attribute and selector.custom_attribute_value is not None:
+        # The index matches case-insensitively; the selector keeps its exact match.
+        entries = snapshot.attribute_index.lookup(selector.custom_attribute, selector.custom_attribute_value, {"VM"})
+        matching_ids = {entry["object_id"] for entry in entries
+                        if entry["attribute"] == selector.custom_attribute and str(entry["value"]) == selector.custom_attribute_value}
+        vms = [vm for vm in vms if (vm.get("instance_uuid") or vm.get("name")) in matching_ids]
+    elif selector.custom_attribute:
+        vms = [vm for vm in vms if selector.custom_attribute in (vm.get("custom_attributes") or {})]
+    if selector.resource_pool:
+        # The pool and its child pools: each subtree is one contiguous slice of the tree (same name in several clusters: all of them).
+        tree = snapshot.resource_pool_tree
+        pool_positions = [i for position in tree.find(selector.resource_pool, selector.cluster_name) for i in range(position, tree.subtree_end[position])]
+        count("records_scanned", len(pool_positions))
+        pool_vm_ids = {member.get("instance_uuid") or member.get("name") for i in pool_positions for member in tree.members[i]}
+        vms = [vm for vm in vms if (vm.get("instance_uuid") or vm.get("name")) in pool_vm_ids]
+    return vms
+
+def find_host_by_name(snapshot: InventorySnapshot, host_name: str) -> Optional[Dict[str, Any]]:
+    with timer("lookup.host"):
+        host = from_inventory_store(snapshot, lambda store, generation: store.find("hosts", ("name",), host_name, generation),
+                                    lambda: snapshot.lookup_indexes["host_by_name"].get(host_name))
+    if host: return host
     logger.warning(f"Host with name '{host_name}' not found in cache.")
     return None
 
-def find_datastore_by_name(datastore_name: str) -> Optional[Dict[str, Any]]:
-    datastores = get_data_from_cache("datastores")
-    if datastores:
-        for ds in datastores:
-            if ds.get("name") == datastore_name: return ds
+def find_host_placement(snapshot: InventorySnapshot, host_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Returns {"cluster": cluster without its hosts or None, "datacenter": {"name"}} for a cached host, matched by BIOS UUID or name."""
+    def from_indexes():
+        placements = snapshot.lookup_indexes["host_placement"]
+        if host_data.get("uuid_bios") and ("uuid_bios", host_data["uuid_bios"]) in placements:
+            return placements[("uuid_bios", host_data["uuid_bios"])]
+        return placements.get(("name", host_data.get("name")))
+    with timer("lookup.host_placement"):
+        return from_inventory_store(snapshot, lambda store, generation: store.host_placement(host_data, generation), from_indexes)
+
+def find_datastore_by_name(snapshot: InventorySnapshot, datastore_name: str) -> Optional[Dict[str, Any]]:
+    with timer("lookup.datastore"):
+        ds = from_inventory_store(snapshot, lambda store, generation: store.find("datastores", ("name",), datastore_name, generation),
+                                  lambda: snapshot.lookup_indexes["datastore_by_name"].get(datastore_name))
+    if ds: return ds
     logger.warning(f"Datastore with name '{datastore_name}' not found in cache.")
     return None
 
-def find_network_by_name_or_key(network_identifier: str) -> Optional[Dict[str, Any]]:
-    networks = get_data_from_cache("global_networks")
-    if networks:
-        for pg_type_key in ["standard_port_groups_summary", "distributed_port_groups"]:
-            for net in networks.get(pg_type_key, []):
-                if net.get("name") == network_identifier or net.get("key") == network_identifier:
-                    return net
+def find_network_by_name_or_key(snapshot: InventorySnapshot, network_identifier: str) -> Optional[Dict[str, Any]]:
+    with timer("lookup.network"):
+        net = from_inventory_store(snapshot, lambda store, generation: store.find("networks", ("name", "key"), network_identifier, generation),
+                                   lambda: snapshot.lookup_indexes["network_by_id"].get(network_identifier))
+    if net: return net
     logger.warning(f"Network with identifier '{network_identifier}' not found in cache.")
     return None
 
@@ -350,6 +790,28 @@ def create_graph_node_id(obj_type: str, identifier: Union[str, int]) -> str:
 # --- API Endpoints (Non-Visualization) ---
 @app.get("/api/v1/status", summary="Statut de la collecte de données vSphere", tags=["Status"])
 async def get_collection_status():
+    now = datetime.now(timezone.utc)
+    snapshot = app_state["snapshot"]
+    sections = {
+        name: {
+            "collected_at_utc": info["collected_at_utc"].isoformat(),
+            "age_seconds": round((now - info["collected_at_utc"]).total_seconds(), 1),
+            "profile": info["profile"],
+            "scope": info["scope"],
+        }
+        for name, info in (snapshot.section_timestamps.items() if snapshot else [])
+    }
+    if CACHE_MODE == "shared":
+        collector_status = read_collector_status(SNAPSHOT_PATH) or {}
+        return {
+            "last_collection_timestamp_utc": collector_status.get("last_collection_timestamp_utc"),
+            "last_collection_status": collector_status.get("last_collection_status", "Collector not running"),
+            "last_collection_message": collector_status.get("last_collection_message", ""),
+            "is_currently_collecting": collector_status.get("is_collecting", False),
+            "last_collection_phases": collector_status.get("last_collection_phases"),
+            "cache_generation": snapshot.generation if snapshot else None,
+            "sections": sections,
+        }
     timestamp_iso = (
         app_state["last_collection_timestamp_utc"].isoformat()
         if app_state["last_collection_timestamp_utc"]
@@ -360,6 +822,10 @@ async def get_collection_status():
         "last_collection_status": app_state["last_collection_status"],
         "last_collection_message": app_state["last_collection_message"],
         "is_currently_collecting": app_state["is_collecting"],
+        "last_collection_phases": app_state["last_collection_phases"],
+        "collection_worker": collection_worker.status() if collection_worker else {"mode": "thread"},
+        "cache_generation": snapshot.generation if snapshot else None,
+        "sections": sections,
     }
 
 @app.post(
@@ -368,18 +834,616 @@ async def get_collection_status():
     status_code=status.HTTP_202_ACCEPTED,
     tags=["Admin"],
 )
-async def refresh_vsphere_data_endpoint():
-    if app_state["is_collecting"]:
+async def refresh_vsphere_data_endpoint(request: Optional[RefreshRequest] = None):
+    request = request or RefreshRequest()
+    if CACHE_MODE == "shared":
+        if (read_collector_status(SNAPSHOT_PATH) or {}).get("is_collecting"):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Data collection is already in progress.",
+            )
+        request_id = submit_collector_request(SNAPSHOT_PATH, {"kind": "collection", **request.model_dump()})
+        return {
+            "message": "Data refresh request handed to the collector process. Check /api/v1/status for updates.",
+            "request_id": request_id,
+            "profile": request.profile,
+            "datacenters": request.datacenters,
+            "clusters": request.clusters,
+        }
+    if not claim_collection():
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Data collection is already in progress.",
         )
-    asyncio.create_task(collect_and_cache_data())
+    app_state["collection_task"] = asyncio.create_task(
+        collect_and_cache_data(request.profile, request.datacenters, request.clusters, already_claimed=True))
     return {
-        "message": "Data refresh process initiated. Check /api/v1/status for updates."
+        "message": "Data refresh process initiated. Check /api/v1/status for updates.",
+        "profile": request.profile,
+        "datacenters": request.datacenters,
+        "clusters": request.clusters,
     }
 
+@app.delete(
+    "/api/v1/vsphere/refresh",
+    summary="Annuler la collecte en cours (les phases déjà terminées sont conservées)",
+    status_code=status.HTTP_202_ACCEPTED,
+    tags=["Admin"],
+)
+async def cancel_vsphere_refresh_endpoint():
+    if CACHE_MODE == "shared":
+        if not (read_collector_status(SNAPSHOT_PATH) or {}).get("is_collecting"):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="No data collection is in progress.")
+        request_collection_cancel(SNAPSHOT_PATH)
+        return {"message": "Cancellation handed to the collector process. Check /api/v1/status for the outcome."}
+    control = app_state["collection_control"]
+    if not app_state["is_collecting"] or control is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="No data collection is in progress.")
+    control.cancel()
+    return {"message": "Cancellation requested: the collection stops after the current object. Check /api/v1/status for the outcome."}
+
+@app.post(
+    "/api/v1/vsphere/refresh/{object_type}/{identifier:path}",
+    summary="Rafraîchir un seul objet vSphere (VM, hôte ou datastore) par nom, Instance UUID ou MOR id",
+    tags=["Admin"],
+)
+async def refresh_single_object_endpoint(object_type: Literal["vm", "host", "datastore"], identifier: str):
+    start_time = time.perf_counter()
+    cached_record = find_cached_object(get_snapshot(), object_type, identifier)
+    mor_id = cached_record.get("mor_id") if cached_record else None
+    if CACHE_MODE == "shared":
+        return await refresh_single_object_via_collector(object_type, identifier, mor_id, start_time)
+    try:
+        record = await asyncio.to_thread(vsphere_collector.refresh_single_object, object_type, identifier, mor_id)
+    except Exception as e:
+        logger.error(f"Targeted refresh of {object_type} '{identifier}' failed: {e}", exc_info=True)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Échec du rafraîchissement de {object_type} '{identifier}': {e}")
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{object_type} '{identifier}' introuvable dans vCenter.")
+
+    try:
+        new_snapshot = await install_snapshot(lambda current: apply_object_refresh(current, object_type, identifier, record))
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Hôte '{identifier}' absent du cache, lancez une collecte complète.")
+    duration_ms = (time.perf_counter() - start_time) * 1000
+    logger.info(f"Targeted refresh of {object_type} '{identifier}' done in {duration_ms:.0f} ms.")
+    return {"object_type": object_type, "identifier": identifier, "cache_generation": new_snapshot.generation, "duration_ms": round(duration_ms, 1), "record": record}
+
+async def refresh_single_object_via_collector(object_type: str, identifier: str, mor_id: Optional[str], start_time: float):
+    request_id = submit_collector_request(SNAPSHOT_PATH, {"kind": "object", "object_type": object_type, "identifier": identifier, "mor_id": mor_id})
+    result = await wait_for_collector_request(request_id)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"Le processus collecteur n'a pas traité le rafraîchissement de {object_type} '{identifier}' à temps.")
+    if not result["ok"]:
+        error_status = status.HTTP_404_NOT_FOUND if result["error"] in ("not_found", "not_in_cache") else status.HTTP_502_BAD_GATEWAY
+        raise HTTPException(status_code=error_status, detail=result["message"])
+    snapshot = get_snapshot()
+    duration_ms = (time.perf_counter() - start_time) * 1000
+    return {"object_type": object_type, "identifier": identifier, "cache_generation": snapshot.generation, "duration_ms": round(duration_ms, 1),
+            "record": find_cached_object(snapshot, object_type, mor_id or identifier)}
+
+@app.get(
+    "/api/v1/events",
+    summary="Flux d'événements (SSE) : progression des collectes et deltas par génération",
+    tags=["Status"],
+)
+async def stream_events_endpoint():
+    async def event_generator():
+        queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        event_subscribers.add(queue)
+        try:
+            snapshot = app_state["snapshot"]
+            yield format_sse({"id": 0, "type": "hello", "data": {
+                "cache_generation": snapshot.generation if snapshot else None,
+                "is_collecting": app_state["is_collecting"],
+                "cache_mode": CACHE_MODE,
+            }})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_subscribers.discard(queue)
+    return StreamingResponse(event_generator(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- History Endpoints ---
+@app.get("/api/v1/history", summary="Générations d'inventaire conservées pour les comparaisons", tags=["History"])
+async def list_generations():
+    history = app_state["history"]
+    return {"max_generations": history.max_generations, "size_bytes": history.size_bytes, "generations": history.generations()}
+
+@app.get("/api/v1/diff", summary="Changements entre deux générations d'inventaire", tags=["History"])
+async def diff_generations(
+    from_generation: Optional[int] = Query(None, alias="from", description="Génération de départ."),
+    to_generation: Optional[int] = Query(None, alias="to", description="Génération d'arrivée (par défaut : la génération courante)."),
+    since: Optional[datetime] = Query(None, description="Alternative à 'from' : dernière génération conservée à cette date (ISO 8601)."),
+):
+    snapshot = get_snapshot()
+    history = app_state["history"]
+    to_generation = to_generation if to_generation is not None else snapshot.generation
+    if from_generation is None and since is not None:
+        from_generation = history.generation_at(since if since.tzinfo else since.replace(tzinfo=timezone.utc))
+    if from_generation is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Paramètre 'from' ou 'since' requis (ou aucune génération conservée à cette date).")
+    try:
+        diff = await asyncio.to_thread(history.diff, from_generation, to_generation)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    for object_type, bucket in diff["changes"].items():
+        for entry in bucket["added"] + bucket["removed"] + bucket["changed"]:
+            entry["id"] = create_graph_node_id(object_type, entry["primary_id"])
+    return diff
+
+# --- Performance Metrics Endpoints ---
+MetricEntityType = Literal["vm", "host", "datastore"]
+
+@app.get("/api/v1/metrics/{entity_type}", summary="Dernières valeurs de performance de tous les objets d'un type", tags=["Metrics"])
+async def list_current_metrics(
+    entity_type: MetricEntityType,
+    sort_by: Optional[str] = Query(None, description=f"Métrique de tri décroissant : {', '.join(METRIC_NAMES)}."),
+    limit: int = Query(100, ge=1, le=10000),
+):
+    poller = app_state["metrics_poller"]
+    items = [{"identifier": key[1], **values} for key, values in metrics_store.latest(entity_type).items()]
+    if sort_by:
+        items.sort(key=lambda item: (item.get(sort_by) is None, -(item.get(sort_by) or 0)))
+    return {
+        "entity_type": entity_type,
+        "sampling_enabled": poller is not None,
+        "last_sample_utc": datetime.fromtimestamp(poller.last_sample_utc, timezone.utc).isoformat() if poller and poller.last_sample_utc else None,
+        "last_error": poller.last_error if poller else None,
+        "items": items[:limit],
+    }
+
+@app.get("/api/v1/metrics/{entity_type}/{identifier}", summary="Série récente des métriques de performance d'un objet", tags=["Metrics"])
+async def get_metric_series(
+    entity_type: MetricEntityType,
+    identifier: str,
+    samples: Optional[int] = Query(None, ge=1, description="Nombre d'échantillons les plus récents (par défaut : tout le tampon)."),
+    metrics: Optional[str] = Query(None, description="Métriques à retourner, séparées par des virgules."),
+):
+    snapshot = get_snapshot()
+    record = find_cached_object(snapshot, entity_type, identifier)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{entity_type} '{identifier}' non trouvé dans le cache.")
+    series = metrics_store.series(entity_key_for(entity_type, record), samples, [m.strip() for m in metrics.split(",")] if metrics else None)
+    return {"entity_type": entity_type, "identifier": identifier, "name": record.get("name"), "interval_s": METRICS_INTERVAL_S,
+            **(series or {"timestamps": [], "series": {}})}
+
+# --- Capacity Endpoints ---
+CapacityLevel = Literal["hosts", "clusters", "datacenters", "datastores", "resource_pools"]
+
+@app.get("/api/v1/capacity/{level}", summary="Agrégats de capacité et de surallocation par niveau", tags=["Capacity"])
+async def list_capacity_aggregates(
+    level: CapacityLevel,
+    datacenter_name: Optional[str] = Query(None, description="Filtrer par datacenter."),
+    cluster_name: Optional[str] = Query(None, description="Filtrer par cluster (hôtes et resource pools)."),
+    name_contains: Optional[str] = Query(None, description="Filtrer les noms contenant cette chaîne."),
+    sort_by: Optional[str] = Query(None, description="Champ de tri, ex. vcpu_to_core_ratio ou used_pct."),
+    descending: bool = Query(True, description="Tri décroissant."),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=10000),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules."),
+):
+    snapshot = get_snapshot()
+    rows = snapshot.capacity[level]
+    if sort_by:
+        # None (e.g. a ratio over zero capacity) always sorts last.
+        present = [r for r in rows if r.get(sort_by) is not None]
+        rows = sorted(present, key=lambda r: r[sort_by], reverse=descending) + [r for r in rows if r.get(sort_by) is None]
+    filtered = filter_and_paginate(rows, 0, len(rows), {"datacenter_name": datacenter_name, "cluster_name": cluster_name, "name_contains": name_contains})
+    return {"level": level, "cache_generation": snapshot.generation, "total": len(filtered),
+            "items": filter_and_paginate(filtered, skip, limit, None, fields)}
+
+@app.get("/api/v1/capacity/{level}/{name}", summary="Agrégats de capacité d'un objet", tags=["Capacity"])
+async def get_capacity_aggregate(level: CapacityLevel, name: str, datacenter_name: Optional[str] = Query(None, description="Datacenter, si le nom est ambigu.")):
+    snapshot = get_snapshot()
+    row = find_capacity_row(snapshot.capacity[level], name, datacenter_name)
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"'{name}' introuvable dans les agrégats '{level}'.")
+    return {"level": level, "cache_generation": snapshot.generation, **row}
+
+# --- Resource Pool Endpoints ---
+@app.get("/api/v1/resource-pools/tree", summary="Arborescence des resource pools avec réservations, limites et VMs cumulées", tags=["Resource Pools"])
+async def get_resource_pool_forest(
+    datacenter_name: Optional[str] = Query(None, description="Filtrer par datacenter."),
+    cluster_name: Optional[str] = Query(None, description="Filtrer par cluster."),
+    depth: Optional[int] = Query(None, ge=0, description="Niveaux de pools enfants à inclure (tous par défaut)."),
+    include_vms: bool = Query(False, description="Inclure les VMs directement membres de chaque pool."),
+):
+    snapshot = get_snapshot()
+    tree = snapshot.resource_pool_tree
+    roots = [tree.subtree(position, depth, include_vms) for position in tree.roots(datacenter_name, cluster_name)]
+    return {"cache_generation": snapshot.generation, "total": len(roots), "roots": roots}
+
+@app.get("/api/v1/resource-pools/tree/{identifier}", summary="Sous-arbre d'un resource pool (par nom ou MOR id)", tags=["Resource Pools"])
+async def get_resource_pool_subtree(
+    identifier: str,
+    cluster_name: Optional[str] = Query(None, description="Cluster, si le nom est ambigu."),
+    depth: Optional[int] = Query(None, ge=0, description="Niveaux de pools enfants à inclure (tous par défaut)."),
+    include_vms: bool = Query(False, description="Inclure les VMs directement membres de chaque pool."),
+):
+    snapshot = get_snapshot()
+    positions = snapshot.resource_pool_tree.find(identifier, cluster_name)
+    if not positions:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Resource pool '{identifier}' introuvable.")
+    if len(positions) > 1:
+        clusters = sorted({str(snapshot.resource_pool_tree.nodes[p].get("cluster_name")) for p in positions})
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Plusieurs resource pools nommés '{identifier}' ({', '.join(clusters)}) : précisez cluster_name ou le MOR id.")
+    return {"cache_generation": snapshot.generation, **snapshot.resource_pool_tree.subtree(positions[0], depth, include_vms)}
+
+# --- Storage Topology Endpoints ---
+@app.get("/api/v1/storage/luns", summary="LUNs vus par les hôtes (nombre d'hôtes, chemins actifs minimum, datastores)", tags=["Storage"])
+async def list_storage_luns(
+    vendor: Optional[str] = Query(None, description="Filtrer par fabricant."),
+    skip: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000),
+):
+    snapshot = get_snapshot()
+    luns = [lun for lun in snapshot.storage_topology.list_luns() if vendor is None or str(lun.get("vendor") or "").strip().lower() == vendor.strip().lower()]
+    return {"cache_generation": snapshot.generation, "total": len(luns), "items": luns[skip:skip + limit]}
+
+@app.get("/api/v1/storage/luns/{canonical_name}", summary="Hôtes, chemins par état, HBAs et datastores d'un LUN", tags=["Storage"])
+async def get_storage_lun(canonical_name: str):
+    snapshot = get_snapshot()
+    lun = snapshot.storage_topology.lun(canonical_name)
+    if lun is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"LUN '{canonical_name}' introuvable.")
+    return {"cache_generation": snapshot.generation, **lun}
+
+@app.get("/api/v1/storage/redundancy", summary="Couples hôte/LUN sous le nombre minimal de chemins actifs", tags=["Storage"])
+async def get_path_redundancy_report(
+    min_active_paths: int = Query(2, ge=1, le=32, description="Nombre minimal de chemins actifs attendu par LUN et par hôte."),
+    include_local: bool = Query(False, description="Inclure les disques locaux (un seul chemin par nature)."),
+    cluster_name: Optional[str] = Query(None, description="Filtrer par cluster."),
+    skip: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000),
+):
+    snapshot = get_snapshot()
+    report = snapshot.storage_topology.redundancy_report(min_active_paths, include_local, cluster_name)
+    return {"cache_generation": snapshot.generation, **report, "items": report["items"][skip:skip + limit]}
+
+# --- Datastore Forecast Endpoints ---
+async def load_datastore_history():
+    """In shared mode the collector process owns the history file; pick up its latest version."""
+    if CACHE_MODE != "shared": return
+    try:
+        await asyncio.to_thread(datastore_history.load_if_changed)
+    except Exception as e:
+        logger.warning(f"Failed to load datastore history {DATASTORE_HISTORY_PATH}: {e}")
+
+@app.get("/api/v1/forecast/datastores", summary="Tendance de remplissage et date de saturation estimée des datastores", tags=["Forecast"])
+async def list_datastore_forecasts(
+    window_days: float = Query(30, gt=0, description="Période (jours) sur laquelle la tendance est calculée."),
+    datacenter_name: Optional[str] = Query(None, description="Filtrer par datacenter."),
+    name_contains: Optional[str] = Query(None, description="Filtrer les noms contenant cette chaîne."),
+    max_days_until_full: Optional[float] = Query(None, ge=0, description="Ne garder que les datastores saturés avant ce délai (jours)."),
+    sort_by: str = Query("days_until_full", description="Champ de tri, ex. days_until_full ou used_growth_gb_per_day."),
+    descending: bool = Query(False, description="Tri décroissant."),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=10000),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules."),
+):
+    await load_datastore_history()
+    rows = await asyncio.to_thread(datastore_history.forecast, window_days)
+    if max_days_until_full is not None:
+        rows = [r for r in rows if r["days_until_full"] is not None and r["days_until_full"] <= max_days_until_full]
+    # None (no growth, or too few samples) always sorts last.
+    present = [r for r in rows if r.get(sort_by) is not None]
+    rows = sorted(present, key=lambda r: r[sort_by], reverse=descending) + [r for r in rows if r.get(sort_by) is None]
+    filtered = filter_and_paginate(rows, 0, len(rows), {"datacenter_name": datacenter_name, "name_contains": name_contains})
+    return {"window_days": window_days, "history": datastore_history.stats(), "total": len(filtered),
+            "items": filter_and_paginate(filtered, skip, limit, None, fields)}
+
+@app.get("/api/v1/forecast/datastores/{identifier}", summary="Historique de capacité et prévision d'un datastore", tags=["Forecast"])
+async def get_datastore_forecast(
+    identifier: str,
+    window_days: float = Query(30, gt=0, description="Période (jours) sur laquelle la tendance est calculée."),
+    history_days: Optional[float] = Query(None, gt=0, description="Limiter l'historique retourné aux N derniers jours."),
+):
+    await load_datastore_history()
+    record = find_cached_object(app_state["snapshot"], "datastore", identifier) if app_state["snapshot"] else None
+    key = datastore_key(record) if record else identifier  # datastores no longer in the inventory keep their history
+    series = datastore_history.series(key, history_days)
+    if series is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Aucun historique de capacité pour le datastore '{identifier}'.")
+    forecast = next((r for r in await asyncio.to_thread(datastore_history.forecast, window_days) if r["datastore_key"] == key), None)
+    return {"datastore_key": key, "window_days": window_days, "forecast": forecast, "history": series}
+
+# --- Inventory Store Endpoints ---
+InventoryTable = Literal[tuple(STORE_TABLES)]
+InventoryObjectTable = Literal[tuple(OBJECT_TABLES)]
+
+def get_inventory_store() -> InventoryStore:
+    if inventory_store is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Base d'inventaire SQLite non configurée (VLENS_INVENTORY_DB_PATH).")
+    return inventory_store
+
+@app.get("/api/v1/inventory", summary="État de la base d'inventaire SQLite (génération, nombre de lignes par table)", tags=["Inventory"])
+async def get_inventory_store_stats():
+    return await asyncio.to_thread(get_inventory_store().stats)
+
+@app.get("/api/v1/inventory/{table}", summary="Interroger une table d'inventaire (filtres, tri et pagination exécutés en SQL)", tags=["Inventory"])
+async def query_inventory_table(
+    table: InventoryTable,
+    where: List[str] = Query(default=[], description="Filtres combinés : 'colonne=valeur', 'colonne~texte' (contient), ou 'colonne>=valeur' (>, >=, <, <=)."),
+    sort_by: Optional[str] = Query(None, description="Colonne de tri, ex. ram_mb ou free_space_gb."),
+    descending: bool = Query(False, description="Tri décroissant."),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=10000),
+    fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules."),
+):
+    try:
+        result = await asyncio.to_thread(get_inventory_store().query, table, where, sort_by, descending, skip, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"table": table, "cache_generation": result["generation"], "total": result["total"],
+            "items": [project_fields(item, fields) for item in result["items"]]}
+
+@app.get("/api/v1/inventory/{table}/{identifier}", summary="Lire un objet de la base d'inventaire par nom, UUID ou MOR id", tags=["Inventory"])
+async def get_inventory_object(table: InventoryObjectTable, identifier: str,
+                               fields: Optional[str] = Query(None, description="Champs à retourner, séparés par des virgules.")):
+    record = await asyncio.to_thread(get_inventory_store().get, table, identifier)
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"'{identifier}' introuvable dans la table '{table}'.")
+    return project_fields(record, fields)
+
+# --- Search Endpoint ---
+@app.get("/api/v1/search", summary="Recherche plein texte dans l'inventaire (autocomplétion)", tags=["Search"])
+async def search_inventory(
+    q: str = Query(..., min_length=1, description="Fragment recherché : nom, UUID, IP, MAC, valeur d'attribut personnalisé, chemin vmdk..."),
+    types: Optional[str] = Query(None, description="Types à inclure, séparés par des virgules (VM,Host,Datastore,Network,DVS,ResourcePool)."),
+    limit: int = Query(20, ge=1, le=200),
+):
+    start_time = time.perf_counter()
+    snapshot = get_snapshot()
+    object_types = {t.strip() for t in types.split(",") if t.strip()} if types else None
+    results = snapshot.search_index.search(q, limit, object_types)
+    for result in results:
+        # start_object_identifier for the scene graph, and the node id to focus in an open graph
+        result["identifier"] = result.pop("primary_id")
+        result["node_id"] = create_graph_node_id(result["type"], result["identifier"])
+    return {"query": q, "cache_generation": snapshot.generation, "duration_ms": round((time.perf_counter() - start_time) * 1000, 2), "results": results}
+
+# --- Address Lookup Endpoints ---
+def address_lookup_response(snapshot: InventorySnapshot, query: Dict[str, Any], entries: List[Dict[str, Any]], skip: int = 0, limit: int = 1000) -> Dict[str, Any]:
+    items = [{**entry, "node_id": create_graph_node_id(entry["owner_type"], entry["owner_id"])} for entry in entries[skip:skip + limit]]
+    return {**query, "cache_generation": snapshot.generation, "total": len(entries), "items": items}
+
+@app.get("/api/v1/lookup/ip/{ip}", summary="Trouver les VMs et interfaces VMkernel portant une adresse IP", tags=["Lookup"])
+async def lookup_ip_address(ip: str):
+    snapshot = get_snapshot()
+    try:
+        entries = snapshot.address_index.lookup_ip(ip)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Adresse IP invalide : '{ip}'.")
+    return address_lookup_response(snapshot, {"ip": ip}, entries)
+
+@app.get("/api/v1/lookup/mac/{mac}", summary="Trouver l'adaptateur portant une adresse MAC", tags=["Lookup"])
+async def lookup_mac_address(mac: str):
+    snapshot = get_snapshot()
+    return address_lookup_response(snapshot, {"mac": mac}, snapshot.address_index.lookup_mac(mac))
+
+@app.get("/api/v1/lookup/cidr/{cidr:path}", summary="Lister les adresses d'un sous-réseau (ex. 10.20.0.0/16)", tags=["Lookup"])
+async def lookup_cidr(cidr: str, skip: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000)):
+    snapshot = get_snapshot()
+    try:
+        entries = snapshot.address_index.lookup_cidr(cidr)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Réseau CIDR invalide : '{cidr}'.")
+    return address_lookup_response(snapshot, {"cidr": cidr}, entries, skip, limit)
+
+# --- Custom Attribute Endpoints ---
+@app.get("/api/v1/attributes", summary="Attributs personnalisés présents dans l'inventaire (nombre d'objets et de valeurs)", tags=["Attributes"])
+async def list_custom_attributes():
+    snapshot = get_snapshot()
+    return {"cache_generation": snapshot.generation, "attributes": snapshot.attribute_index.attributes()}
+
+@app.get("/api/v1/attributes/{attribute}", summary="VMs et hôtes portant une valeur d'attribut personnalisé (égalité ou préfixe)", tags=["Attributes"])
+async def lookup_custom_attribute(
+    attribute: str,
+    value: Optional[str] = Query(None, description="Valeur exacte (insensible à la casse), ex. App=billing."),
+    prefix: Optional[str] = Query(None, description="Début de la valeur (insensible à la casse). Sans value ni prefix, les valeurs distinctes sont listées."),
+    types: Optional[str] = Query(None, description="Types à inclure, séparés par des virgules (VM,Host)."),
+    skip: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000),
+):
+    snapshot = get_snapshot()
+    if value is not None and prefix is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Indiquez soit 'value', soit 'prefix', pas les deux.")
+    if value is None and prefix is None:
+        values = snapshot.attribute_index.values(attribute)
+        return {"attribute": attribute, "cache_generation": snapshot.generation, "total": len(values), "values": values[skip:skip + limit]}
+    object_types = {t.strip() for t in types.split(",") if t.strip()} if types else None
+    if value is not None: entries = snapshot.attribute_index.lookup(attribute, value, object_types)
+    else: entries = snapshot.attribute_index.lookup_prefix(attribute, prefix, object_types)
+    items = [{**entry, "node_id": create_graph_node_id(entry["object_type"], entry["object_id"])} for entry in entries[skip:skip + limit]]
+    return {"attribute": attribute, "value": value, "prefix": prefix, "cache_generation": snapshot.generation, "total": len(entries), "items": items}
+
+# --- VLAN Endpoints ---
+@app.get("/api/v1/vlans", summary="VLANs des port groups d'accès (nombre de port groups et de cartes réseau de VMs)", tags=["VLAN"])
+async def list_vlans():
+    snapshot = get_snapshot()
+    vlans = snapshot.vlan_index.summary()
+    return {"cache_generation": snapshot.generation, "total": len(vlans), "items": vlans}
+
+@app.get("/api/v1/vlans/coverage", summary="Trunks portant une plage de VLANs et VLANs portés par aucun port group", tags=["VLAN"])
+async def get_vlan_coverage(vlans: str = Query(..., description="VLAN ou plage de VLANs, ex. 220 ou 100-200.")):
+    snapshot = get_snapshot()
+    try:
+        start, end = parse_vlan_range(vlans)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Plage de VLANs invalide : '{vlans}' (0 à 4095).")
+    return {"cache_generation": snapshot.generation, **snapshot.vlan_index.coverage(start, end)}
+
+@app.get("/api/v1/vlans/{vlan_id}", summary="Port groups (standard et distribués), hôtes et VMs d'un VLAN", tags=["VLAN"])
+async def get_vlan_membership(
+    vlan_id: int = Path(..., ge=0, le=4095),
+    include_trunks: bool = Query(True, description="Inclure les port groups trunk qui portent ce VLAN."),
+):
+    snapshot = get_snapshot()
+    return {"cache_generation": snapshot.generation, **snapshot.vlan_index.membership(vlan_id, include_trunks)}
+
 # --- Endpoint for 3D Visualization (Depth-Aware) ---
+def make_scene_node(obj_data: Dict[str, Any], obj_type: str) -> Optional[SceneNode]:
+    primary_id_val = None
+    display_label = obj_data.get("name", "N/A")
+    node_status_val = None
+
+    if obj_type == "VM":
+        primary_id_val = obj_data.get("instance_uuid") or obj_data.get("name")
+        display_label = obj_data.get("name", str(primary_id_val))
+        node_status_val = obj_data.get("power_state")
+    elif obj_type == "Host":
+        primary_id_val = obj_data.get("uuid_bios") or obj_data.get("name")
+        display_label = obj_data.get("name", str(primary_id_val))
+        node_status_val = obj_data.get("status") or obj_data.get("power_state")
+    elif obj_type == "Datastore":
+        primary_id_val = obj_data.get("uuid") or obj_data.get("name")
+        display_label = obj_data.get("name", str(primary_id_val))
+        node_status_val = "accessible" if obj_data.get("accessible") else "inaccessible"
+    elif obj_type == "Network":
+        primary_id_val = obj_data.get("key") or obj_data.get("name")
+        display_label = obj_data.get("name", str(primary_id_val))
+        vlan_info = obj_data.get("vlan_id_info")
+        if vlan_info and vlan_info != "N/A" and str(vlan_info) not in str(display_label):
+            display_label = f"{display_label} (VLAN: {vlan_info})"
+    elif obj_type == "Cluster":
+        primary_id_val = obj_data.get("name")
+        display_label = obj_data.get("name", str(primary_id_val))
+        node_status_val = obj_data.get("overallStatus")
+
+    if not primary_id_val or primary_id_val == "N/A":
+        logger.warning(f"Unique ID not found for {obj_type} with name: {obj_data.get('name', 'Unknown')}. Data: {obj_data}")
+        return None
+    return SceneNode(id=create_graph_node_id(obj_type, primary_id_val), type=obj_type, label=str(display_label), status=node_status_val, data=obj_data)
+
+def resolve_scene_roots(snapshot: InventorySnapshot, config: VisualizationConfig) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """Starting VMs by node id, and the requested identifiers not found in the cache."""
+    if config.start_object_type != "VM":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Type d'objet de départ '{config.start_object_type}' non supporté pour l'instant.")
+    identifiers = ([config.start_object_identifier] if config.start_object_identifier else []) + config.start_objects
+    if not identifiers and config.selector is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Indiquez start_object_identifier, start_objects ou selector.")
+    start_vms: Dict[str, Dict[str, Any]] = {}
+    unresolved: List[str] = []
+    with span("resolve start objects", **{"vlens.identifiers": len(identifiers), "vlens.selector": config.selector is not None}):
+        for identifier in identifiers:
+            vm_data = find_vm_by_identifier(snapshot, identifier)
+            if vm_data: start_vms[create_graph_node_id("VM", vm_data.get("instance_uuid") or vm_data.get("name"))] = vm_data
+            else: unresolved.append(identifier)
+        if config.selector is not None:
+            for vm_data in select_scene_vms(snapshot, config.selector):
+                start_vms.setdefault(create_graph_node_id("VM", vm_data.get("instance_uuid") or vm_data.get("name")), vm_data)
+        set_attributes(**{"vlens.start_vms": len(start_vms), "vlens.unresolved": len(unresolved)})
+    if not start_vms:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Aucune VM de départ trouvée ({', '.join(unresolved) or 'sélecteur sans résultat'}).")
+    return start_vms, unresolved
+
+def iter_scene_graph(snapshot: InventorySnapshot, config: VisualizationConfig,
+                     start_vms: Dict[str, Dict[str, Any]]) -> Iterator[Tuple[int, Union[SceneNode, SceneEdge]]]:
+    """(hop, node or edge) of the scene graph around start_vms, breadth-first: the starting VMs (hop 0), then what they
+    link to, then what the hosts explored at depth 2 link to. A node comes before the edges that reference it. Only ids
+    are kept for deduplication, so the caller decides whether to hold the graph or stream it."""
+    # All roots are explored into the same visited sets, so shared hosts, datastores and networks are visited once.
+    seen: Set[str] = set()
+    edge_keys: Set[Tuple[str, str, str]] = set()
+    edge_counter = 0
+    pending: Deque[Tuple[SceneNode, int]] = deque()
+
+    def visit(obj_data: Dict[str, Any], obj_type: str, depth: int, expand: bool, found: List[Any]) -> Optional[str]:
+        node = make_scene_node(obj_data, obj_type)
+        if node is None: return None
+        if node.id not in seen:
+            seen.add(node.id)
+            count("nodes_added")
+            found.append((depth - 1, node))
+            if expand: pending.append((node, depth))
+        return node.id
+
+    def link(source_id: Optional[str], target_id: Optional[str], label: str, depth: int, found: List[Any]):
+        nonlocal edge_counter
+        if not source_id or not target_id: return
+        if (source_id, target_id, label) in edge_keys:
+            count("edges_deduplicated")
+            return
+        edge_keys.add((source_id, target_id, label))
+        edge_counter += 1
+        safe_label_for_id = "".join(c if c.isalnum() else "_" for c in label)
+        found.append((depth - 1, SceneEdge(id=f"edge-{source_id}-to-{target_id}-{safe_label_for_id}-{edge_counter}", source=source_id, target=target_id, label=label)))
+        count("edges_added")
+
+    found: List[Any] = []
+    for vm_data in start_vms.values(): visit(vm_data, "VM", 1, True, found)
+    yield from found
+    while pending:
+        current_node, current_depth = pending.popleft()
+        found = []
+        count("nodes_expanded")
+        with span(f"explore {current_node.type}", **{"vlens.object": current_node.label, "vlens.depth": current_depth}):
+            if current_node.type == "VM":
+                vm_data = current_node.data
+                inclusions = config.vm_inclusions
+                host_id, host_data = None, None
+                if inclusions.include_host:
+                    host_name_vm = vm_data.get("host_name")
+                    if host_name_vm and host_name_vm != "N/A":
+                        host_data = find_host_by_name(snapshot, host_name_vm)
+                        if host_data:
+                            host_id = visit(host_data, "Host", current_depth + 1, current_depth < config.depth, found)
+                            link(current_node.id, host_id, "Hébergée par", current_depth + 1, found)
+
+                if inclusions.include_cluster_of_host and host_id:
+                    host_placement = find_host_placement(snapshot, host_data)
+                    cluster_data_found = host_placement["cluster"] if host_placement else None
+                    if cluster_data_found:
+                        link(host_id, visit(cluster_data_found, "Cluster", current_depth + 1, False, found), "Membre de", current_depth + 1, found)
+
+                if inclusions.include_datastores:
+                    for disk in vm_data.get("disks", []):
+                        ds_name = disk.get("datastore_name")
+                        if ds_name and ds_name != "N/A":
+                            datastore_data = find_datastore_by_name(snapshot, ds_name)
+                            if datastore_data:
+                                link(current_node.id, visit(datastore_data, "Datastore", current_depth + 1, False, found), "Stockée sur", current_depth + 1, found)
+
+                if inclusions.include_networks:
+                    for nic in vm_data.get("network_adapters", []):
+                        network_identifier_to_search = nic.get("network_name")
+                        portgroup_key = nic.get("portgroup_key_if_dvs")
+                        if portgroup_key and portgroup_key != "N/A":
+                            network_identifier_to_search = portgroup_key
+
+                        if network_identifier_to_search and network_identifier_to_search != "N/A":
+                            network_data = find_network_by_name_or_key(snapshot, network_identifier_to_search)
+                            if not network_data and portgroup_key and portgroup_key != "N/A" and nic.get("network_name") != portgroup_key:
+                                network_data = find_network_by_name_or_key(snapshot, nic.get("network_name"))
+                            if network_data:
+                                link(current_node.id, visit(network_data, "Network", current_depth + 1, False, found), "Connectée à", current_depth + 1, found)
+
+            elif current_node.type == "Host" and config.host_depth2_inclusions.include_vms_on_host:
+                host_name = current_node.data.get("name")
+                vms_on_host = from_inventory_store(snapshot, lambda store, generation: store.find_all("vms", "host_name", host_name, generation),
+                                                   lambda: snapshot.lookup_indexes["vms_by_host"].get(host_name, []))
+                for vm_on_host_data in vms_on_host:
+                    # Starting VMs are linked to their host already ("Hébergée par").
+                    if create_graph_node_id("VM", vm_on_host_data.get("instance_uuid") or vm_on_host_data.get("name")) in start_vms: continue
+                    link(current_node.id, visit(vm_on_host_data, "VM", current_depth + 1, False, found), "Héberge aussi", current_depth + 1, found)
+        yield from found
+
+def collect_scene_graph(snapshot: InventorySnapshot, config: VisualizationConfig,
+                        start_vms: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, SceneNode], List[SceneEdge]]:
+    nodes_map: Dict[str, SceneNode] = {}
+    edges_list: List[SceneEdge] = []
+    with span("traverse", **{"vlens.depth": config.depth, "vlens.roots": len(start_vms)}):
+        for _, item in iter_scene_graph(snapshot, config, start_vms):
+            if isinstance(item, SceneNode): nodes_map[item.id] = item
+            else: edges_list.append(item)
+        set_attributes(**{"vlens.nodes": len(nodes_map), "vlens.edges": len(edges_list)})
+    return nodes_map, edges_list
+
 @app.post(
     "/api/v1/visualization/scene-graph",
     response_model=SceneGraphResponse,
@@ -387,202 +1451,114 @@ async def refresh_vsphere_data_endpoint():
     tags=["Visualization"],
 )
 async def generate_scene_graph_endpoint(config: VisualizationConfig):
-    if not app_state["cached_data"]:
+    snapshot = app_state["snapshot"]
+    if snapshot is None:
         raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Cache de données non initialisé.")
 
-    nodes_map: Dict[str, VisualizationNode] = {}
-    edges_list: List[VisualizationEdge] = []
-    edge_counter = 0
-    processed_for_depth_expansion: Set[str] = set()
-
-    def add_node_to_graph(obj_data: Dict[str, Any], obj_type: str) -> Optional[VisualizationNode]:
-        nonlocal nodes_map
-        primary_id_val = None
-        display_label = obj_data.get("name", "N/A")
-        node_status_val = None
-
-        if obj_type == "VM":
-            primary_id_val = obj_data.get("instance_uuid") or obj_data.get("name")
-            display_label = obj_data.get("name", str(primary_id_val))
-            node_status_val = obj_data.get("power_state")
-        elif obj_type == "Host":
-            primary_id_val = obj_data.get("uuid_bios") or obj_data.get("name")
-            display_label = obj_data.get("name", str(primary_id_val))
-            node_status_val = obj_data.get("status") or obj_data.get("power_state")
-        elif obj_type == "Datastore":
-            primary_id_val = obj_data.get("uuid") or obj_data.get("name")
-            display_label = obj_data.get("name", str(primary_id_val))
-            node_status_val = "accessible" if obj_data.get("accessible") else "inaccessible"
-        elif obj_type == "Network":
-            primary_id_val = obj_data.get("key") or obj_data.get("name")
-            display_label = obj_data.get("name", str(primary_id_val))
-        elif obj_type == "Cluster":
-            primary_id_val = obj_data.get("name")
-            display_label = obj_data.get("name", str(primary_id_val))
-            node_status_val = obj_data.get("overallStatus")
-
-        if not primary_id_val or primary_id_val == "N/A":
-            logger.warning(f"Unique ID not found for {obj_type} with name: {obj_data.get('name', 'Unknown')}. Data: {obj_data}")
-            return None
-
-        node_id = create_graph_node_id(obj_type, primary_id_val)
-        if node_id not in nodes_map:
-            node = VisualizationNode(
-                id=node_id, type=obj_type, label=str(display_label), status=node_status_val, data=obj_data
-            )
-            nodes_map[node_id] = node
-            logger.debug(f"Added node: {node_id} ({obj_type}: {display_label})")
-            return node
-        logger.debug(f"Node already exists: {node_id} ({obj_type}: {display_label})")
-        return nodes_map[node_id]
-
-    def add_edge_to_graph(source_node: Optional[VisualizationNode], target_node: Optional[VisualizationNode], label: str):
-        nonlocal edges_list, edge_counter
-        if not source_node or not target_node:
-            logger.debug(f"Skipping edge creation due to missing source/target. Source: {source_node}, Target: {target_node}")
-            return
-
-        for edge in edges_list:
-            if edge.source == source_node.id and edge.target == target_node.id and edge.label == label:
-                logger.debug(f"Duplicate edge skipped: {source_node.id} -> {target_node.id} ({label})")
-                return
-
-        edge_counter += 1
-        safe_label_for_id = "".join(c if c.isalnum() else "_" for c in label)
-        edge_id = f"edge-{source_node.id}-to-{target_node.id}-{safe_label_for_id}-{edge_counter}"
-        edge = VisualizationEdge(id=edge_id, source=source_node.id, target=target_node.id, label=label)
-        edges_list.append(edge)
-        logger.debug(f"Added edge: {edge_id} ({source_node.label} -{label}-> {target_node.label})")
-
-    def explore_dependencies(current_obj_data: Dict[str, Any], current_obj_type: str, current_depth: int):
-        nonlocal processed_for_depth_expansion
-
-        current_node = add_node_to_graph(current_obj_data, current_obj_type)
-        if not current_node:
-            logger.warning(f"Could not create/retrieve node for {current_obj_type} data: {current_obj_data.get('name', 'N/A')}")
-            return
-
-        if current_node.id in processed_for_depth_expansion:
-            logger.debug(f"Node {current_node.id} ({current_obj_type}) already processed for depth expansion. Skipping further exploration from here.")
-            return
-        processed_for_depth_expansion.add(current_node.id)
-
-        if current_obj_type == "VM" and current_depth <= config.depth:
-            vm_data = current_obj_data
-            vm_node = current_node
-            inclusions = config.vm_inclusions
-            logger.debug(f"Exploring VM '{vm_node.label}' at depth {current_depth}")
-
-            host_node_for_vm: Optional[VisualizationNode] = None
-            if inclusions.include_host:
-                host_name_vm = vm_data.get("host_name")
-                if host_name_vm and host_name_vm != "N/A":
-                    host_data = find_host_by_name(host_name_vm)
-                    if host_data:
-                        host_node_for_vm = add_node_to_graph(host_data, "Host")
-                        if host_node_for_vm:
-                            add_edge_to_graph(vm_node, host_node_for_vm, "Hébergée par")
-                            if current_depth < config.depth:
-                                explore_dependencies(host_data, "Host", current_depth + 1)
-            
-            if inclusions.include_cluster_of_host and host_node_for_vm:
-                host_data_for_cluster_search = host_node_for_vm.data
-                infra_cache = get_data_from_cache("infrastructure")
-                cluster_data_found = None
-                if infra_cache and infra_cache.get("datacenters"):
-                    for dc_item in infra_cache["datacenters"]:
-                        for cluster_item in dc_item.get("clusters", []):
-                            for h_in_cluster in cluster_item.get("hosts", []):
-                                if (host_data_for_cluster_search.get("uuid_bios") and \
-                                    h_in_cluster.get("uuid_bios") == host_data_for_cluster_search.get("uuid_bios")) or \
-                                   (h_in_cluster.get("name") == host_data_for_cluster_search.get("name")):
-                                    cluster_data_found = cluster_item; break
-                            if cluster_data_found: break
-                        if cluster_data_found: break
-                if cluster_data_found:
-                    cluster_node = add_node_to_graph(cluster_data_found, "Cluster")
-                    if cluster_node:
-                        add_edge_to_graph(host_node_for_vm, cluster_node, "Membre de")
-            
-            if inclusions.include_datastores:
-                for disk in vm_data.get("disks", []):
-                    ds_name = disk.get("datastore_name")
-                    if ds_name and ds_name != "N/A":
-                        datastore_data = find_datastore_by_name(ds_name)
-                        if datastore_data:
-                            ds_node = add_node_to_graph(datastore_data, "Datastore")
-                            if ds_node: add_edge_to_graph(vm_node, ds_node, "Stockée sur")
-
-            if inclusions.include_networks:
-                for nic in vm_data.get("network_adapters", []):
-                    network_identifier_to_search = nic.get("network_name")
-                    portgroup_key = nic.get("portgroup_key_if_dvs")
-                    if portgroup_key and portgroup_key != "N/A":
-                        network_identifier_to_search = portgroup_key
-                    
-                    if network_identifier_to_search and network_identifier_to_search != "N/A":
-                        network_data = find_network_by_name_or_key(network_identifier_to_search)
-                        if not network_data and portgroup_key and portgroup_key != "N/A" and nic.get("network_name") != portgroup_key:
-                            network_data = find_network_by_name_or_key(nic.get("network_name"))
-                        
-                        if network_data:
-                            network_node = add_node_to_graph(network_data, "Network")
-                            if network_node:
-                                add_edge_to_graph(vm_node, network_node, "Connectée à")
-                                vlan_info = network_data.get("vlan_id_info")
-                                if vlan_info and vlan_info != "N/A" and str(vlan_info) not in network_node.label:
-                                    network_node.label += f" (VLAN: {vlan_info})"
-                                    nodes_map[network_node.id] = network_node
-
-        elif current_obj_type == "Host" and current_depth <= config.depth:
-            host_data = current_obj_data
-            host_node = current_node
-            logger.debug(f"Exploring Host '{host_node.label}' at depth {current_depth}")
-
-            if config.host_depth2_inclusions.include_vms_on_host:
-                all_vms_cache = get_data_from_cache("vms")
-                if all_vms_cache:
-                    for vm_on_host_data in all_vms_cache:
-                        is_not_start_vm = True
-                        if config.start_object_type == "VM":
-                             is_not_start_vm = not (
-                                 (vm_on_host_data.get("instance_uuid") and vm_on_host_data.get("instance_uuid") == config.start_object_identifier) or \
-                                 (vm_on_host_data.get("name") == config.start_object_identifier)
-                             )
-                        
-                        if vm_on_host_data.get("host_name") == host_data.get("name") and is_not_start_vm:
-                            other_vm_node = add_node_to_graph(vm_on_host_data, "VM")
-                            if other_vm_node:
-                                add_edge_to_graph(host_node, other_vm_node, "Héberge aussi")
-        
-    if config.start_object_type == "VM":
-        start_vm_data = find_vm_by_identifier(config.start_object_identifier)
-        if not start_vm_data:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"VM de départ '{config.start_object_identifier}' non trouvée.")
-        explore_dependencies(start_vm_data, "VM", 1)
-    else:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Type d'objet de départ '{config.start_object_type}' non supporté pour l'instant.")
+    start_vms, unresolved = resolve_scene_roots(snapshot, config)
+    root_ids: Set[str] = set(start_vms)
+    nodes_map, edges_list = collect_scene_graph(snapshot, config, start_vms)
+
+    aggregation_info = None
+    max_nodes = config.max_nodes if config.max_nodes is not None else SCENE_MAX_NODES
+    if max_nodes and len(nodes_map) > max_nodes:
+        with span("aggregate", **{"vlens.max_nodes": max_nodes}):
+            nodes_map, edges_list, aggregation_info = aggregate_scene_graph(snapshot.generation, nodes_map, edges_list, max_nodes, root_ids,
+                                                                            aggregation_parameters(config, max_nodes))
+
+    if config.include_metrics:
+        with span("metrics"):
+            latest = metrics_store.latest()
+            for node in nodes_map.values():
+                key = entity_key_for(node.type.lower(), node.data)
+                if key in latest: node.metrics = latest[key]
+
+    layout_info = None
+    if config.layout:
+        with span("layout", **{"vlens.algorithm": config.layout}):
+            layout_info = await apply_scene_layout(list(nodes_map.values()), edges_list, config.layout, config.layout_dimensions)
+            set_attributes(**{"vlens.cached": layout_info["cached"]})
+
+    logger.info(f"Graphe généré avec {len(nodes_map)} nœuds et {len(edges_list)} arêtes pour {len(root_ids)} objet(s) de départ (depth {config.depth}).")
+    with span("serialize", **{"vlens.nodes": len(nodes_map), "vlens.edges": len(edges_list)}):
+        body = encode_object({}, "nodes", encode_scene_nodes(snapshot, list(nodes_map.values())), {
+            "edges": scene_edge_fields(edges_list),
+            "layout": layout_info, "aggregation": aggregation_info, "roots": sorted(root_ids), "unresolved_start_objects": unresolved,
+        })
+        set_attributes(**{"vlens.bytes": len(body)})
+    return json_response(body)
 
-    logger.info(f"Graphe généré avec {len(nodes_map)} nœuds et {len(edges_list)} arêtes pour '{config.start_object_identifier}' (depth {config.depth}).")
-    return SceneGraphResponse(nodes=list(nodes_map.values()), edges=edges_list)
-
-# --- Endpoint for DAT Generation ---
 @app.post(
-    "/api/v1/dat/generate/vm",
-    response_model=VMDATResponse,
-    summary="Générer un Document d'Architecture Technique (DAT) pour une VM en format JSON structuré.",
-    tags=["Documentation"],
+    "/api/v1/visualization/scene-graph/stream",
+    summary="Graphe de scène diffusé en NDJSON, en largeur d'abord",
+    description="Mêmes paramètres que /api/v1/visualization/scene-graph. Une ligne JSON par nœud ou arête (`record`: `node` ou `edge`, "
+                "`hop`: distance aux objets de départ), envoyée dès que le parcours la trouve, puis une ligne `summary`. "
+                "Ni agrégation ni layout (ils demandent le graphe complet) : `max_nodes`, s'il est indiqué, arrête le parcours.",
+    tags=["Visualization"],
 )
-async def generate_vm_dat_endpoint(request: DATGenerationRequest):
-    logger.info(f"Requête de génération de DAT JSON reçue pour la VM: {request.vm_identifier}")
-
-    if not app_state["cached_data"]:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Cache de données non initialisé.")
-
-    vm_data = find_vm_by_identifier(request.vm_identifier)
-    if not vm_data:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"VM '{request.vm_identifier}' non trouvée.")
+async def stream_scene_graph_endpoint(config: VisualizationConfig):
+    snapshot = get_snapshot()
+    start_vms, unresolved = resolve_scene_roots(snapshot, config)
+    latest = metrics_store.latest() if config.include_metrics else {}
+
+    def records() -> Iterator[bytes]:
+        start_time = time.perf_counter()
+        node_count, edge_count, truncated = 0, 0, False
+        chunk: List[bytes] = []
+        for hop, item in iter_scene_graph(snapshot, config, start_vms):
+            if isinstance(item, SceneNode):
+                if config.max_nodes and node_count >= config.max_nodes:
+                    truncated = True
+                    break
+                node_count += 1
+                chunk.append(encode_object({"record": "node", "hop": hop, "id": item.id, "type": item.type, "label": item.label, "status": item.status},
+                                           "data", encode_record(snapshot, item.type, item.data), {"metrics": latest.get(entity_key_for(item.type.lower(), item.data))}))
+            else:
+                edge_count += 1
+                chunk.append(dumps({"record": "edge", "hop": hop, "id": item.id, "source": item.source, "target": item.target, "label": item.label}))
+            if len(chunk) >= SCENE_STREAM_CHUNK_RECORDS:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        chunk.append(dumps({"record": "summary", "cache_generation": snapshot.generation, "nodes": node_count, "edges": edge_count,
+                            "roots": sorted(start_vms), "unresolved_start_objects": unresolved, "truncated": truncated,
+                            "duration_ms": round((time.perf_counter() - start_time) * 1000, 1)}))
+        logger.info(f"Graphe diffusé avec {node_count} nœuds et {edge_count} arêtes pour {len(start_vms)} objet(s) de départ (depth {config.depth}).")
+        yield b"\n".join(chunk) + b"\n"
+
+    return StreamingResponse(records(), media_type="application/x-ndjson")
+
+@app.get(
+    "/api/v1/visualization/aggregates/{token}",
+    response_model=AggregateMembersResponse,
+    summary="Parcourir les membres d'un nœud agrégé du graphe de scène (jeton expand_token)",
+    tags=["Visualization"],
+)
+async def get_aggregate_members(token: str, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000)):
+    try:
+        token_generation, aggregate_id, parameters = parse_expand_token(token)
+        config = VisualizationConfig(**parameters)
+    except ValueError:  # pydantic's ValidationError included
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Jeton d'agrégat invalide.")
+    # The members are recomputed: same request on the current generation, then the group with the token's aggregate id.
+    snapshot = get_snapshot()
+    start_vms, _ = resolve_scene_roots(snapshot, config)
+    nodes_map, edges_list = collect_scene_graph(snapshot, config, start_vms)
+    with span("aggregate", **{"vlens.max_nodes": config.max_nodes}):
+        groups = plan_scene_aggregation(nodes_map, edges_list, config.max_nodes, set(start_vms)) if config.max_nodes and len(nodes_map) > config.max_nodes else []
+    group = next((g for g in groups if g.aggregate_id == aggregate_id), None)
+    if group is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail=f"Cet agrégat (génération {token_generation}) n'existe plus dans la génération {snapshot.generation}, régénérez le graphe de scène.")
+    page = [nodes_map[member] for member in group.member_ids[skip:skip + limit]]
+    page_ids = {node.id for node in page}
+    return json_response(encode_object(
+        {"aggregate_id": group.aggregate_id, "member_type": group.member_type, "cache_generation": snapshot.generation, "total": len(group.member_ids)},
+        "nodes", encode_scene_nodes(snapshot, page),
+        {"edges": scene_edge_fields([e for e in edges_list if e.source in page_ids or e.target in page_ids])},
+    ))
 
+# --- Endpoint for DAT Generation ---
+def build_vm_dat(snapshot: InventorySnapshot, vm_data: Dict[str, Any]) -> VMDATResponse:
     vm_identification = DAT_VM_Identification(
         vm_name=vm_data.get('name'),
         instance_uuid=vm_data.get('instance_uuid'),
@@ -626,7 +1602,7 @@ async def generate_vm_dat_endpoint(request: DATGenerationRequest):
         ds_type_for_info = "N/A"
 
         if ds_name and ds_name != "N/A":
-            datastore_details_cache = find_datastore_by_name(ds_name)
+            datastore_details_cache = find_datastore_by_name(snapshot, ds_name)
             if datastore_details_cache:
                 ds_name_for_info = datastore_details_cache.get('name', "N/A")
                 ds_type_for_info = datastore_details_cache.get('type', "N/A")
@@ -675,7 +1651,7 @@ async def generate_vm_dat_endpoint(request: DATGenerationRequest):
         cached_pg_name, cached_dvs_name_val, cached_vlan_val = None, None, None
         network_id_to_search = portgroup_key_dvs_raw if portgroup_key_dvs_raw and portgroup_key_dvs_raw != "N/A" else nic_network_name_raw
         if network_id_to_search and network_id_to_search != "N/A":
-            network_details_from_cache = find_network_by_name_or_key(network_id_to_search)
+            network_details_from_cache = find_network_by_name_or_key(snapshot, network_id_to_search)
             if network_details_from_cache:
                 cached_pg_name = network_details_from_cache.get('name'); cached_dvs_name_val = network_details_from_cache.get('dvswitch_name'); cached_vlan_val = network_details_from_cache.get('vlan_id_info')
         connected_net_info = DAT_VM_Network_ConnectedNetwork(
@@ -689,29 +1665,21 @@ async def generate_vm_dat_endpoint(request: DATGenerationRequest):
             key=str(nic_key_val) if nic_key_val is not None else None,
             adapter_type=nic_raw.get('adapter_type'), mac_address=nic_raw.get('mac_address'),
             mac_address_type=nic_raw.get('mac_address_type'), connected_at_poweron=nic_raw.get('connected_at_poweron'),
-            guest_net_connected_status=nic_raw.get('guest_net_connected'), connected_network_info=connected_net_info, guest_ips=nic_raw.get('guest_ips', []),
+            guest_net_connected_status=nic_raw.get('guest_net_connected'), connected_network_info=connected_net_info, guest_ips=nic_raw.get('guest_ips', []), guest_ip_addresses=guest_ip_addresses(nic_raw),
         )
         network_config_list.append(nic_obj)
 
     dat_host_info, dat_cluster_info = None, None; datacenter_name_val: Optional[str] = None; host_name_from_vm = vm_data.get("host_name")
     if host_name_from_vm and host_name_from_vm != "N/A":
-        host_data_cache = find_host_by_name(host_name_from_vm)
+        host_data_cache = find_host_by_name(snapshot, host_name_from_vm)
         if host_data_cache:
             dat_host_info = DAT_Hosting_Host(name=host_data_cache.get('name'), model=host_data_cache.get('model'), esxi_version=host_data_cache.get('version_full'), status=host_data_cache.get('status') or host_data_cache.get('power_state'), bios_uuid=host_data_cache.get('uuid_bios'))
-            infra_cache_val = get_data_from_cache("infrastructure")
-            if infra_cache_val and infra_cache_val.get("datacenters"):
-                for dc_item_val in infra_cache_val["datacenters"]:
-                    found_in_dc_val = False
-                    for cluster_item_val in dc_item_val.get("clusters", []):
-                        for h_in_cluster_val in cluster_item_val.get("hosts", []):
-                            if (host_data_cache.get("uuid_bios") and h_in_cluster_val.get("uuid_bios") == host_data_cache.get("uuid_bios")) or (h_in_cluster_val.get("name") == host_data_cache.get("name")):
-                                dat_cluster_info = DAT_Hosting_Cluster(name=cluster_item_val.get('name'), overall_status=cluster_item_val.get('overallStatus'), ha_enabled=cluster_item_val.get('ha_enabled'), drs_enabled=cluster_item_val.get('drs_enabled'), drs_behavior=cluster_item_val.get('drs_behavior')); datacenter_name_val = dc_item_val.get("name"); found_in_dc_val = True; break
-                        if found_in_dc_val: break
-                    if not found_in_dc_val:
-                        for standalone_h_item in dc_item_val.get("standalone_hosts", []):
-                            if (host_data_cache.get("uuid_bios") and standalone_h_item.get("uuid_bios") == host_data_cache.get("uuid_bios")) or (standalone_h_item.get("name") == host_data_cache.get("name")):
-                                datacenter_name_val = dc_item_val.get("name"); found_in_dc_val = True; break
-                    if found_in_dc_val: break
+            host_placement = find_host_placement(snapshot, host_data_cache)
+            if host_placement:
+                cluster_item_val = host_placement["cluster"]
+                if cluster_item_val:
+                    dat_cluster_info = DAT_Hosting_Cluster(name=cluster_item_val.get('name'), overall_status=cluster_item_val.get('overallStatus'), ha_enabled=cluster_item_val.get('ha_enabled'), drs_enabled=cluster_item_val.get('drs_enabled'), drs_behavior=cluster_item_val.get('drs_behavior'))
+                datacenter_name_val = host_placement["datacenter"].get("name")
     hosting_context = DAT_VM_HostingContext(host=dat_host_info, cluster=dat_cluster_info, datacenter_name=datacenter_name_val)
 
     custom_attributes_list: List[DAT_VM_CustomAttribute] = []
@@ -719,7 +1687,7 @@ async def generate_vm_dat_endpoint(request: DATGenerationRequest):
     for attr_name, attr_value in custom_attrs_raw.items():
         custom_attributes_list.append(DAT_VM_CustomAttribute(name=attr_name, value=str(attr_value)))
 
-    dat_response = VMDATResponse(
+    return VMDATResponse(
         generated_at_utc=datetime.now(timezone.utc).isoformat(),
         vm_identification=vm_identification,
         compute_resources=compute_resources,
@@ -729,8 +1697,37 @@ async def generate_vm_dat_endpoint(request: DATGenerationRequest):
         custom_attributes=custom_attributes_list,
     )
 
+@app.post(
+    "/api/v1/dat/generate/vm",
+    response_model=VMDATResponse,
+    summary="Générer un Document d'Architecture Technique (DAT) pour une VM en format JSON structuré.",
+    tags=["Documentation"],
+)
+async def generate_vm_dat_endpoint(request: DATGenerationRequest):
+    logger.info(f"Requête de génération de DAT JSON reçue pour la VM: {request.vm_identifier}")
+
+    snapshot = app_state["snapshot"]
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Cache de données non initialisé.")
+
+    vm_data = find_vm_by_identifier(snapshot, request.vm_identifier)
+    if not vm_data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"VM '{request.vm_identifier}' non trouvée.")
+
+    # The document only changes with the cache generation: it is encoded once per generation, and only
+    # generated_at_utc (its first field) is encoded per request.
+    vm_key = object_key("VM", vm_data)
+    def encode_dat() -> bytes:
+        count("dat_builds")
+        with span("build DAT"):
+            return build_vm_dat(snapshot, vm_data).model_dump_json(exclude={"generated_at_utc"}).encode("utf-8")
+    with span("serialize", **{"vlens.fragment_cached": bool(vm_key)}):
+        document = json_fragments.get_or_encode(("dat", snapshot.generation, vm_key), encode_dat) if vm_key else encode_dat()
+        body = b'{"generated_at_utc":' + dumps(datetime.now(timezone.utc).isoformat()) + b"," + document[1:]
+        set_attributes(**{"vlens.bytes": len(body)})
+
     logger.info(f"DAT JSON structuré généré pour la VM: {request.vm_identifier}")
-    return dat_response
+    return json_response(body)
 
 # --- Uvicorn Command (for reference) ---
 # uvicorn api_server:app --reload --host 0.0.0.0 --port 8000
@@ -0,0 +1,67 @@
+import bisect
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+
+# --- Custom Attribute Index ---
+# Built per cache generation from the custom attributes of VMs and hosts: one entry per (object, attribute) pair, kept
+# sorted by (attribute, value) case-insensitively, so "App=billing" is one binary search for the start of the range and
+# a prefix query ("App=bill*") a second one for its end. Values are returned with their original case.
+_PREFIX_END = "\U0010ffff"
+ATTRIBUTE_SOURCE_FIELDS = {"VM": {"name", "instance_uuid", "custom_attributes"}, "Host": {"name", "uuid_bios", "custom_attributes"}}
+
+def _fold(text: Any) -> str:
+    return str(text).casefold()
+
+def _iter_attribute_entries(data: Mapping[str, Any]) -> Iterator[Dict[str, Any]]:
+    for vm in data.get("vms") or []:
+        for attribute, value in (vm.get("custom_attributes") or {}).items():
+            yield {"attribute": attribute, "value": value, "object_type": "VM", "object_name": vm.get("name"),
+                   "object_id": vm.get("instance_uuid") or vm.get("name")}
+    for dc in (data.get("infrastructure") or {}).get("datacenters", []):
+        for host in [h for c in dc.get("clusters", []) for h in c.get("hosts", [])] + dc.get("standalone_hosts", []):
+            for attribute, value in (host.get("custom_attributes") or {}).items():
+                yield {"attribute": attribute, "value": value, "object_type": "Host", "object_name": host.get("name"),
+                       "object_id": host.get("uuid_bios") or host.get("name")}
+
+class AttributeIndex:
+    def __init__(self, keys: List[Tuple[str, str]], entries: List[Dict[str, Any]]):
+        self.keys = keys
+        self.entries = entries
+
+    def _range(self, attribute: str, first: str, last: str) -> List[Dict[str, Any]]:
+        attribute = _fold(attribute)
+        start, end = bisect.bisect_left(self.keys, (attribute, first)), bisect.bisect_right(self.keys, (attribute, last))
+        return self.entries[start:end]
+
+    def lookup(self, attribute: str, value: str, object_types: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """Objects whose attribute equals value (case-insensitive)."""
+        entries = self._range(attribute, _fold(value), _fold(value))
+        return [e for e in entries if object_types is None or e["object_type"] in object_types]
+
+    def lookup_prefix(self, attribute: str, prefix: str, object_types: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """Objects whose attribute value starts with prefix (case-insensitive), in value order."""
+        entries = self._range(attribute, _fold(prefix), _fold(prefix) + _PREFIX_END)
+        return [e for e in entries if object_types is None or e["object_type"] in object_types]
+
+    def attributes(self) -> List[Dict[str, Any]]:
+        """Attribute names with their number of objects and distinct values."""
+        summary: Dict[str, Dict[str, Any]] = {}
+        for (folded_attribute, folded_value), entry in zip(self.keys, self.entries):
+            item = summary.setdefault(folded_attribute, {"attribute": entry["attribute"], "objects": 0, "values": set()})
+            item["objects"] += 1
+            item["values"].add(folded_value)
+        return [{"attribute": item["attribute"], "objects": item["objects"], "distinct_values": len(item["values"])} for item in summary.values()]
+
+    def values(self, attribute: str, prefix: str = "") -> List[Dict[str, Any]]:
+        """Distinct values of attribute (optionally starting with prefix) with their number of objects, in value order."""
+        counts: Counter = Counter()
+        first_seen: Dict[str, Any] = {}
+        for entry in self._range(attribute, _fold(prefix), _fold(prefix) + _PREFIX_END):
+            folded_value = _fold(entry["value"])
+            counts[folded_value] += 1
+            first_seen.setdefault(folded_value, entry["value"])
+        return [{"value": first_seen[folded_value], "objects": count} for folded_value, count in counts.items()]
+
+def build_attribute_index(data: Mapping[str, Any]) -> AttributeIndex:
+    keyed = sorted(((_fold(e["attribute"]), _fold(e["value"])), position, e) for position, e in enumerate(_iter_attribute_entries(data)))
+    return AttributeIndex([key for key, _, _ in keyed], [entry for _, _, entry in keyed])
@@ -0,0 +1,152 @@
+"""API latency at scale: drives the scene-graph, DAT and list endpoints in-process against a synthetic inventory.
+
+The inventory comes from synthetic_inventory.py (no vCenter needed) and is installed as the current generation the same
+way a collection is; requests go through the whole ASGI stack with Starlette's TestClient. For every scenario the
+harness reports p50/p99 latency, throughput and the process's peak RSS, and can compare them with a stored baseline:
+
+    python benchmarks/api_benchmark.py --vms 20000 --save-baseline benchmarks/api_baseline.json
+    python benchmarks/api_benchmark.py --vms 20000 --baseline benchmarks/api_baseline.json --max-regression 0.25
+
+With --baseline, the exit status is 1 if any scenario's p50 or p99 grew by more than --max-regression (a fraction).
+Baselines are only comparable on the same machine and inventory size.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+import api_server
+from inventory_snapshot import apply_collection_result
+from synthetic_inventory import synthetic_inventory
+
+Request = Tuple[str, str, Dict[str, Any]]  # (method, path, json body or query params)
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KiB on Linux
+
+def scenarios(data: Dict[str, Any], rng: random.Random) -> Dict[str, Callable[[], Request]]:
+    vms = data["vms"]
+    hosts = [h for dc in data["infrastructure"]["datacenters"] for c in dc["clusters"] for h in c["hosts"]]
+    pick_vm = lambda: rng.choice(vms)
+    return {
+        "scene graph depth 1": lambda: ("POST", "/api/v1/visualization/scene-graph", {"start_object_identifier": pick_vm()["name"], "depth": 1}),
+        "scene graph depth 2": lambda: ("POST", "/api/v1/visualization/scene-graph", {"start_object_identifier": pick_vm()["name"], "depth": 2}),
+        "scene graph 20 VMs": lambda: ("POST", "/api/v1/visualization/scene-graph",
+                                       {"start_objects": [vm["name"] for vm in rng.sample(vms, min(20, len(vms)))], "depth": 1}),
+        "scene graph 20 VMs NDJSON": lambda: ("POST", "/api/v1/visualization/scene-graph/stream",
+                                              {"start_objects": [vm["name"] for vm in rng.sample(vms, min(20, len(vms)))], "depth": 1}),
+        "DAT": lambda: ("POST", "/api/v1/dat/generate/vm", {"vm_identifier": pick_vm()["instance_uuid"]}),
+        "capacity hosts": lambda: ("GET", "/api/v1/capacity/hosts", {"sort_by": "vcpu_to_core_ratio", "limit": 100}),
+        "search": lambda: ("GET", "/api/v1/search", {"q": pick_vm()["name"][:-2], "limit": 20}),
+        "lookup cidr /24": lambda: ("GET", f"/api/v1/lookup/cidr/{pick_vm()['network_adapters'][0]['guest_ip_addresses'][0]['address'].rsplit('.', 1)[0]}.0/24", {}),
+        "attribute value": lambda: ("GET", "/api/v1/attributes/App", {"value": pick_vm()["custom_attributes"]["App"], "limit": 100}),
+        "vlan membership": lambda: ("GET", f"/api/v1/vlans/{rng.randint(100, 149)}", {}),
+        "lun lookup": lambda: ("GET", f"/api/v1/storage/luns/{rng.choice(rng.choice(data['datastores'])['vmfs_extents'])}", {}),
+        "path redundancy": lambda: ("GET", "/api/v1/storage/redundancy", {"limit": 100}),
+        "resource pool subtree": lambda: ("GET", f"/api/v1/resource-pools/tree/{rng.choice(data['resource_pools'])['mor_id']}", {}),
+        "host capacity row": lambda: ("GET", f"/api/v1/capacity/hosts/{rng.choice(hosts)['name']}", {}),
+    }
+
+def run_scenario(client: TestClient, next_request: Callable[[], Request], requests: int, warmup: int) -> Dict[str, Any]:
+    durations: List[float] = []
+    response_bytes = 0
+    for position in range(warmup + requests):
+        method, path, payload = next_request()
+        start = time.perf_counter()
+        response = client.post(path, json=payload) if method == "POST" else client.get(path, params=payload)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+        if position >= warmup:
+            durations.append(elapsed * 1000)
+            response_bytes += len(response.content)
+    durations.sort()
+    return {
+        "p50_ms": round(statistics.median(durations), 3),
+        "p99_ms": round(durations[min(len(durations) - 1, int(len(durations) * 0.99))], 3),
+        "throughput_rps": round(len(durations) / (sum(durations) / 1000), 1),
+        "mean_response_kb": round(response_bytes / len(durations) / 1024, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Descriptions of the scenarios whose p50 or p99 regressed beyond max_regression."""
+    if baseline.get("config", {}).get("vms") != results["config"]["vms"]:
+        print(f"warning: baseline was measured with {baseline.get('config', {}).get('vms')} VMs, this run with {results['config']['vms']}")
+    regressions = []
+    for name, measured in results["scenarios"].items():
+        reference = baseline.get("scenarios", {}).get(name)
+        if not reference: continue
+        for metric in ("p50_ms", "p99_ms"):
+            if reference[metric] > 0 and measured[metric] > reference[metric] * (1 + max_regression):
+                regressions.append(f"{name}: {metric} {reference[metric]:.2f} -> {measured[metric]:.2f} ms (+{measured[metric] / reference[metric] - 1:.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vms", type=int, default=10000, help="VMs in the synthetic inventory (1k to 100k)")
+    parser.add_argument("--vms-per-host", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--scenario", action="append", help="run only these scenarios (repeatable)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed p50/p99 growth over the baseline, as a fraction")
+    parser.add_argument("--save-baseline", help="write this run's results to this JSON file")
+    args = parser.parse_args()
+
+    api_server.logger.disabled = True
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one INFO line per TestClient request
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    data = synthetic_inventory(args.vms, args.vms_per_host, args.seed)
+    generated_s = time.perf_counter() - start
+    start = time.perf_counter()
+    api_server.app_state["snapshot"] = apply_collection_result(None, data, datetime.now(timezone.utc))
+    snapshot_s = time.perf_counter() - start
+    gc.collect()
+    print(f"inventory: {len(data['vms'])} VMs, {sum(len(c['hosts']) for dc in data['infrastructure']['datacenters'] for c in dc['clusters'])} hosts, "
+          f"{len(data['datastores'])} datastores (generated in {generated_s:.1f} s, snapshot built in {snapshot_s:.1f} s, "
+          f"peak RSS {rss_before:.0f} -> {peak_rss_mb():.0f} MB)")
+
+    rng = random.Random(args.seed)
+    plan = scenarios(data, rng)
+    unknown = set(args.scenario or []) - set(plan)
+    if unknown: parser.error(f"unknown scenarios: {', '.join(sorted(unknown))} (available: {', '.join(plan)})")
+    results: Dict[str, Any] = {"config": {"vms": args.vms, "vms_per_host": args.vms_per_host, "requests": args.requests, "seed": args.seed,
+                                          "snapshot_build_s": round(snapshot_s, 2)}, "scenarios": {}}
+    client = TestClient(api_server.app)  # no lifespan: the synthetic generation stays installed, no collection starts
+    print(f"{'scenario':28}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'resp KB':>10}{'peak RSS MB':>13}")
+    for name, next_request in plan.items():
+        if args.scenario and name not in args.scenario: continue
+        measured = run_scenario(client, next_request, args.requests, args.warmup)
+        results["scenarios"][name] = measured
+        print(f"{name:28}{measured['p50_ms']:10.2f}{measured['p99_ms']:10.2f}{measured['throughput_rps']:10.1f}{measured['mean_response_kb']:10.1f}{measured['peak_rss_mb']:13.0f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f: json.dump(results, f, indent=2)
+        print(f"results written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"REGRESSION (more than {args.max_regression:.0%} over {args.baseline}):")
+            for line in regressions: print(f"  {line}")
+            sys.exit(1)
+        print(f"no regression beyond {args.max_regression:.0%} over {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Scene-graph and DAT response serialization: pydantic response models vs the fast JSON path.
+
+Builds a synthetic inventory (no vCenter needed) and times, for the same graph and the same VM:
+  - "models": validated response models, then FastAPI's response step (validation against response_model, JSON dump);
+  - "fast (cold)": plain dataclasses and the fast JSON path with an empty fragment cache (first request after a collection);
+  - "fast (warm)": the fast path once the records' fragments are cached (later requests, unchanged records).
+
+Usage: python benchmarks/serialization_benchmark.py [--vms 5000] [--graph-vms 1000] [--repeat 7]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter
+
+import api_server
+from fast_json import FragmentCache, encode_object
+from inventory_snapshot import build_snapshot
+from synthetic_inventory import synthetic_inventory
+
+def scene_graph(snapshot, n_vms: int, build_node: Callable, build_edge: Callable):
+    """VMs with their hosts, datastores and networks, as the scene-graph endpoint would return them."""
+    nodes: Dict[str, Any] = {}
+    edges: List[Any] = []
+    def node(object_type: str, record: Dict[str, Any], primary: str):
+        node_id = api_server.create_graph_node_id(object_type, primary)
+        if node_id not in nodes: nodes[node_id] = build_node(id=node_id, type=object_type, label=record["name"], status=None, data=record)
+        return nodes[node_id]
+    for vm in snapshot.get("vms")[:n_vms]:
+        vm_node = node("VM", vm, vm["instance_uuid"])
+        targets = [node("Host", api_server.find_host_by_name(snapshot, vm["host_name"]), vm["host_name"])]
+        targets += [node("Datastore", api_server.find_datastore_by_name(snapshot, d["datastore_name"]), d["datastore_name"]) for d in vm["disks"]]
+        targets += [node("Network", api_server.find_network_by_name_or_key(snapshot, n["portgroup_key_if_dvs"]), n["portgroup_key_if_dvs"]) for n in vm["network_adapters"]]
+        for target in targets:
+            edges.append(build_edge(id=f"edge-{vm_node.id}-to-{target.id}-{len(edges)}", source=vm_node.id, target=target.id, label="link"))
+    return list(nodes.values()), edges
+
+def timed(repeat: int, function: Callable[[], Any]) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vms", type=int, default=5000, help="VMs in the synthetic inventory")
+    parser.add_argument("--graph-vms", type=int, default=1000, help="VMs in the benchmarked scene graph")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    snapshot = build_snapshot(synthetic_inventory(args.vms))
+    api_server.app_state["snapshot"] = snapshot
+    scene_adapter, dat_adapter = TypeAdapter(api_server.SceneGraphResponse), TypeAdapter(api_server.VMDATResponse)
+
+    def scene_models() -> bytes:
+        nodes, edges = scene_graph(snapshot, args.graph_vms, api_server.VisualizationNode, api_server.VisualizationEdge)
+        response = api_server.SceneGraphResponse(nodes=nodes, edges=edges)
+        return scene_adapter.dump_json(scene_adapter.validate_python(response))
+
+    def scene_fast() -> bytes:
+        nodes, edges = scene_graph(snapshot, args.graph_vms, api_server.SceneNode, api_server.SceneEdge)
+        return encode_object({}, "nodes", api_server.encode_scene_nodes(snapshot, nodes), {
+            "edges": api_server.scene_edge_fields(edges), "layout": None, "aggregation": None, "roots": [], "unresolved_start_objects": []})
+
+    vm_names = [vm["name"] for vm in snapshot.get("vms")[:200]]
+    def dat_models():
+        for name in vm_names:
+            dat = api_server.build_vm_dat(snapshot, api_server.find_vm_by_identifier(snapshot, name))
+            dat_adapter.dump_json(dat_adapter.validate_python(dat))
+
+    async def dat_requests():
+        for name in vm_names: await api_server.generate_vm_dat_endpoint(api_server.DATGenerationRequest(vm_identifier=name))
+    def dat_fast():
+        asyncio.run(dat_requests())
+
+    def cold(function: Callable[[], Any]) -> Callable[[], Any]:
+        def run():
+            api_server.json_fragments = FragmentCache(api_server.json_fragments.max_bytes)
+            return function()
+        return run
+
+    api_server.logger.disabled = True
+    assert len(scene_models()) == len(scene_fast()), "both paths must produce the same document"
+    print(f"inventory: {args.vms} VMs; scene graph: {args.graph_vms} VMs and their dependencies ({len(scene_fast()) / 1e6:.1f} MB); DAT: {len(vm_names)} VMs")
+    print(f"{'':28}{'models':>12}{'fast (cold)':>14}{'fast (warm)':>14}")
+    for label, models, fast in (("scene graph (ms)", scene_models, scene_fast), (f"{len(vm_names)} DATs (ms)", dat_models, dat_fast)):
+        print(f"{label:28}{timed(args.repeat, models):12.1f}{timed(args.repeat, cold(fast)):14.1f}{timed(args.repeat, fast):14.1f}")
+
+if __name__ == "__main__":
+    main()
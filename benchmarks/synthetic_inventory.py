@@ -0,0 +1,219 @@
+"""Synthetic collector output (the cached_data schema of vsphere_collector.main) at any size, without a vCenter.
+
+Deterministic for a given size and seed. Hosts carry the full network and storage configuration of the "full" profile
+(physical NICs, standard vSwitches with port groups, VMkernel adapters, proxy switches, HBAs, LUNs with multipath paths),
+clusters have their own datastores and a resource pool tree, and VMs have disks, NICs with guest IPs and custom attributes.
+
+Usage: python benchmarks/synthetic_inventory.py --vms 10000 --output inventory.json
+"""
+import argparse
+import json
+import random
+from typing import Any, Dict, List
+
+HOSTS_PER_CLUSTER = 16
+CLUSTERS_PER_DATACENTER = 32
+VMS_PER_DATASTORE = 50
+DISTRIBUTED_PORT_GROUPS = 50
+FIRST_VLAN = 100
+APPLICATIONS = ["billing", "crm", "erp", "web", "search", "payments", "reporting", "hr", "mail", "backup"]
+
+def _host(index: int, rng: random.Random, dvs: Dict[str, Any], cluster_luns: List[str]) -> Dict[str, Any]:
+    name = f"esx{index:05d}.lab"
+    mac = lambda n: f"00:25:b5:{index // 256 % 256:02x}:{index % 256:02x}:{n:02x}"
+    hbas = [{"key": f"key-vim.host.FibreChannelHba-vmhba{n}", "device": f"vmhba{n}", "bus": 59 + n, "status": "online", "model": "QLE2772",
+             "driver": "qlnativefc", "pci": f"0000:3b:00.{n}", "type": "vim.host.FibreChannelHba", "node_wwn": f"20000024ff{index:06x}{n}",
+             "port_wwn": f"21000024ff{index:06x}{n}", "speed_gbps": 32.0} for n in (1, 2)]
+    luns = []
+    for canonical_name in cluster_luns + [f"mpx.vmhba0:C0:T0:L0.{index}"]:
+        local = canonical_name.startswith("mpx.")
+        paths = []
+        for hba in (hbas[:1] if local else hbas):
+            for target in ((0,) if local else (0, 1)):
+                state = "dead" if rng.random() < 0.01 else ("active" if target == 0 or rng.random() < 0.9 else "standby")
+                paths.append({"key": f"key-vim.host.MultipathInfo.Path-{hba['device']}:C0:T{target}:L0-{canonical_name}",
+                              "name": f"{hba['device']}:C0:T{target}:L0", "path_state": state, "state": state, "adapter_key": hba["key"],
+                              "adapter_device_name": hba["device"], "lun_target_key": f"lun-{canonical_name}", "transport_type": "FibreChannelTargetTransport",
+                              "fc_transport_wwnn": "50060160" + f"{target:08x}", "fc_transport_wwpn": "50060161" + f"{target:08x}"})
+        luns.append({"key": f"key-vim.host.MultipathInfo.LogicalUnit-{canonical_name}", "id": canonical_name, "lun_type_mp": "disk", "paths": paths,
+                     "policy": {"name": "VMW_PSP_RR" if not local else "VMW_PSP_FIXED", "preferred_path_key": None}, "satp": "VMW_SATP_ALUA",
+                     "device_name": f"/vmfs/devices/disks/{canonical_name}", "canonical_name": canonical_name, "vendor": "DGC" if not local else "Local",
+                     "model": "VRAID" if not local else "Disk", "lun_type": "disk", "queue_depth": 64, "is_ssd": True, "is_local": local,
+                     "operational_state": ["ok"], "capabilities_unmap": True, "capabilities_zero_blocks": True})
+    portgroups = [{"name": "Management Network", "vlan_id": 10, "vswitch_name": "vSwitch0", "policy_security_allow_promiscuous": False,
+                   "policy_security_mac_changes": False, "policy_security_forged_transmits": False},
+                  {"name": "VM Network", "vlan_id": 20, "vswitch_name": "vSwitch0", "policy_security_allow_promiscuous": False,
+                   "policy_security_mac_changes": False, "policy_security_forged_transmits": False}]
+    return {
+        "name": name, "mor_id": f"'vim.HostSystem:host-{index}'", "status": "green", "power_state": "poweredOn", "connection_state": "connected",
+        "maintenance_mode": rng.random() < 0.02, "boot_time": "2026-01-05 08:12:44 UTC", "version_full": "VMware ESXi 8.0.2 build-22380479",
+        "version_build": "22380479", "api_version": "8.0.2.0", "vendor": "Dell Inc.", "model": "PowerEdge R750", "uuid_bios": f"4c4c4544-{index:04x}-host",
+        "cpu_model": "Intel(R) Xeon(R) Gold 6338 CPU @ 2.00GHz", "cpu_sockets": 2, "cpu_total_cores": 64, "cpu_threads": 128, "cpu_mhz": 2000,
+        "memory_gb": 1024.0, "cpu_cores_per_socket": 32,
+        "physical_nics": [{"key": f"key-vim.host.PhysicalNic-vmnic{n}", "device": f"vmnic{n}", "mac": mac(n), "driver": "i40en", "link_speed_mb": 25000,
+                           "link_duplex": True, "pci": f"0000:18:00.{n}", "wake_on_lan_supported": False} for n in range(4)],
+        "vswitches_standard": [{"name": "vSwitch0", "key": "key-vim.host.VirtualSwitch-vSwitch0", "num_ports": 128, "mtu": 1500, "uplink_devices": ["vmnic0", "vmnic1"],
+                                "portgroup_keys_on_vswitch": [f"key-vim.host.PortGroup-{pg['name']}" for pg in portgroups], "portgroup_details_on_vswitch": portgroups,
+                                "security_allow_promiscuous": False, "security_mac_changes": False, "security_forged_transmits": False,
+                                "teaming_policy": "loadbalance_srcid", "teaming_reverse_policy": True, "teaming_notify_switches": True, "teaming_rolling_order": False,
+                                "teaming_failure_criteria_check_speed": "minimum", "teaming_active_nics": ["vmnic0", "vmnic1"], "teaming_standby_nics": []}],
+        "vmkernel_adapters": [
+            {"device": "vmk0", "key": "key-vim.host.VirtualNic-vmk0", "portgroup_name": "Management Network", "dvs_name": "N/A", "dvs_port_key": "N/A",
+             "mac": mac(9), "mtu": 1500, "ip_address": f"10.0.{index // 256}.{index % 256}", "subnet_mask": "255.255.0.0", "dhcp_enabled": False,
+             "services_enabled": ["Management"]},
+            {"device": "vmk1", "key": "key-vim.host.VirtualNic-vmk1", "portgroup_name": "", "dvs_name": dvs["name"], "dvs_port_key": str(100 + index % 1000),
+             "mac": mac(10), "mtu": 9000, "ip_address": f"10.1.{index // 256}.{index % 256}", "subnet_mask": "255.255.0.0", "dhcp_enabled": False,
+             "services_enabled": ["vMotion"]}],
+        "proxy_switches": [{"dvs_uuid": dvs["uuid"], "dvs_name": dvs["name"], "num_uplinks_on_host": 2, "uplink_port_devices_on_host": ["vmnic2", "vmnic3"],
+                            "host_proxy_key": dvs["uuid"]}],
+        "storage_configuration": {"storage_adapters": hbas, "logical_units_multipath": luns, "iscsi_port_bindings": []},
+        "custom_attributes": {"Owner": "infra", "Rack": f"R{index // 20:03d}"},
+    }
+
+def _vm(index: int, rng: random.Random, host: Dict[str, Any], datastores: List[Dict[str, Any]], port_groups: List[Dict[str, Any]],
+        dc_name: str, cluster_name: str) -> Dict[str, Any]:
+    name = f"vm-{index:06d}"
+    disks = []
+    for d in range(rng.choice((1, 1, 2, 3))):
+        ds = datastores[(index + d) % len(datastores)]["name"]
+        disks.append({"key": 2000 + d, "controller_key": 1000, "unit_number": d, "label": f"Hard disk {d + 1}", "capacity_gb": float(rng.choice((40, 80, 100, 250, 500))),
+                      "thin_provisioned": rng.random() < 0.7, "disk_mode": "persistent", "write_through": False, "datastore_name": ds,
+                      "vmdk_path": f"[{ds}] {name}/{name}{'_' + str(d) if d else ''}.vmdk", "sioc_shares": 1000, "sioc_shares_level": "normal", "sioc_limit_iops": -1})
+    nics = []
+    for n in range(rng.choice((1, 1, 1, 2))):
+        port_group = port_groups[(index + n * 7) % len(port_groups)]
+        address = f"10.{100 + (index + n * 7) % DISTRIBUTED_PORT_GROUPS}.{index // 256 % 256}.{index % 256}"
+        addresses = [{"address": address, "prefix": 24, "state": "preferred", "family": "ipv4"}]
+        if index % 10 == 0: addresses.append({"address": f"fd00:{n:x}::{index:x}", "prefix": 64, "state": "preferred", "family": "ipv6"})
+        nics.append({"key": 4000 + n, "label": f"Network adapter {n + 1}", "adapter_type": "VirtualVmxnet3",
+                     "mac_address": f"00:50:56:{index // 65536 % 256:02x}:{index // 256 % 256:02x}:{(index + n * 128) % 256:02x}", "mac_address_type": "assigned",
+                     "connected_at_poweron": True, "guest_net_connected": True, "network_name": f"DVPort: {port_group['name']}",
+                     "portgroup_key_if_dvs": port_group["key"], "switch_uuid_if_dvs": port_group["dvswitch_uuid"],
+                     "guest_ips": [f"{a['address']} (Prefix: {a['prefix']}, State: {a['state']})" for a in addresses], "guest_ip_addresses": addresses})
+    windows = index % 3 == 0
+    powered_on = rng.random() < 0.9
+    return {
+        "name": name, "instance_uuid": f"5003{index:04x}-0000-4000-8000-{index:012x}", "mor_id": f"'vim.VirtualMachine:vm-{index}'",
+        "bios_uuid": f"4203{index:04x}-0000-4000-8000-{index:012x}", "vmx_path": f"[{disks[0]['datastore_name']}] {name}/{name}.vmx",
+        "guest_os_full": "Microsoft Windows Server 2022 (64-bit)" if windows else "Red Hat Enterprise Linux 9 (64-bit)",
+        "guest_os_id": "windows2019srvNext_64Guest" if windows else "rhel9_64Guest", "vm_version": "vmx-20",
+        "tools_status": "toolsOk" if powered_on else "toolsNotRunning", "tools_version": "12352",
+        "tools_running": "guestToolsRunning" if powered_on else "guestToolsNotRunning", "power_state": "poweredOn" if powered_on else "poweredOff",
+        "boot_time": "2026-01-05 08:12:44 UTC" if powered_on else "N/A", "host_name": host["name"], "host_mor_id": host["mor_id"],
+        "vcpus": rng.choice((1, 2, 2, 4, 4, 8, 16)), "cores_per_socket": 1, "ram_mb": rng.choice((2048, 4096, 8192, 16384, 32768)),
+        "cpu_reservation_mhz": 0, "cpu_limit_mhz": -1, "cpu_shares": 2000, "cpu_shares_level": "normal", "mem_reservation_mb": 0, "mem_limit_mb": -1,
+        "mem_shares": 81920, "mem_shares_level": "normal", "disks": disks, "network_adapters": nics,
+        "custom_attributes": {"App": APPLICATIONS[index % len(APPLICATIONS)], "Owner": f"team-{index % 25:02d}", "Env": rng.choice(("prod", "prod", "dev", "test"))},
+        "datacenter_name": dc_name, "cluster_name": cluster_name,
+    }
+
+def _resource_pools(cluster_index: int, cluster: Dict[str, Any], dc_name: str, vms: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Resources > (Prod > (Web, DB), Dev, Test), VMs spread over the leaves and the root."""
+    base = cluster_index * 10
+    layout = [("Resources", None), ("Prod", 0), ("Web", 1), ("DB", 1), ("Dev", 0), ("Test", 0)]
+    pools = []
+    for offset, (name, parent) in enumerate(layout):
+        mor_id = f"'vim.ResourcePool:resgroup-{base + offset}'"
+        pools.append({"name": name, "mor_id": mor_id, "overall_status": "green",
+                      "parent_name": cluster["name"] if parent is None else layout[parent][0],
+                      "parent_type": "ClusterComputeResource" if parent is None else "ResourcePool",
+                      "parent_mor_id": f"'vim.ClusterComputeResource:domain-c{cluster_index}'" if parent is None else pools[parent]["mor_id"],
+                      "config_name": name, "config_entity": mor_id, "cpu_reservation_mhz": 0 if parent is None else 2000 * offset,
+                      "cpu_expandable_reservation": True, "cpu_limit_mhz": -1 if name != "Dev" else 20000, "cpu_shares_level": "normal", "cpu_shares_value": 4000,
+                      "mem_reservation_mb": 0 if parent is None else 4096 * offset, "mem_expandable_reservation": True, "mem_limit_mb": -1,
+                      "mem_shares_level": "normal", "mem_shares_value": 163840, "vms_in_pool": [], "vm_mor_ids": [], "child_resource_pools": [],
+                      "child_resource_pool_mor_ids": [], "datacenter_name": dc_name, "cluster_name": cluster["name"]})
+        if parent is not None:
+            pools[parent]["child_resource_pools"].append(name)
+            pools[parent]["child_resource_pool_mor_ids"].append(mor_id)
+    members = [0, 2, 3, 4, 5]
+    for position, vm in enumerate(vms):
+        pool = pools[members[position % len(members)]]
+        pool["vms_in_pool"].append(vm["name"])
+        pool["vm_mor_ids"].append(vm["mor_id"])
+    return pools
+
+def synthetic_inventory(n_vms: int, vms_per_host: int = 40, seed: int = 0) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    n_hosts = max(1, n_vms // vms_per_host)
+    n_clusters = (n_hosts + HOSTS_PER_CLUSTER - 1) // HOSTS_PER_CLUSTER
+    datacenters, datastores, vms, resource_pools, dvs_list, port_groups = [], [], [], [], [], []
+    host_index = vm_index = 0
+    for dc_index in range((n_clusters + CLUSTERS_PER_DATACENTER - 1) // CLUSTERS_PER_DATACENTER):
+        dc_name = f"DC{dc_index + 1}"
+        dvs = {"name": f"dvs-{dc_name}", "uuid": f"50 2c 1a 9f {dc_index:02x}", "mor_id": f"'vim.dvs.VmwareDistributedVirtualSwitch:dvs-{dc_index}'",
+               "version": "8.0.0", "description": None, "mtu": 9000, "num_ports": 4096, "num_hosts": 0, "uplink_port_policy": {},
+               "default_port_config": {"security_policy": {"allow_promiscuous": False, "mac_changes": False, "forged_transmits": False}, "vlan_info": "0"},
+               "contact_name": None, "contact_info": None, "link_discovery_protocol": "lldp", "link_discovery_operation": "both", "health_check_supported": True,
+               "health_check_config": [], "nioc_enabled": True, "nioc_version": "version3", "nioc_resource_pools": [], "private_vlans": [], "lacp_groups": [],
+               "port_groups": []}
+        dc_port_groups = [{"name": f"DPG-{dc_name}-{FIRST_VLAN + j}", "key": f"dvportgroup-{dc_index * 1000 + j}", "type": "Distributed Port Group",
+                           "dvswitch_name": dvs["name"], "dvswitch_uuid": dvs["uuid"], "dvswitch_mor_id": dvs["mor_id"], "vlan_id_info": str(FIRST_VLAN + j),
+                           "vlan_mode": "access", "vlan_ranges": [[FIRST_VLAN + j, FIRST_VLAN + j]], "ports_configured": 256, "description": None}
+                          for j in range(DISTRIBUTED_PORT_GROUPS)]
+        dc_port_groups.append({"name": f"DPG-{dc_name}-trunk", "key": f"dvportgroup-{dc_index * 1000 + 999}", "type": "Distributed Port Group",
+                               "dvswitch_name": dvs["name"], "dvswitch_uuid": dvs["uuid"], "dvswitch_mor_id": dvs["mor_id"],
+                               "vlan_id_info": f"Trunk ({FIRST_VLAN}-{FIRST_VLAN + DISTRIBUTED_PORT_GROUPS - 1})", "vlan_mode": "trunk",
+                               "vlan_ranges": [[FIRST_VLAN, FIRST_VLAN + DISTRIBUTED_PORT_GROUPS - 1]], "ports_configured": 64, "description": None})
+        dvs["port_groups"] = [{"name": pg["name"], "key": pg["key"], "num_ports": pg["ports_configured"], "type": "earlyBinding", "vlan_info": pg["vlan_id_info"],
+                               "vlan_mode": pg["vlan_mode"], "vlan_ranges": pg["vlan_ranges"], "description": None} for pg in dc_port_groups]
+        dc = {"name": dc_name, "overallStatus": "green", "clusters": [], "standalone_hosts": []}
+        for cluster_index in range(dc_index * CLUSTERS_PER_DATACENTER, min(n_clusters, (dc_index + 1) * CLUSTERS_PER_DATACENTER)):
+            cluster = {"name": f"{dc_name}-C{cluster_index:03d}", "overallStatus": "green", "ha_enabled": True, "ha_admission_control": True,
+                       "ha_vm_restart_priority": "medium", "drs_enabled": True, "drs_behavior": "fullyAutomated", "hosts": []}
+            cluster_hosts = min(HOSTS_PER_CLUSTER, n_hosts - host_index)
+            cluster_vms = n_vms * cluster_hosts // n_hosts if cluster_index < n_clusters - 1 else n_vms - vm_index
+            cluster_datastores = [{"name": f"ds-{cluster['name']}-{j:02d}", "uuid": f"datastore-{cluster_index * 100 + j}",
+                                   "mor_id": f"'vim.Datastore:datastore-{cluster_index * 100 + j}'", "type": "VMFS", "capacity_gb": 16384.0,
+                                   "free_space_gb": round(rng.uniform(1000, 8000), 2), "accessible": True, "url": f"ds:///vmfs/volumes/{cluster_index:04x}{j:04x}/",
+                                   "maintenance_mode": "normal", "mounted_on_hosts": [], "datacenter_name": dc_name, "uncommitted_gb": 2048.0,
+                                   "storage_io_control": "Enabled", "vmfs_extents": [f"naa.6006016{cluster_index:08x}{j:04x}"]}
+                                  for j in range(max(2, cluster_vms // VMS_PER_DATASTORE))]
+            for ds in cluster_datastores: ds["provisioned_gb"] = round(ds["capacity_gb"] - ds["free_space_gb"] + ds["uncommitted_gb"], 2)
+            luns = [ds["vmfs_extents"][0] for ds in cluster_datastores]
+            for _ in range(cluster_hosts):
+                host = _host(host_index, rng, dvs, luns)
+                host_index += 1
+                cluster["hosts"].append(host)
+                for ds in cluster_datastores:
+                    ds["mounted_on_hosts"].append({"host_name": host["name"], "host_mor_id": host["mor_id"], "mount_path": f"/vmfs/volumes/{ds['name']}",
+                                                   "access_mode": "readWrite", "accessible_on_host": True, "mounted_on_host": True})
+            dvs["num_hosts"] += cluster_hosts
+            members = []
+            for k in range(cluster_vms):
+                vm = _vm(vm_index, rng, cluster["hosts"][k % cluster_hosts], cluster_datastores, dc_port_groups[:-1], dc_name, cluster["name"])
+                vm_index += 1
+                members.append(vm)
+            vms += members
+            resource_pools += _resource_pools(cluster_index, cluster, dc_name, members)
+            datastores += cluster_datastores
+            dc["clusters"].append(cluster)
+        datacenters.append(dc)
+        dvs_list.append(dvs)
+        port_groups += dc_port_groups
+    data = {
+        "vcenter_details": {"name": "VMware VirtualCenter Server", "fullName": "VMware vCenter Server 8.0.2 build-22617221", "version": "8.0.2", "build": "22617221",
+                            "apiType": "VirtualCenter", "apiVersion": "8.0.2.0", "osType": "linux-x64", "instanceUuid": "b5a4c7e2-synthetic"},
+        "custom_attribute_definitions": [{"key": 100 + i, "name": name, "type": "<class 'str'>", "managed_object_type": "vim.VirtualMachine"}
+                                         for i, name in enumerate(("App", "Owner", "Env", "Rack"))],
+        "infrastructure": {"datacenters": datacenters}, "datastores": datastores, "vms": vms,
+        "global_networks": {"standard_port_groups_summary": [{"name": "VM Network", "type": "Standard Port Group (Summary)"},
+                                                             {"name": "Management Network", "type": "Standard Port Group (Summary)"}],
+                            "distributed_port_groups": port_groups},
+        "resource_pools": resource_pools, "distributed_virtual_switches": dvs_list,
+    }
+    data["collection_meta"] = {"profile": "full", "sections": list(data), "scope": None, "omitted_host_keys": [], "phases": {}, "cancelled": False}
+    return data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vms", type=int, default=10000)
+    parser.add_argument("--vms-per-host", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="JSON file to write (the collector's cached_data)")
+    args = parser.parse_args()
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(synthetic_inventory(args.vms, args.vms_per_host, args.seed), f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+from typing import Any, Dict, List, Mapping, Optional
+import numpy as np
+import vsphere_collector
+
+# --- Capacity Aggregates ---
+# Built once per cache generation: VM, host and disk fields are loaded into NumPy arrays and rolled up per host,
+# cluster, datacenter, datastore and resource pool with grouped reductions (np.bincount), so the /api/v1/capacity
+# endpoints only read precomputed rows. Ratios use powered-on VMs; allocations of all VMs are reported alongside.
+CAPACITY_LEVELS = ("hosts", "clusters", "datacenters", "datastores", "resource_pools")
+# Record fields read by build_capacity_aggregates, per object type (see inventory_snapshot.apply_object_refresh).
+CAPACITY_SOURCE_FIELDS = {
+    "VM": {"name", "host_name", "vcpus", "ram_mb", "power_state", "disks"},
+    "Host": {"name", "cpu_total_cores", "cpu_mhz", "memory_gb"},
+    "Datastore": {"name", "type", "datacenter_name", "capacity_gb", "free_space_gb", "provisioned_gb", "used_space_gb"},
+}
+
+def _index_of(keys: Dict[Any, int], key: Any) -> int:
+    return keys.setdefault(key, len(keys))
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    return np.divide(numerator, denominator, out=np.full(len(numerator), np.nan), where=denominator > 0)
+
+def _rows(keys: List[Dict[str, Any]], columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Turns column arrays into JSON-ready rows; NaN (e.g. a ratio over zero capacity) becomes None."""
+    as_lists = {}
+    for name, values in columns.items():
+        if values.dtype.kind == "f":
+            as_lists[name] = [None if np.isnan(v) else v for v in np.round(values, 2).tolist()]
+        else:
+            as_lists[name] = values.tolist()
+    return [{**key, **{name: values[i] for name, values in as_lists.items()}} for i, key in enumerate(keys)]
+
+def _compute_rollup(group_of_vm: np.ndarray, group_of_host: np.ndarray, group_count: int, vm: Dict[str, np.ndarray], host: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Sums VM allocations and host capacity per group. VMs or hosts mapped to -1 are left out."""
+    vm_mask, host_mask = group_of_vm >= 0, group_of_host >= 0
+    def vm_sum(weights):
+        return np.bincount(group_of_vm[vm_mask], weights=weights[vm_mask], minlength=group_count)
+    def host_sum(weights):
+        return np.bincount(group_of_host[host_mask], weights=weights[host_mask], minlength=group_count)
+    on = vm["powered_on"]
+    columns = {
+        "host_count": np.bincount(group_of_host[host_mask], minlength=group_count),
+        "vm_count": np.bincount(group_of_vm[vm_mask], minlength=group_count),
+        "powered_on_vm_count": vm_sum(on).astype(np.int64),
+        "vcpus_allocated": vm_sum(vm["vcpus"]).astype(np.int64),
+        "vcpus_powered_on": vm_sum(vm["vcpus"] * on).astype(np.int64),
+        "vram_allocated_gb": vm_sum(vm["ram_gb"]),
+        "vram_powered_on_gb": vm_sum(vm["ram_gb"] * on),
+        "vm_disk_provisioned_gb": vm_sum(vm["disk_gb"]),
+        "cpu_cores": host_sum(host["cores"]).astype(np.int64),
+        "cpu_capacity_mhz": host_sum(host["cores"] * host["mhz"]).astype(np.int64),
+        "memory_gb": host_sum(host["memory_gb"]),
+    }
+    columns["vcpu_to_core_ratio"] = _ratio(columns["vcpus_powered_on"], columns["cpu_cores"])
+    columns["vram_to_pram_ratio"] = _ratio(columns["vram_powered_on_gb"], columns["memory_gb"])
+    return columns
+
+def build_capacity_aggregates(data: Mapping[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    # Hosts and their placement
+    host_keys: Dict[str, int] = {}
+    cluster_keys: Dict[Any, int] = {}
+    dc_keys: Dict[str, int] = {}
+    host_rows, host_cluster, host_dc, cores, mhz, memory_gb = [], [], [], [], [], []
+    for dc in (data.get("infrastructure") or {}).get("datacenters", []):
+        dc_index = _index_of(dc_keys, dc.get("name"))
+        placed = [(h, c) for c in dc.get("clusters", []) for h in c.get("hosts", [])] + [(h, None) for h in dc.get("standalone_hosts", [])]
+        for host, cluster in placed:
+            if host.get("name") in host_keys: continue
+            _index_of(host_keys, host.get("name"))
+            host_rows.append({"name": host.get("name"), "cluster_name": cluster.get("name") if cluster else None, "datacenter_name": dc.get("name")})
+            host_cluster.append(_index_of(cluster_keys, (dc.get("name"), cluster.get("name"))) if cluster else -1)
+            host_dc.append(dc_index)
+            cores.append(host.get("cpu_total_cores") or 0)
+            mhz.append(host.get("cpu_mhz") or 0)
+            memory_gb.append(host.get("memory_gb") or 0)
+    host = {"cores": np.array(cores, dtype=np.float64), "mhz": np.array(mhz, dtype=np.float64), "memory_gb": np.array(memory_gb, dtype=np.float64)}
+    host_cluster_arr = np.array(host_cluster, dtype=np.int64)
+    host_dc_arr = np.array(host_dc, dtype=np.int64)
+
+    # VMs and their disks
+    vms = data.get("vms") or []
+    vm_keys: Dict[str, int] = {}
+    vm_ids: Dict[str, int] = {}
+    datastore_keys = {ds.get("name"): i for i, ds in enumerate(data.get("datastores") or [])}
+    vm_host, vcpus, ram_gb, powered_on, disk_gb = [], [], [], [], []
+    disk_vm, disk_ds, disk_capacity = [], [], []
+    for vm_index, vm in enumerate(vms):
+        vm_keys.setdefault(vm.get("name"), vm_index)
+        if isinstance(vm.get("mor_id"), str): vm_ids.setdefault(vsphere_collector.parse_mor_id(vm["mor_id"]), vm_index)
+        vm_host.append(host_keys.get(vm.get("host_name"), -1))
+        vcpus.append(vm.get("vcpus") or 0)
+        ram_gb.append((vm.get("ram_mb") or 0) / 1024)
+        powered_on.append(vm.get("power_state") == "poweredOn")
+        total = 0.0
+        for disk in vm.get("disks") or []:
+            capacity = disk.get("capacity_gb") or 0
+            total += capacity
+            disk_vm.append(vm_index)
+            disk_ds.append(datastore_keys.get(disk.get("datastore_name"), -1))
+            disk_capacity.append(capacity)
+        disk_gb.append(total)
+    vm = {"vcpus": np.array(vcpus, dtype=np.float64), "ram_gb": np.array(ram_gb, dtype=np.float64),
+          "powered_on": np.array(powered_on, dtype=np.float64), "disk_gb": np.array(disk_gb, dtype=np.float64)}
+    vm_host_arr = np.array(vm_host, dtype=np.int64)
+    vm_known = vm_host_arr >= 0
+    vm_cluster = np.where(vm_known, host_cluster_arr[np.where(vm_known, vm_host_arr, 0)] if len(host_cluster_arr) else -1, -1)
+    vm_dc = np.where(vm_known, host_dc_arr[np.where(vm_known, vm_host_arr, 0)] if len(host_dc_arr) else -1, -1)
+
+    aggregates = {
+        "hosts": _rows(host_rows, _compute_rollup(vm_host_arr, np.arange(len(host_rows)), len(host_rows), vm, host)),
+        "clusters": _rows([{"name": c, "datacenter_name": d} for d, c in cluster_keys],
+                          _compute_rollup(vm_cluster, host_cluster_arr, len(cluster_keys), vm, host)),
+        "datacenters": _rows([{"name": d} for d in dc_keys], _compute_rollup(vm_dc, host_dc_arr, len(dc_keys), vm, host)),
+    }
+
+    # Datastores: capacity reported by vCenter against the disks placed on them
+    datastores = data.get("datastores") or []
+    ds_count = len(datastores)
+    disk_ds_arr, disk_vm_arr = np.array(disk_ds, dtype=np.int64), np.array(disk_vm, dtype=np.int64)
+    disk_mask = disk_ds_arr >= 0
+    ds_vm_pairs = np.unique(np.stack([disk_ds_arr[disk_mask], disk_vm_arr[disk_mask]]), axis=1) if disk_mask.any() else np.empty((2, 0), dtype=np.int64)
+    capacity = np.array([ds.get("capacity_gb") or 0 for ds in datastores], dtype=np.float64)
+    free = np.array([ds.get("free_space_gb") or 0 for ds in datastores], dtype=np.float64)
+    provisioned = np.array([ds.get("provisioned_gb", ds.get("used_space_gb")) or 0 for ds in datastores], dtype=np.float64)
+    ds_columns = {
+        "capacity_gb": capacity, "free_space_gb": free, "used_space_gb": capacity - free, "provisioned_gb": provisioned,
+        "used_pct": _ratio(capacity - free, capacity) * 100,
+        "provisioned_to_capacity_ratio": _ratio(provisioned, capacity),
+        "vm_count": np.bincount(ds_vm_pairs[0], minlength=ds_count),
+        "vm_disk_count": np.bincount(disk_ds_arr[disk_mask], minlength=ds_count),
+        "vm_disk_provisioned_gb": np.bincount(disk_ds_arr[disk_mask], weights=np.array(disk_capacity, dtype=np.float64)[disk_mask], minlength=ds_count),
+    }
+    aggregates["datastores"] = _rows([{"name": ds.get("name"), "type": ds.get("type"), "datacenter_name": ds.get("datacenter_name")} for ds in datastores], ds_columns)
+
+    # Resource pools: VMs directly in each pool
+    pools = data.get("resource_pools") or []
+    pool_of, vm_of = [], []
+    for pool_index, pool in enumerate(pools):
+        # Members by MOR id (VM names are not unique); by name for records collected without vm_mor_ids.
+        if pool.get("vm_mor_ids") is not None: members = [vm_ids.get(vsphere_collector.parse_mor_id(str(mor_id))) for mor_id in pool["vm_mor_ids"]]
+        else: members = [vm_keys.get(vm_name) for vm_name in pool.get("vms_in_pool") or []]
+        for vm_index in members:
+            if vm_index is not None:
+                pool_of.append(pool_index); vm_of.append(vm_index)
+    pool_arr, member_arr = np.array(pool_of, dtype=np.int64), np.array(vm_of, dtype=np.int64)
+    def pool_sum(weights):
+        return np.bincount(pool_arr, weights=weights[member_arr] if len(member_arr) else None, minlength=len(pools))
+    aggregates["resource_pools"] = _rows(
+        [{"name": p.get("name"), "mor_id": p.get("mor_id"), "parent_name": p.get("parent_name"),
+          "cluster_name": p.get("cluster_name"), "datacenter_name": p.get("datacenter_name")} for p in pools],
+        {"vm_count": np.bincount(pool_arr, minlength=len(pools)),
+         "powered_on_vm_count": pool_sum(vm["powered_on"]).astype(np.int64),
+         "vcpus_allocated": pool_sum(vm["vcpus"]).astype(np.int64),
+         "vram_allocated_gb": pool_sum(vm["ram_gb"]),
+         "vm_disk_provisioned_gb": pool_sum(vm["disk_gb"]),
+         "cpu_reservation_mhz": np.array([p.get("cpu_reservation_mhz") or 0 for p in pools], dtype=np.int64),
+         "mem_reservation_mb": np.array([p.get("mem_reservation_mb") or 0 for p in pools], dtype=np.int64)})
+    return aggregates
+
+def find_capacity_row(rows: List[Dict[str, Any]], name: str, datacenter_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    return next((r for r in rows if r.get("name") == name and (datacenter_name is None or r.get("datacenter_name") == datacenter_name)), None)
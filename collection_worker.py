@@ -0,0 +1,164 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from shared_snapshot import read_collection_handoff, write_collection_handoff
+
+logger = logging.getLogger(__name__)
+
+# --- Collection Worker Process ---
+# vCenter collection (SOAP parsing, pyVmomi object construction) is CPU-bound and holds the GIL for minutes. Run in a
+# thread of the API process, it starves the event loop; run here, in a child process, it only competes for a core.
+# The pipe carries small control messages only (commands, progress, outcome): the result is written to a handoff file
+# (shared_snapshot.write_collection_handoff) and decoded by the API process record by record. The child is started
+# with "spawn" (no copy of the API's threads and sockets) and is restarted when it dies or misses its time budget.
+STOP_TIMEOUT_S = 10
+
+class CollectionWorker:
+    """Runs vsphere_collector.main in a child process, one collection at a time. collect replaces vsphere_collector.main
+    (same signature); it must be a module-level function the child can import."""
+    def __init__(self, handoff_path: str, collect: Optional[Callable[..., Any]] = None):
+        self.handoff_path = handoff_path
+        self.collect_function = collect
+        self.restarts = 0
+        self.last_exit_code: Optional[int] = None
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self._sequence = 0
+        self._stopping = False
+        self._lock = threading.Lock()  # one collection at a time
+
+    def status(self) -> Dict[str, Any]:
+        alive = self._process is not None and self._process.is_alive()
+        return {"mode": "process", "pid": self._process.pid if alive else None, "alive": alive, "restarts": self.restarts,
+                "last_exit_code": self.last_exit_code}
+
+    def start(self):
+        if self._process is not None and self._process.is_alive(): return
+        self._stopping = False
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(target=_worker_main, args=(child_conn, self.collect_function), name="vlens-collection-worker", daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        logger.info(f"Collection worker started (pid {self._process.pid}).")
+
+    def stop(self):
+        if self._process is None: return
+        self._stopping = True
+        try:
+            self._conn.send({"op": "stop"})
+        except OSError:
+            pass
+        self._process.join(STOP_TIMEOUT_S)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._conn.close()
+        self._process = None
+
+    def cancel(self):
+        """Asks the running collection to stop after the current object, like CollectionControl.cancel."""
+        try:
+            if self._conn is not None: self._conn.send({"op": "cancel", "sequence": self._sequence})
+        except OSError:
+            pass
+
+    def _restart(self, reason: str):
+        if self._process is not None and self._process.is_alive():
+            self._process.kill()
+        if self._process is not None:
+            self._process.join()
+            self.last_exit_code = self._process.exitcode
+            self._conn.close()
+        self._process = None
+        self.restarts += 1
+        logger.warning(f"Restarting the collection worker: {reason} (exit code {self.last_exit_code}).")
+        self.start()
+
+    def collect(self, profile: str = "full", datacenters: Optional[List[str]] = None, clusters: Optional[List[str]] = None,
+                progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None, timeout_s: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Blocking. The collected data, or None when the collector returned none. Raises TimeoutError when the worker did
+        not answer within timeout_s (it is killed and restarted) and RuntimeError when it died or the collection raised."""
+        with self._lock:
+            self.start()
+            self._sequence += 1
+            sequence = self._sequence
+            self._conn.send({"op": "collect", "sequence": sequence, "profile": profile, "datacenters": datacenters, "clusters": clusters,
+                             "handoff_path": self.handoff_path})
+            deadline = time.monotonic() + timeout_s if timeout_s else None
+            while True:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    self._restart(f"collection {sequence} did not finish within {timeout_s:.0f}s")
+                    raise TimeoutError(f"Data collection did not finish within {timeout_s:.0f}s; the collection worker was restarted.")
+                try:
+                    message = self._conn.recv() if self._conn.poll(min(1.0, remaining) if remaining is not None else 1.0) else None
+                except (EOFError, OSError):
+                    message = None
+                if message is None:
+                    if self._process is not None and self._process.is_alive(): continue
+                    if self._stopping: raise RuntimeError("The collection worker was stopped during the collection.")
+                    self._restart(f"it exited during collection {sequence}")
+                    raise RuntimeError(f"The collection worker exited with code {self.last_exit_code} during the collection.")
+                if message["type"] == "progress":
+                    if progress_callback: progress_callback(message["progress"])
+                    continue
+                if message["sequence"] != sequence: continue  # outcome of an abandoned collection
+                if message.get("error"): raise RuntimeError(message["error"])
+                if not message["has_data"]: return None
+                try:
+                    return read_collection_handoff(self.handoff_path, sequence)
+                finally:
+                    try:
+                        os.remove(self.handoff_path)
+                    except OSError:
+                        pass
+
+def _worker_main(conn, collect: Optional[Callable[..., Any]] = None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    import vsphere_collector
+    collect = collect or vsphere_collector.main
+    commands: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    send_lock = threading.Lock()
+    running: Dict[str, Any] = {"sequence": None, "control": None}
+    cancelled = set()
+
+    def send(message: Dict[str, Any]):
+        with send_lock: conn.send(message)
+
+    def read_commands():
+        # Cancellations are applied here, while the main thread is busy collecting.
+        while True:
+            try:
+                command = conn.recv()
+            except (EOFError, OSError):  # the API process is gone
+                command = {"op": "stop"}
+            if command["op"] in ("cancel", "stop"):
+                cancelled.add(command.get("sequence"))
+                if running["control"] is not None and (command["op"] == "stop" or running["sequence"] == command["sequence"]):
+                    running["control"].cancel()
+            if command["op"] != "cancel": commands.put(command)
+            if command["op"] == "stop": return
+
+    threading.Thread(target=read_commands, name="worker-commands", daemon=True).start()
+    while True:
+        command = commands.get()
+        if command["op"] == "stop": return
+        control = vsphere_collector.CollectionControl()
+        running.update(sequence=command["sequence"], control=control)
+        if command["sequence"] in cancelled: control.cancel()
+        try:
+            _, collected_data = collect(command["profile"], command["datacenters"], command["clusters"],
+                                        lambda progress: send({"type": "progress", "progress": progress}), control)
+            if collected_data: write_collection_handoff(command["handoff_path"], command["sequence"], collected_data)
+            send({"type": "result", "sequence": command["sequence"], "has_data": bool(collected_data)})
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Collection {command['sequence']} failed: {e}", exc_info=True)
+            send({"type": "result", "sequence": command["sequence"], "error": f"{e.__class__.__name__} - {e}"})
+        finally:
+            running.update(sequence=None, control=None)
@@ -0,0 +1,178 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import vsphere_collector
+from datastore_history import DATASTORE_HISTORY_PATH, history_from_environment
+from inventory_store import InventoryStore
+from inventory_snapshot import InventorySnapshot, advance_generation_counter, apply_collection_result, apply_object_refresh, diff_object_tables
+from shared_snapshot import PublishedChanges, SharedSnapshotReader, pop_collection_cancel, pop_collector_requests, publish_snapshot, write_collector_status
+
+# --- Logging Configuration ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+# Single process that owns vCenter collection when the API runs with several uvicorn workers (VLENS_CACHE_MODE=shared).
+SNAPSHOT_PATH = os.getenv("VLENS_SNAPSHOT_PATH", "data/inventory.snapshot")
+COLLECTION_INTERVAL_S = float(os.getenv("VLENS_COLLECTION_INTERVAL_S", "0"))  # 0 disables periodic collections
+REQUEST_POLL_S = float(os.getenv("VLENS_REQUEST_POLL_S", "1"))
+COMPLETED_REQUESTS_KEPT = 50
+datastore_history = history_from_environment()
+INVENTORY_DB_PATH = os.getenv("VLENS_INVENTORY_DB_PATH", "")
+inventory_store = InventoryStore(INVENTORY_DB_PATH) if INVENTORY_DB_PATH else None
+published_changes = PublishedChanges()
+
+collector_status: Dict[str, Any] = {
+    "last_collection_timestamp_utc": None,
+    "last_collection_status": "Not yet run",
+    "last_collection_message": "",
+    "is_collecting": False,
+    "last_collection_phases": None,
+    "cache_generation": None,
+    "completed_requests": {},
+}
+
+def _publish_status():
+    write_collector_status(SNAPSHOT_PATH, collector_status)
+
+def _complete_request(request: Dict[str, Any], ok: bool, message: str, error: Optional[str] = None):
+    """Records the outcome of a queued request; error is one of not_initialized, not_found, not_in_cache or failed."""
+    completed = collector_status["completed_requests"]
+    completed[request["request_id"]] = {"ok": ok, "message": message, "error": error, "cache_generation": collector_status["cache_generation"]}
+    for request_id in list(completed)[:-COMPLETED_REQUESTS_KEPT]:
+        del completed[request_id]
+
+def _install(snapshot: InventorySnapshot, previous: Optional[InventorySnapshot]) -> InventorySnapshot:
+    changes = diff_object_tables(previous, snapshot) if previous is not None else None
+    if changes is not None: published_changes.append(previous.generation, snapshot.generation, changes)
+    # The store is written first: workers serve their lookups from it once they load the generation, and fall back to
+    # the snapshot's indexes only until they do (the store is then one generation ahead).
+    if inventory_store is not None:
+        try:
+            result = inventory_store.write_snapshot(snapshot, previous, changes)
+            logger.info(f"Wrote cache generation {snapshot.generation} to {INVENTORY_DB_PATH} ({result['objects_written']} objects, incremental: {result['incremental']}).")
+        except Exception as e:
+            logger.error(f"Failed to write inventory store {INVENTORY_DB_PATH}: {e}", exc_info=True)
+    publish_snapshot(SNAPSHOT_PATH, snapshot, published_changes)
+    collector_status["cache_generation"] = snapshot.generation
+    logger.info(f"Published cache generation {snapshot.generation} to {SNAPSHOT_PATH}.")
+    try:
+        if datastore_history.record_snapshot(snapshot): datastore_history.save()
+    except Exception as e:
+        logger.error(f"Failed to record datastore capacity history to {DATASTORE_HISTORY_PATH}: {e}", exc_info=True)
+    return snapshot
+
+def run_collection(current: Optional[InventorySnapshot], profile: str = "full", datacenters: Optional[List[str]] = None,
+                   clusters: Optional[List[str]] = None) -> Optional[InventorySnapshot]:
+    collector_status["is_collecting"] = True
+    _publish_status()
+    start_time = datetime.now(timezone.utc)
+    control = vsphere_collector.CollectionControl()
+    pop_collection_cancel(SNAPSHOT_PATH)  # a stale request must not cancel this collection
+    stop_watching = threading.Event()
+    def watch_for_cancel():
+        while not stop_watching.wait(REQUEST_POLL_S):
+            if pop_collection_cancel(SNAPSHOT_PATH):
+                logger.info("Cancellation of the running collection requested.")
+                control.cancel()
+                return
+    threading.Thread(target=watch_for_cancel, daemon=True).start()
+    try:
+        _, collected_data = vsphere_collector.main(profile, datacenters, clusters, None, control)
+        end_time = datetime.now(timezone.utc)
+        duration = end_time - start_time
+        if collected_data:
+            current = _install(apply_collection_result(current, collected_data, end_time), current)
+            outcome, incomplete_phases = vsphere_collector.collection_outcome(collected_data["collection_meta"])
+            collector_status["last_collection_timestamp_utc"] = end_time.isoformat()
+            collector_status["last_collection_status"] = outcome
+            collector_status["last_collection_phases"] = collected_data["collection_meta"].get("phases")
+            if incomplete_phases:
+                collector_status["last_collection_message"] = f"Data collection {outcome.lower()} at {end_time.isoformat()} (took {duration.total_seconds():.2f}s): {incomplete_phases}; those sections keep their previous data"
+                logger.warning(collector_status["last_collection_message"])
+            else:
+                collector_status["last_collection_message"] = f"Data collected successfully at {end_time.isoformat()} (took {duration.total_seconds():.2f}s)"
+                logger.info(collector_status["last_collection_message"])
+        else:
+            collector_status["last_collection_status"] = "Failed"
+            collector_status["last_collection_message"] = f"Collector returned no data at {end_time.isoformat()}. Check collector logs."
+            logger.error(collector_status["last_collection_message"])
+    except Exception as e:
+        duration = datetime.now(timezone.utc) - start_time
+        collector_status["last_collection_status"] = "Failed (Exception)"
+        collector_status["last_collection_message"] = f"Exception during data collection: {str(e)} (took {duration.total_seconds():.2f}s)"
+        logger.error(collector_status["last_collection_message"], exc_info=True)
+    finally:
+        stop_watching.set()
+        collector_status["is_collecting"] = False
+    return current
+
+def run_object_refresh(current: Optional[InventorySnapshot], request: Dict[str, Any]) -> Optional[InventorySnapshot]:
+    object_type, identifier = request["object_type"], request["identifier"]
+    if current is None:
+        _complete_request(request, False, "Data cache not initialized.", "not_initialized")
+        return current
+    try:
+        record = vsphere_collector.refresh_single_object(object_type, identifier, request.get("mor_id"))
+        if record is None:
+            _complete_request(request, False, f"{object_type} '{identifier}' not found in vCenter.", "not_found")
+            return current
+        current = _install(apply_object_refresh(current, object_type, identifier, record), current)
+        _complete_request(request, True, f"{object_type} '{identifier}' refreshed.")
+    except LookupError as e:
+        _complete_request(request, False, str(e), "not_in_cache")
+    except Exception as e:
+        logger.error(f"Targeted refresh of {object_type} '{identifier}' failed: {e}", exc_info=True)
+        _complete_request(request, False, f"Targeted refresh of {object_type} '{identifier}' failed: {e}", "failed")
+    return current
+
+def main():
+    current = None
+    try:
+        current = SharedSnapshotReader(SNAPSHOT_PATH).read_if_changed()
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable snapshot file: {e}")
+    if current is not None:
+        advance_generation_counter(current.generation)
+        collector_status["cache_generation"] = current.generation
+        logger.info(f"Resuming from published cache generation {current.generation}.")
+
+    try:
+        datastore_history.load_if_changed()
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable datastore history {DATASTORE_HISTORY_PATH}: {e}")
+
+    logger.info("Collector service starting, initiating first data collection...")
+    current = run_collection(current)
+    last_full_collection = time.monotonic()
+    _publish_status()
+    try:
+        while True:
+            for request in pop_collector_requests(SNAPSHOT_PATH):
+                if request.get("kind") == "object":
+                    current = run_object_refresh(current, request)
+                else:
+                    current = run_collection(current, request.get("profile", "full"), request.get("datacenters"), request.get("clusters"))
+                    ok = collector_status["last_collection_status"] == "Success"
+                    _complete_request(request, ok, collector_status["last_collection_message"], None if ok else "failed")
+                    if request.get("profile", "full") == "full": last_full_collection = time.monotonic()
+                _publish_status()
+            if COLLECTION_INTERVAL_S > 0 and time.monotonic() - last_full_collection >= COLLECTION_INTERVAL_S:
+                current = run_collection(current)
+                last_full_collection = time.monotonic()
+                _publish_status()
+            time.sleep(REQUEST_POLL_S)
+    finally:
+        vsphere_collector.close_persistent_service_instance()
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # docker stop: run the finally blocks
+    main()
@@ -0,0 +1,256 @@
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# --- Datastore Capacity History ---
+# One column per recorded collection and one row per datastore, in a fixed-size ring of columns:
+#   values[row, metric, column] (float32, NaN where a datastore was not collected), timestamps[column] (epoch seconds).
+# Persisted as a single .npz file, rewritten atomically after each recorded sample.
+HISTORY_METRICS = ["capacity_gb", "free_space_gb", "uncommitted_gb"]
+CAPACITY, FREE, UNCOMMITTED = range(len(HISTORY_METRICS))
+SECONDS_PER_DAY = 86400.0
+MIN_FIT_SAMPLES = 3
+
+# --- Configuration ---
+# Shared by the API process (local mode) and the collector process (shared mode), which write and read the same file.
+DATASTORE_HISTORY_PATH = os.getenv("VLENS_DATASTORE_HISTORY_PATH", "data/datastore_history.npz")
+DATASTORE_HISTORY_SAMPLES = int(os.getenv("VLENS_DATASTORE_HISTORY_SAMPLES", "1440"))
+DATASTORE_HISTORY_MIN_INTERVAL_S = float(os.getenv("VLENS_DATASTORE_HISTORY_MIN_INTERVAL_S", "3600"))
+
+def datastore_key(datastore: Dict[str, Any]) -> Optional[str]:
+    key = datastore.get("uuid") if datastore.get("uuid") not in (None, "", "N/A") else datastore.get("name")
+    return None if key in (None, "", "N/A") else str(key)
+
+class DatastoreCapacityHistory:
+    def __init__(self, path: Optional[str], max_samples: int, min_interval_s: float):
+        self.path = path
+        self.max_samples = max_samples
+        self.min_interval_s = min_interval_s
+        self.last_collected_at: Optional[float] = None  # collection time of the datastores section last recorded
+        self._keys: List[str] = []
+        self._names: List[Optional[str]] = []
+        self._datacenters: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._values = np.full((0, len(HISTORY_METRICS), max_samples), np.nan, dtype=np.float32)
+        self._timestamps = np.zeros(max_samples, dtype=np.int64)
+        self._head = 0  # next column to write
+        self._count = 0
+        self._column_opened_at: Optional[float] = None  # first collection merged into the last column
+        self._file_key: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+
+    # --- Recording ---
+    def _grow(self, needed: int, keep: set):
+        """Drops datastores with no retained sample (except those in keep, which are being recorded), then doubles the
+        row capacity if still needed."""
+        live = [row for row, key in enumerate(self._keys) if key in keep or not np.all(np.isnan(self._values[row, FREE]))]
+        if len(live) < len(self._keys):
+            self._values = self._values[live]
+            self._keys, self._names, self._datacenters = ([items[row] for row in live] for items in (self._keys, self._names, self._datacenters))
+            self._rows = {key: row for row, key in enumerate(self._keys)}
+        if len(self._keys) + needed > self._values.shape[0]:
+            rows = max(64, 2 * (len(self._keys) + needed))
+            grown = np.full((rows, len(HISTORY_METRICS), self.max_samples), np.nan, dtype=np.float32)
+            grown[:len(self._keys)] = self._values[:len(self._keys)]
+            self._values = grown
+
+    def record(self, collected_at: datetime, datastores: List[Dict[str, Any]]) -> bool:
+        """Adds a sample column for a datastores collection. Collections closer than min_interval_s to the last sample
+        update that sample instead, so the ring spans a predictable time range. Returns False if already recorded."""
+        timestamp = collected_at.timestamp()
+        with self._lock:
+            if self.last_collected_at is not None and timestamp <= self.last_collected_at: return False
+            samples = [(datastore_key(ds), ds) for ds in datastores]
+            samples = [(key, ds) for key, ds in samples if key is not None]
+            new_keys = list(dict.fromkeys(key for key, _ in samples if key not in self._rows))
+            if len(self._keys) + len(new_keys) > self._values.shape[0]: self._grow(len(new_keys), {key for key, _ in samples})
+            for key in new_keys:
+                self._rows[key] = len(self._keys)
+                self._keys.append(key); self._names.append(None); self._datacenters.append(None)
+
+            last_column = (self._head - 1) % self.max_samples
+            # The interval is measured from the collection that opened the column, not from its latest update, so
+            # collections more frequent than min_interval_s still open a new column every min_interval_s.
+            if self._count and timestamp - self._column_opened_at < self.min_interval_s:
+                column = last_column
+            else:
+                column = self._head
+                self._head = (self._head + 1) % self.max_samples
+                self._count = min(self._count + 1, self.max_samples)
+                self._values[:, :, column] = np.nan
+                self._column_opened_at = timestamp
+            self._timestamps[column] = int(timestamp)  # the column holds the values of this collection
+            rows = np.array([self._rows[key] for key, _ in samples], dtype=np.int64)
+            matrix = np.array([[_as_float(ds.get(metric)) for metric in HISTORY_METRICS] for _, ds in samples], dtype=np.float32).reshape(-1, len(HISTORY_METRICS))
+            self._values[rows, :, column] = matrix
+            for key, ds in samples:
+                row = self._rows[key]
+                self._names[row], self._datacenters[row] = ds.get("name"), ds.get("datacenter_name")
+            self.last_collected_at = timestamp
+        return True
+
+    def record_snapshot(self, snapshot) -> bool:
+        """Records the snapshot's datastores section if it was collected after the last recorded sample."""
+        section = snapshot.section_timestamps.get("datastores")
+        if not section: return False
+        return self.record(section["collected_at_utc"], snapshot.get("datastores") or [])
+
+    # --- Persistence ---
+    def save(self):
+        if not self.path: return
+        with self._lock:
+            payload = {
+                "keys": np.array(self._keys, dtype=str),
+                "names": np.array([name or "" for name in self._names], dtype=str),
+                "datacenters": np.array([dc or "" for dc in self._datacenters], dtype=str),
+                "values": self._values[:len(self._keys)],
+                "timestamps": self._timestamps,
+                "state": np.array([self._head, self._count, -1 if self.last_collected_at is None else self.last_collected_at,
+                                   -1 if self._column_opened_at is None else self._column_opened_at], dtype=np.float64),
+            }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        stat_result = os.stat(self.path)
+        self._file_key = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+    def load_if_changed(self) -> bool:
+        """(Re)loads the history file if it changed on disk since the last load or save. Returns True if loaded."""
+        if not self.path: return False
+        try:
+            stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        file_key = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+        if file_key == self._file_key: return False
+        with np.load(self.path, allow_pickle=False) as archive:
+            values, timestamps = archive["values"], archive["timestamps"]
+            head, count, last_collected_at, *column_opened_at = archive["state"].tolist()
+            keys, names, datacenters = archive["keys"].tolist(), archive["names"].tolist(), archive["datacenters"].tolist()
+        if values.shape[1:] != (len(HISTORY_METRICS), self.max_samples):
+            # Different ring size: keep the most recent columns in chronological order.
+            order = (np.arange(int(head) - int(count), int(head)) % timestamps.shape[0])[-self.max_samples:]
+            resized = np.full((values.shape[0], len(HISTORY_METRICS), self.max_samples), np.nan, dtype=np.float32)
+            resized[:, :, :len(order)] = values[:, :, order]
+            resized_timestamps = np.zeros(self.max_samples, dtype=np.int64)
+            resized_timestamps[:len(order)] = timestamps[order]
+            values, timestamps, head, count = resized, resized_timestamps, len(order) % self.max_samples, len(order)
+        # Files written before the opening time was saved: the last column's timestamp is the best available.
+        column_opened_at = column_opened_at[0] if column_opened_at else float(timestamps[(int(head) - 1) % timestamps.shape[0]])
+        with self._lock:
+            self._values, self._timestamps = values.astype(np.float32), timestamps.astype(np.int64)
+            self._head, self._count = int(head), int(count)
+            self.last_collected_at = None if last_collected_at < 0 else last_collected_at
+            self._column_opened_at = None if not count or column_opened_at < 0 else column_opened_at
+            self._keys, self._names, self._datacenters = keys, [n or None for n in names], [d or None for d in datacenters]
+            self._rows = {key: row for row, key in enumerate(keys)}
+        self._file_key = file_key
+        return True
+
+    # --- Queries ---
+    def _ordered(self) -> Tuple[np.ndarray, np.ndarray]:
+        order = np.arange(self._head - self._count, self._head) % self.max_samples
+        return self._timestamps[order], order
+
+    def series(self, key: str, days: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None: return None
+            timestamps, order = self._ordered()
+            values = self._values[row][:, order]
+        keep = ~np.isnan(values[FREE])
+        if days is not None: keep &= timestamps >= timestamps.max(initial=0) - days * SECONDS_PER_DAY
+        values = values[:, keep].astype(np.float64)
+        used = values[CAPACITY] - values[FREE]
+        return {
+            "timestamps": timestamps[keep].tolist(),
+            "capacity_gb": _rounded(values[CAPACITY]), "free_space_gb": _rounded(values[FREE]),
+            "used_gb": _rounded(used), "provisioned_gb": _rounded(used + values[UNCOMMITTED]),
+        }
+
+    def forecast(self, window_days: float, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Least-squares trend of used and provisioned space over the last window_days, for every datastore at once."""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            timestamps, order = self._ordered()
+            values = self._values[:len(self._keys)][:, :, order].astype(np.float64)  # (datastores, metrics, samples)
+            keys, names, datacenters = list(self._keys), list(self._names), list(self._datacenters)
+        if not keys: return []
+        in_window = timestamps >= now.timestamp() - window_days * SECONDS_PER_DAY
+        if not in_window.any(): return []
+        values, timestamps = values[:, :, in_window], timestamps[in_window].astype(np.float64)
+        days = (timestamps - timestamps.mean()) / SECONDS_PER_DAY  # centered for precision
+        used = values[:, CAPACITY] - values[:, FREE]
+        provisioned = used + values[:, UNCOMMITTED]
+        used_slope, used_r2, n = _fit_slopes(days, used)
+        provisioned_slope, _, _ = _fit_slopes(days, provisioned)
+
+        # Latest collected values per datastore (last non-NaN column).
+        present = ~np.isnan(values[:, FREE])
+        last = np.where(present.any(axis=1), present.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1), -1)
+        rows = np.arange(len(keys))
+        latest = values[rows, :, np.maximum(last, 0)]
+        latest[last < 0] = np.nan
+        latest_ts = np.where(last >= 0, timestamps[np.maximum(last, 0)], np.nan)
+        free_now = latest[:, FREE]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            days_until_full = np.where((used_slope > 0) & (n >= MIN_FIT_SAMPLES), free_now / used_slope - (now.timestamp() - latest_ts) / SECONDS_PER_DAY, np.nan)
+            used_pct = (latest[:, CAPACITY] - free_now) / latest[:, CAPACITY] * 100
+        days_until_full = np.maximum(days_until_full, 0)
+
+        results = []
+        for i, key in enumerate(keys):
+            if last[i] < 0: continue
+            until_full = _value(days_until_full[i])
+            results.append({
+                "datastore_key": key, "name": names[i], "datacenter_name": datacenters[i],
+                "samples": int(n[i]),
+                "capacity_gb": _value(latest[i, CAPACITY]), "free_space_gb": _value(free_now[i]), "used_pct": _value(used_pct[i]),
+                "used_growth_gb_per_day": _value(used_slope[i], 3) if n[i] >= MIN_FIT_SAMPLES else None,
+                "provisioned_growth_gb_per_day": _value(provisioned_slope[i], 3) if n[i] >= MIN_FIT_SAMPLES else None,
+                "trend_r2": _value(used_r2[i], 3) if n[i] >= MIN_FIT_SAMPLES else None,
+                "days_until_full": until_full,
+                "full_date_utc": (now + timedelta(days=until_full)).date().isoformat() if until_full is not None and until_full < 36500 else None,
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            timestamps, _ = self._ordered()
+            return {
+                "datastores": len(self._keys), "samples": self._count, "max_samples": self.max_samples,
+                "oldest_sample_utc": datetime.fromtimestamp(int(timestamps[0]), timezone.utc).isoformat() if self._count else None,
+                "latest_sample_utc": datetime.fromtimestamp(int(timestamps[-1]), timezone.utc).isoformat() if self._count else None,
+            }
+def history_from_environment() -> DatastoreCapacityHistory:
+    return DatastoreCapacityHistory(DATASTORE_HISTORY_PATH, DATASTORE_HISTORY_SAMPLES, DATASTORE_HISTORY_MIN_INTERVAL_S)
+
+def _fit_slopes(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-row least-squares slope and r² of y (rows x samples, NaN = missing) against x, in one pass over the matrix."""
+    mask = ~np.isnan(y)
+    n = mask.sum(axis=1)
+    xm = np.where(mask, x, 0.0)
+    ym = np.where(mask, y, 0.0)
+    sx, sy = xm.sum(axis=1), ym.sum(axis=1)
+    sxx, sxy, syy = (xm * xm).sum(axis=1), (xm * ym).sum(axis=1), (ym * ym).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var_x, var_y, cov = n * sxx - sx * sx, n * syy - sy * sy, n * sxy - sx * sy
+        slope = np.where(var_x > 0, cov / var_x, np.nan)
+        r2 = np.where((var_x > 0) & (var_y > 0), cov * cov / (var_x * var_y), np.nan)
+    return slope, r2, n
+
+def _as_float(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+def _value(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+def _rounded(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(v) else v for v in np.round(values, 2).tolist()]
@@ -0,0 +1,81 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback: same output, slower
+    orjson = None
+
+# --- Fast JSON Responses ---
+# Scene graphs and DATs are built from cache records that were validated when collected. Instead of re-validating them
+# through response models and re-encoding every record on each request, responses are assembled from encoded fragments:
+# each record's JSON is kept by content hash (unchanged records keep their hash across generations), and only the small
+# per-request fields (labels, metrics, positions) are encoded per request.
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson is not None else 0
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)): return value.isoformat()
+    if isinstance(value, np.generic): return value.item()
+    return str(value)
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None: return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def encode_object(before: Dict[str, Any], name: str, raw: bytes, after: Optional[Dict[str, Any]] = None) -> bytes:
+    """JSON object with the fields of before, then name set to the already encoded JSON raw, then the fields of after."""
+    parts = [dumps(before)[:-1]]
+    if before: parts.append(b",")
+    parts += [dumps(name), b":", raw]
+    if after: parts += [b",", dumps(after)[1:]]
+    else: parts.append(b"}")
+    return b"".join(parts)
+
+def encode_array(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+class FragmentCache:
+    """LRU of encoded JSON fragments, bounded by their total size."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Any, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Any) -> Optional[bytes]:
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return fragment
+
+    def put(self, key: Any, fragment: bytes):
+        if len(fragment) > self.max_bytes: return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None: self._size -= len(previous)
+            self._entries[key] = fragment
+            self._size += len(fragment)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_or_encode(self, key: Any, encode: Callable[[], bytes]) -> bytes:
+        fragment = self.get(key)
+        if fragment is None:
+            fragment = encode()
+            self.put(key, fragment)
+        return fragment
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
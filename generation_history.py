@@ -0,0 +1,147 @@
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Mapping, Optional, Tuple
+from inventory_snapshot import InventorySnapshot, diff_object_tables
+
+# --- Generation History ---
+# The last N generations are kept as a chain of changesets (what each generation added, removed or changed relative
+# to the one before). Records are the snapshots' own objects, so unchanged ones are never duplicated, and a diff between
+# two retained generations composes the changesets in between: O(changed objects), not O(inventory).
+ObjectKey = Tuple[str, str]
+Entry = Tuple[Dict[str, Any], str]  # (record, content hash)
+
+# Nested lists diffed item by item (keyed by this field) rather than reported as a whole new value.
+NESTED_LIST_KEYS = {
+    "disks": "key", "network_adapters": "key", "mounted_on_hosts": "host_name",
+    "physical_nics": "device", "vmkernel_adapters": "device", "port_groups": "key",
+}
+
+@dataclass(frozen=True)
+class ChangeSet:
+    generation: int
+    previous_generation: int
+    created_at_utc: datetime
+    added: Mapping[ObjectKey, Entry]
+    removed: Mapping[ObjectKey, Entry]
+    changed: Mapping[ObjectKey, Tuple[Entry, Entry]]
+    size_bytes: int  # serialized size of the records this generation introduced, a proxy for the memory it pins
+
+    def counts(self) -> Dict[str, int]:
+        return {"added": len(self.added), "removed": len(self.removed), "changed": len(self.changed)}
+
+def _record_size(record: Dict[str, Any]) -> int:
+    return len(json.dumps(record, default=str, separators=(",", ":")))
+
+def _diff_keyed_list(old_items: List[Any], new_items: List[Any], key_field: str) -> Dict[str, Any]:
+    old_by_key = {item.get(key_field): item for item in old_items if isinstance(item, dict)}
+    new_by_key = {item.get(key_field): item for item in new_items if isinstance(item, dict)}
+    return {
+        "added": [new_by_key[k] for k in new_by_key if k not in old_by_key],
+        "removed": [old_by_key[k] for k in old_by_key if k not in new_by_key],
+        "changed": {str(k): diff_record_fields(old_by_key[k], new_by_key[k]) for k in new_by_key if k in old_by_key and old_by_key[k] != new_by_key[k]},
+    }
+
+def diff_record_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """{field: {"from", "to"}} for scalar fields; keyed nested lists report their added, removed and changed items."""
+    fields = {}
+    for field_name in sorted(old.keys() | new.keys()):
+        old_value, new_value = old.get(field_name), new.get(field_name)
+        if old_value == new_value: continue
+        if field_name in NESTED_LIST_KEYS and isinstance(old_value, list) and isinstance(new_value, list):
+            fields[field_name] = _diff_keyed_list(old_value, new_value, NESTED_LIST_KEYS[field_name])
+        else:
+            fields[field_name] = {"from": old_value, "to": new_value}
+    return fields
+
+class GenerationHistory:
+    """Bounded by max_generations changesets and by max_bytes of records pinned by them, whichever is hit first."""
+    def __init__(self, max_generations: int, max_bytes: int):
+        self.max_generations = max_generations
+        self.max_bytes = max_bytes
+        self.baseline: Optional[Tuple[int, datetime]] = None  # oldest generation diffs can start from
+        self.changesets: Deque[ChangeSet] = deque()
+        self.size_bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, previous: Optional[InventorySnapshot], current: InventorySnapshot,
+               changes: Optional[Dict[str, Dict[ObjectKey, Any]]] = None) -> Optional[Dict[str, Dict[ObjectKey, Any]]]:
+        """Appends the changeset from previous to current and returns the raw changes (None for the first generation).
+        changes, if already known (e.g. published by the collector), saves diffing the two generations."""
+        if previous is not None and changes is None: changes = diff_object_tables(previous, current)
+        if previous is None or self.baseline is None:
+            with self._lock:
+                self.baseline, self.changesets, self.size_bytes = (current.generation, current.created_at_utc), deque(), 0
+            return changes
+        changeset = ChangeSet(
+            generation=current.generation, previous_generation=previous.generation, created_at_utc=current.created_at_utc,
+            added=changes["added"], removed=changes["removed"], changed=changes["changed"],
+            size_bytes=sum(_record_size(r) for r, _ in changes["added"].values()) + sum(_record_size(new[0]) for _, new in changes["changed"].values()),
+        )
+        with self._lock:
+            if (self.changesets[-1].generation if self.changesets else self.baseline[0]) != previous.generation:
+                # The chain is broken (e.g. the history was created after previous): restart it from previous.
+                self.baseline, self.changesets, self.size_bytes = (previous.generation, previous.created_at_utc), deque(), 0
+            self.changesets.append(changeset)
+            self.size_bytes += changeset.size_bytes
+            while self.changesets and (len(self.changesets) > self.max_generations or self.size_bytes > self.max_bytes):
+                evicted = self.changesets.popleft()
+                self.size_bytes -= evicted.size_bytes
+                self.baseline = (evicted.generation, evicted.created_at_utc)
+        return changes
+
+    def generations(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            if self.baseline is None: return []
+            listing = [{"generation": self.baseline[0], "created_at_utc": self.baseline[1].isoformat(), "changes": None}]
+            listing += [{"generation": cs.generation, "created_at_utc": cs.created_at_utc.isoformat(), "changes": cs.counts(), "size_bytes": cs.size_bytes}
+                        for cs in self.changesets]
+            return listing
+
+    def generation_at(self, moment: datetime) -> Optional[int]:
+        """Latest retained generation created at or before moment."""
+        found = None
+        for item in self.generations():
+            if datetime.fromisoformat(item["created_at_utc"]) <= moment: found = item["generation"]
+        return found
+
+    def diff(self, from_generation: int, to_generation: int) -> Dict[str, Any]:
+        """Typed change sets between two retained generations (either order). Raises LookupError if one is not retained."""
+        with self._lock:
+            retained = ([self.baseline[0]] if self.baseline else []) + [cs.generation for cs in self.changesets]
+            for generation in (from_generation, to_generation):
+                if generation not in retained:
+                    raise LookupError(f"Generation {generation} is not retained (available: {retained[0] if retained else None}..{retained[-1] if retained else None}).")
+            low, high = sorted((from_generation, to_generation))
+            span = [cs for cs in self.changesets if low < cs.generation <= high]
+        # key -> [state at low, state at high]; None means absent
+        states: Dict[ObjectKey, List[Optional[Entry]]] = {}
+        for changeset in span:
+            for key, entry in changeset.added.items():
+                states.setdefault(key, [None, None])[1] = entry
+            for key, entry in changeset.removed.items():
+                states.setdefault(key, [entry, None])[1] = None
+            for key, (old_entry, new_entry) in changeset.changed.items():
+                states.setdefault(key, [old_entry, None])[1] = new_entry
+        if from_generation > to_generation:
+            states = {key: [after, before] for key, (before, after) in states.items()}
+
+        result: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for (object_type, primary_id), (before, after) in states.items():
+            if before is None and after is None: continue
+            bucket = result.setdefault(object_type, {"added": [], "removed": [], "changed": []})
+            if before is None:
+                bucket["added"].append({"primary_id": primary_id, "name": after[0].get("name"), "hash": after[1]})
+            elif after is None:
+                bucket["removed"].append({"primary_id": primary_id, "name": before[0].get("name"), "hash": before[1]})
+            elif before[1] != after[1]:
+                bucket["changed"].append({"primary_id": primary_id, "name": after[0].get("name"), "hash_from": before[1], "hash_to": after[1],
+                                          "fields": diff_record_fields(before[0], after[0])})
+        return {
+            "from_generation": from_generation,
+            "to_generation": to_generation,
+            "summary": {t: {kind: len(items) for kind, items in bucket.items()} for t, bucket in result.items()},
+            "changes": result,
+        }
@@ -0,0 +1,138 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# --- Scene Graph Layout ---
+# Node coordinates computed server-side, so large graphs do not stall the browser:
+#   - "layered": one layer per object type (clusters, hosts, VMs, then storage and networks), ordered by barycenter sweeps;
+#   - "force": Fruchterman-Reingold with numpy; all-pairs repulsion is expressed as matrix products, in row blocks.
+# Initial positions derive from a hash of each node id, so a node keeps its place when the graph around it changes, and the
+# same graph always gets the same layout. Layouts are cached per graph signature.
+LAYER_RANKS = {"Cluster": 0, "ResourcePool": 0, "Host": 1, "VM": 2, "Datastore": 3, "Network": 3, "DVS": 4}
+LAYER_SPACING = 220.0  # between layers
+NODE_SPACING = 180.0  # between nodes of a layer, and the target edge length of force layouts
+MAX_LAYER_WIDTH = 40  # 2D layers with more nodes wrap onto several rows
+FORCE_ITERATIONS = 100
+FORCE_BLOCK_ROWS = 512
+BARYCENTER_SWEEPS = 4
+GOLDEN_ANGLE = np.pi * (3.0 - np.sqrt(5.0))
+
+Edge = Tuple[str, str]
+
+def graph_signature(node_ids: Sequence[str], node_types: Sequence[str], edges: Sequence[Edge], algorithm: str, dimensions: int) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{algorithm}:{dimensions}\n".encode())
+    for node_id, node_type in sorted(zip(node_ids, node_types)): digest.update(f"n:{node_type}:{node_id}\n".encode())
+    for source, target in sorted(edges): digest.update(f"e:{source}:{target}\n".encode())
+    return digest.hexdigest()
+
+def _seed_positions(node_ids: Sequence[str], dimensions: int) -> np.ndarray:
+    """Deterministic pseudo-random positions in [-1, 1) from each node id."""
+    raw = np.frombuffer(b"".join(hashlib.blake2b(node_id.encode(), digest_size=8 * dimensions).digest() for node_id in node_ids), dtype=np.uint64)
+    return (raw.reshape(len(node_ids), dimensions) / np.float64(2 ** 64) * 2.0 - 1.0)
+
+def _edge_indexes(node_ids: Sequence[str], edges: Sequence[Edge]) -> Tuple[np.ndarray, np.ndarray]:
+    position = {node_id: i for i, node_id in enumerate(node_ids)}
+    pairs = [(position[s], position[t]) for s, t in edges if s in position and t in position and s != t]
+    if not pairs: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    array = np.array(pairs, dtype=np.int64)
+    return array[:, 0], array[:, 1]
+
+def force_layout(node_ids: Sequence[str], edges: Sequence[Edge], dimensions: int, iterations: int = FORCE_ITERATIONS) -> np.ndarray:
+    n = len(node_ids)
+    if n == 0: return np.zeros((0, dimensions))
+    k = 1.0  # ideal edge length in layout units; scaled to NODE_SPACING at the end
+    positions = _seed_positions(node_ids, dimensions).astype(np.float32) * np.float32(np.sqrt(n) * k)
+    sources, targets = _edge_indexes(node_ids, edges)
+    temperature = np.sqrt(n) * k * 0.1
+    for iteration in range(iterations):
+        displacement = np.empty_like(positions)
+        squared_norms = (positions * positions).sum(axis=1)
+        for start in range(0, n, FORCE_BLOCK_ROWS):
+            block = positions[start:start + FORCE_BLOCK_ROWS]
+            # Repulsion k²/d along (xi - xj)/d, i.e. sum_j w_ij (xi - xj) with w_ij = k²/d², without materializing xi - xj.
+            distance_sq = np.maximum(squared_norms[start:start + FORCE_BLOCK_ROWS, None] + squared_norms[None, :] - 2.0 * (block @ positions.T), 1e-4)
+            weights = np.float32(k * k) / distance_sq
+            displacement[start:start + FORCE_BLOCK_ROWS] = block * weights.sum(axis=1)[:, None] - weights @ positions
+        if sources.size:
+            delta = positions[sources] - positions[targets]
+            distance = np.sqrt(np.maximum((delta * delta).sum(axis=1), 1e-4))
+            pull = delta * (distance / k)[:, None]  # attraction d²/k along delta/d
+            np.add.at(displacement, sources, -pull)
+            np.add.at(displacement, targets, pull)
+        length = np.sqrt(np.maximum((displacement * displacement).sum(axis=1), 1e-9))
+        step = temperature * (1.0 - iteration / iterations)
+        positions += displacement * (np.minimum(length, step) / length)[:, None]
+    positions -= positions.mean(axis=0)
+    return positions.astype(np.float64) * NODE_SPACING / k
+
+def layered_layout(node_ids: Sequence[str], node_types: Sequence[str], edges: Sequence[Edge], dimensions: int) -> np.ndarray:
+    n = len(node_ids)
+    ranks = np.array([LAYER_RANKS.get(t, max(LAYER_RANKS.values()) + 1) for t in node_types], dtype=np.int64)
+    sources, targets = _edge_indexes(node_ids, edges)
+    neighbors: List[List[int]] = [[] for _ in range(n)]
+    for s, t in zip(sources.tolist(), targets.tolist()):
+        neighbors[s].append(t); neighbors[t].append(s)
+    layers = [sorted(np.flatnonzero(ranks == rank).tolist(), key=lambda i: node_ids[i]) for rank in sorted(set(ranks.tolist()))]
+    order = np.zeros(n)
+    for layer in layers: order[layer] = np.arange(len(layer)) - (len(layer) - 1) / 2.0
+    # Barycenter sweeps: each node moves towards the mean order of its neighbors in the other layers.
+    for sweep in range(BARYCENTER_SWEEPS):
+        for layer in (layers if sweep % 2 == 0 else layers[::-1]):
+            keys = [(np.mean(order[[j for j in neighbors[i] if ranks[j] != ranks[i]] or [i]]), node_ids[i]) for i in layer]
+            layer[:] = [i for _, i in sorted(zip(keys, layer), key=lambda item: item[0])]
+            order[layer] = np.arange(len(layer)) - (len(layer) - 1) / 2.0
+    positions = np.zeros((n, dimensions))
+    if dimensions == 2:
+        row_offset = 0.0
+        for layer in layers:
+            # Wide layers wrap row by row, alternating direction, so neighbouring ranks stay close.
+            slot = np.arange(len(layer))
+            row, column = slot // MAX_LAYER_WIDTH, slot % MAX_LAYER_WIDTH
+            width = min(len(layer), MAX_LAYER_WIDTH)
+            column = np.where(row % 2 == 1, width - 1 - column, column)
+            positions[layer, 0] = (column - (width - 1) / 2.0) * NODE_SPACING
+            positions[layer, 1] = (row_offset + row * 0.5) * LAYER_SPACING
+            row_offset += 1 + int(row[-1]) * 0.5 if len(layer) else 0
+    else:
+        # Each layer is a disc (golden-angle spiral) at its own height; central positions go to the best-ordered nodes.
+        for layer in layers:
+            index = np.argsort(np.abs(order[layer]), kind="stable")
+            radius = NODE_SPACING * 0.6 * np.sqrt(np.arange(len(layer)))
+            angle = np.arange(len(layer)) * GOLDEN_ANGLE
+            members = np.array(layer)[index]
+            positions[members, 0] = radius * np.cos(angle)
+            positions[members, 2] = radius * np.sin(angle)
+        for depth, layer in enumerate(layers): positions[layer, 1] = -depth * LAYER_SPACING
+    return positions
+
+def compute_layout(node_ids: Sequence[str], node_types: Sequence[str], edges: Sequence[Edge], algorithm: str, dimensions: int) -> Dict[str, List[float]]:
+    """{node_id: [x, y] or [x, y, z]}. Nodes are processed in id order, so the result does not depend on input order."""
+    ordered = sorted(range(len(node_ids)), key=lambda i: node_ids[i])
+    ids = [node_ids[i] for i in ordered]
+    types = [node_types[i] for i in ordered]
+    edges = sorted(edges)
+    if algorithm == "layered": positions = layered_layout(ids, types, edges, dimensions)
+    else: positions = force_layout(ids, edges, dimensions)
+    return {node_id: [round(v, 1) for v in row] for node_id, row in zip(ids, positions.tolist())}
+
+class LayoutCache:
+    """LRU of computed layouts, keyed by graph signature."""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, signature: str) -> Optional[Dict[str, List[float]]]:
+        with self._lock:
+            layout = self._entries.get(signature)
+            if layout is not None: self._entries.move_to_end(signature)
+            return layout
+
+    def put(self, signature: str, layout: Dict[str, List[float]]):
+        with self._lock:
+            self._entries[signature] = layout
+            self._entries.move_to_end(signature)
+            while len(self._entries) > self.max_entries: self._entries.popitem(last=False)
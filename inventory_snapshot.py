@@ -0,0 +1,491 @@
+import hashlib
+import itertools
+import json
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+import vsphere_collector
+from address_index import ADDRESS_SOURCE_FIELDS, AddressIndex, build_address_index
+from attribute_index import ATTRIBUTE_SOURCE_FIELDS, AttributeIndex, build_attribute_index
+from capacity_aggregates import CAPACITY_SOURCE_FIELDS, build_capacity_aggregates
+from resource_pool_tree import POOL_TREE_SOURCE_FIELDS, ResourcePoolTree, build_resource_pool_tree
+from search_index import SearchIndex, build_search_index, reindex_record
+from storage_topology import STORAGE_SOURCE_FIELDS, StorageTopology, build_storage_topology
+from vlan_index import VLAN_SOURCE_FIELDS, VlanIndex, build_vlan_index
+
+# --- Lookup Indexes ---
+def _iter_hosts_with_placement(infrastructure: Optional[Dict[str, Any]]):
+    for dc in (infrastructure or {}).get("datacenters", []):
+        for cluster in dc.get("clusters", []):
+            for host in cluster.get("hosts", []):
+                yield host, cluster, dc
+        for host in dc.get("standalone_hosts", []):
+            yield host, None, dc
+
+def _build_host_lookups(infrastructure: Optional[Dict[str, Any]]) -> Dict[str, Dict[Any, Any]]:
+    indexes: Dict[str, Dict[Any, Any]] = {"host_by_name": {}, "host_by_mor": {}, "host_placement": {}}
+    placements: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for host, cluster, dc in _iter_hosts_with_placement(infrastructure):
+        indexes["host_by_name"].setdefault(host.get("name"), host)
+        if host.get("mor_id"): indexes["host_by_mor"].setdefault(vsphere_collector.parse_mor_id(host["mor_id"]), host)
+        # Same shape as InventoryStore.host_placement: the cluster without its hosts, the datacenter's name only.
+        placement = placements.get((id(cluster), id(dc)))
+        if placement is None:
+            placement = placements[(id(cluster), id(dc))] = {"cluster": {k: v for k, v in cluster.items() if k != "hosts"} if cluster else None,
+                                                             "datacenter": {"name": dc.get("name")}}
+        indexes["host_placement"].setdefault(("name", host.get("name")), placement)
+        if host.get("uuid_bios") and host.get("uuid_bios") != "N/A":
+            indexes["host_placement"].setdefault(("uuid_bios", host["uuid_bios"]), placement)
+    return indexes
+
+def build_lookup_indexes(cached_data: Dict[str, Any]) -> Dict[str, Dict[Any, Any]]:
+    """Builds the identifier -> record maps used by the find_* helpers. First occurrence wins, like the former linear scans."""
+    indexes: Dict[str, Dict[Any, Any]] = {
+        "vm_by_name": {}, "vm_by_uuid": {}, "vm_by_mor": {}, "vms_by_host": {},
+        **_build_host_lookups(cached_data.get("infrastructure")),
+        "datastore_by_name": {}, "datastore_by_mor": {}, "network_by_id": {},
+    }
+    for vm in cached_data.get("vms") or []:
+        indexes["vm_by_name"].setdefault(vm.get("name"), vm)
+        if vm.get("instance_uuid") not in (None, "N/A"): indexes["vm_by_uuid"].setdefault(vm["instance_uuid"], vm)
+        if vm.get("mor_id"): indexes["vm_by_mor"].setdefault(vsphere_collector.parse_mor_id(vm["mor_id"]), vm)
+        indexes["vms_by_host"].setdefault(vm.get("host_name"), []).append(vm)
+    for ds in cached_data.get("datastores") or []:
+        indexes["datastore_by_name"].setdefault(ds.get("name"), ds)
+        if ds.get("mor_id"): indexes["datastore_by_mor"].setdefault(vsphere_collector.parse_mor_id(ds["mor_id"]), ds)
+    for pg_type_key in ["standard_port_groups_summary", "distributed_port_groups"]:
+        for net in (cached_data.get("global_networks") or {}).get(pg_type_key, []):
+            for network_identifier in (net.get("name"), net.get("key")):
+                if network_identifier is not None: indexes["network_by_id"].setdefault(network_identifier, net)
+    return indexes
+
+# --- Partial Collection Merge ---
+def _record_in_scope(record: Dict[str, Any], scope: Dict[str, List[str]], scoped_hosts: Optional[set] = None) -> bool:
+    if scope.get("datacenters") and record.get("datacenter_name") not in scope["datacenters"]:
+        return False
+    if scope.get("clusters"):
+        if "mounted_on_hosts" in record:  # datastores have no cluster: they belong to the clusters of the hosts mounting them
+            return any(mount.get("host_name") in scoped_hosts or vsphere_collector.parse_mor_id(mount.get("host_mor_id")) in scoped_hosts
+                       for mount in record["mounted_on_hosts"])
+        return record.get("cluster_name") in scope["clusters"]
+    return bool(scope.get("datacenters"))
+
+def _scoped_cluster_hosts(infrastructures: List[Optional[Dict[str, Any]]], scope: Dict[str, List[str]]) -> set:
+    """Names and MOR ids of the hosts of the scoped clusters, in the cached and the collected inventory."""
+    hosts = set()
+    for infrastructure in infrastructures:
+        for host, cluster, dc in _iter_hosts_with_placement(infrastructure):
+            if cluster is None or cluster.get("name") not in scope["clusters"]: continue
+            if scope.get("datacenters") and dc.get("name") not in scope["datacenters"]: continue
+            hosts.add(host.get("name"))
+            if host.get("mor_id"): hosts.add(vsphere_collector.parse_mor_id(host["mor_id"]))
+    hosts.discard(None)
+    return hosts
+
+def _record_merge_key(section: str, record: Dict[str, Any]) -> Any:
+    if section == "vms":
+        return record.get("instance_uuid") or record.get("name")
+    if section == "resource_pools":
+        return record.get("mor_id") or record.get("name")
+    return record.get("name")
+
+def _merge_scoped_infrastructure(old_infra: Dict[str, Any], new_infra: Dict[str, Any], scope: Dict[str, List[str]]) -> Dict[str, Any]:
+    datacenters = list((old_infra or {}).get("datacenters", []))
+    for new_dc in new_infra.get("datacenters", []):
+        old_index = next((i for i, dc in enumerate(datacenters) if dc.get("name") == new_dc.get("name")), None)
+        if old_index is None:
+            datacenters.append(new_dc)
+        elif scope.get("clusters"):
+            old_dc = datacenters[old_index]
+            new_cluster_names = {c.get("name") for c in new_dc.get("clusters", [])}
+            merged_dc = dict(old_dc)
+            merged_dc["clusters"] = [c for c in old_dc.get("clusters", []) if c.get("name") not in new_cluster_names] + new_dc.get("clusters", [])
+            datacenters[old_index] = merged_dc
+        else:
+            datacenters[old_index] = new_dc
+    return {**(old_infra or {}), "datacenters": datacenters}
+
+def _carry_over_host_details(new_infra: Dict[str, Any], old_infra: Optional[Dict[str, Any]], keys: List[str]):
+    """Profiles that skip host network/storage details keep the previously collected ones."""
+    if not old_infra: return
+    old_hosts = {}
+    for dc in old_infra.get("datacenters", []):
+        for host in [h for c in dc.get("clusters", []) for h in c.get("hosts", [])] + dc.get("standalone_hosts", []):
+            old_hosts[host.get("name")] = host
+    for dc in new_infra.get("datacenters", []):
+        for host in [h for c in dc.get("clusters", []) for h in c.get("hosts", [])] + dc.get("standalone_hosts", []):
+            old_host = old_hosts.get(host.get("name"))
+            if old_host:
+                for key in keys:
+                    if key in old_host and key not in host: host[key] = old_host[key]
+
+def merge_collected_data(existing: Optional[Dict[str, Any]], collected: Dict[str, Any]) -> Dict[str, Any]:
+    """Merges a (possibly partial or scoped) collection result into the cache. Sections absent from the result are preserved.
+    Host details omitted by the profile must already have been carried over (see apply_collection_result)."""
+    meta = collected.get("collection_meta") or {}
+    scope = meta.get("scope")
+    merged = dict(existing or {})
+    scoped_hosts = None
+    for section in meta.get("sections", [k for k in collected if k != "collection_meta"]):
+        if section not in collected: continue
+        new_value = collected[section]
+        if scope is not None and section in vsphere_collector.SCOPED_SECTIONS and merged.get(section) is not None:
+            if section == "infrastructure":
+                new_value = _merge_scoped_infrastructure(merged[section], new_value, scope)
+            else:
+                new_keys = {_record_merge_key(section, r) for r in new_value}
+                if section == "datastores" and scope.get("clusters") and scoped_hosts is None:
+                    scoped_hosts = _scoped_cluster_hosts([(existing or {}).get("infrastructure"), collected.get("infrastructure")], scope)
+                kept = [r for r in merged[section] if not _record_in_scope(r, scope, scoped_hosts) and _record_merge_key(section, r) not in new_keys]
+                new_value = kept + new_value
+        merged[section] = new_value
+    merged["collection_meta"] = meta
+    return merged
+
+# --- Single-Object Replacement ---
+def replace_cached_object(cached_data: Dict[str, Any], object_type: str, old_record: Optional[Dict[str, Any]], new_record: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns a copy of the cache with old_record replaced by new_record. Only the containers on the path are copied."""
+    new_data = dict(cached_data)
+    if object_type in ("vm", "datastore"):
+        section = "vms" if object_type == "vm" else "datastores"
+        records = list(new_data.get(section) or [])
+        position = next((i for i, r in enumerate(records) if r is old_record), None) if old_record is not None else None
+        if position is None: records.append(new_record)
+        else: records[position] = new_record
+        new_data[section] = records
+        return new_data
+    infrastructure = dict(new_data["infrastructure"])
+    datacenters = list(infrastructure["datacenters"])
+    for dc_index, dc in enumerate(datacenters):
+        for cluster_index, cluster in enumerate(dc.get("clusters", [])):
+            for host_index, host in enumerate(cluster.get("hosts", [])):
+                if host is old_record:
+                    hosts = list(cluster["hosts"]); hosts[host_index] = new_record
+                    clusters = list(dc["clusters"]); clusters[cluster_index] = {**cluster, "hosts": hosts}
+                    datacenters[dc_index] = {**dc, "clusters": clusters}
+                    new_data["infrastructure"] = {**infrastructure, "datacenters": datacenters}
+                    return new_data
+        for host_index, host in enumerate(dc.get("standalone_hosts", [])):
+            if host is old_record:
+                hosts = list(dc["standalone_hosts"]); hosts[host_index] = new_record
+                datacenters[dc_index] = {**dc, "standalone_hosts": hosts}
+                new_data["infrastructure"] = {**infrastructure, "datacenters": datacenters}
+                return new_data
+    raise ValueError("Host record to replace not found in cached infrastructure.")
+
+# --- Object Table ---
+# Every tracked object keyed by (type, primary id) with a content hash. Keys mirror the scene-graph node ids.
+# Unchanged records keep their hash (and, after a collection, the previous generation's record object itself).
+OBJECT_KEY_FIELDS = {
+    "VM": ("instance_uuid", "name"), "Host": ("uuid_bios", "name"), "Cluster": ("name",), "Datastore": ("uuid", "name"),
+    "Network": ("key", "name"), "DVS": ("uuid", "name"), "ResourcePool": ("mor_id", "name"),
+}
+
+def object_key(object_type: str, record: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    for key_field in OBJECT_KEY_FIELDS[object_type]:
+        value = record.get(key_field)
+        if value not in (None, "", "N/A"): return object_type, str(value)
+    return None
+
+def content_hash(record: Dict[str, Any]) -> str:
+    return hashlib.blake2b(json.dumps(record, sort_keys=True, default=str, separators=(",", ":")).encode("utf-8"), digest_size=16).hexdigest()
+
+def _iter_object_lists(data: Mapping[str, Any]):
+    """Yields (object_type, list) for every list of tracked records, so callers can also replace records in place."""
+    yield "VM", data.get("vms") or []
+    for dc in (data.get("infrastructure") or {}).get("datacenters", []):
+        for cluster in dc.get("clusters", []):
+            yield "Host", cluster.get("hosts", [])
+        yield "Host", dc.get("standalone_hosts", [])
+    yield "Datastore", data.get("datastores") or []
+    for pg_type_key in ["standard_port_groups_summary", "distributed_port_groups"]:
+        yield "Network", (data.get("global_networks") or {}).get(pg_type_key, [])
+    yield "DVS", data.get("distributed_virtual_switches") or []
+    yield "ResourcePool", data.get("resource_pools") or []
+
+def _iter_keyed_records(data: Mapping[str, Any]):
+    for object_type, records in _iter_object_lists(data):
+        for record in records: yield object_type, record
+    for dc in (data.get("infrastructure") or {}).get("datacenters", []):
+        for cluster in dc.get("clusters", []):
+            # Hosts are tracked on their own; keeping the nested list would flag the cluster for every host change.
+            yield "Cluster", {k: v for k, v in cluster.items() if k != "hosts"}
+
+def build_object_table(data: Mapping[str, Any], previous: Optional["InventorySnapshot"] = None, known_hashes: Optional[Dict[int, str]] = None,
+                       hashes_by_key: Optional[Mapping[Tuple[str, str], str]] = None) -> Dict[Tuple[str, str], Tuple[Dict[str, Any], str]]:
+    """Maps each object key to (record, content hash). Only records not shared with previous are hashed, unless their hash
+    is known by id() or, for data read back from a published snapshot, by key. First occurrence wins."""
+    previous_table = previous.object_table if previous else {}
+    known_hashes = known_hashes or {}
+    hashes_by_key = hashes_by_key or {}
+    table: Dict[Tuple[str, str], Tuple[Dict[str, Any], str]] = {}
+    for object_type, record in _iter_keyed_records(data):
+        key = object_key(object_type, record)
+        if key is None or key in table: continue
+        previous_entry = previous_table.get(key)
+        if previous_entry is not None and previous_entry[0] is record:
+            table[key] = previous_entry
+        else:
+            table[key] = (record, known_hashes.get(id(record)) or hashes_by_key.get(key) or content_hash(record))
+    return table
+
+def share_unchanged_records(collected_data: Dict[str, Any], current: "InventorySnapshot") -> Dict[int, str]:
+    """Replaces, inside a fresh collector result, every record whose content equals the current generation's with that
+    record object, so unchanged records are shared between generations instead of duplicated. Returns the hashes computed
+    for the records that did change, by id(), so they are not hashed twice."""
+    known_hashes: Dict[int, str] = {}
+    for object_type, records in _iter_object_lists(collected_data):
+        for position, record in enumerate(records):
+            key = object_key(object_type, record)
+            if key is None: continue
+            record_hash = content_hash(record)
+            current_entry = current.object_table.get(key)
+            if current_entry is not None and current_entry[1] == record_hash: records[position] = current_entry[0]
+            else: known_hashes[id(record)] = record_hash
+    return known_hashes
+
+# --- Immutable Cache Generations ---
+_generation_counter = itertools.count(1)
+
+INDEX_FIELDS = ("lookup_indexes", "capacity", "search_index", "address_index", "attribute_index", "resource_pool_tree",
+                "storage_topology", "vlan_index", "object_table")
+
+@dataclass(frozen=True)
+class InventorySnapshot:
+    """One immutable generation of the inventory cache.
+
+    Requests take a single snapshot and read only from it, so they never mix sections from two collections.
+    Records are shared between generations and must be treated as read-only; writers build a new snapshot
+    instead. An old generation is freed by reference counting as soon as no request holds it anymore.
+
+    Each index is built by its builder, once: all of them in build_snapshot, or on first access for a lazy snapshot
+    (a worker reading a published generation only decodes the sections and builds the indexes its requests use)."""
+    generation: int
+    data: Mapping[str, Any]
+    section_timestamps: Mapping[str, Dict[str, Any]]
+    builders: Dict[str, Callable[[], Any]] = field(repr=False, compare=False)
+    created_at_utc: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    _indexes: Dict[str, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _locks: Dict[str, threading.Lock] = field(default_factory=lambda: {name: threading.Lock() for name in INDEX_FIELDS}, init=False, repr=False, compare=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.data.get(key)
+
+    def _index(self, name: str) -> Any:
+        if name not in self._indexes:
+            with self._locks[name]:  # concurrent requests wait for one build instead of each running their own
+                if name not in self._indexes:
+                    self._indexes[name] = self.builders[name]()
+                    del self.builders[name]  # releases what the builder captured
+        return self._indexes[name]
+
+    def built_indexes(self) -> List[str]:
+        return [name for name in INDEX_FIELDS if name in self._indexes]
+
+    @property
+    def lookup_indexes(self) -> Mapping[str, Dict[Any, Any]]:
+        return self._index("lookup_indexes")
+
+    @property
+    def capacity(self) -> Mapping[str, List[Dict[str, Any]]]:
+        return self._index("capacity")
+
+    @property
+    def search_index(self) -> SearchIndex:
+        return self._index("search_index")
+
+    @property
+    def address_index(self) -> AddressIndex:
+        return self._index("address_index")
+
+    @property
+    def attribute_index(self) -> AttributeIndex:
+        return self._index("attribute_index")
+
+    @property
+    def resource_pool_tree(self) -> ResourcePoolTree:
+        return self._index("resource_pool_tree")
+
+    @property
+    def storage_topology(self) -> StorageTopology:
+        return self._index("storage_topology")
+
+    @property
+    def vlan_index(self) -> VlanIndex:
+        return self._index("vlan_index")
+
+    @property
+    def object_table(self) -> Mapping[Tuple[str, str], Tuple[Dict[str, Any], str]]:
+        return self._index("object_table")
+
+def advance_generation_counter(last_generation: int):
+    """Makes the next generation id follow last_generation (used when resuming from a published snapshot)."""
+    global _generation_counter
+    _generation_counter = itertools.count(last_generation + 1)
+
+def build_snapshot(data: Mapping[str, Any], previous: Optional[InventorySnapshot] = None,
+                   updated_sections: Optional[Dict[str, Dict[str, Any]]] = None, generation: Optional[int] = None,
+                   known_hashes: Optional[Dict[int, str]] = None, reuse: Optional[Dict[str, Any]] = None, lazy: bool = False,
+                   load_hashes: Optional[Callable[[], Mapping[Tuple[str, str], str]]] = None) -> InventorySnapshot:
+    """Builds the next generation from data. Section timestamps are inherited from previous and overridden by updated_sections.
+    A plain dict is copied and frozen; any other mapping (e.g. lazily decoded shared sections) is assumed read-only already.
+    reuse maps index fields to values already valid for data, which are not rebuilt (see apply_object_refresh).
+    A lazy snapshot builds each index on first access, without previous (which it must not keep alive). load_hashes, if
+    given, returns the content hashes of data's records by object key, e.g. as published with the data."""
+    section_timestamps = dict(previous.section_timestamps) if previous else {}
+    section_timestamps.update(updated_sections or {})
+    if lazy: previous = None
+    builders: Dict[str, Callable[[], Any]] = {
+        "lookup_indexes": lambda: MappingProxyType(build_lookup_indexes(data)),
+        "capacity": lambda: MappingProxyType(build_capacity_aggregates(data)),
+        "search_index": lambda: build_search_index(data, previous.search_index if previous else None),
+        "address_index": lambda: build_address_index(data),
+        "attribute_index": lambda: build_attribute_index(data),
+        "resource_pool_tree": lambda: build_resource_pool_tree(data),
+        "storage_topology": lambda: build_storage_topology(data),
+        "vlan_index": lambda: build_vlan_index(data),
+        "object_table": lambda: MappingProxyType(build_object_table(data, previous, known_hashes, load_hashes() if load_hashes else None)),
+    }
+    for name, value in (reuse or {}).items(): builders[name] = lambda value=value: value
+    snapshot = InventorySnapshot(
+        generation=generation if generation is not None else next(_generation_counter),
+        data=MappingProxyType(dict(data)) if isinstance(data, dict) else data,
+        section_timestamps=MappingProxyType(section_timestamps),
+        builders=builders,
+    )
+    if not lazy:
+        for name in INDEX_FIELDS: snapshot._index(name)
+    return snapshot
+
+def apply_collection_result(current: Optional[InventorySnapshot], collected_data: Dict[str, Any], collected_at_utc: datetime) -> InventorySnapshot:
+    """Merges a collector result into the current generation and stamps the sections it refreshed."""
+    meta = collected_data.get("collection_meta") or {}
+    updated_sections = {
+        section: {"collected_at_utc": collected_at_utc, "profile": meta.get("profile"), "scope": meta.get("scope")}
+        for section in meta.get("sections", [])
+    }
+    # Carry over first, so hosts collected without network/storage details can still be matched as unchanged.
+    if current is not None and meta.get("omitted_host_keys") and "infrastructure" in collected_data:
+        _carry_over_host_details(collected_data["infrastructure"], current.data.get("infrastructure"), meta["omitted_host_keys"])
+    known_hashes = share_unchanged_records(collected_data, current) if current is not None else None
+    return build_snapshot(merge_collected_data(current.data if current else None, collected_data), current, updated_sections, known_hashes=known_hashes)
+
+def find_cached_object(snapshot: InventorySnapshot, object_type: str, identifier: str) -> Optional[Dict[str, Any]]:
+    """Resolves a VM, host or datastore by name, instance UUID (VMs) or MOR id."""
+    indexes = snapshot.lookup_indexes
+    moid = vsphere_collector.parse_mor_id(identifier)
+    if object_type == "vm":
+        return indexes["vm_by_name"].get(identifier) or indexes["vm_by_uuid"].get(identifier) or indexes["vm_by_mor"].get(moid)
+    if object_type == "host":
+        return indexes["host_by_name"].get(identifier) or indexes["host_by_mor"].get(moid)
+    return indexes["datastore_by_name"].get(identifier) or indexes["datastore_by_mor"].get(moid)
+
+# --- Single-Object Refresh ---
+# A refreshed record only invalidates what is derived from the fields that changed. Each index module declares the
+# record fields it reads per object type (*_SOURCE_FIELDS): indexes none of whose fields changed are carried over from
+# the current generation, the others are rebuilt. The maps holding the record itself (lookups, search documents, object
+# table) get the new record swapped in, and are only rebuilt when an identifier they are keyed by changed.
+_REFRESH_OBJECT_TYPES = {"vm": "VM", "host": "Host", "datastore": "Datastore"}
+_DERIVED_INDEX_FIELDS = {
+    "capacity": CAPACITY_SOURCE_FIELDS, "address_index": ADDRESS_SOURCE_FIELDS, "attribute_index": ATTRIBUTE_SOURCE_FIELDS,
+    "resource_pool_tree": POOL_TREE_SOURCE_FIELDS, "storage_topology": STORAGE_SOURCE_FIELDS, "vlan_index": VLAN_SOURCE_FIELDS,
+}
+_RECORD_LOOKUPS = {  # lookup map -> record field it is keyed by
+    "vm": {"vm_by_name": "name", "vm_by_uuid": "instance_uuid", "vm_by_mor": "mor_id"},
+    "datastore": {"datastore_by_name": "name", "datastore_by_mor": "mor_id"},
+}
+
+def _changed_fields(old_record: Dict[str, Any], record: Dict[str, Any]) -> Set[str]:
+    return {f for f in old_record.keys() | record.keys() if old_record.get(f) != record.get(f)}
+
+def _refresh_lookup_indexes(current: InventorySnapshot, data: Mapping[str, Any], object_type: str,
+                            old_record: Optional[Dict[str, Any]], record: Dict[str, Any]) -> Mapping[str, Dict[Any, Any]]:
+    indexes = dict(current.lookup_indexes)
+    if object_type == "host":
+        # replace_cached_object also copied the host's cluster and datacenter, which the placements point to.
+        indexes.update(_build_host_lookups(data.get("infrastructure")))
+        return MappingProxyType(indexes)
+    key_fields = set(_RECORD_LOOKUPS[object_type].values()) | ({"host_name"} if object_type == "vm" else set())
+    if old_record is None or _changed_fields(old_record, record) & key_fields:
+        return MappingProxyType(build_lookup_indexes(data))
+    for name, key_field in _RECORD_LOOKUPS[object_type].items():
+        key = vsphere_collector.parse_mor_id(record.get(key_field)) if key_field == "mor_id" else record.get(key_field)
+        if indexes[name].get(key) is old_record: indexes[name] = {**indexes[name], key: record}
+    if object_type == "vm":
+        host_name = record.get("host_name")
+        indexes["vms_by_host"] = {**indexes["vms_by_host"], host_name: [record if vm is old_record else vm for vm in indexes["vms_by_host"].get(host_name, [])]}
+    return MappingProxyType(indexes)
+
+def _reusable_indexes(current: InventorySnapshot, data: Mapping[str, Any], object_type: str,
+                      old_record: Optional[Dict[str, Any]], record: Dict[str, Any]) -> Dict[str, Any]:
+    """The indexes of the generation built by apply_object_refresh that need no full rebuild, by field name."""
+    table_type = _REFRESH_OBJECT_TYPES[object_type]
+    reuse: Dict[str, Any] = {"lookup_indexes": _refresh_lookup_indexes(current, data, object_type, old_record, record)}
+    changed = _changed_fields(old_record, record) if old_record is not None else None
+    for name, source_fields in _DERIVED_INDEX_FIELDS.items():
+        fields = source_fields.get(table_type, set())
+        if not fields or (changed is not None and not changed & fields): reuse[name] = getattr(current, name)
+    search_index = reindex_record(current.search_index, table_type, old_record, record) if old_record is not None else None
+    if search_index is not None: reuse["search_index"] = search_index
+    key = object_key(table_type, record)
+    entry = current.object_table.get(key) if key else None
+    if old_record is not None and entry is not None and entry[0] is old_record and object_key(table_type, old_record) == key:
+        reuse["object_table"] = MappingProxyType({**current.object_table, key: (record, content_hash(record))})
+    return reuse
+
+def apply_object_refresh(current: InventorySnapshot, object_type: str, identifier: str, record: Dict[str, Any]) -> InventorySnapshot:
+    """Swaps one refreshed record into a new generation. Raises LookupError for a host that is not in the cache yet."""
+    # A collection may have installed a newer generation while the record was being fetched: resolve it again here.
+    old_record = find_cached_object(current, object_type, record.get("mor_id") or identifier) or find_cached_object(current, object_type, record.get("name"))
+    if object_type == "host" and old_record is None:
+        raise LookupError(f"Host '{identifier}' is not in the cache yet; run a full collection first.")
+    data = replace_cached_object(current.data, object_type, old_record, record)
+    return build_snapshot(data, current, reuse=_reusable_indexes(current, data, object_type, old_record, record))
+
+# --- Generation Deltas ---
+def diff_object_tables(previous: Optional[InventorySnapshot], current: InventorySnapshot) -> Dict[str, Dict[Tuple[str, str], Any]]:
+    """Compares two generations by content hash. Shared records (same object) are skipped without comparing anything.
+    Returns {"added": {key: entry}, "removed": {key: entry}, "changed": {key: (old_entry, new_entry)}}."""
+    old_table = previous.object_table if previous else {}
+    new_table = current.object_table
+    added, changed = {}, {}
+    for key, entry in new_table.items():
+        old_entry = old_table.get(key)
+        if old_entry is None: added[key] = entry
+        elif old_entry[0] is not entry[0] and old_entry[1] != entry[1]: changed[key] = (old_entry, entry)
+    removed = {key: entry for key, entry in old_table.items() if key not in new_table}
+    return {"added": added, "removed": removed, "changed": changed}
+
+def compose_changes(steps: List[Dict[str, Dict[Tuple[str, str], Any]]]) -> Dict[str, Dict[Tuple[str, str], Any]]:
+    """The changes across consecutive generations, from the diff_object_tables result of each step, oldest first."""
+    states: Dict[Tuple[str, str], List[Any]] = {}  # key -> [entry before the first step, entry after the last one]
+    for step in steps:
+        for key, entry in step["added"].items(): states.setdefault(key, [None, None])[1] = entry
+        for key, entry in step["removed"].items(): states.setdefault(key, [entry, None])[1] = None
+        for key, (old_entry, new_entry) in step["changed"].items(): states.setdefault(key, [old_entry, None])[1] = new_entry
+    added, removed, changed = {}, {}, {}
+    for key, (before, after) in states.items():
+        if before is None and after is not None: added[key] = after
+        elif after is None and before is not None: removed[key] = before
+        elif before is not None and before[1] != after[1]: changed[key] = (before, after)
+    return {"added": added, "removed": removed, "changed": changed}
+
+def compute_generation_delta(previous: Optional[InventorySnapshot], current: InventorySnapshot,
+                             changes: Optional[Dict[str, Dict[Tuple[str, str], Any]]] = None) -> Dict[str, Any]:
+    """Per-object differences between two generations: added records, removed ids and, for changed ones, the new value
+    of each changed field (None for a field that disappeared). Keys mirror the primary ids of the scene-graph nodes,
+    so clients can patch their graphs in place. changes, if given, is diff_object_tables(previous, current)."""
+    changes = changes if changes is not None else diff_object_tables(previous, current)
+    changed = []
+    for key, ((old_record, _), (record, _)) in changes["changed"].items():
+        fields = {f: record.get(f) for f in old_record.keys() | record.keys() if old_record.get(f) != record.get(f)}
+        changed.append({"type": key[0], "primary_id": key[1], "fields": fields})
+    return {
+        "generation": current.generation,
+        "previous_generation": previous.generation if previous else None,
+        "added": [{"type": key[0], "primary_id": key[1], "data": record} for key, (record, _) in changes["added"].items()],
+        "removed": [{"type": key[0], "primary_id": key[1]} for key in changes["removed"]],
+        "changed": changed,
+    }
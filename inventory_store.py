@@ -0,0 +1,329 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from inventory_snapshot import InventorySnapshot, diff_object_tables
+
+# --- SQLite Inventory Store ---
+# Each cache generation is also written to an indexed SQLite database (WAL mode), so inventory tables can be queried
+# with filters, sorting and paging pushed down to SQL, including from other processes. Readers use one connection per
+# thread and parameterized statements (compiled once per connection by sqlite3's statement cache); a small LRU of decoded
+# records and of lookup results sits in front. Writes are incremental when the database holds the previous generation:
+# only the objects whose content hash changed are rewritten, in one transaction, so readers see either generation but
+# never a mix. The find_* lookups of the API read from here (find, find_all, host_placement) when the database holds the
+# generation they serve, so API workers need not decode the object sections of a shared snapshot to resolve objects.
+SCHEMA_VERSION = "2"  # a database written with another version is rewritten in full
+OBJECT_TABLES: Dict[str, Tuple[str, Tuple[str, ...], Dict[str, str]]] = {
+    # table: (object type, identifier columns in lookup order, indexed columns)
+    "vms": ("VM", ("name", "instance_uuid", "mor_id"), {
+        "name": "TEXT", "instance_uuid": "TEXT", "mor_id": "TEXT", "power_state": "TEXT", "host_name": "TEXT", "cluster_name": "TEXT",
+        "datacenter_name": "TEXT", "guest_os_id": "TEXT", "vcpus": "INTEGER", "ram_mb": "INTEGER"}),
+    "hosts": ("Host", ("name", "uuid_bios", "mor_id"), {
+        "name": "TEXT", "uuid_bios": "TEXT", "mor_id": "TEXT", "status": "TEXT", "connection_state": "TEXT", "maintenance_mode": "INTEGER",
+        "version_full": "TEXT", "cluster_name": "TEXT", "datacenter_name": "TEXT", "cpu_total_cores": "INTEGER", "memory_gb": "REAL"}),
+    "datastores": ("Datastore", ("name", "uuid", "mor_id"), {
+        "name": "TEXT", "uuid": "TEXT", "mor_id": "TEXT", "type": "TEXT", "datacenter_name": "TEXT", "capacity_gb": "REAL",
+        "free_space_gb": "REAL", "accessible": "INTEGER"}),
+    "networks": ("Network", ("key", "name"), {"key": "TEXT", "name": "TEXT", "type": "TEXT", "dvswitch_name": "TEXT", "vlan_id_info": "TEXT"}),
+    "dvs": ("DVS", ("uuid", "name", "mor_id"), {"uuid": "TEXT", "name": "TEXT", "mor_id": "TEXT", "version": "TEXT"}),
+    "resource_pools": ("ResourcePool", ("mor_id", "name"), {
+        "mor_id": "TEXT", "name": "TEXT", "parent_name": "TEXT", "cluster_name": "TEXT", "datacenter_name": "TEXT"}),
+    "clusters": ("Cluster", ("name",), {
+        "name": "TEXT", "datacenter_name": "TEXT", "overallStatus": "TEXT", "ha_enabled": "INTEGER", "drs_enabled": "INTEGER"}),
+}
+# Placement columns of tables whose records do not carry it: stored next to the record and added to it by get and
+# query, but not by the lookups, which return records as collected. These tables are rewritten with every generation,
+# since a placement can change without the record changing.
+CONTEXT_COLUMNS: Dict[str, Tuple[str, ...]] = {"hosts": ("cluster_name", "datacenter_name"), "clusters": ("datacenter_name",)}
+
+def _host_luns(host: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return ((host.get("storage_configuration") or {}).get("logical_units_multipath")) or []
+
+CHILD_TABLES: Dict[str, Tuple[str, str, Callable[[Dict[str, Any]], List[Dict[str, Any]]], Dict[str, str]]] = {
+    # table: (parent table, parent name column, sub-records of a parent record, indexed columns)
+    "vm_disks": ("vms", "vm_name", lambda vm: vm.get("disks") or [], {
+        "label": "TEXT", "datastore_name": "TEXT", "vmdk_path": "TEXT", "capacity_gb": "REAL", "thin_provisioned": "INTEGER", "disk_mode": "TEXT"}),
+    "vm_nics": ("vms", "vm_name", lambda vm: vm.get("network_adapters") or [], {
+        "label": "TEXT", "mac_address": "TEXT", "network_name": "TEXT", "portgroup_key_if_dvs": "TEXT", "adapter_type": "TEXT", "connected": "INTEGER"}),
+    "host_luns": ("hosts", "host_name", _host_luns, {
+        "canonical_name": "TEXT", "device_name": "TEXT", "vendor": "TEXT", "model": "TEXT", "lun_type": "TEXT", "is_ssd": "INTEGER",
+        "paths_total": "INTEGER", "paths_active": "INTEGER"}),
+    "datastore_mounts": ("datastores", "datastore_name", lambda ds: ds.get("mounted_on_hosts") or [], {
+        "host_name": "TEXT", "mount_path": "TEXT", "access_mode": "TEXT", "accessible_on_host": "INTEGER", "mounted_on_host": "INTEGER"}),
+}
+# Columns not read straight from the (sub-)record.
+COMPUTED_COLUMNS: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Any]] = {
+    ("host_luns", "paths_total"): lambda lun: len(lun.get("paths") or []),
+    ("host_luns", "paths_active"): lambda lun: sum(1 for p in lun.get("paths") or [] if p.get("state") == "active"),
+}
+STORE_TABLES = list(OBJECT_TABLES) + list(CHILD_TABLES)
+_FILTER = re.compile(r"^(\w+)(>=|<=|=|~|>|<)(.*)$")
+
+def table_columns(table: str) -> Dict[str, str]:
+    if table in OBJECT_TABLES: return {"object_id": "TEXT", **OBJECT_TABLES[table][2]}
+    parent_table, parent_column, _, columns = CHILD_TABLES[table]
+    return {"object_id": "TEXT", parent_column: "TEXT", **columns}
+
+def parse_filter(table: str, expression: str) -> Tuple[str, str, str]:
+    """'column=value' (case-insensitive), 'column~text' (contains), or a comparison with >, >=, < or <=. Raises ValueError."""
+    match = _FILTER.match(expression)
+    if not match or match.group(1) not in table_columns(table):
+        raise ValueError(f"Invalid filter '{expression}' for table '{table}' (columns: {', '.join(table_columns(table))}).")
+    return match.group(1), match.group(2), match.group(3)
+
+class StaleGenerationError(Exception):
+    """The store does not hold the generation a lookup was made for (not written yet, or already replaced)."""
+
+def _column_value(value: Any) -> Any:
+    if value in (None, "N/A"): return None
+    if isinstance(value, (int, float, str)): return value  # bools are stored as 0/1
+    return str(value)
+
+class InventoryStore:
+    """SQLite copy of the inventory cache, written by the collecting process and readable from any process."""
+    def __init__(self, path: str, hot_objects: int = 4096):
+        self.path = path
+        self.hot_objects = hot_objects
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._hot: "OrderedDict[Tuple[int, str, str], Dict[str, Any]]" = OrderedDict()
+        self._hot_lookups: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()  # (generation, kind, table, ...) -> result
+        self._hot_lock = threading.Lock()
+
+    # --- Connections ---
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=256, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            connection.execute("PRAGMA query_only=ON")
+        return connection
+
+    def _create_schema(self, connection: sqlite3.Connection):
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        for table in STORE_TABLES:
+            columns = table_columns(table)
+            definitions = [f"{c} {t}{' COLLATE NOCASE' if t == 'TEXT' else ''}" for c, t in columns.items()]
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(definitions)}, record TEXT NOT NULL)")
+            for column, column_type in columns.items():
+                if column_type == "TEXT" or column == "object_id":
+                    connection.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})")
+
+    # --- Writes ---
+    def _rows(self, table: str, object_id: str, record: Dict[str, Any], context: Dict[str, Any]) -> Iterator[Tuple[str, tuple]]:
+        """(table, row) for an object and its sub-records. context (e.g. a host's cluster) fills the CONTEXT_COLUMNS."""
+        source = {**record, **context}
+        yield table, (object_id, *(_column_value(source.get(c)) for c in OBJECT_TABLES[table][2]), json.dumps(record, default=str))
+        for child_table, (parent_table, _, sub_records, columns) in CHILD_TABLES.items():
+            if parent_table != table: continue
+            for sub_record in sub_records(record):
+                values = [_column_value(COMPUTED_COLUMNS[(child_table, c)](sub_record) if (child_table, c) in COMPUTED_COLUMNS else sub_record.get(c)) for c in columns]
+                yield child_table, (object_id, record.get("name"), *values, json.dumps(sub_record, default=str))
+
+    def _object_entries(self, snapshot: InventorySnapshot, table: str, keys=None) -> Iterator[Tuple[str, tuple]]:
+        object_type = OBJECT_TABLES[table][0]
+        placements = snapshot.lookup_indexes["host_placement"] if table == "hosts" else {}
+        cluster_datacenters = {cluster.get("name"): dc.get("name") for dc in (snapshot.get("infrastructure") or {}).get("datacenters", [])
+                               for cluster in dc.get("clusters", [])} if table == "clusters" else {}
+        for (entry_type, object_id), (record, _) in snapshot.object_table.items():
+            if entry_type != object_type or (keys is not None and (entry_type, object_id) not in keys): continue
+            context = {}
+            if table == "hosts":
+                placement = placements.get(("name", record.get("name"))) or {}
+                context = {"cluster_name": (placement.get("cluster") or {}).get("name"), "datacenter_name": (placement.get("datacenter") or {}).get("name")}
+            elif table == "clusters":
+                context = {"datacenter_name": cluster_datacenters.get(record.get("name"))}
+            yield from self._rows(table, object_id, record, context)
+
+    def _insert(self, connection: sqlite3.Connection, rows: Iterator[Tuple[str, tuple]]):
+        by_table: Dict[str, List[tuple]] = {}
+        for table, row in rows: by_table.setdefault(table, []).append(row)
+        for table, table_rows in by_table.items():
+            placeholders = ", ".join("?" * (len(table_columns(table)) + 1))
+            connection.executemany(f"INSERT INTO {table} VALUES ({placeholders})", table_rows)
+
+    def write_snapshot(self, snapshot: InventorySnapshot, previous: Optional[InventorySnapshot] = None,
+                       changes: Optional[Dict[str, Dict[Tuple[str, str], Any]]] = None) -> Dict[str, Any]:
+        """Writes snapshot's generation. Returns {"generation", "incremental", "objects_written"}."""
+        with self._write_lock:
+            connection = self._connect()
+            try:
+                self._create_schema(connection)
+                stored = connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+                schema = connection.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+                incremental = (previous is not None and stored is not None and int(stored[0]) == previous.generation
+                               and schema is not None and schema[0] == SCHEMA_VERSION)
+                if incremental and changes is None: changes = diff_object_tables(previous, snapshot)
+                written = 0
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    for table, (object_type, _, _) in OBJECT_TABLES.items():
+                        child_tables = [t for t, spec in CHILD_TABLES.items() if spec[0] == table]
+                        if incremental and table not in CONTEXT_COLUMNS:
+                            stale = [key for part in ("removed", "changed") for key in changes[part] if key[0] == object_type]
+                            for t in [table] + child_tables:
+                                connection.executemany(f"DELETE FROM {t} WHERE object_id = ?", [(key[1],) for key in stale])
+                            keys = {key for part in ("added", "changed") for key in changes[part] if key[0] == object_type}
+                            if keys: self._insert(connection, self._object_entries(snapshot, table, keys))
+                            written += len(keys)
+                        else:
+                            for t in [table] + child_tables: connection.execute(f"DELETE FROM {t}")
+                            self._insert(connection, self._object_entries(snapshot, table))
+                            written += sum(1 for key in snapshot.object_table if key[0] == object_type)
+                    connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                        ("generation", str(snapshot.generation)), ("schema_version", SCHEMA_VERSION),
+                        ("written_at_utc", datetime.now(timezone.utc).isoformat())])
+                    connection.execute("COMMIT")
+                except BaseException:
+                    connection.execute("ROLLBACK")
+                    raise
+            finally:
+                connection.close()
+        return {"generation": snapshot.generation, "incremental": incremental, "objects_written": written}
+
+    # --- Reads ---
+    def _read(self, function: Callable[[sqlite3.Connection, Optional[int]], Any]) -> Any:
+        """Runs function(connection, generation) inside one read transaction, i.e. against a single generation."""
+        connection = self._reader()
+        connection.execute("BEGIN")
+        try:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+            return function(connection, int(row[0]) if row else None)
+        except sqlite3.OperationalError as e:
+            if "no such table" in str(e): return function(None, None)
+            raise
+        finally:
+            if connection.in_transaction: connection.execute("COMMIT")
+
+    def _decode(self, generation: int, table: str, object_id: str, record_json: str) -> Dict[str, Any]:
+        key = (generation, table, object_id)
+        with self._hot_lock:
+            record = self._hot.get(key)
+            if record is not None:
+                self._hot.move_to_end(key)
+                return record
+        record = json.loads(record_json)
+        with self._hot_lock:
+            self._hot[key] = record
+            while len(self._hot) > self.hot_objects: self._hot.popitem(last=False)
+        return record
+
+    def _with_context(self, table: str, record: Dict[str, Any], context_values: Tuple[Any, ...]) -> Dict[str, Any]:
+        return {**record, **dict(zip(CONTEXT_COLUMNS[table], context_values))} if table in CONTEXT_COLUMNS else record
+
+    def get(self, table: str, identifier: str) -> Optional[Dict[str, Any]]:
+        """Record of an object table by any of its identifier columns (first match in lookup order)."""
+        context_select = "".join(f", {c}" for c in CONTEXT_COLUMNS.get(table, ()))
+        def lookup(connection, generation):
+            if connection is None: return None
+            for column in OBJECT_TABLES[table][1]:
+                row = connection.execute(f"SELECT object_id, record{context_select} FROM {table} WHERE {column} = ? LIMIT 1", (identifier,)).fetchone()
+                if row: return self._with_context(table, self._decode(generation, table, row[0], row[1]), row[2:])
+            return None
+        return self._read(lookup)
+
+    # --- Lookups ---
+    # Same results as the in-memory lookup indexes of the generation: exact (case-sensitive) matches, first written
+    # object first. The NOCASE indexes find the candidates, which are then compared exactly.
+    def _lookup(self, key: Tuple[Any, ...], generation: int, function: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._hot_lock:
+            if key in self._hot_lookups:
+                self._hot_lookups.move_to_end(key)
+                return self._hot_lookups[key]
+        def run(connection, stored_generation):
+            if stored_generation != generation:
+                raise StaleGenerationError(f"{self.path} holds generation {stored_generation}, not {generation}.")
+            return function(connection)
+        result = self._read(run)
+        with self._hot_lock:
+            self._hot_lookups[key] = result
+            while len(self._hot_lookups) > self.hot_objects: self._hot_lookups.popitem(last=False)
+        return result
+
+    def _matches(self, connection: sqlite3.Connection, generation: int, table: str, column: str, value: str) -> Iterator[Dict[str, Any]]:
+        rows = connection.execute(f"SELECT object_id, record FROM {table} WHERE {column} = ? ORDER BY rowid", (value,))
+        for object_id, record_json in rows:
+            record = self._decode(generation, table, object_id, record_json)
+            if record.get(column) == value: yield record
+
+    def find(self, table: str, columns: Tuple[str, ...], value: str, generation: int) -> Optional[Dict[str, Any]]:
+        """Record whose first of columns equal to value is found, trying columns in order, as collected. Raises
+        StaleGenerationError when the store does not hold generation."""
+        def run(connection):
+            for column in columns:
+                record = next(self._matches(connection, generation, table, column, value), None)
+                if record is not None: return record
+            return None
+        return self._lookup((generation, "find", table, columns, value), generation, run)
+
+    def find_all(self, table: str, column: str, value: str, generation: int) -> List[Dict[str, Any]]:
+        """Records whose column equals value, in write order. Raises StaleGenerationError like find."""
+        return self._lookup((generation, "find_all", table, column, value), generation,
+                            lambda connection: list(self._matches(connection, generation, table, column, value)))
+
+    def host_placement(self, host: Dict[str, Any], generation: int) -> Optional[Dict[str, Any]]:
+        """{"cluster": cluster record or None, "datacenter": {"name"}} of a host, matched by BIOS UUID or name, or None.
+        Cluster records do not nest their hosts. Raises StaleGenerationError like find."""
+        uuid_bios, name = host.get("uuid_bios"), host.get("name")
+        def run(connection):
+            row = None
+            for column, value in (("uuid_bios", uuid_bios if uuid_bios != "N/A" else None), ("name", name)):
+                if value is None: continue
+                row = next((r for r in connection.execute(f"SELECT {column}, cluster_name, datacenter_name FROM hosts WHERE {column} = ? ORDER BY rowid", (value,))
+                            if r[0] == value), None)
+                if row is not None: break
+            if row is None: return None
+            cluster = next(self._matches(connection, generation, "clusters", "name", row[1]), None) if row[1] is not None else None
+            return {"cluster": cluster, "datacenter": {"name": row[2]}}
+        return self._lookup((generation, "host_placement", uuid_bios, name), generation, run)
+
+    def query(self, table: str, filters: Optional[List[str]] = None, sort_by: Optional[str] = None, descending: bool = False,
+              skip: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """{"generation", "total", "items"}. Raises ValueError for unknown columns or malformed filters."""
+        columns = table_columns(table)
+        clauses, parameters = [], []
+        for column, operator, value in (parse_filter(table, f) for f in filters or []):
+            if operator == "~":
+                clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+                parameters.append("%" + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+            else:
+                if columns[column] == "INTEGER" and value.lower() in ("true", "false"): value = int(value.lower() == "true")
+                clauses.append(f"{column} {operator} ?")
+                parameters.append(value)
+        if sort_by is not None and sort_by not in columns:
+            raise ValueError(f"Unknown sort column '{sort_by}' for table '{table}'.")
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        # NULLs always sort last, like the in-memory list endpoints.
+        order = f" ORDER BY {sort_by} IS NULL, {sort_by}{' DESC' if descending else ''}, rowid" if sort_by else " ORDER BY rowid"
+        parent_column = CHILD_TABLES[table][1] if table in CHILD_TABLES else None
+        extra_columns = (parent_column,) if parent_column else CONTEXT_COLUMNS.get(table, ())
+        select = f"SELECT object_id, record{''.join(', ' + c for c in extra_columns)} FROM {table}"
+
+        def run(connection, generation):
+            if connection is None: return {"generation": None, "total": 0, "items": []}
+            total = connection.execute(f"SELECT COUNT(*) FROM {table}{where}", parameters).fetchone()[0]
+            rows = connection.execute(f"{select}{where}{order} LIMIT ? OFFSET ?", [*parameters, limit, skip]).fetchall()
+            if parent_column:
+                items = [{parent_column: row[2], **json.loads(row[1])} for row in rows]
+            else:
+                items = [self._with_context(table, self._decode(generation, table, row[0], row[1]), row[2:]) for row in rows]
+            return {"generation": generation, "total": total, "items": items}
+        return self._read(run)
+
+    def stats(self) -> Dict[str, Any]:
+        def run(connection, generation):
+            if connection is None: return {"path": self.path, "generation": None}
+            counts = {table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in STORE_TABLES}
+            written_at = connection.execute("SELECT value FROM meta WHERE key = 'written_at_utc'").fetchone()
+            return {"path": self.path, "generation": generation, "written_at_utc": written_at[0] if written_at else None, "rows": counts,
+                    "size_mb": round(os.path.getsize(self.path) / (1024 * 1024), 1)}
+        return self._read(run)
@@ -0,0 +1,233 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from pyVmomi import vim
+import vsphere_collector
+
+logger = logging.getLogger(__name__)
+
+# --- Metric Definitions ---
+# name -> (vCenter counter "group.name.rollup", instance, scale applied to the raw value)
+# Datastore latencies are queried per datastore instance ("*") and kept both on the host/VM (worst datastore) and on
+# each datastore (worst host). Realtime statistics have a 20 s sampling interval.
+REALTIME_INTERVAL_S = 20
+METRIC_COUNTERS: Dict[str, Tuple[str, str, float]] = {
+    "cpu_usage_pct": ("cpu.usage.average", "", 0.01),
+    "cpu_ready_pct": ("cpu.ready.summation", "", 100.0 / (REALTIME_INTERVAL_S * 1000)),
+    "mem_active_mb": ("mem.active.average", "", 1 / 1024),
+    "net_rx_kbps": ("net.received.average", "", 1.0),
+    "net_tx_kbps": ("net.transmitted.average", "", 1.0),
+    "datastore_read_latency_ms": ("datastore.totalReadLatency.average", "*", 1.0),
+    "datastore_write_latency_ms": ("datastore.totalWriteLatency.average", "*", 1.0),
+}
+METRIC_NAMES = list(METRIC_COUNTERS)
+DATASTORE_METRICS = ("datastore_read_latency_ms", "datastore_write_latency_ms")
+
+# --- Ring Buffer Store ---
+EntityKey = Tuple[str, str]  # (entity type: host | vm | datastore, identifier)
+
+class MetricRingStore:
+    """Fixed-size ring buffers of samples per entity and metric, in preallocated NumPy arrays.
+
+    Memory is bounded by max_entities x len(METRIC_NAMES) x capacity float32 values: rows are allocated on first sight
+    (doubling up to max_entities) and rows of entities that left the inventory are reused."""
+    def __init__(self, capacity: int, max_entities: int):
+        self.capacity = capacity
+        self.max_entities = max_entities
+        self._rows: Dict[EntityKey, int] = {}
+        self._free_rows: List[int] = []
+        self._values = np.full((0, len(METRIC_NAMES), capacity), np.nan, dtype=np.float32)
+        self._timestamps = np.zeros((0, capacity), dtype=np.int64)
+        self._heads = np.zeros(0, dtype=np.int64)  # next slot to write
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._lock = threading.Lock()
+        self._overflow_logged = False
+
+    def _grow(self):
+        old_size = len(self._heads)
+        new_size = min(max(old_size * 2, 64), self.max_entities)
+        values = np.full((new_size, len(METRIC_NAMES), self.capacity), np.nan, dtype=np.float32)
+        values[:old_size] = self._values
+        timestamps = np.zeros((new_size, self.capacity), dtype=np.int64)
+        timestamps[:old_size] = self._timestamps
+        self._values, self._timestamps = values, timestamps
+        self._heads = np.concatenate([self._heads, np.zeros(new_size - old_size, dtype=np.int64)])
+        self._counts = np.concatenate([self._counts, np.zeros(new_size - old_size, dtype=np.int64)])
+        self._free_rows.extend(range(new_size - 1, old_size - 1, -1))
+
+    def _row_for(self, key: EntityKey) -> Optional[int]:
+        row = self._rows.get(key)
+        if row is not None: return row
+        if not self._free_rows and len(self._heads) < self.max_entities: self._grow()
+        if not self._free_rows:
+            if not self._overflow_logged:
+                logger.warning(f"Metric store full ({self.max_entities} entities); new entities are not recorded.")
+                self._overflow_logged = True
+            return None
+        row = self._free_rows.pop()
+        self._rows[key] = row
+        return row
+
+    def record(self, timestamp: int, samples: Dict[EntityKey, Dict[str, float]]):
+        """Writes one sample per entity (missing metrics are stored as NaN) with a single vectorized assignment."""
+        if not samples: return
+        with self._lock:
+            keyed_rows = [(self._row_for(key), values) for key, values in samples.items()]
+            keyed_rows = [(row, values) for row, values in keyed_rows if row is not None]
+            if not keyed_rows: return
+            rows = np.array([row for row, _ in keyed_rows], dtype=np.int64)
+            matrix = np.array([[values.get(name, np.nan) for name in METRIC_NAMES] for _, values in keyed_rows], dtype=np.float32)
+            slots = self._heads[rows]
+            self._values[rows, :, slots] = matrix
+            self._timestamps[rows, slots] = timestamp
+            self._heads[rows] = (slots + 1) % self.capacity
+            self._counts[rows] = np.minimum(self._counts[rows] + 1, self.capacity)
+
+    def retain(self, keys: set):
+        """Frees the rows of entities no longer in the inventory."""
+        with self._lock:
+            for key in [k for k in self._rows if k not in keys]:
+                row = self._rows.pop(key)
+                self._values[row] = np.nan
+                self._timestamps[row] = 0
+                self._heads[row] = self._counts[row] = 0
+                self._free_rows.append(row)
+
+    def series(self, key: EntityKey, samples: Optional[int] = None, metrics: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Oldest-first series of the last samples for one entity, or None if it has never been sampled."""
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None: return None
+            count = int(self._counts[row]) if samples is None else min(samples, int(self._counts[row]))
+            order = (np.arange(int(self._heads[row]) - count, int(self._heads[row])) % self.capacity)
+            timestamps = self._timestamps[row, order].tolist()
+            values = self._values[row][:, order]
+        selected = metrics or METRIC_NAMES
+        return {"timestamps": timestamps, "series": {name: _to_json(values[METRIC_NAMES.index(name)]) for name in selected if name in METRIC_NAMES}}
+
+    def latest(self, entity_type: Optional[str] = None) -> Dict[EntityKey, Dict[str, Any]]:
+        """Most recent sample of every entity (of entity_type, if given)."""
+        with self._lock:
+            items = [(key, row) for key, row in self._rows.items() if (entity_type is None or key[0] == entity_type) and self._counts[row] > 0]
+            if not items: return {}
+            rows = np.array([row for _, row in items], dtype=np.int64)
+            slots = (self._heads[rows] - 1) % self.capacity
+            matrix = self._values[rows, :, slots]
+            timestamps = self._timestamps[rows, slots].tolist()
+        return {key: {"timestamp": timestamps[i], **dict(zip(METRIC_NAMES, _to_json(matrix[i])))} for i, (key, _) in enumerate(items)}
+
+def _to_json(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(v) else v for v in np.round(values.astype(np.float64), 2).tolist()]
+
+# --- vCenter Sampling ---
+def entity_key_for(object_type: str, record: Dict[str, Any]) -> Optional[EntityKey]:
+    if object_type == "vm": return ("vm", record.get("instance_uuid") or record.get("name"))
+    if object_type == "host": return ("host", record.get("name"))
+    if object_type == "datastore": return ("datastore", record.get("name"))
+    return None
+
+def inventory_entity_keys(snapshot) -> set:
+    keys = {("host", name) for name in snapshot.lookup_indexes["host_by_name"]}
+    keys.update(entity_key_for("vm", vm) for vm in snapshot.get("vms") or [])
+    keys.update(("datastore", ds.get("name")) for ds in snapshot.get("datastores") or [])
+    return keys
+
+def _datastore_instance_names(datastores: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Perf instances of datastore counters are the volume UUIDs found at the end of the datastore URL."""
+    instances = {}
+    for ds in datastores:
+        url = str(ds.get("url") or "").rstrip("/")
+        if url and url != "N/A": instances[url.rsplit("/", 1)[-1]] = ds.get("name")
+    return instances
+
+def resolve_counter_ids(perf_manager) -> Dict[str, int]:
+    by_full_name = {f"{c.groupInfo.key}.{c.nameInfo.key}.{c.rollupType}": c.key for c in perf_manager.perfCounter}
+    counter_ids = {name: by_full_name[full_name] for name, (full_name, _, _) in METRIC_COUNTERS.items() if full_name in by_full_name}
+    missing = [name for name in METRIC_COUNTERS if name not in counter_ids]
+    if missing: logger.warning(f"Performance counters not available on this vCenter: {missing}")
+    return counter_ids
+
+def sample_metrics(si, snapshot, counter_ids: Dict[str, int], batch_size: int, include_vms: bool) -> Tuple[int, Dict[EntityKey, Dict[str, float]]]:
+    """Queries the latest realtime sample of every powered-on host (and VM) in batches of batch_size entities per QueryPerf call."""
+    perf_manager = si.content.perfManager
+    entities: List[Tuple[Any, EntityKey]] = []
+    for host in snapshot.lookup_indexes["host_by_name"].values():
+        moid = vsphere_collector.parse_mor_id(host.get("mor_id"))
+        if moid and host.get("power_state") == "poweredOn": entities.append((vim.HostSystem(moid, si._stub), ("host", host.get("name"))))
+    if include_vms:
+        for vm in snapshot.get("vms") or []:
+            moid = vsphere_collector.parse_mor_id(vm.get("mor_id"))
+            if moid and vm.get("power_state") == "poweredOn": entities.append((vim.VirtualMachine(moid, si._stub), entity_key_for("vm", vm)))
+    metric_ids = [vim.PerformanceManager.MetricId(counterId=counter_ids[name], instance=METRIC_COUNTERS[name][1]) for name in METRIC_NAMES if name in counter_ids]
+    metric_by_counter = {counter_ids[name]: name for name in counter_ids}
+    datastore_names = _datastore_instance_names(snapshot.get("datastores") or [])
+
+    samples: Dict[EntityKey, Dict[str, float]] = {}
+    newest_timestamp = 0
+    for start in range(0, len(entities), batch_size):
+        batch = entities[start:start + batch_size]
+        specs = [vim.PerformanceManager.QuerySpec(entity=mor, metricId=metric_ids, intervalId=REALTIME_INTERVAL_S, maxSample=1) for mor, _ in batch]
+        keys_by_moid = {mor._moId: key for mor, key in batch}
+        try:
+            results = perf_manager.QueryPerf(querySpec=specs) or []
+        except Exception as e:
+            logger.warning(f"QueryPerf failed for a batch of {len(batch)} entities: {e.__class__.__name__} - {e}")
+            continue
+        for entity_metric in results:
+            key = keys_by_moid.get(entity_metric.entity._moId)
+            if key is None or not entity_metric.sampleInfo: continue
+            newest_timestamp = max(newest_timestamp, int(entity_metric.sampleInfo[-1].timestamp.timestamp()))
+            values = samples.setdefault(key, {})
+            for series in entity_metric.value:
+                name = metric_by_counter.get(series.id.counterId)
+                if name is None or not series.value or series.value[-1] < 0: continue
+                value = series.value[-1] * METRIC_COUNTERS[name][2]
+                if name in DATASTORE_METRICS:
+                    values[name] = max(values.get(name, 0.0), value)
+                    ds_name = datastore_names.get(series.id.instance)
+                    if ds_name:
+                        ds_values = samples.setdefault(("datastore", ds_name), {})
+                        ds_values[name] = max(ds_values.get(name, 0.0), value)
+                elif series.id.instance == "":
+                    values[name] = value
+    return newest_timestamp or int(time.time()), samples
+
+class MetricsPoller:
+    """Background thread sampling vCenter every interval_s seconds into a MetricRingStore."""
+    def __init__(self, store: MetricRingStore, snapshot_provider: Callable[[], Any], interval_s: float, batch_size: int, include_vms: bool):
+        self.store = store
+        self.snapshot_provider = snapshot_provider
+        self.interval_s = interval_s
+        self.batch_size = batch_size
+        self.include_vms = include_vms
+        self.last_sample_utc: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-poller", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        counter_ids = None
+        while not self._stop.is_set():
+            snapshot = self.snapshot_provider()
+            if snapshot is not None:
+                try:
+                    si = vsphere_collector.get_persistent_service_instance()
+                    if counter_ids is None: counter_ids = resolve_counter_ids(si.content.perfManager)
+                    start = time.monotonic()
+                    timestamp, samples = sample_metrics(si, snapshot, counter_ids, self.batch_size, self.include_vms)
+                    self.store.record(timestamp, samples)
+                    self.store.retain(inventory_entity_keys(snapshot))
+                    self.last_sample_utc, self.last_error = timestamp, None
+                    logger.info(f"Sampled performance metrics for {len(samples)} entities in {time.monotonic() - start:.2f}s.")
+                except Exception as e:
+                    self.last_error = f"{e.__class__.__name__} - {e}"
+                    logger.error(f"Performance metrics sampling failed: {self.last_error}")
+            self._stop.wait(self.interval_s)
@@ -0,0 +1,249 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# --- Request Tracing ---
+# Each HTTP request gets a trace: a root span, the child spans opened by the endpoint (lookups, traversal steps,
+# serialization), integer counters (cache scans, nodes visited, edges deduplicated) and accumulated timers for calls
+# too frequent to be spans of their own (one dict lookup per edge). The trace is summarized in the Server-Timing
+# response header and, when an export target is configured, written in OpenTelemetry's OTLP/JSON encoding (one
+# ExportTraceServiceRequest per line, the format of the collector's file exporter) or POSTed to an OTLP/HTTP collector.
+# Export runs on a background thread in batches, so requests never wait on the file or the network.
+MAX_SPANS_PER_TRACE = 256  # further nested spans are counted as dropped, as OpenTelemetry SDK span limits do
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-(?P<trace_id>[0-9a-f]{32})-(?P<span_id>[0-9a-f]{16})-[0-9a-f]{2}$")
+_SPAN_KIND_INTERNAL, _SPAN_KIND_SERVER = 1, 2
+_STATUS_ERROR = 2
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_span_id", "start_ns", "end_ns", "attributes", "kind")
+
+    def __init__(self, name: str, parent_span_id: Optional[str], attributes: Dict[str, Any], kind: int = _SPAN_KIND_INTERNAL):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.kind = kind
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+class RequestTrace:
+    def __init__(self, name: str, attributes: Dict[str, Any], traceparent: Optional[str] = None):
+        match = _TRACEPARENT_RE.match(traceparent or "")
+        self.trace_id = match["trace_id"] if match else os.urandom(16).hex()
+        self.root = Span(name, match["span_id"] if match else None, attributes, _SPAN_KIND_SERVER)
+        self.spans: List[Span] = []
+        self.stack: List[Span] = [self.root]
+        self.counters: Dict[str, int] = {}
+        self.timers: Dict[str, List[int]] = {}  # name -> [calls, total ns]
+        self.dropped_spans = 0
+        self.error = False
+
+    def finish(self):
+        self.root.end_ns = time.time_ns()
+        self.root.attributes.update({f"vlens.{name}": value for name, value in self.counters.items()})
+        for name, (calls, total_ns) in self.timers.items():
+            self.root.attributes[f"vlens.{name}.calls"] = calls
+            self.root.attributes[f"vlens.{name}.duration_ms"] = round(total_ns / 1e6, 3)
+        if self.dropped_spans: self.root.attributes["vlens.dropped_spans"] = self.dropped_spans
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: total, child spans and timers summed by name, then counters."""
+        durations: Dict[str, float] = {}
+        for span in self.spans: durations[span.name] = durations.get(span.name, 0.0) + span.duration_ms
+        metrics = [f"total;dur={self.root.duration_ms:.2f}"]
+        metrics += [f"{_token(name)};dur={duration:.2f}" for name, duration in durations.items()]
+        metrics += [f'{_token(name)};dur={total_ns / 1e6:.2f};desc="{calls} calls"' for name, (calls, total_ns) in self.timers.items()]
+        metrics += [f'{_token(name)};desc="{value}"' for name, value in self.counters.items()]
+        return ", ".join(metrics)
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("vlens_request_trace", default=None)
+
+def _token(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_\-]", "_", name)
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Child span of the innermost open span of the current request (a no-op outside a traced request)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    if len(trace.spans) >= MAX_SPANS_PER_TRACE and len(trace.stack) > 1:  # the endpoint's top-level phases are always kept
+        trace.dropped_spans += 1
+        yield None
+        return
+    child = Span(name, trace.stack[-1].span_id, attributes)
+    trace.spans.append(child)
+    trace.stack.append(child)
+    try:
+        yield child
+    finally:
+        child.end_ns = time.time_ns()
+        trace.stack.remove(child)
+
+@contextmanager
+def timer(name: str) -> Iterator[None]:
+    """Adds the block's duration and one call to the request's timer name."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        totals = trace.timers.setdefault(name, [0, 0])
+        totals[0] += 1
+        totals[1] += time.perf_counter_ns() - start
+
+def count(name: str, value: int = 1):
+    trace = _current_trace.get()
+    if trace is not None: trace.counters[name] = trace.counters.get(name, 0) + value
+
+def set_attributes(**attributes: Any):
+    """Sets attributes on the innermost open span of the current request."""
+    trace = _current_trace.get()
+    if trace is not None: trace.stack[-1].attributes.update(attributes)
+
+# --- OTLP/JSON Export ---
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool): return {"boolValue": value}
+    if isinstance(value, int): return {"intValue": str(value)}  # int64 is a string in OTLP/JSON
+    if isinstance(value, float): return {"doubleValue": value}
+    if isinstance(value, (list, tuple)): return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+def _otlp_span(trace: RequestTrace, span: Span) -> Dict[str, Any]:
+    item = {"traceId": trace.trace_id, "spanId": span.span_id, "name": span.name, "kind": span.kind,
+            "startTimeUnixNano": str(span.start_ns), "endTimeUnixNano": str(span.end_ns or span.start_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items() if value is not None]}
+    if span.parent_span_id: item["parentSpanId"] = span.parent_span_id
+    if span is trace.root and trace.error: item["status"] = {"code": _STATUS_ERROR}
+    return item
+
+def otlp_request(traces: List[RequestTrace], service_name: str) -> Dict[str, Any]:
+    """ExportTraceServiceRequest (OTLP/JSON) for these finished traces."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": "vlens.request_tracing"},
+                        "spans": [_otlp_span(trace, s) for trace in traces for s in [trace.root, *trace.spans]]}],
+    }]}
+
+class TraceExporter:
+    """Background thread exporting finished traces in batches to a JSON-lines file and/or an OTLP/HTTP endpoint."""
+    def __init__(self, file_path: str = "", endpoint: str = "", service_name: str = "vlens-api", batch_size: int = 64,
+                 flush_interval_s: float = 2.0, max_queue: int = 4096):
+        self.file_path = file_path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.exported = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+        self._queue: "queue.Queue[Optional[RequestTrace]]" = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, trace: RequestTrace):
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout_s: float = 5.0):
+        self._queue.put(None)
+        self._thread.join(timeout_s)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch: List[RequestTrace] = []
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                try:
+                    trace = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if trace is None:
+                    stopping = True
+                    break
+                batch.append(trace)
+            if batch: self._export(batch)
+
+    def _export(self, batch: List[RequestTrace]):
+        body = json.dumps(otlp_request(batch, self.service_name), separators=(",", ":"))
+        try:
+            if self.file_path:
+                os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+                with open(self.file_path, "a", encoding="utf-8") as f: f.write(body + "\n")
+            if self.endpoint:
+                request = urllib.request.Request(self.endpoint, data=body.encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST")
+                with urllib.request.urlopen(request, timeout=10) as response: response.read()
+            self.exported += len(batch)
+            self.last_error = None
+        except Exception as e:
+            self.dropped += len(batch)
+            self.last_error = f"{e.__class__.__name__} - {e}"
+            logger.warning(f"Trace export failed ({len(batch)} traces dropped): {self.last_error}")
+
+# --- ASGI Middleware ---
+class TracingMiddleware:
+    """Opens a trace per HTTP request, adds its Server-Timing header and hands it to the exporter when the body is sent.
+
+    Only requests slower than min_export_ms are exported; the header is set on every response. Streaming responses
+    send their headers before the body is produced, so their header only covers the work done up to that point.
+    """
+    def __init__(self, app, exporter: Optional[TraceExporter] = None, min_export_ms: float = 0.0):
+        self.app = app
+        self.exporter = exporter
+        self.min_export_ms = min_export_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        trace = RequestTrace(f"{scope['method']} {scope['path']}", {"http.request.method": scope["method"], "url.path": scope["path"],
+                                                                     "url.query": scope.get("query_string", b"").decode("latin-1") or None},
+                             headers.get(b"traceparent", b"").decode("latin-1"))
+        token = _current_trace.set(trace)
+        body_bytes = 0
+
+        async def send_traced(message):
+            nonlocal body_bytes
+            if message["type"] == "http.response.start":
+                trace.root.attributes["http.response.status_code"] = message["status"]
+                trace.error = message["status"] >= 500
+                message["headers"] = [*message.get("headers", []), (b"server-timing", trace.server_timing().encode("latin-1"))]
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_traced)
+        except Exception:
+            trace.error = True
+            raise
+        finally:
+            _current_trace.reset(token)
+            trace.root.attributes["http.response.body.size"] = body_bytes
+            trace.finish()
+            if self.exporter is not None and trace.root.duration_ms >= self.min_export_ms: self.exporter.submit(trace)
@@ -0,0 +1,137 @@
+from typing import Any, Dict, List, Mapping, Optional
+import vsphere_collector
+
+# --- Resource Pool Tree ---
+# Built per cache generation from the collected pools, linked by MOR id. Pools are laid out in depth-first order with,
+# for each one, the end of its subtree, so any subtree is one contiguous slice (served in O(subtree)). Rollups are
+# summed bottom-up in a single reverse pass over that order (every pool comes after its parent), and effective limits
+# (the most restrictive limit on the path from the root) top-down in a single forward pass.
+ROLLUP_FIELDS = ("pool_count", "vm_count", "powered_on_vm_count", "vcpus", "ram_mb", "cpu_reservation_mhz", "mem_reservation_mb",
+                 "vm_cpu_reservation_mhz", "vm_mem_reservation_mb")
+NODE_FIELDS = ("name", "mor_id", "overall_status", "parent_name", "parent_type", "datacenter_name", "cluster_name",
+               "cpu_reservation_mhz", "cpu_expandable_reservation", "cpu_limit_mhz", "cpu_shares_level",
+               "mem_reservation_mb", "mem_expandable_reservation", "mem_limit_mb", "mem_shares_level")
+# VM fields read for pool members and rollups (hosts and datastores are not read).
+POOL_TREE_SOURCE_FIELDS = {"VM": {"mor_id", "name", "instance_uuid", "power_state", "vcpus", "ram_mb", "cpu_reservation_mhz", "mem_reservation_mb"}}
+
+def _moid(value: Any) -> Optional[str]:
+    return vsphere_collector.parse_mor_id(value) if isinstance(value, str) else None
+
+def _number(value: Any) -> int:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+def _restrict(own_limit: Any, inherited_limit: int) -> int:
+    """Most restrictive of two limits, -1 meaning unlimited."""
+    own_limit = own_limit if isinstance(own_limit, (int, float)) and own_limit >= 0 else -1
+    if own_limit < 0: return inherited_limit
+    return own_limit if inherited_limit < 0 else min(own_limit, inherited_limit)
+
+class ResourcePoolTree:
+    def __init__(self, nodes: List[Dict[str, Any]], subtree_end: List[int], members: List[List[Dict[str, Any]]],
+                 by_id: Dict[str, int], by_name: Dict[str, List[int]]):
+        self.nodes = nodes
+        self.subtree_end = subtree_end
+        self.members = members
+        self.by_id = by_id
+        self.by_name = by_name
+
+    def roots(self, datacenter_name: Optional[str] = None, cluster_name: Optional[str] = None) -> List[int]:
+        return [i for i, node in enumerate(self.nodes) if node["depth"] == 0
+                and (datacenter_name is None or node.get("datacenter_name") == datacenter_name)
+                and (cluster_name is None or node.get("cluster_name") == cluster_name)]
+
+    def find(self, identifier: str, cluster_name: Optional[str] = None) -> List[int]:
+        """Positions of the pools with this MOR id or name (several names may match without cluster_name)."""
+        position = self.by_id.get(_moid(identifier))
+        if position is not None: return [position]
+        return [i for i in self.by_name.get(identifier, []) if cluster_name is None or self.nodes[i].get("cluster_name") == cluster_name]
+
+    def subtree(self, position: int, max_depth: Optional[int] = None, include_vms: bool = False) -> Dict[str, Any]:
+        """The pool at position with its descendants nested under "children", down to max_depth levels below it."""
+        base_depth = self.nodes[position]["depth"]
+        root: Dict[str, Any] = {}
+        stack: List[Dict[str, Any]] = []
+        for i in range(position, self.subtree_end[position]):
+            node = self.nodes[i]
+            relative_depth = node["depth"] - base_depth
+            if max_depth is not None and relative_depth > max_depth: continue
+            item = {**node, "children": []}
+            if include_vms: item["vms"] = self.members[i]
+            del stack[relative_depth:]
+            if stack: stack[-1]["children"].append(item)
+            else: root = item
+            stack.append(item)
+        return root
+
+def build_resource_pool_tree(data: Mapping[str, Any]) -> ResourcePoolTree:
+    pools = [pool for pool in data.get("resource_pools") or [] if _moid(pool.get("mor_id"))]
+    pool_by_id = {}
+    for pool in pools: pool_by_id.setdefault(_moid(pool["mor_id"]), pool)
+    vms = data.get("vms") or []
+    vm_by_id = {_moid(vm.get("mor_id")): vm for vm in vms if _moid(vm.get("mor_id"))}
+    vm_by_name = {vm.get("name"): vm for vm in vms}
+
+    # Children by MOR id, from the parent links, in collection order.
+    children: Dict[str, List[str]] = {pool_id: [] for pool_id in pool_by_id}
+    has_parent = set()
+    for pool_id, pool in pool_by_id.items():
+        parent_id = _moid(pool.get("parent_mor_id"))
+        if parent_id in pool_by_id and parent_id != pool_id:
+            children[parent_id].append(pool_id)
+            has_parent.add(pool_id)
+
+    nodes: List[Dict[str, Any]] = []
+    subtree_end: List[int] = []
+    members: List[List[Dict[str, Any]]] = []
+    member_records: List[List[Dict[str, Any]]] = []
+    parent_of: List[int] = []
+    by_id: Dict[str, int] = {}
+    for root_id in [pool_id for pool_id in pool_by_id if pool_id not in has_parent]:
+        stack = [(root_id, -1, 0)]
+        while stack:
+            pool_id, parent_position, depth = stack.pop()
+            if pool_id in by_id: continue
+            position = len(nodes)
+            by_id[pool_id] = position
+            pool = pool_by_id[pool_id]
+            nodes.append({"id": pool_id, **{f: pool.get(f) for f in NODE_FIELDS}, "parent_id": nodes[parent_position]["id"] if parent_position >= 0 else None,
+                          "depth": depth, "child_count": len(children[pool_id])})
+            subtree_end.append(position + 1)
+            parent_of.append(parent_position)
+            if pool.get("vm_mor_ids") is not None: pool_vms = [vm_by_id.get(_moid(mor_id)) for mor_id in pool["vm_mor_ids"]]
+            else: pool_vms = [vm_by_name.get(name) for name in pool.get("vms_in_pool") or []]
+            member_records.append([vm for vm in pool_vms if vm])
+            members.append([{"name": vm.get("name"), "instance_uuid": vm.get("instance_uuid"), "power_state": vm.get("power_state")} for vm in member_records[-1]])
+            nodes[-1]["vm_count"] = len(members[-1])
+            stack.extend((child_id, position, depth + 1) for child_id in reversed(children[pool_id]))
+
+    # Bottom-up: each pool's totals are complete when its parent (earlier in the order) is reached.
+    rollups = []
+    for node, pool_vms in zip(nodes, member_records):
+        rollups.append({
+            "pool_count": 0, "vm_count": len(pool_vms),
+            "powered_on_vm_count": sum(1 for vm in pool_vms if vm.get("power_state") == "poweredOn"),
+            "vcpus": sum(_number(vm.get("vcpus")) for vm in pool_vms), "ram_mb": sum(_number(vm.get("ram_mb")) for vm in pool_vms),
+            "cpu_reservation_mhz": _number(node.get("cpu_reservation_mhz")), "mem_reservation_mb": _number(node.get("mem_reservation_mb")),
+            "vm_cpu_reservation_mhz": sum(_number(vm.get("cpu_reservation_mhz")) for vm in pool_vms),
+            "vm_mem_reservation_mb": sum(_number(vm.get("mem_reservation_mb")) for vm in pool_vms),
+        })
+    for position in range(len(nodes) - 1, -1, -1):
+        parent_position = parent_of[position]
+        if parent_position < 0: continue
+        subtree_end[parent_position] = max(subtree_end[parent_position], subtree_end[position])
+        parent_rollup, rollup = rollups[parent_position], rollups[position]
+        parent_rollup["pool_count"] += rollup["pool_count"] + 1
+        for f in ROLLUP_FIELDS[1:]: parent_rollup[f] += rollup[f]
+
+    # Top-down: effective limits.
+    for position, node in enumerate(nodes):
+        parent_position = parent_of[position]
+        inherited = nodes[parent_position]["effective"] if parent_position >= 0 else {"cpu_limit_mhz": -1, "mem_limit_mb": -1}
+        node["effective"] = {"cpu_limit_mhz": _restrict(node.get("cpu_limit_mhz"), inherited["cpu_limit_mhz"]),
+                             "mem_limit_mb": _restrict(node.get("mem_limit_mb"), inherited["mem_limit_mb"])}
+        node["rollup"] = rollups[position]
+
+    by_name: Dict[str, List[int]] = {}
+    for position, node in enumerate(nodes): by_name.setdefault(node.get("name"), []).append(position)
+    return ResourcePoolTree(nodes, subtree_end, members, by_id, by_name)
@@ -0,0 +1,131 @@
+import base64
+import hashlib
+import json
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Sequence, Set, Tuple
+
+# --- Scene Graph Level of Detail ---
+# Above a node budget, sibling nodes of the same type are collapsed into aggregate nodes, in passes of decreasing precision
+# until the graph fits:
+#   1. same type and exactly the same neighbours (e.g. the other VMs of a host, which only link to that host);
+#   2. same type and same main neighbour (their best-connected one);
+#   3. same type.
+# Largest groups are collapsed first, and protected nodes (the start objects) are never collapsed.
+AGGREGATE_TYPE = "Aggregate"
+AGGREGATE_ID_PREFIX = "aggregate-"
+MEMBER_PREVIEW = 5
+Edge = Tuple[str, str, str]  # (source, target, label)
+
+@dataclass
+class AggregateGroup:
+    aggregate_id: str
+    member_type: str
+    member_ids: List[str]
+
+def _aggregate_id(member_ids: Sequence[str]) -> str:
+    digest = hashlib.blake2b("\n".join(sorted(member_ids)).encode(), digest_size=8).hexdigest()
+    return f"{AGGREGATE_ID_PREFIX}{digest}"
+
+def plan_aggregation(node_types: Mapping[str, str], edges: Sequence[Edge], max_nodes: int, protected: Set[str]) -> List[AggregateGroup]:
+    """Groups to collapse so that at most max_nodes nodes remain (when enough nodes are collapsible)."""
+    count = len(node_types)
+    if count <= max_nodes: return []
+    incident: Dict[str, List[Tuple[str, str, str]]] = {node_id: [] for node_id in node_types}
+    for source, target, label in edges:
+        if source in incident and target in incident and source != target:
+            incident[source].append((target, label, "out"))
+            incident[target].append((source, label, "in"))
+    degree = {node_id: len(links) for node_id, links in incident.items()}
+    assigned: Dict[str, str] = {}
+    groups: List[AggregateGroup] = []
+
+    def group_key(node_id: str, level: int):
+        links = incident[node_id]
+        if level == 1: return (node_types[node_id], tuple(sorted(set(links))))
+        if level == 2:
+            anchor = min((other for other, _, _ in links), key=lambda other: (-degree[other], other), default=None)
+            return (node_types[node_id], assigned.get(anchor, anchor))
+        return (node_types[node_id],)
+
+    for level in (1, 2, 3):
+        if count <= max_nodes: break
+        buckets: Dict[Any, List[str]] = {}
+        for node_id in sorted(node_types):
+            if node_id in protected or node_id in assigned: continue
+            buckets.setdefault(group_key(node_id, level), []).append(node_id)
+        for _, members in sorted(buckets.items(), key=lambda item: (-len(item[1]), str(item[0]))):
+            if count <= max_nodes: break
+            if len(members) < 2: continue
+            group = AggregateGroup(_aggregate_id(members), node_types[members[0]], members)
+            groups.append(group)
+            for member in members: assigned[member] = group.aggregate_id
+            count -= len(members) - 1
+    return groups
+
+def rewrite_edges(edges: Sequence[Edge], groups: Sequence[AggregateGroup]) -> List[Tuple[str, str, str, int]]:
+    """Edges of the reduced graph as (source, target, label, number of original edges), members replaced by their aggregate."""
+    representative = {member: group.aggregate_id for group in groups for member in group.member_ids}
+    rewritten: "OrderedDict[Edge, int]" = OrderedDict()
+    for source, target, label in edges:
+        key = (representative.get(source, source), representative.get(target, target), label)
+        if key[0] == key[1]: continue
+        rewritten[key] = rewritten.get(key, 0) + 1
+    return [(source, target, label, multiplicity) for (source, target, label), multiplicity in rewritten.items()]
+
+def _format_size_mb(size_mb: float) -> str:
+    if size_mb >= 1024 * 1024: return f"{size_mb / 1024 / 1024:.1f} TB"
+    if size_mb >= 1024: return f"{size_mb / 1024:.1f} GB"
+    return f"{size_mb:.0f} MB"
+
+def _number(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else 0.0
+
+def summarize_members(member_type: str, records: Sequence[Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """(label, stats) of an aggregate node, e.g. "287 VMs, 1.2 TB RAM, 42 powered off"."""
+    count = len(records)
+    if member_type == "VM":
+        ram_mb = sum(_number(r.get("ram_mb")) for r in records)
+        powered_off = sum(1 for r in records if r.get("power_state") != "poweredOn")
+        stats = {"count": count, "vcpus": int(sum(_number(r.get("vcpus")) for r in records)), "ram_mb": ram_mb, "powered_off": powered_off}
+        return f"{count} VMs, {_format_size_mb(ram_mb)} RAM, {powered_off} powered off", stats
+    if member_type == "Host":
+        memory_gb = sum(_number(r.get("memory_gb")) for r in records)
+        maintenance = sum(1 for r in records if r.get("maintenance_mode") is True)
+        stats = {"count": count, "cpu_total_cores": int(sum(_number(r.get("cpu_total_cores")) for r in records)), "memory_gb": round(memory_gb, 1),
+                 "in_maintenance": maintenance}
+        return f"{count} Hosts, {_format_size_mb(memory_gb * 1024)} RAM, {maintenance} in maintenance", stats
+    if member_type == "Datastore":
+        capacity_gb = sum(_number(r.get("capacity_gb")) for r in records)
+        free_gb = sum(_number(r.get("free_space_gb")) for r in records)
+        stats = {"count": count, "capacity_gb": round(capacity_gb, 2), "free_space_gb": round(free_gb, 2)}
+        return f"{count} Datastores, {_format_size_mb(free_gb * 1024)} free of {_format_size_mb(capacity_gb * 1024)}", stats
+    return f"{count} {member_type}s", {"count": count}
+
+# --- Expand Tokens ---
+# An aggregate's expand token is self-describing: "<generation>.<aggregate digest>.<parameters hash>.<parameters>", the
+# parameters being the scene-graph request (compressed JSON) that produced the aggregate. Any worker, including after a
+# restart, pages the members by running that request again on its snapshot; the aggregate id is a hash of the member ids,
+# so the token stays valid for as long as the request still produces the same group.
+def _canonical(parameters: Mapping[str, Any]) -> bytes:
+    return json.dumps(parameters, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+def expand_token(generation: int, aggregate_id: str, parameters: Mapping[str, Any]) -> str:
+    canonical = _canonical(parameters)
+    digest = hashlib.blake2b(canonical, digest_size=8).hexdigest()
+    payload = base64.urlsafe_b64encode(zlib.compress(canonical)).decode().rstrip("=")
+    return f"{generation}.{aggregate_id[len(AGGREGATE_ID_PREFIX):]}.{digest}.{payload}"
+
+def parse_expand_token(token: str) -> Tuple[int, str, Dict[str, Any]]:
+    """(generation, aggregate_id, request parameters). Raises ValueError for a malformed or altered token."""
+    try:
+        generation, aggregate_digest, digest, payload = token.split(".")
+        canonical = zlib.decompress(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        parameters = json.loads(canonical)
+        generation = int(generation)
+    except (ValueError, zlib.error) as e:
+        raise ValueError(f"malformed expand token: {e}") from None
+    if hashlib.blake2b(canonical, digest_size=8).hexdigest() != digest or not isinstance(parameters, dict):
+        raise ValueError("expand token parameters do not match their hash")
+    return generation, f"{AGGREGATE_ID_PREFIX}{aggregate_digest}", parameters
@@ -0,0 +1,235 @@
+import bisect
+import heapq
+import itertools
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Set, Tuple
+from address_index import guest_ip_addresses
+
+# --- Search Index ---
+# Inverted index over every inventory object, built per cache generation:
+#   - name trigrams -> documents, for substring matches on names ("prod" finds "web-prod-01");
+#   - terms -> documents, for prefix matches on names, UUIDs, IPs, MACs, custom attribute values, vmdk paths...
+# A new generation reuses the previous index and only re-indexes the records that changed.
+MAX_TERM_LENGTH = 128
+MAX_PREFIX_TERMS = 5000  # bounds the work of very short prefix queries
+MAX_CANDIDATES = 2000  # documents scored per query and per match kind; enough to rank an autocomplete list
+MAX_INCREMENTAL_TERMS = 1000  # past this many new terms, re-sorting is cheaper than inserting one by one
+TERM_SPLIT_RE = re.compile(r"[\s/\[\]\(\),;=]+")
+PRIMARY_ID_FIELDS = {"VM": "instance_uuid", "Host": "uuid_bios", "Datastore": "uuid"}  # falling back to the name
+
+@dataclass(frozen=True)
+class SearchDocument:
+    object_type: str
+    primary_id: str
+    name: str
+    record: Dict[str, Any]
+    terms: Mapping[str, str]  # term -> field it came from (first field wins)
+
+    @property
+    def name_lower(self) -> str:
+        return self.name.lower()
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _iter_searchable_fields(object_type: str, record: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    yield "name", record.get("name")
+    for attribute, value in (record.get("custom_attributes") or {}).items():
+        yield f"custom_attributes.{attribute}", value
+    if object_type == "VM":
+        yield "instance_uuid", record.get("instance_uuid")
+        yield "bios_uuid", record.get("bios_uuid")
+        yield "guest_os_full", record.get("guest_os_full")
+        for nic in record.get("network_adapters") or []:
+            yield "mac_address", nic.get("mac_address")
+            for ip in guest_ip_addresses(nic): yield "guest_ip", ip.get("address")
+        for disk in record.get("disks") or []:
+            yield "vmdk_path", disk.get("vmdk_path")
+    elif object_type == "Host":
+        yield "uuid_bios", record.get("uuid_bios")
+        yield "model", record.get("model")
+        for vmk in record.get("vmkernel_adapters") or []:
+            yield "vmkernel_ip", vmk.get("ip_address")
+            yield "vmkernel_mac", vmk.get("mac")
+    elif object_type == "Datastore":
+        yield "uuid", record.get("uuid")
+        yield "url", record.get("url")
+    elif object_type == "Network":
+        yield "key", record.get("key")
+    elif object_type == "DVS":
+        yield "uuid", record.get("uuid")
+
+def _extract_terms(object_type: str, record: Dict[str, Any]) -> Dict[str, str]:
+    terms: Dict[str, str] = {}
+    for field_name, value in _iter_searchable_fields(object_type, record):
+        if value in (None, "", "N/A"): continue
+        text = str(value).lower()
+        if len(text) <= MAX_TERM_LENGTH: terms.setdefault(text, field_name)
+        for token in TERM_SPLIT_RE.split(text):
+            if token: terms.setdefault(token[:MAX_TERM_LENGTH], field_name)
+    return terms
+
+def _primary_id(object_type: str, record: Dict[str, Any]) -> Any:
+    return record.get(PRIMARY_ID_FIELDS[object_type]) or record.get("name")
+
+def _iter_search_records(data: Mapping[str, Any]) -> Iterator[Tuple[str, Any, Dict[str, Any]]]:
+    for vm in data.get("vms") or []:
+        yield "VM", _primary_id("VM", vm), vm
+    for dc in (data.get("infrastructure") or {}).get("datacenters", []):
+        for cluster in dc.get("clusters", []):
+            for host in cluster.get("hosts", []):
+                yield "Host", _primary_id("Host", host), host
+        for host in dc.get("standalone_hosts", []):
+            yield "Host", _primary_id("Host", host), host
+    for ds in data.get("datastores") or []:
+        yield "Datastore", _primary_id("Datastore", ds), ds
+    for pg_type_key in ["standard_port_groups_summary", "distributed_port_groups"]:
+        for net in (data.get("global_networks") or {}).get(pg_type_key, []):
+            yield "Network", net.get("key") or net.get("name"), net
+    for dvs in data.get("distributed_virtual_switches") or []:
+        yield "DVS", dvs.get("uuid") or dvs.get("name"), dvs
+    for pool in data.get("resource_pools") or []:
+        yield "ResourcePool", pool.get("mor_id") or pool.get("name"), pool
+
+class SearchIndex:
+    """Immutable once built. Posting sets are shared with the previous generation and copied only when they change."""
+    def __init__(self, documents: Dict[Tuple[str, str], SearchDocument], name_grams: Dict[str, Set[Tuple[str, str]]],
+                 term_postings: Dict[str, Set[Tuple[str, str]]], sorted_terms: List[str]):
+        self.documents = documents
+        self.name_grams = name_grams
+        self.term_postings = term_postings
+        self.sorted_terms = sorted_terms
+
+    def search(self, query: str, limit: int = 20, object_types: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        q = query.strip().lower()
+        if not q: return []
+        scores: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        def offer(doc_key, score, field_name):
+            if object_types and doc_key[0] not in object_types: return
+            if doc_key not in scores or scores[doc_key][0] < score: scores[doc_key] = (score, field_name)
+
+        # Exact and prefix matches first: terms are scanned in lexicographic order.
+        examined = 0
+        start = bisect.bisect_left(self.sorted_terms, q)
+        for term in self.sorted_terms[start:start + MAX_PREFIX_TERMS]:
+            if not term.startswith(q) or examined >= MAX_CANDIDATES: break
+            for doc_key in itertools.islice(self.term_postings[term], MAX_CANDIDATES - examined):
+                examined += 1
+                field_name = self.documents[doc_key].terms[term]
+                if field_name == "name":
+                    name = self.documents[doc_key].name_lower
+                    offer(doc_key, 100 if q == name else 90 if term == q else 80 if name.startswith(q) else 70, field_name)
+                else:
+                    offer(doc_key, 50 if term == q else 30, field_name)
+
+        # Then substrings of names, through their trigrams.
+        if len(q) >= 3:
+            posting_lists = sorted((self.name_grams.get(g, set()) for g in _trigrams(q)), key=len)
+            candidates = set.intersection(*posting_lists) if posting_lists[0] else set()
+            for doc_key in itertools.islice(candidates, MAX_CANDIDATES):
+                name = self.documents[doc_key].name_lower
+                if q in name: offer(doc_key, 100 if name == q else 80 if name.startswith(q) else 60, "name")
+
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1][0], len(self.documents[item[0]].name), self.documents[item[0]].name))
+        return [
+            {"type": doc_key[0], "primary_id": doc_key[1], "name": self.documents[doc_key].name, "score": score, "matched_field": field_name}
+            for doc_key, (score, field_name) in ranked
+        ]
+
+def _add_postings(postings: Dict[str, Set], copied: Set[str], keys, doc_key) -> List[str]:
+    created = []
+    for key in keys:
+        if key not in postings:
+            postings[key] = set(); copied.add(key); created.append(key)
+        elif key not in copied:
+            postings[key] = set(postings[key]); copied.add(key)
+        postings[key].add(doc_key)
+    return created
+
+def _remove_postings(postings: Dict[str, Set], copied: Set[str], keys, doc_key) -> List[str]:
+    emptied = []
+    for key in keys:
+        if key not in copied:
+            postings[key] = set(postings[key]); copied.add(key)
+        postings[key].discard(doc_key)
+        if not postings[key]:
+            del postings[key]; emptied.append(key)
+    return emptied
+
+def build_search_index(data: Mapping[str, Any], previous: Optional[SearchIndex] = None) -> SearchIndex:
+    """Indexes data, re-using previous for every record that did not change (same object, or same extracted terms)."""
+    documents: Dict[Tuple[str, str], SearchDocument] = {}
+    for object_type, primary_id, record in _iter_search_records(data):
+        if not primary_id or primary_id == "N/A": continue
+        doc_key = (object_type, str(primary_id))
+        if doc_key in documents: continue
+        old_doc = previous.documents.get(doc_key) if previous else None
+        if old_doc is not None and old_doc.record is record:
+            documents[doc_key] = old_doc
+            continue
+        terms = _extract_terms(object_type, record)
+        name = str(record.get("name") or primary_id)
+        if old_doc is not None and old_doc.terms == terms and old_doc.name == name:
+            documents[doc_key] = SearchDocument(object_type, doc_key[1], name, record, old_doc.terms)
+        else:
+            documents[doc_key] = SearchDocument(object_type, doc_key[1], name, record, terms)
+
+    if previous is None:
+        name_grams: Dict[str, Set] = {}
+        term_postings: Dict[str, Set] = {}
+        for doc_key, doc in documents.items():
+            for gram in _trigrams(doc.name_lower): name_grams.setdefault(gram, set()).add(doc_key)
+            for term in doc.terms: term_postings.setdefault(term, set()).add(doc_key)
+        return SearchIndex(documents, name_grams, term_postings, sorted(term_postings))
+
+    def unchanged(old_doc: Optional[SearchDocument], new_doc: Optional[SearchDocument]) -> bool:
+        return old_doc is not None and new_doc is not None and new_doc.terms is old_doc.terms and new_doc.name == old_doc.name
+    changed_keys = [k for k, doc in previous.documents.items() if not unchanged(doc, documents.get(k))]
+    changed_keys += [k for k, doc in documents.items() if k not in previous.documents]
+    return _update_postings(previous, documents, changed_keys)
+
+def _update_postings(previous: SearchIndex, documents: Dict[Tuple[str, str], SearchDocument], changed_keys: List[Tuple[str, str]]) -> SearchIndex:
+    """The index of documents, from previous's postings with those of changed_keys moved from their old to their new document."""
+    name_grams, term_postings = dict(previous.name_grams), dict(previous.term_postings)
+    copied_grams: Set[str] = set()
+    copied_terms: Set[str] = set()
+    created_terms: Set[str] = set()
+    emptied_terms: Set[str] = set()
+    for doc_key in changed_keys:
+        old_doc = previous.documents.get(doc_key)
+        if old_doc is None: continue
+        _remove_postings(name_grams, copied_grams, _trigrams(old_doc.name_lower), doc_key)
+        emptied_terms.update(_remove_postings(term_postings, copied_terms, old_doc.terms, doc_key))
+    for doc_key in changed_keys:
+        new_doc = documents.get(doc_key)
+        if new_doc is None: continue
+        _add_postings(name_grams, copied_grams, _trigrams(new_doc.name_lower), doc_key)
+        created_terms.update(_add_postings(term_postings, copied_terms, new_doc.terms, doc_key))
+
+    # Terms emptied then re-created within this build are unchanged from the sorted list's point of view.
+    removed_terms = emptied_terms - set(term_postings)
+    added_terms = {t for t in created_terms if t not in emptied_terms and t in term_postings}
+    if len(added_terms) > MAX_INCREMENTAL_TERMS:
+        sorted_terms = sorted(term_postings)
+    elif removed_terms or added_terms:
+        sorted_terms = [t for t in previous.sorted_terms if t not in removed_terms] if removed_terms else list(previous.sorted_terms)
+        for term in added_terms: bisect.insort(sorted_terms, term)
+    else:
+        sorted_terms = previous.sorted_terms
+    return SearchIndex(documents, name_grams, term_postings, sorted_terms)
+
+def reindex_record(previous: SearchIndex, object_type: str, old_record: Dict[str, Any], record: Dict[str, Any]) -> Optional[SearchIndex]:
+    """previous with old_record replaced by record (an object refresh), or None when old_record is not the document of its
+    key (a duplicate name) or the key itself changed: build_search_index then handles it."""
+    doc_key = (object_type, str(_primary_id(object_type, record)))
+    old_doc = previous.documents.get(doc_key)
+    if old_doc is None or old_doc.record is not old_record or str(_primary_id(object_type, old_record)) != doc_key[1]: return None
+    documents = dict(previous.documents)
+    terms = _extract_terms(object_type, record)
+    name = str(record.get("name") or doc_key[1])
+    if terms == old_doc.terms and name == old_doc.name:
+        documents[doc_key] = SearchDocument(object_type, doc_key[1], name, record, old_doc.terms)
+        return SearchIndex(documents, previous.name_grams, previous.term_postings, previous.sorted_terms)
+    documents[doc_key] = SearchDocument(object_type, doc_key[1], name, record, terms)
+    return _update_postings(previous, documents, [doc_key])
@@ -0,0 +1,295 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from inventory_snapshot import InventorySnapshot, build_snapshot, compose_changes
+
+# --- Snapshot File Format ---
+# [header: magic, generation, index length][index JSON][section JSON payloads...][object hashes][changesets...]
+# The index maps each section to its (offset, length) in the payload area, so readers decode only what they touch.
+# The collector also publishes what it already computed for the generation: the content hash of every object (so
+# readers never hash records) and the changesets of its last few generations (so a reader records its history from
+# them instead of decoding and diffing two whole generations). Readers build their indexes lazily, on first use.
+SNAPSHOT_MAGIC = b"VLNSNAP1"
+SNAPSHOT_HEADER = struct.Struct("<8sQI")
+PUBLISHED_CHANGESETS = 16  # lets a worker that missed a few generations between two polls still catch up from them
+PUBLISHED_CHANGES_MAX_BYTES = 64 * 1024 * 1024
+
+def _encode_json(value: Any) -> bytes:
+    return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _atomic_write(path: str, chunks: List[bytes]):
+    """Writes to a temporary file and renames it over path, so readers only ever see a complete file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+    with open(tmp_path, "wb") as f:
+        for chunk in chunks: f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def encode_changes(changes: Dict[str, Dict[Tuple[str, str], Any]]) -> bytes:
+    """JSON of a diff_object_tables result: [type, id, record, hash] items, changed ones with the old and the new entry."""
+    return _encode_json({
+        "added": [[*key, *entry] for key, entry in changes["added"].items()],
+        "removed": [[*key, *entry] for key, entry in changes["removed"].items()],
+        "changed": [[*key, *old_entry, *new_entry] for key, (old_entry, new_entry) in changes["changed"].items()],
+    })
+
+def decode_changes(payload: bytes) -> Dict[str, Dict[Tuple[str, str], Any]]:
+    encoded = json.loads(payload)
+    return {
+        "added": {(t, i): (record, h) for t, i, record, h in encoded["added"]},
+        "removed": {(t, i): (record, h) for t, i, record, h in encoded["removed"]},
+        "changed": {(t, i): ((old, old_h), (new, new_h)) for t, i, old, old_h, new, new_h in encoded["changed"]},
+    }
+
+class PublishedChanges:
+    """The publisher's last changesets, encoded once, as (previous generation, generation, payload) oldest first."""
+    def __init__(self, max_changesets: int = PUBLISHED_CHANGESETS, max_bytes: int = PUBLISHED_CHANGES_MAX_BYTES):
+        self.max_changesets = max_changesets
+        self.max_bytes = max_bytes
+        self.changesets: Deque[Tuple[int, int, bytes]] = deque()
+
+    def append(self, previous_generation: int, generation: int, changes: Dict[str, Dict[Tuple[str, str], Any]]):
+        if self.changesets and self.changesets[-1][1] != previous_generation: self.changesets.clear()  # the chain is broken
+        self.changesets.append((previous_generation, generation, encode_changes(changes)))
+        while len(self.changesets) > self.max_changesets or sum(len(c[2]) for c in self.changesets) > self.max_bytes:
+            self.changesets.popleft()
+
+def publish_snapshot(path: str, snapshot: InventorySnapshot, published_changes: Optional[PublishedChanges] = None):
+    payloads = [(name, _encode_json(value)) for name, value in snapshot.data.items()]
+    index = {
+        "created_at_utc": snapshot.created_at_utc.isoformat(),
+        "section_timestamps": {
+            name: {**info, "collected_at_utc": info["collected_at_utc"].isoformat()}
+            for name, info in snapshot.section_timestamps.items()
+        },
+        "sections": {},
+        "changesets": [],
+    }
+    offset = 0
+    for name, payload in payloads:
+        index["sections"][name] = [offset, len(payload)]
+        offset += len(payload)
+    extra = [_encode_json([[*key, entry[1]] for key, entry in snapshot.object_table.items()])]
+    index["object_hashes"] = [offset, len(extra[0])]
+    offset += len(extra[0])
+    for previous_generation, generation, payload in (published_changes.changesets if published_changes else []):
+        index["changesets"].append([previous_generation, generation, offset, len(payload)])
+        extra.append(payload)
+        offset += len(payload)
+    index_bytes = _encode_json(index)
+    _atomic_write(path, [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, snapshot.generation, len(index_bytes)), index_bytes] + [p for _, p in payloads] + extra)
+
+class MappedSections(Mapping):
+    """Read-only mapping over the sections of a memory-mapped snapshot file, decoded on first access."""
+    def __init__(self, mapped: mmap.mmap, base_offset: int, sections: Dict[str, List[int]]):
+        self._mapped = mapped
+        self._base_offset = base_offset
+        self._sections = sections
+        self._decoded: Dict[str, Any] = {}
+        self._lock = threading.Lock()  # a section decoded twice would hand out two copies of its records
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._decoded:
+            with self._lock:
+                if key not in self._decoded:
+                    offset, length = self._sections[key]
+                    start = self._base_offset + offset
+                    self._decoded[key] = json.loads(self._mapped[start:start + length])
+        return self._decoded[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sections)
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+class SharedSnapshotReader:
+    """Maps the snapshot file read-only and returns a lazy InventorySnapshot whenever a new generation is published."""
+    def __init__(self, path: str):
+        self.path = path
+        self.generation: Optional[int] = None
+        self._file_key: Optional[Tuple[int, int, int]] = None
+        self._mapped: Optional[mmap.mmap] = None
+        self._changesets: List[Tuple[int, int, int, int]] = []  # (previous generation, generation, start, length)
+
+    def read_if_changed(self) -> Optional[InventorySnapshot]:
+        try:
+            stat_result = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        file_key = (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+        if file_key == self._file_key:
+            return None
+        with open(self.path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, generation, index_length = SNAPSHOT_HEADER.unpack_from(mapped, 0)
+        if magic != SNAPSHOT_MAGIC:
+            mapped.close()
+            raise ValueError(f"{self.path} is not a vLens snapshot file.")
+        self._file_key = file_key
+        if generation == self.generation:
+            mapped.close()
+            return None
+        index = json.loads(mapped[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + index_length])
+        section_timestamps = {
+            name: {**info, "collected_at_utc": datetime.fromisoformat(info["collected_at_utc"])}
+            for name, info in index["section_timestamps"].items()
+        }
+        base = SNAPSHOT_HEADER.size + index_length
+        data = MappedSections(mapped, base, index["sections"])
+        self.generation = generation
+        self._mapped = mapped
+        self._changesets = [(previous_generation, next_generation, base + offset, length)
+                            for previous_generation, next_generation, offset, length in index.get("changesets", [])]
+        load_hashes = None
+        if index.get("object_hashes"):
+            offset, length = index["object_hashes"]
+            load_hashes = lambda: {(t, i): h for t, i, h in json.loads(mapped[base + offset:base + offset + length])}
+        return build_snapshot(data, updated_sections=section_timestamps, generation=generation, lazy=True, load_hashes=load_hashes)
+
+    def read_changes(self, from_generation: int) -> Optional[Dict[str, Dict[Tuple[str, str], Any]]]:
+        """Changes from from_generation to the generation last read, composed from the published changesets, or None when
+        the file does not hold the whole chain (the caller then has to diff the two generations itself)."""
+        steps = []
+        generation = from_generation
+        for previous_generation, next_generation, start, length in self._changesets:
+            if previous_generation != generation: continue
+            steps.append(decode_changes(self._mapped[start:start + length]))
+            generation = next_generation
+        return compose_changes(steps) if generation == self.generation and steps else None
+
+# --- Collection Handoff ---
+# A collection worker process (collection_worker.py) hands its raw result to the API process in a file with the snapshot
+# layout, so only a path crosses the pipe. Each section is stored as JSON lines: large lists of objects (the VMs, the
+# datacenters, clusters and hosts of the infrastructure) are moved to lines of their own, recursively, and relinked
+# through the index. The reader decodes line by line, so the GIL is released between records and the API keeps serving
+# requests, where one json.loads of a whole section would hold it for seconds on a large inventory.
+HANDOFF_MAGIC = b"VLNCOLL1"
+HANDOFF_SPLIT_BYTES = 64 * 1024  # lists of objects larger than this, once encoded, are split into one line per object
+
+def _split_lines(value: Any, lines: List[bytes], links: Dict[int, List[Any]]) -> int:
+    """Appends value to lines with its large lists of objects replaced by links to their elements' lines; returns its line."""
+    position = len(lines)
+    lines.append(b"")
+    paths: List[Any] = []
+
+    def strip(node: Any, path: List[str]) -> Any:
+        if isinstance(node, dict): return {key: strip(item, path + [key]) for key, item in node.items()}
+        if isinstance(node, list) and node and all(isinstance(item, dict) for item in node) and len(_encode_json(node)) > HANDOFF_SPLIT_BYTES:
+            paths.append([path, [_split_lines(item, lines, links) for item in node]])
+            return []
+        return node
+
+    lines[position] = _encode_json(strip(value, []))
+    if paths: links[position] = paths
+    return position
+
+def write_collection_handoff(path: str, sequence: int, collected_data: Dict[str, Any]) -> int:
+    """Writes a collector result for read_collection_handoff; returns the file size."""
+    index: Dict[str, Any] = {"sections": {}}
+    payloads = []
+    offset = 0
+    for name, value in collected_data.items():
+        lines: List[bytes] = []
+        links: Dict[int, List[Any]] = {}
+        root = _split_lines(value, lines, links)
+        payload = b"\n".join(lines)
+        index["sections"][name] = {"offset": offset, "length": len(payload), "root": root, "links": {str(k): v for k, v in links.items()}}
+        payloads.append(payload)
+        offset += len(payload)
+    index_bytes = _encode_json(index)
+    _atomic_write(path, [SNAPSHOT_HEADER.pack(HANDOFF_MAGIC, sequence, len(index_bytes)), index_bytes] + payloads)
+    return SNAPSHOT_HEADER.size + len(index_bytes) + offset
+
+def read_collection_handoff(path: str, sequence: int) -> Dict[str, Any]:
+    """Collector result written by write_collection_handoff for this sequence number. Raises ValueError on a mismatch."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, found_sequence, index_length = SNAPSHOT_HEADER.unpack_from(mapped, 0)
+        if magic != HANDOFF_MAGIC or found_sequence != sequence:
+            raise ValueError(f"{path} is not the result of collection {sequence}.")
+        index = json.loads(mapped[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + index_length])
+        base = SNAPSHOT_HEADER.size + index_length
+        collected_data = {}
+        for name, section in index["sections"].items():
+            start = base + section["offset"]
+            decoded = [json.loads(line) for line in mapped[start:start + section["length"]].split(b"\n")]
+            for position, paths in section["links"].items():
+                for key_path, children in paths:
+                    if not key_path:  # the section itself is a split list
+                        decoded[int(position)] = [decoded[child] for child in children]
+                        continue
+                    parent = decoded[int(position)]
+                    for key in key_path[:-1]: parent = parent[key]
+                    parent[key_path[-1]] = [decoded[child] for child in children]
+            collected_data[name] = decoded[section["root"]]
+        return collected_data
+    finally:
+        mapped.close()
+
+# --- Collector Status and Requests ---
+# The collector process owns collection; API workers read its status and hand it refresh requests through files.
+def status_path(snapshot_path: str) -> str:
+    return f"{snapshot_path}.status.json"
+
+def requests_dir(snapshot_path: str) -> str:
+    return f"{snapshot_path}.requests"
+
+def write_collector_status(snapshot_path: str, collector_status: Dict[str, Any]):
+    _atomic_write(status_path(snapshot_path), [_encode_json(collector_status)])
+
+def read_collector_status(snapshot_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(status_path(snapshot_path), "rb") as f:
+            return json.loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def cancel_path(snapshot_path: str) -> str:
+    return f"{snapshot_path}.cancel"
+
+def request_collection_cancel(snapshot_path: str):
+    _atomic_write(cancel_path(snapshot_path), [_encode_json({"requested_at": time.time()})])
+
+def pop_collection_cancel(snapshot_path: str) -> bool:
+    """True (once) if a cancellation of the running collection was requested."""
+    try:
+        os.remove(cancel_path(snapshot_path))
+        return True
+    except FileNotFoundError:
+        return False
+
+def submit_collector_request(snapshot_path: str, request: Dict[str, Any]) -> str:
+    request_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    _atomic_write(os.path.join(requests_dir(snapshot_path), f"{request_id}.json"), [_encode_json({**request, "request_id": request_id})])
+    return request_id
+
+def pop_collector_requests(snapshot_path: str) -> List[Dict[str, Any]]:
+    """Returns pending requests oldest first and removes them from the queue."""
+    directory = requests_dir(snapshot_path)
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(".json"))
+    except FileNotFoundError:
+        return []
+    pending = []
+    for name in names:
+        request_path = os.path.join(directory, name)
+        try:
+            with open(request_path, "rb") as f:
+                pending.append(json.loads(f.read()))
+        except ValueError:
+            pass
+        finally:
+            os.remove(request_path)
+    return pending
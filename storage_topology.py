@@ -0,0 +1,91 @@
+from typing import Any, Dict, List, Mapping, Optional
+import numpy as np
+
+# --- Storage Topology Index ---
+# Built per cache generation from the hosts' multipath tables: one row per (host, LUN) pair, keyed by the LUN's
+# canonical name (naa./eui./t10. ids are the same on every host that sees the device). Paths of the whole fleet are
+# flattened into arrays and counted per row and state with a single np.bincount, so LUN lookups and the redundancy
+# report only read precomputed rows and mask them.
+PATH_STATES = ("active", "standby", "disabled", "dead", "unknown")
+_STATE_CODES = {state: code for code, state in enumerate(PATH_STATES)}
+STORAGE_SOURCE_FIELDS = {"Host": {"name", "storage_configuration"}, "Datastore": {"name", "vmfs_extents"}}
+
+def _iter_hosts(data: Mapping[str, Any]):
+    for dc in (data.get("infrastructure") or {}).get("datacenters", []):
+        for cluster in dc.get("clusters", []):
+            for host in cluster.get("hosts", []): yield host, cluster.get("name"), dc.get("name")
+        for host in dc.get("standalone_hosts", []): yield host, None, dc.get("name")
+
+class StorageTopology:
+    def __init__(self, rows: List[Dict[str, Any]], path_counts: np.ndarray, is_local: np.ndarray,
+                 luns: Dict[str, Dict[str, Any]], rows_by_lun: Dict[str, List[int]], datastores_by_lun: Dict[str, List[str]]):
+        self.rows = rows
+        self.path_counts = path_counts  # (rows, len(PATH_STATES))
+        self.is_local = is_local
+        self.cluster_names = np.array([row["cluster_name"] for row in rows], dtype=object)
+        self.luns = luns
+        self.rows_by_lun = rows_by_lun
+        self.datastores_by_lun = datastores_by_lun
+
+    def _row(self, i: int) -> Dict[str, Any]:
+        counts = self.path_counts[i].tolist()
+        return {**self.rows[i], "paths_total": sum(counts), "paths": dict(zip(PATH_STATES, counts))}
+
+    def lun(self, canonical_name: str) -> Optional[Dict[str, Any]]:
+        """The LUN with every host that sees it, their path counts by state and HBAs, and the datastores it backs."""
+        lun = self.luns.get(canonical_name)
+        if lun is None: return None
+        hosts = [self._row(i) for i in self.rows_by_lun[canonical_name]]
+        return {**lun, "datastores": self.datastores_by_lun.get(canonical_name, []), "host_count": len(hosts),
+                "paths_total": sum(h["paths_total"] for h in hosts), "hosts": hosts}
+
+    def list_luns(self) -> List[Dict[str, Any]]:
+        return [{**lun, "datastores": self.datastores_by_lun.get(name, []), "host_count": len(self.rows_by_lun[name]),
+                 "min_active_paths": int(self.path_counts[self.rows_by_lun[name], _STATE_CODES["active"]].min())}
+                for name, lun in self.luns.items()]
+
+    def redundancy_report(self, min_active_paths: int = 2, include_local: bool = False, cluster_name: Optional[str] = None) -> Dict[str, Any]:
+        """(host, LUN) pairs with fewer than min_active_paths active paths, worst first, with fleet-wide totals."""
+        active = self.path_counts[:, _STATE_CODES["active"]]
+        considered = np.ones(len(self.rows), dtype=bool) if include_local else ~self.is_local
+        if cluster_name is not None: considered &= self.cluster_names == cluster_name
+        degraded = np.flatnonzero(considered & (active < min_active_paths))
+        degraded = degraded[np.lexsort((degraded, active[degraded]))]
+        totals = self.path_counts[considered].sum(axis=0).tolist()
+        return {
+            "min_active_paths": min_active_paths, "host_lun_pairs": int(considered.sum()), "degraded_pairs": len(degraded),
+            "luns_affected": len({self.rows[i]["canonical_name"] for i in degraded}), "hosts_affected": len({self.rows[i]["host_name"] for i in degraded}),
+            "paths_by_state": dict(zip(PATH_STATES, totals)), "items": [self._row(i) for i in degraded],
+        }
+
+def build_storage_topology(data: Mapping[str, Any]) -> StorageTopology:
+    rows: List[Dict[str, Any]] = []
+    is_local: List[bool] = []
+    luns: Dict[str, Dict[str, Any]] = {}
+    rows_by_lun: Dict[str, List[int]] = {}
+    path_rows: List[int] = []
+    path_states: List[int] = []
+    for host, cluster_name, dc_name in _iter_hosts(data):
+        for lun in (host.get("storage_configuration") or {}).get("logical_units_multipath") or []:
+            canonical_name = lun.get("canonical_name")
+            if canonical_name in (None, "", "N/A"): continue
+            row = len(rows)
+            paths = lun.get("paths") or []
+            rows.append({"canonical_name": canonical_name, "host_name": host.get("name"), "cluster_name": cluster_name, "datacenter_name": dc_name,
+                         "device_name": lun.get("device_name"), "policy": (lun.get("policy") or {}).get("name"), "satp": lun.get("satp"),
+                         "hbas": sorted({p.get("adapter_device_name") for p in paths if p.get("adapter_device_name") not in (None, "N/A")})})
+            is_local.append(lun.get("is_local") is True)
+            luns.setdefault(canonical_name, {"canonical_name": canonical_name, "vendor": lun.get("vendor"), "model": lun.get("model"),
+                                             "lun_type": lun.get("lun_type"), "is_ssd": lun.get("is_ssd"), "is_local": lun.get("is_local")})
+            rows_by_lun.setdefault(canonical_name, []).append(row)
+            for path in paths:
+                path_rows.append(row)
+                path_states.append(_STATE_CODES.get(str(path.get("state")), _STATE_CODES["unknown"]))
+    width = len(PATH_STATES)
+    flat = np.array(path_rows, dtype=np.int64) * width + np.array(path_states, dtype=np.int64)
+    path_counts = np.bincount(flat, minlength=len(rows) * width).reshape(len(rows), width)
+    datastores_by_lun: Dict[str, List[str]] = {}
+    for ds in data.get("datastores") or []:
+        for extent in ds.get("vmfs_extents") or []:
+            datastores_by_lun.setdefault(extent, []).append(ds.get("name"))
+    return StorageTopology(rows, path_counts, np.array(is_local, dtype=bool), luns, rows_by_lun, datastores_by_lun)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules live at the repository root, the synthetic inventory generator in benchmarks/.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
@@ -0,0 +1,61 @@
+import pytest
+from address_index import build_address_index, guest_ip_addresses, normalize_mac
+
+def nic(label, mac, *addresses):
+    return {"label": label, "mac_address": mac, "network_name": "VM Network",
+            "guest_ip_addresses": [{"address": a, "prefix": 24, "state": "preferred", "family": "ipv6" if ":" in a else "ipv4"} for a in addresses]}
+
+@pytest.fixture(scope="module")
+def index():
+    vms = [
+        {"name": "web-01", "instance_uuid": "u-web-01", "network_adapters": [nic("Network adapter 1", "00:50:56:aa:bb:01", "10.0.0.20", "2001:db8::20")]},
+        {"name": "web-02", "instance_uuid": "u-web-02", "network_adapters": [nic("Network adapter 1", "00:50:56:AA:BB:02", "10.0.0.255", "10.0.1.0")]},
+        {"name": "db-01", "instance_uuid": "u-db-01", "network_adapters": [nic("Network adapter 1", "00:50:56:aa:bb:03", "10.0.0.0", "fe80::1%eth0"),
+                                                                           nic("Network adapter 2", "00:50:56:aa:bb:04")]},
+        {"name": "legacy", "instance_uuid": "u-legacy", "network_adapters": [{"label": "Network adapter 1", "mac_address": "00:50:56:aa:bb:05",
+                                                                              "guest_ips": ["10.0.0.7 (Prefix: 24, State: preferred)", "2001:db8::7 (Prefix: 64, State: unknown)"]}]},
+    ]
+    host = {"name": "esx-01", "uuid_bios": "u-esx-01", "vmkernel_adapters": [
+        {"device": "vmk0", "mac": "00:50:56:aa:bb:10", "ip_address": "10.0.0.100", "subnet_mask": "255.255.255.0", "portgroup_name": "Management"}]}
+    return build_address_index({"vms": vms, "infrastructure": {"datacenters": [{"clusters": [{"hosts": [host]}], "standalone_hosts": []}]}})
+
+def owners(entries):
+    return [(e["owner_name"], e["address"]) for e in entries]
+
+def test_ipv4_cidr_is_an_inclusive_range_in_address_order(index):
+    assert owners(index.lookup_cidr("10.0.0.0/24")) == [("db-01", "10.0.0.0"), ("legacy", "10.0.0.7"), ("web-01", "10.0.0.20"),
+                                                        ("esx-01", "10.0.0.100"), ("web-02", "10.0.0.255")]
+    assert owners(index.lookup_cidr("10.0.0.17/31")) == []
+    assert owners(index.lookup_cidr("10.0.0.20/30")) == [("web-01", "10.0.0.20")]  # host bits are ignored
+    assert owners(index.lookup_cidr("10.0.1.0/24")) == [("web-02", "10.0.1.0")]
+    assert len(index.lookup_cidr("0.0.0.0/0")) == 6
+    host_entry, = index.lookup_ip("10.0.0.100")
+    assert host_entry["owner_type"] == "Host" and host_entry["prefix"] == 24 and host_entry["adapter"] == "vmk0"
+
+def test_ipv6_lookups(index):
+    assert owners(index.lookup_ip("2001:db8::20")) == [("web-01", "2001:db8::20")]
+    assert owners(index.lookup_ip("2001:0db8:0000::0020")) == [("web-01", "2001:db8::20")]  # any notation
+    assert owners(index.lookup_cidr("2001:db8::/64")) == [("legacy", "2001:db8::7"), ("web-01", "2001:db8::20")]
+    assert owners(index.lookup_ip("fe80::1")) == [("db-01", "fe80::1%eth0")]  # zone id dropped from the key
+    assert index.lookup_ip("2001:db8::21") == []
+    with pytest.raises(ValueError):
+        index.lookup_ip("2001:db8::g")
+    with pytest.raises(ValueError):
+        index.lookup_cidr("10.0.0.0/33")
+
+@pytest.mark.parametrize("mac", ["00:50:56:aa:bb:02", "00-50-56-AA-BB-02", "0050.56aa.bb02", "005056AABB02"])
+def test_mac_notations_are_normalized(index, mac):
+    assert normalize_mac(mac) == "00:50:56:aa:bb:02"
+    entry, = index.lookup_mac(mac)  # one entry per adapter, not per address
+    assert entry["owner_name"] == "web-02"
+
+def test_invalid_and_addressless_macs(index):
+    assert normalize_mac("00:50:56:aa:bb") is None and index.lookup_mac("00:50:56:aa:bb") == []
+    entry, = index.lookup_mac("00:50:56:aa:bb:04")
+    assert entry["owner_name"] == "db-01" and entry["address"] is None
+    assert index.lookup_mac("00:50:56:aa:bb:10")[0]["owner_type"] == "Host"
+
+def test_legacy_guest_ips_are_parsed():
+    parsed = guest_ip_addresses({"guest_ips": ["10.0.0.7 (Prefix: 24, State: preferred)", "fe80::7 (Prefix: N/A, State: unknown)", "garbage"]})
+    assert parsed == [{"address": "10.0.0.7", "prefix": 24, "state": "preferred", "family": "ipv4"},
+                      {"address": "fe80::7", "prefix": None, "state": "unknown", "family": "ipv6"}]
@@ -0,0 +1,40 @@
+import pytest
+from attribute_index import build_attribute_index
+
+@pytest.fixture(scope="module")
+def index():
+    vms = [
+        {"name": "bill-01", "instance_uuid": "u1", "custom_attributes": {"App": "Billing", "Owner": "Team-A"}},
+        {"name": "bill-02", "instance_uuid": "u2", "custom_attributes": {"app": "billing-api"}},
+        {"name": "web-01", "instance_uuid": "u3", "custom_attributes": {"App": "web"}},
+        {"name": "straße-01", "instance_uuid": "u4", "custom_attributes": {"App": "STRASSE"}},
+        {"name": "bare", "instance_uuid": "u5"},
+    ]
+    hosts = [{"name": "esx-01", "uuid_bios": "h1", "custom_attributes": {"APP": "billing"}},
+             {"name": "esx-02", "custom_attributes": {"Rack": "R1"}}]
+    data = {"vms": vms, "infrastructure": {"datacenters": [{"clusters": [{"hosts": hosts[:1]}], "standalone_hosts": hosts[1:]}]}}
+    return build_attribute_index(data)
+
+def test_exact_lookup_folds_attribute_and_value_case(index):
+    assert sorted(e["object_name"] for e in index.lookup("app", "BILLING")) == ["bill-01", "esx-01"]
+    assert [e["value"] for e in index.lookup("App", "billing", {"VM"})] == ["Billing"]
+    assert [e["object_id"] for e in index.lookup("app", "billing", {"Host"})] == ["h1"]
+    assert index.lookup("App", "bill") == [] and index.lookup("Missing", "billing") == []
+
+def test_casefolding_goes_beyond_lowercase(index):
+    assert [e["object_name"] for e in index.lookup("app", "straße")] == ["straße-01"]
+
+def test_prefix_lookup_returns_values_in_order(index):
+    assert [e["value"] for e in index.lookup_prefix("APP", "Bill")] in (["Billing", "billing", "billing-api"], ["billing", "Billing", "billing-api"])
+    assert [e["object_name"] for e in index.lookup_prefix("app", "bill", {"VM"})] == ["bill-01", "bill-02"]
+    assert len(index.lookup_prefix("app", "")) == 5
+    assert index.lookup_prefix("app", "z") == []
+
+def test_prefix_range_stays_within_the_attribute(index):
+    assert [e["object_name"] for e in index.lookup_prefix("Owner", "")] == ["bill-01"]
+    assert [e["object_id"] for e in index.lookup_prefix("rack", "r")] == ["esx-02"]
+
+def test_attribute_and_value_summaries(index):
+    assert {a["attribute"].casefold(): (a["objects"], a["distinct_values"]) for a in index.attributes()} == {
+        "app": (5, 4), "owner": (1, 1), "rack": (1, 1)}
+    assert [(v["value"].casefold(), v["objects"]) for v in index.values("app", "b")] == [("billing", 2), ("billing-api", 1)]
@@ -0,0 +1,43 @@
+import copy
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+import api_server
+from capacity_aggregates import build_capacity_aggregates
+from inventory_snapshot import apply_collection_result
+from synthetic_inventory import synthetic_inventory
+
+def pool_members(data):
+    vms = {vm["mor_id"]: vm for vm in data["vms"]}
+    return {pool["mor_id"]: [vms[mor_id] for mor_id in pool["vm_mor_ids"]] for pool in data["resource_pools"]}
+
+def test_resource_pool_rows_count_vms_by_mor_id_despite_duplicate_names():
+    data = copy.deepcopy(synthetic_inventory(200))
+    pools = data["resource_pools"]
+    # A VM of another pool takes the name of a VM of the first pool, with different sizing.
+    first, other = pools[0]["vm_mor_ids"][0], pools[2]["vm_mor_ids"][0]
+    vms = {vm["mor_id"]: vm for vm in data["vms"]}
+    vms[other]["name"], vms[other]["vcpus"] = vms[first]["name"], vms[first]["vcpus"] + 7
+    for pool in pools: pool["vms_in_pool"] = [vms[mor_id]["name"] for mor_id in pool["vm_mor_ids"]]
+    rows = {row["mor_id"]: row for row in build_capacity_aggregates(data)["resource_pools"]}
+    for mor_id, members in pool_members(data).items():
+        assert rows[mor_id]["vm_count"] == len(members)
+        assert rows[mor_id]["vcpus_allocated"] == sum(vm["vcpus"] for vm in members)
+
+def test_resource_pool_rows_fall_back_to_vm_names():
+    data = copy.deepcopy(synthetic_inventory(200))
+    for pool in data["resource_pools"]: pool.pop("vm_mor_ids")
+    rows = build_capacity_aggregates(data)["resource_pools"]
+    assert [row["vm_count"] for row in rows] == [len(pool["vms_in_pool"]) for pool in data["resource_pools"]]
+
+def test_capacity_total_counts_the_filtered_rows():
+    data = synthetic_inventory(2000)
+    previous = api_server.app_state["snapshot"]
+    api_server.app_state["snapshot"] = snapshot = apply_collection_result(None, data, datetime.now(timezone.utc))
+    try:
+        cluster = snapshot.capacity["hosts"][0]["cluster_name"]
+        body = TestClient(api_server.app).get("/api/v1/capacity/hosts", params={"cluster_name": cluster, "limit": 1}).json()
+        expected = [row for row in snapshot.capacity["hosts"] if row["cluster_name"] == cluster]
+        assert body["total"] == len(expected) < len(snapshot.capacity["hosts"])
+        assert len(body["items"]) == 1
+    finally:
+        api_server.app_state["snapshot"] = previous
@@ -0,0 +1,25 @@
+import pytest
+import shared_snapshot
+from shared_snapshot import read_collection_handoff, write_collection_handoff
+from synthetic_inventory import synthetic_inventory
+
+def test_handoff_round_trip(tmp_path):
+    data = synthetic_inventory(400)
+    path = str(tmp_path / "collection.handoff")
+    size = write_collection_handoff(path, 7, data)
+    assert size == (tmp_path / "collection.handoff").stat().st_size
+    assert read_collection_handoff(path, 7) == data
+
+def test_handoff_splits_large_lists_into_lines(tmp_path, monkeypatch):
+    # Every list of objects is split, down to the hosts nested in clusters.
+    monkeypatch.setattr(shared_snapshot, "HANDOFF_SPLIT_BYTES", 0)
+    data = synthetic_inventory(100)
+    path = str(tmp_path / "collection.handoff")
+    write_collection_handoff(path, 1, data)
+    assert read_collection_handoff(path, 1) == data
+
+def test_handoff_rejects_another_sequence(tmp_path):
+    path = str(tmp_path / "collection.handoff")
+    write_collection_handoff(path, 3, {"vms": []})
+    with pytest.raises(ValueError):
+        read_collection_handoff(path, 4)
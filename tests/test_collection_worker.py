@@ -0,0 +1,45 @@
+import os
+import time
+import pytest
+from collection_worker import CollectionWorker
+
+def fake_collect(profile, datacenters, clusters, progress_callback, control):
+    """Stands in for vsphere_collector.main in the child process; the profile selects the behaviour."""
+    if profile == "exit": os._exit(3)
+    if profile == "hang": time.sleep(60)
+    progress_callback({"phase": "vms", "objects": 2})
+    return None, {"vms": [{"name": "vm-1", "datacenters": datacenters}, {"name": "vm-2", "clusters": clusters}], "profile": profile}
+
+@pytest.fixture
+def worker(tmp_path):
+    worker = CollectionWorker(str(tmp_path / "collection.handoff"), fake_collect)
+    yield worker
+    worker.stop()
+
+def test_collect_returns_handoff_data_and_progress(worker):
+    progress = []
+    data = worker.collect("full", ["DC1"], None, progress.append, timeout_s=60)
+    assert data == {"vms": [{"name": "vm-1", "datacenters": ["DC1"]}, {"name": "vm-2", "clusters": None}], "profile": "full"}
+    assert progress == [{"phase": "vms", "objects": 2}]
+    assert not os.path.exists(worker.handoff_path)
+    assert worker.status()["alive"] and worker.restarts == 0
+
+def test_worker_restarts_after_dying(worker):
+    worker.start()
+    first_pid = worker.status()["pid"]
+    with pytest.raises(RuntimeError):
+        worker.collect("exit", timeout_s=60)
+    assert worker.restarts == 1 and worker.last_exit_code == 3
+    assert worker.collect("full", timeout_s=60)["profile"] == "full"
+    assert worker.status()["pid"] != first_pid
+
+def test_worker_restarts_after_timeout(worker):
+    worker.start()
+    first_pid = worker.status()["pid"]
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        worker.collect("hang", timeout_s=2)
+    assert time.monotonic() - started < 30
+    assert worker.restarts == 1
+    assert worker.collect("full", timeout_s=60)["profile"] == "full"
+    assert worker.status()["pid"] != first_pid
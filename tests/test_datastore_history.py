@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from datastore_history import DatastoreCapacityHistory
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def datastore(free_gb, capacity_gb=1000.0, name="ds-01"):
+    return {"name": name, "uuid": f"uuid-{name}", "datacenter_name": "DC1", "capacity_gb": capacity_gb, "free_space_gb": free_gb, "uncommitted_gb": 0.0}
+
+def test_ring_keeps_the_latest_samples_in_order(tmp_path):
+    history = DatastoreCapacityHistory(str(tmp_path / "history.npz"), 4, 3600)
+    for day in range(7):
+        assert history.record(START + timedelta(days=day), [datastore(900 - 10 * day)])
+    series = history.series("uuid-ds-01")
+    assert series["free_space_gb"] == [870.0, 860.0, 850.0, 840.0]
+    assert series["timestamps"] == [int((START + timedelta(days=day)).timestamp()) for day in range(3, 7)]
+    assert history.stats()["samples"] == 4
+
+def test_ring_wraparound_survives_save_and_load(tmp_path):
+    path = str(tmp_path / "history.npz")
+    history = DatastoreCapacityHistory(path, 4, 3600)
+    for day in range(6): history.record(START + timedelta(days=day), [datastore(900 - 10 * day)])
+    history.save()
+    loaded = DatastoreCapacityHistory(path, 4, 3600)
+    assert loaded.load_if_changed()
+    assert loaded.series("uuid-ds-01") == history.series("uuid-ds-01")
+    assert not loaded.record(START + timedelta(days=5), [datastore(0)])  # already recorded
+    # A smaller ring keeps the most recent columns.
+    resized = DatastoreCapacityHistory(path, 2, 3600)
+    resized.load_if_changed()
+    assert resized.series("uuid-ds-01")["free_space_gb"] == [860.0, 850.0]
+
+def test_collections_within_min_interval_update_the_last_sample(tmp_path):
+    history = DatastoreCapacityHistory(None, 8, 3600)
+    for minutes in (0, 20, 40, 60, 80):
+        history.record(START + timedelta(minutes=minutes), [datastore(900 - minutes)])
+    series = history.series("uuid-ds-01")
+    # 0-40 share the first column, 60-80 the second; each column keeps the time of the values it holds.
+    assert series["free_space_gb"] == [860.0, 820.0]
+    assert series["timestamps"] == [int((START + timedelta(minutes=40)).timestamp()), int((START + timedelta(minutes=80)).timestamp())]
+
+def test_forecast_of_linear_growth(tmp_path):
+    history = DatastoreCapacityHistory(None, 64, 3600)
+    for day in range(10):
+        history.record(START + timedelta(days=day), [datastore(500 - 20 * day), datastore(800, name="ds-flat")])
+    now = START + timedelta(days=9)
+    forecasts = {row["name"]: row for row in history.forecast(30, now)}
+    growing = forecasts["ds-01"]
+    assert growing["used_growth_gb_per_day"] == pytest.approx(20)
+    assert growing["trend_r2"] == pytest.approx(1)
+    assert growing["days_until_full"] == pytest.approx(320 / 20)
+    assert growing["full_date_utc"] == (now + timedelta(days=16)).date().isoformat()
+    assert forecasts["ds-flat"]["used_growth_gb_per_day"] == 0 and forecasts["ds-flat"]["days_until_full"] is None
+
+def test_forecast_needs_enough_samples(tmp_path):
+    history = DatastoreCapacityHistory(None, 64, 3600)
+    for day in range(2): history.record(START + timedelta(days=day), [datastore(500 - 20 * day)])
+    row, = history.forecast(30, START + timedelta(days=1))
+    assert row["samples"] == 2 and row["used_growth_gb_per_day"] is None and row["days_until_full"] is None
+
+def test_growing_keeps_datastores_of_the_sample_being_recorded(tmp_path):
+    history = DatastoreCapacityHistory(None, 2, 0)
+    history.record(START, [datastore(900, name="a")])
+    others = [datastore(500, name=f"b{i}") for i in range(64)]
+    history.record(START + timedelta(days=1), others)
+    history.record(START + timedelta(days=2), others)  # "a" has no retained sample left
+    assert history.record(START + timedelta(days=3), [datastore(880, name="a")] + [datastore(700, name=f"c{i}") for i in range(100)])
+    assert history.series("uuid-a")["free_space_gb"] == [880.0]
+    assert history.series("uuid-b0")["free_space_gb"] == [500.0]
+    assert history.series("uuid-c99")["free_space_gb"] == [700.0]
@@ -0,0 +1,61 @@
+import copy
+import pytest
+from fastapi.testclient import TestClient
+import api_server
+from generation_history import GenerationHistory
+from inventory_snapshot import build_snapshot, compose_changes, diff_object_tables
+from synthetic_inventory import synthetic_inventory
+
+@pytest.fixture(scope="module")
+def generations():
+    """Three generations: vm-new is added then changed, vms[1] changed then removed, vm-brief added then removed."""
+    data = synthetic_inventory(100)
+    vms = data["vms"]
+    new_vm = {**copy.deepcopy(vms[0]), "name": "vm-new", "instance_uuid": "new-uuid", "mor_id": "'vim.VirtualMachine:vm-9001'"}
+    brief_vm = {**copy.deepcopy(vms[0]), "name": "vm-brief", "instance_uuid": "brief-uuid", "mor_id": "'vim.VirtualMachine:vm-9002'"}
+    first = build_snapshot(data)
+    second = build_snapshot({**data, "vms": [vms[0], {**vms[1], "power_state": "poweredOff"}, *vms[2:], new_vm, brief_vm]}, first)
+    third = build_snapshot({**data, "vms": [vms[0], *vms[2:], {**new_vm, "ram_mb": 1024}]}, second)
+    return first, second, third
+
+def keys(changes):
+    return {kind: sorted(entries) for kind, entries in changes.items()}
+
+def test_diff_object_tables_reports_each_kind(generations):
+    first, second, _ = generations
+    changes = diff_object_tables(first, second)
+    vms = first.get("vms")
+    assert [key for key in changes["added"] if key[0] == "VM"] == [("VM", "new-uuid"), ("VM", "brief-uuid")]
+    assert list(changes["changed"]) == [("VM", vms[1]["instance_uuid"])]
+    assert not changes["removed"]
+    old_entry, new_entry = changes["changed"][("VM", vms[1]["instance_uuid"])]
+    assert old_entry[0]["power_state"] == "poweredOn" and new_entry[0]["power_state"] == "poweredOff"
+    assert diff_object_tables(second, second) == {"added": {}, "removed": {}, "changed": {}}
+
+def test_compose_changes_collapses_consecutive_steps(generations):
+    first, second, third = generations
+    composed = compose_changes([diff_object_tables(first, second), diff_object_tables(second, third)])
+    vm1 = ("VM", first.get("vms")[1]["instance_uuid"])
+    assert composed["added"][("VM", "new-uuid")][0]["ram_mb"] == 1024  # added -> changed: added with its latest record
+    assert composed["removed"][vm1][0]["power_state"] == "poweredOn"  # changed -> removed: removed as it was at first
+    assert ("VM", "brief-uuid") not in {**composed["added"], **composed["removed"], **composed["changed"]}  # added -> removed
+    assert keys(composed) == keys(diff_object_tables(first, third))
+
+def test_diff_endpoint_between_retained_generations(generations, monkeypatch):
+    first, second, third = generations
+    history = GenerationHistory(10, 1 << 30)
+    for previous, current in ((None, first), (first, second), (second, third)): history.record(previous, current)
+    monkeypatch.setitem(api_server.app_state, "history", history)
+    monkeypatch.setitem(api_server.app_state, "snapshot", third)
+    client = TestClient(api_server.app)
+    body = client.get("/api/v1/diff", params={"from": first.generation}).json()
+    assert body["to_generation"] == third.generation
+    vm_changes = body["changes"]["VM"]
+    assert [item["primary_id"] for item in vm_changes["added"]] == ["new-uuid"]
+    assert [item["name"] for item in vm_changes["removed"]] == [first.get("vms")[1]["name"]]
+    assert not vm_changes["changed"]
+    assert vm_changes["added"][0]["id"] == api_server.create_graph_node_id("VM", "new-uuid")
+    back = client.get("/api/v1/diff", params={"from": third.generation, "to": first.generation}).json()["changes"]["VM"]
+    assert [item["primary_id"] for item in back["removed"]] == ["new-uuid"]
+    assert client.get("/api/v1/diff", params={"from": first.generation - 1}).status_code == 404
+    assert client.get("/api/v1/diff").status_code == 400
@@ -0,0 +1,64 @@
+import copy
+import pytest
+from inventory_snapshot import apply_object_refresh, build_snapshot
+from inventory_store import InventoryStore, StaleGenerationError
+from synthetic_inventory import synthetic_inventory
+
+@pytest.fixture
+def snapshot():
+    return build_snapshot(synthetic_inventory(300))
+
+@pytest.fixture
+def store(tmp_path):
+    return InventoryStore(str(tmp_path / "inventory.db"))
+
+def refreshed_vm(snapshot, **fields):
+    vm = copy.deepcopy(snapshot.get("vms")[5])
+    vm.update(fields)
+    return apply_object_refresh(snapshot, "vm", vm["name"], vm), vm
+
+def test_first_write_is_full(store, snapshot):
+    result = store.write_snapshot(snapshot)
+    assert result == {"generation": snapshot.generation, "incremental": False, "objects_written": len(snapshot.object_table)}
+    stats = store.stats()
+    assert stats["generation"] == snapshot.generation
+    assert stats["rows"]["vms"] == len(snapshot.get("vms"))
+    assert stats["rows"]["vm_disks"] == sum(len(vm["disks"]) for vm in snapshot.get("vms"))
+
+def test_incremental_write_rewrites_changed_objects_only(store, snapshot):
+    store.write_snapshot(snapshot)
+    updated, vm = refreshed_vm(snapshot, power_state="poweredOff", ram_mb=65536)
+    result = store.write_snapshot(updated, snapshot)
+    assert result["incremental"]
+    hosts_and_clusters = sum(1 for key in updated.object_table if key[0] in ("Host", "Cluster"))  # rewritten with their placement
+    assert result["objects_written"] == 1 + hosts_and_clusters
+    assert store.get("vms", vm["name"])["power_state"] == "poweredOff"
+    assert store.query("vms", ["ram_mb>=65536"])["items"] == [store.get("vms", vm["name"])]
+    assert store.stats()["rows"]["vms"] == len(updated.get("vms"))
+
+def test_incremental_write_removes_deleted_objects(store, snapshot):
+    store.write_snapshot(snapshot)
+    removed = snapshot.get("vms")[0]
+    data = {**snapshot.data, "vms": snapshot.get("vms")[1:]}
+    updated = build_snapshot(data, snapshot, {})
+    assert store.write_snapshot(updated, snapshot)["incremental"]
+    assert store.get("vms", removed["name"]) is None
+    assert store.query("vm_disks", [f"vm_name={removed['name']}"])["total"] == 0
+
+def test_write_is_full_when_previous_generation_is_not_stored(store, snapshot):
+    store.write_snapshot(snapshot)
+    updated, _ = refreshed_vm(snapshot, power_state="poweredOff")
+    again, _ = refreshed_vm(updated, power_state="suspended")
+    assert not store.write_snapshot(again, updated)["incremental"]
+
+def test_lookups_match_the_generation_indexes(store, snapshot):
+    store.write_snapshot(snapshot)
+    indexes = snapshot.lookup_indexes
+    vm = snapshot.get("vms")[42]
+    assert store.find("vms", ("name", "instance_uuid"), vm["instance_uuid"], snapshot.generation) == vm
+    assert store.find("vms", ("name",), vm["name"].upper(), snapshot.generation) is None  # exact, like the indexes
+    assert store.find_all("vms", "host_name", vm["host_name"], snapshot.generation) == indexes["vms_by_host"][vm["host_name"]]
+    for host in indexes["host_by_name"].values():  # same shape: the cluster without its hosts, the datacenter's name
+        assert store.host_placement(host, snapshot.generation) == indexes["host_placement"][("name", host["name"])]
+    with pytest.raises(StaleGenerationError):
+        store.find("vms", ("name",), vm["name"], snapshot.generation + 1)
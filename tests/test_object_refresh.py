@@ -0,0 +1,63 @@
+import copy
+import numpy as np
+import pytest
+import vsphere_collector
+from inventory_snapshot import INDEX_FIELDS, apply_object_refresh, build_snapshot
+from synthetic_inventory import synthetic_inventory
+
+def canonical(value):
+    """Comparable form of an index: containers and objects as plain data, NaN equal to itself."""
+    if isinstance(value, np.ndarray): return canonical(value.tolist())
+    if isinstance(value, np.generic): return canonical(value.item())
+    if isinstance(value, float) and value != value: return "nan"
+    if isinstance(value, (list, tuple)): return [canonical(item) for item in value]
+    if isinstance(value, (set, frozenset)): return sorted((canonical(item) for item in value), key=repr)
+    if hasattr(value, "items"): return {key: canonical(item) for key, item in value.items()}
+    if hasattr(value, "__dict__") or hasattr(value, "__slots__"):
+        names = list(getattr(value, "__dict__", {})) or list(value.__slots__)
+        return {"__class__": type(value).__name__, **{name: canonical(getattr(value, name)) for name in names}}
+    return value
+
+def move_host(vm, data):
+    host = next(h for dc in data["infrastructure"]["datacenters"] for c in dc["clusters"] for h in c["hosts"] if h["name"] != vm["host_name"])
+    vm.update(host_name=host["name"], host_mor_id=host["mor_id"])
+
+def move_disk(vm, data):
+    datastore = next(ds for ds in data["datastores"] if ds["name"] != vm["disks"][0]["datastore_name"])
+    vm["disks"][0].update(datastore_name=datastore["name"], vmdk_path=f"[{datastore['name']}] {vm['name']}/{vm['name']}.vmdk")
+
+def change_nics(vm, data):
+    nic = vm["network_adapters"][0]
+    nic.update(mac_address="00:50:56:ff:ff:01", guest_ips=["10.200.0.9 (Prefix: 24, State: preferred)"],
+               guest_ip_addresses=[{"address": "10.200.0.9", "prefix": 24, "state": "preferred", "family": "ipv4"}])
+    vm["network_adapters"].append({**copy.deepcopy(nic), "key": 4001, "label": "Network adapter 2", "mac_address": "00:50:56:ff:ff:02",
+                                   "network_name": "DVPort: DPG-DC1-101", "portgroup_key_if_dvs": "dvportgroup-1", "guest_ips": [], "guest_ip_addresses": []})
+
+REFRESHES = {
+    "power_state": lambda vm, data: vm.update(power_state="poweredOff", boot_time="N/A"),
+    "host": move_host,
+    "datastore": move_disk,
+    "nics": change_nics,
+    "rename": lambda vm, data: vm.update(name="vm-renamed"),
+}
+
+@pytest.mark.parametrize("change", list(REFRESHES))
+def test_refreshed_indexes_match_a_full_build(change):
+    current = build_snapshot(synthetic_inventory(300))
+    vm = copy.deepcopy(current.get("vms")[7])
+    REFRESHES[change](vm, current.data)
+    refreshed = apply_object_refresh(current, "vm", current.get("vms")[7]["name"], vm)
+    rebuilt = build_snapshot(refreshed.data)
+    assert refreshed.get("vms")[7] == vm
+    for name in INDEX_FIELDS:
+        assert canonical(getattr(refreshed, name)) == canonical(getattr(rebuilt, name)), name
+
+def test_closing_the_persistent_session_logs_it_out_once(monkeypatch):
+    disconnected = []
+    monkeypatch.setattr(vsphere_collector.connect, "Disconnect", disconnected.append)
+    session = object()
+    monkeypatch.setitem(vsphere_collector._persistent_session, "si", session)
+    vsphere_collector.close_persistent_service_instance()
+    vsphere_collector.close_persistent_service_instance()
+    assert disconnected == [session]
+    assert vsphere_collector._persistent_session["si"] is None
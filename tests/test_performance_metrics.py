@@ -0,0 +1,10 @@
+import pytest
+from fastapi.testclient import TestClient
+import api_server
+
+def test_shared_cache_mode_rejects_metrics_sampling(monkeypatch):
+    monkeypatch.setattr(api_server, "CACHE_MODE", "shared")
+    monkeypatch.setattr(api_server, "METRICS_INTERVAL_S", 20.0)
+    with pytest.raises(RuntimeError, match="VLENS_METRICS_INTERVAL_S"):
+        with TestClient(api_server.app):
+            pass
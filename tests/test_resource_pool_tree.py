@@ -0,0 +1,79 @@
+import pytest
+from resource_pool_tree import build_resource_pool_tree
+
+def pool(number, name, cluster, parent=None, cpu_reservation=0, mem_reservation=0, cpu_limit=-1, vms=()):
+    return {"name": name, "mor_id": f"'vim.ResourcePool:resgroup-{number}'", "cluster_name": cluster, "datacenter_name": "DC1",
+            "parent_mor_id": f"'vim.ResourcePool:resgroup-{parent}'" if parent else f"'vim.ClusterComputeResource:domain-{cluster}'",
+            "cpu_reservation_mhz": cpu_reservation, "mem_reservation_mb": mem_reservation, "cpu_limit_mhz": cpu_limit, "mem_limit_mb": -1,
+            "vms_in_pool": [f"vm-{n}" for n in vms], "vm_mor_ids": [f"'vim.VirtualMachine:vm-{n}'" for n in vms]}
+
+def vm(number, power_state="poweredOn", name=None):
+    return {"name": name or f"vm-{number}", "mor_id": f"'vim.VirtualMachine:vm-{number}'", "instance_uuid": f"uuid-{number}",
+            "power_state": power_state, "vcpus": 2, "ram_mb": 4096, "cpu_reservation_mhz": 100 * number, "mem_reservation_mb": 0}
+
+@pytest.fixture(scope="module")
+def tree():
+    # C1: Resources > (Prod > (Web, DB), Dev); C2: Resources > Prod. vm-9 is named like vm-1.
+    pools = [
+        pool(1, "Resources", "C1", vms=[1]),
+        pool(2, "Prod", "C1", 1, cpu_reservation=4000, mem_reservation=8192, cpu_limit=20000),
+        pool(3, "Web", "C1", 2, cpu_reservation=1000, cpu_limit=30000, vms=[2, 3]),
+        pool(4, "DB", "C1", 2, mem_reservation=4096, vms=[4]),
+        pool(5, "Dev", "C1", 1, cpu_limit=5000, vms=[5, 9]),
+        pool(6, "Resources", "C2"),
+        pool(7, "Prod", "C2", 6, vms=[6]),
+    ]
+    vms = [vm(1), vm(2), vm(3, "poweredOff"), vm(4), vm(5), vm(6), vm(9, name="vm-1")]
+    return build_resource_pool_tree({"resource_pools": pools, "vms": vms})
+
+def names(tree, positions):
+    return [tree.nodes[i]["name"] for i in positions]
+
+def position(tree, name, cluster="C1"):
+    found, = tree.find(name, cluster)
+    return found
+
+def test_subtree_end_slices_a_pool_and_its_descendants(tree):
+    assert names(tree, range(len(tree.nodes))) == ["Resources", "Prod", "Web", "DB", "Dev", "Resources", "Prod"]  # depth first
+    prod = position(tree, "Prod")
+    assert names(tree, range(prod, tree.subtree_end[prod])) == ["Prod", "Web", "DB"]
+    root = position(tree, "Resources")
+    assert tree.subtree_end[root] == position(tree, "Resources", "C2")
+    members = [vm["name"] for i in range(prod, tree.subtree_end[prod]) for vm in tree.members[i]]
+    assert members == ["vm-2", "vm-3", "vm-4"]
+    leaf = position(tree, "Web")
+    assert tree.subtree_end[leaf] == leaf + 1
+
+def test_rollups_cover_the_whole_subtree(tree):
+    root = tree.nodes[position(tree, "Resources")]
+    assert root["vm_count"] == 1 and root["child_count"] == 2
+    assert root["rollup"] == {"pool_count": 4, "vm_count": 6, "powered_on_vm_count": 5, "vcpus": 12, "ram_mb": 6 * 4096,
+                              "cpu_reservation_mhz": 5000, "mem_reservation_mb": 12288,
+                              "vm_cpu_reservation_mhz": 100 + 200 + 300 + 400 + 500 + 900, "vm_mem_reservation_mb": 0}
+    prod = tree.nodes[position(tree, "Prod")]["rollup"]
+    assert (prod["pool_count"], prod["vm_count"], prod["powered_on_vm_count"], prod["cpu_reservation_mhz"]) == (2, 3, 2, 5000)
+
+def test_members_are_matched_by_mor_id(tree):
+    dev = position(tree, "Dev")
+    assert [vm["instance_uuid"] for vm in tree.members[dev]] == ["uuid-5", "uuid-9"]  # not the first VM named vm-1
+
+def test_effective_limits_are_inherited(tree):
+    assert tree.nodes[position(tree, "Web")]["effective"]["cpu_limit_mhz"] == 20000  # Prod's limit is lower
+    assert tree.nodes[position(tree, "DB")]["effective"]["cpu_limit_mhz"] == 20000
+    assert tree.nodes[position(tree, "Dev")]["effective"]["cpu_limit_mhz"] == 5000
+    assert tree.nodes[position(tree, "Resources")]["effective"]["cpu_limit_mhz"] == -1
+
+def test_find_by_name_or_mor_id(tree):
+    assert names(tree, tree.find("Prod")) == ["Prod", "Prod"]  # one per cluster
+    assert [tree.nodes[i]["cluster_name"] for i in tree.find("Prod", "C2")] == ["C2"]
+    assert tree.find("resgroup-4") == tree.find("'vim.ResourcePool:resgroup-4'") == [position(tree, "DB")]
+    assert tree.find("Prod", "C3") == [] and tree.find("Missing") == []
+    assert tree.roots(cluster_name="C2") == [position(tree, "Resources", "C2")]
+
+def test_subtree_nests_children_down_to_max_depth(tree):
+    nested = tree.subtree(position(tree, "Resources"), max_depth=1, include_vms=True)
+    assert [child["name"] for child in nested["children"]] == ["Prod", "Dev"]
+    assert all(child["children"] == [] for child in nested["children"])
+    assert [vm["name"] for vm in nested["vms"]] == ["vm-1"]
+    full = tree.subtree(position(tree, "Resources"))
+    assert [child["name"] for child in full["children"][0]["children"]] == ["Web", "DB"]
@@ -0,0 +1,74 @@
+from datetime import datetime, timezone
+import pytest
+from fastapi.testclient import TestClient
+import api_server
+from inventory_snapshot import apply_collection_result
+from scene_aggregation import expand_token, parse_expand_token
+from synthetic_inventory import synthetic_inventory
+
+@pytest.fixture
+def client():
+    previous = api_server.app_state["snapshot"]
+    install(synthetic_inventory(400))
+    yield TestClient(api_server.app)
+    api_server.app_state["snapshot"] = previous
+
+def install(data):
+    api_server.app_state["snapshot"] = apply_collection_result(api_server.app_state["snapshot"], data, datetime.now(timezone.utc))
+
+def aggregate_node(client):
+    """The VMs sharing the start VM's host, collapsed into one aggregate."""
+    request = {"start_object_identifier": api_server.app_state["snapshot"].get("vms")[0]["name"], "depth": 2, "max_nodes": 20}
+    graph = client.post("/api/v1/visualization/scene-graph", json=request).json()
+    node, = [n for n in graph["nodes"] if n["type"] == "Aggregate"]
+    return node
+
+def members(client, token, limit=10):
+    names, skip = [], 0
+    while True:
+        page = client.get(f"/api/v1/visualization/aggregates/{token}", params={"skip": skip, "limit": limit})
+        assert page.status_code == 200
+        body = page.json()
+        names += [node["label"] for node in body["nodes"]]
+        skip += limit
+        if skip >= body["total"]: return body, names
+
+def test_expand_token_round_trip():
+    parameters = {"start_objects": ["vm-000001"], "depth": 2, "max_nodes": 20}
+    token = expand_token(7, "aggregate-05bfe8e21edff09f", parameters)
+    assert parse_expand_token(token) == (7, "aggregate-05bfe8e21edff09f", parameters)
+    assert expand_token(7, "aggregate-05bfe8e21edff09f", dict(reversed(parameters.items()))) == token  # canonical
+
+def test_members_are_paged_from_the_token(client):
+    node = aggregate_node(client)
+    body, names = members(client, node["data"]["expand_token"])
+    assert body["aggregate_id"] == node["id"] and body["member_type"] == "VM"
+    assert body["total"] == len(names) == node["data"]["stats"]["count"] == len(set(names))
+    assert set(node["data"]["members_preview"]) <= set(names)
+
+def test_token_outlives_its_generation(client):
+    node = aggregate_node(client)
+    _, names = members(client, node["data"]["expand_token"])
+    install(synthetic_inventory(400))  # same inventory, new generation
+    body, again = members(client, node["data"]["expand_token"])
+    assert body["cache_generation"] > int(node["data"]["expand_token"].split(".")[0])
+    assert again == names
+
+def test_vanished_aggregate_is_not_found(client):
+    node = aggregate_node(client)
+    data = synthetic_inventory(400)
+    host_name = data["vms"][0]["host_name"]
+    install({**data, "vms": [vm for i, vm in enumerate(data["vms"]) if i == 0 or vm["host_name"] != host_name]})
+    response = client.get(f"/api/v1/visualization/aggregates/{node['data']['expand_token']}")
+    assert response.status_code == 404
+
+@pytest.mark.parametrize("token", ["garbage", "1.abc.def.ghi", "x.05bfe8e21edff09f.20e4a74c1cc1c54c.eJx1jsEO"])
+def test_malformed_token_is_rejected(client, token):
+    assert client.get(f"/api/v1/visualization/aggregates/{token}").status_code == 400
+
+def test_altered_token_is_rejected(client):
+    generation, aggregate, digest, payload = aggregate_node(client)["data"]["expand_token"].split(".")
+    altered = expand_token(int(generation), f"aggregate-{aggregate}", {"start_objects": ["vm-000002"], "max_nodes": 20}).split(".")[3]
+    assert client.get(f"/api/v1/visualization/aggregates/{generation}.{aggregate}.{digest}.{altered}").status_code == 400
+    invalid = expand_token(int(generation), f"aggregate-{aggregate}", {"depth": 9})  # well-formed, not a valid request
+    assert client.get(f"/api/v1/visualization/aggregates/{invalid}").status_code == 400
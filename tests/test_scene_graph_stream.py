@@ -0,0 +1,57 @@
+import json
+from datetime import datetime, timezone
+import pytest
+from fastapi.testclient import TestClient
+import api_server
+from inventory_snapshot import apply_collection_result
+from synthetic_inventory import synthetic_inventory
+
+@pytest.fixture(scope="module")
+def client():
+    data = synthetic_inventory(400)
+    previous = api_server.app_state["snapshot"]
+    api_server.app_state["snapshot"] = apply_collection_result(None, data, datetime.now(timezone.utc))
+    yield TestClient(api_server.app)  # no lifespan: no collection starts
+    api_server.app_state["snapshot"] = previous
+
+def stream(client, request):
+    response = client.post("/api/v1/visualization/scene-graph/stream", json=request)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def vm_names(count):
+    return [vm["name"] for vm in api_server.app_state["snapshot"].get("vms")[:count]]
+
+def test_stream_is_breadth_first_and_ends_with_a_summary(client):
+    records = stream(client, {"start_object_identifier": vm_names(1)[0], "depth": 2})
+    summary = records[-1]
+    assert summary["record"] == "summary" and all(r["record"] != "summary" for r in records[:-1])
+    nodes = [r for r in records if r["record"] == "node"]
+    edges = [r for r in records if r["record"] == "edge"]
+    assert summary["nodes"] == len(nodes) and summary["edges"] == len(edges) and not summary["truncated"]
+    assert len({n["id"] for n in nodes}) == len(nodes)
+    hops = [r["hop"] for r in records[:-1]]
+    assert hops == sorted(hops) and hops[0] == 0 and max(hops) == 2
+    seen = set()
+    for record in records[:-1]:
+        if record["record"] == "node": seen.add(record["id"])
+        else: assert record["source"] in seen and record["target"] in seen  # nodes come before their edges
+
+def test_stream_matches_the_scene_graph(client):
+    request = {"start_objects": vm_names(5), "depth": 1}
+    records = stream(client, request)
+    graph = client.post("/api/v1/visualization/scene-graph", json=request).json()
+    assert {r["id"] for r in records if r["record"] == "node"} == {n["id"] for n in graph["nodes"]}
+    assert len([r for r in records if r["record"] == "edge"]) == len(graph["edges"])
+    assert records[-1]["roots"] == graph["roots"]
+
+def test_stream_stops_at_max_nodes(client):
+    records = stream(client, {"start_object_identifier": vm_names(1)[0], "depth": 2, "max_nodes": 5})
+    summary = records[-1]
+    assert summary["truncated"] and summary["nodes"] == 5
+    assert len([r for r in records if r["record"] == "node"]) == 5
+
+def test_stream_reports_unresolved_start_objects(client):
+    summary = stream(client, {"start_objects": [vm_names(1)[0], "no-such-vm"]})[-1]
+    assert summary["unresolved_start_objects"] == ["no-such-vm"] and len(summary["roots"]) == 1
@@ -0,0 +1,66 @@
+import copy
+import pytest
+from inventory_snapshot import replace_cached_object
+from search_index import build_search_index, reindex_record
+from synthetic_inventory import synthetic_inventory
+
+@pytest.fixture(scope="module")
+def data():
+    return synthetic_inventory(300)
+
+@pytest.fixture(scope="module")
+def index(data):
+    return build_search_index(data)
+
+def state(index):
+    """Everything a search reads, as comparable values."""
+    return ({key: (doc.name, dict(doc.terms), doc.record) for key, doc in index.documents.items()},
+            {gram: set(keys) for gram, keys in index.name_grams.items()},
+            {term: set(keys) for term, keys in index.term_postings.items()}, list(index.sorted_terms))
+
+def refresh(data, index, object_type, old_record, change):
+    record = copy.deepcopy(old_record)
+    change(record)
+    updated = replace_cached_object(data, {"VM": "vm", "Host": "host", "Datastore": "datastore"}[object_type], old_record, record)
+    return updated, reindex_record(index, object_type, old_record, record)
+
+def first_host(data):
+    return data["infrastructure"]["datacenters"][0]["clusters"][0]["hosts"][0]
+
+VM_CHANGES = {
+    "power_state": lambda vm: vm.update(power_state="poweredOff"),  # no searchable field
+    "rename": lambda vm: vm.update(name="payments-renamed-01"),
+    "guest_ip": lambda vm: vm["network_adapters"][0].update(guest_ip_addresses=[{"address": "172.31.9.9", "prefix": 16, "state": "preferred", "family": "ipv4"}]),
+    "mac": lambda vm: vm["network_adapters"][0].update(mac_address="00:50:56:fe:dc:ba"),
+    "custom_attribute": lambda vm: vm["custom_attributes"].update(Owner="team-unique-owner"),
+    "disk": lambda vm: vm["disks"].pop(),
+}
+
+@pytest.mark.parametrize("change", list(VM_CHANGES))
+def test_reindexed_vm_matches_a_full_rebuild(data, index, change):
+    updated, reindexed = refresh(data, index, "VM", data["vms"][12], VM_CHANGES[change])
+    rebuilt = build_search_index(updated)
+    assert state(reindexed) == state(rebuilt)
+    for query in ("payments-renamed", "172.31", "00:50:56:fe", "team-unique", data["vms"][12]["name"], "vm-0001"):
+        assert reindexed.search(query) == rebuilt.search(query)
+
+def test_reindexed_host_and_datastore_match_a_full_rebuild(data, index):
+    updated, reindexed = refresh(data, index, "Host", first_host(data), lambda host: host.update(name="esx-renamed.lab", model="ProLiant X"))
+    assert state(reindexed) == state(build_search_index(updated))
+    updated, reindexed = refresh(data, index, "Datastore", data["datastores"][1], lambda ds: ds.update(url="ds:///vmfs/volumes/changed/"))
+    assert state(reindexed) == state(build_search_index(updated))
+
+def test_unchanged_terms_keep_the_postings(data, index):
+    _, reindexed = refresh(data, index, "VM", data["vms"][3], VM_CHANGES["power_state"])
+    assert reindexed.term_postings is index.term_postings and reindexed.sorted_terms is index.sorted_terms
+
+def test_reindex_declines_a_changed_primary_id_or_a_stale_record(data, index):
+    vm = data["vms"][4]
+    assert reindex_record(index, "VM", vm, {**vm, "instance_uuid": "another-uuid"}) is None
+    assert reindex_record(index, "VM", copy.deepcopy(vm), {**vm, "name": "x"}) is None  # not the indexed record
+
+def test_incremental_build_matches_a_full_rebuild(data, index):
+    vms = [*data["vms"][1:], {**copy.deepcopy(data["vms"][0]), "instance_uuid": "new-uuid", "name": "brand-new-vm"}]
+    vms[5] = {**vms[5], "name": "renamed-in-collection"}
+    updated = {**data, "vms": vms}
+    assert state(build_search_index(updated, index)) == state(build_search_index(updated))
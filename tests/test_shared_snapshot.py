@@ -0,0 +1,95 @@
+import copy
+import json
+import pytest
+from inventory_snapshot import build_snapshot, compose_changes, diff_object_tables
+from shared_snapshot import MappedSections, PublishedChanges, SharedSnapshotReader, publish_snapshot
+from synthetic_inventory import synthetic_inventory
+
+@pytest.fixture(scope="module")
+def generations():
+    """Three consecutive generations, each changing or adding VMs."""
+    data = synthetic_inventory(200)
+    first = build_snapshot(data)
+    vms = list(data["vms"])
+    vms[3] = {**vms[3], "power_state": "poweredOff"}
+    second = build_snapshot({**data, "vms": vms + [{**copy.deepcopy(vms[0]), "name": "vm-new", "instance_uuid": "new-uuid"}]}, first)
+    third = build_snapshot({**second.data, "vms": [{**second.get("vms")[0], "ram_mb": 1024}] + second.get("vms")[1:]}, second)
+    return first, second, third
+
+def summary(changes):
+    """Keys and content hashes of a changeset (published records come back decoded from JSON)."""
+    return {"added": {k: e[1] for k, e in changes["added"].items()}, "removed": {k: e[1] for k, e in changes["removed"].items()},
+            "changed": {k: (old[1], new[1]) for k, (old, new) in changes["changed"].items()}}
+
+def publish_chain(path, generations):
+    published = PublishedChanges()
+    for previous, current in zip(generations, generations[1:]):
+        published.append(previous.generation, current.generation, diff_object_tables(previous, current))
+    publish_snapshot(path, generations[-1], published)
+
+def test_published_snapshot_round_trip(tmp_path, generations):
+    _, _, snapshot = generations
+    path = str(tmp_path / "inventory.snapshot")
+    publish_snapshot(path, snapshot)
+    reader = SharedSnapshotReader(path)
+    loaded = reader.read_if_changed()
+    assert loaded.generation == snapshot.generation == reader.generation
+    assert reader.read_if_changed() is None  # unchanged file
+    assert json.loads(json.dumps(dict(snapshot.data), default=str)) == dict(loaded.data)
+    assert loaded.section_timestamps == snapshot.section_timestamps
+    assert {key: entry[1] for key, entry in loaded.object_table.items()} == {key: entry[1] for key, entry in snapshot.object_table.items()}
+
+def test_sections_and_indexes_are_loaded_lazily(tmp_path, generations):
+    _, _, snapshot = generations
+    path = str(tmp_path / "inventory.snapshot")
+    publish_snapshot(path, snapshot)
+    loaded = SharedSnapshotReader(path).read_if_changed()
+    assert isinstance(loaded.data, MappedSections)
+    assert not loaded.data._decoded and loaded.built_indexes() == []
+    assert set(loaded.data) == set(snapshot.data) and len(loaded.data) == len(snapshot.data)
+    assert loaded.get("datastores") == json.loads(json.dumps(snapshot.get("datastores"), default=str))
+    assert list(loaded.data._decoded) == ["datastores"]
+    assert loaded.get("datastores") is loaded.get("datastores")  # decoded once
+    name = snapshot.get("vms")[5]["name"]
+    assert loaded.lookup_indexes["vm_by_name"][name]["instance_uuid"] == snapshot.get("vms")[5]["instance_uuid"]
+    assert loaded.built_indexes() == ["lookup_indexes"]
+
+def test_republishing_the_same_generation_is_not_reread(tmp_path, generations):
+    _, second, _ = generations
+    path = str(tmp_path / "inventory.snapshot")
+    publish_snapshot(path, second)
+    reader = SharedSnapshotReader(path)
+    assert reader.read_if_changed() is not None
+    publish_snapshot(path, second)
+    assert reader.read_if_changed() is None
+
+def test_not_a_snapshot_file(tmp_path):
+    path = tmp_path / "inventory.snapshot"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        SharedSnapshotReader(str(path)).read_if_changed()
+
+def test_read_changes_composes_the_published_chain(tmp_path, generations):
+    first, second, third = generations
+    path = str(tmp_path / "inventory.snapshot")
+    publish_chain(path, generations)
+    reader = SharedSnapshotReader(path)
+    reader.read_if_changed()
+    expected = compose_changes([diff_object_tables(first, second), diff_object_tables(second, third)])
+    assert summary(reader.read_changes(first.generation)) == summary(expected)
+    assert summary(reader.read_changes(second.generation)) == summary(diff_object_tables(second, third))
+    assert reader.read_changes(third.generation) is None  # nothing to compose
+    assert reader.read_changes(first.generation - 1) is None  # not in the chain
+
+def test_read_changes_of_a_broken_chain_is_none(tmp_path, generations):
+    first, second, third = generations
+    published = PublishedChanges()
+    published.append(first.generation, second.generation, diff_object_tables(first, second))
+    published.append(first.generation, third.generation, diff_object_tables(first, third))  # does not follow second: restarts the chain
+    path = str(tmp_path / "inventory.snapshot")
+    publish_snapshot(path, third, published)
+    reader = SharedSnapshotReader(path)
+    reader.read_if_changed()
+    assert len(published.changesets) == 1
+    assert reader.read_changes(second.generation) is None
+    assert summary(reader.read_changes(first.generation)) == summary(diff_object_tables(first, third))
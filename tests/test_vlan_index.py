@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from vlan_index import VLAN_COUNT, build_vlan_index, parse_vlan_info, parse_vlan_range
+
+@pytest.mark.parametrize("info, expected", [
+    ("Trunk (100-200, 300, 400-401)", ("trunk", [[100, 200], [300, 300], [400, 401]])),
+    ("Trunk (0-4094)", ("trunk", [[0, 4094]])),
+    ("Trunk (10-x, 20)", ("trunk", [[20, 20]])),  # unparseable parts are skipped
+    ("220", ("access", [[220, 220]])),
+    ("0", ("none", [[0, 0]])),
+    ("Private VLAN (Primary: 42)", ("pvlan", [[42, 42]])),
+    ("N/A", ("N/A", [])),
+    (None, ("N/A", [])),
+])
+def test_vlan_info_strings_are_parsed(info, expected):
+    assert parse_vlan_info(info) == expected
+
+@pytest.mark.parametrize("text, expected", [("220", (220, 220)), ("100-200", (100, 200)), (" 5 - 6 ", (5, 6)), ("0-4095", (0, 4095))])
+def test_vlan_ranges_are_parsed(text, expected):
+    assert parse_vlan_range(text) == expected
+
+@pytest.mark.parametrize("text", ["200-100", "4096", "-1", "a", "1-2-3", ""])
+def test_invalid_vlan_ranges_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_vlan_range(text)
+
+@pytest.fixture(scope="module")
+def index():
+    distributed = [
+        {"key": "dvportgroup-1", "name": "DPG-220", "dvswitch_name": "DVS1", "dvswitch_uuid": "dvs-1", "vlan_mode": "access", "vlan_ranges": [[220, 220]]},
+        {"key": "dvportgroup-2", "name": "DPG-Trunk", "dvswitch_name": "DVS1", "dvswitch_uuid": "dvs-1", "vlan_id_info": "Trunk (200-299, 1000)"},  # legacy
+        {"key": "dvportgroup-3", "name": "DPG-All", "dvswitch_name": "DVS1", "dvswitch_uuid": "dvs-1", "vlan_id_info": "Trunk (0-4094)"},
+        {"key": "dvportgroup-4", "name": "DPG-Unknown", "dvswitch_name": "DVS1", "dvswitch_uuid": "dvs-1", "vlan_id_info": "N/A"},
+    ]
+    host = {"name": "esx-01", "proxy_switches": [{"dvs_uuid": "dvs-1", "dvs_name": "DVS1"}], "vswitches_standard": [{"name": "vSwitch0", "portgroup_details_on_vswitch": [
+        {"name": "VM Network", "vlan_id": 0}, {"name": "Prod-220", "vlan_id": 220}, {"name": "VGT", "vlan_id": 4095}]}]}
+    vms = [{"name": "web-01", "instance_uuid": "u1", "host_name": "esx-01", "network_adapters": [
+               {"label": "Network adapter 1", "portgroup_key_if_dvs": "dvportgroup-1", "mac_address": "00:50:56:00:00:01"},
+               {"label": "Network adapter 2", "portgroup_key_if_dvs": "N/A", "network_name": "Prod-220", "mac_address": "00:50:56:00:00:02"}]}]
+    data = {"global_networks": {"distributed_port_groups": distributed}, "infrastructure": {"datacenters": [{"clusters": [{"hosts": [host]}]}]}, "vms": vms}
+    return build_vlan_index(data)
+
+def test_carried_counts_match_the_port_group_ranges(index):
+    expected = np.zeros(VLAN_COUNT, dtype=np.int64)
+    for entry in index.entries:
+        for start, end in entry["vlan_ranges"]: expected[start:end + 1] += 1
+    assert index.carried_count.tolist() == expected.tolist()
+    assert [index.carried_count[v] for v in (0, 220, 250, 1000, 4094, 4095)] == [3, 5, 3, 3, 2, 0]
+
+def test_coverage_of_a_range(index):
+    coverage = index.coverage(190, 310)
+    assert coverage["vlan_count"] == 121 and coverage["carried_vlans"] == 121 and coverage["uncarried_vlans"] == []
+    trunks = {t["name"]: (t["covered_vlans"], t["covers_all"]) for t in coverage["trunks"]}
+    assert trunks == {"DPG-All": (121, True), "VGT": (121, True), "DPG-Trunk": (100, False)}
+    assert index.coverage(4090, 4095)["uncarried_vlans"] == [[4095, 4095]]
+    single = index.coverage(1000, 1000)
+    assert single["carried_vlans"] == 1 and {t["name"] for t in single["trunks"]} == {"DPG-All", "DPG-Trunk", "VGT"}
+
+def test_full_range_coverage(index):
+    coverage = index.coverage(0, VLAN_COUNT - 1)
+    assert coverage["carried_vlans"] == 4095 and coverage["uncarried_vlans"] == [[4095, 4095]]
+    assert [t["name"] for t in coverage["trunks"] if t["covers_all"]] == []
+
+def test_membership_lists_access_port_groups_before_trunks(index):
+    members = index.membership(220)
+    assert [(p["name"], p["mode"]) for p in members["portgroups"]] == [
+        ("DPG-220", "access"), ("Prod-220", "access"), ("DPG-Trunk", "trunk"), ("DPG-All", "trunk"), ("VGT", "trunk")]
+    assert members["hosts"] == ["esx-01"]
+    assert [(vm["adapter"], vm["portgroup"]) for vm in members["vms"]] == [("Network adapter 1", "DPG-220"), ("Network adapter 2", "Prod-220")]
+    assert [p["name"] for p in index.membership(220, include_trunks=False)["portgroups"]] == ["DPG-220", "Prod-220"]
+    assert [p["name"] for p in index.membership(0)["portgroups"]] == ["VM Network", "DPG-All", "VGT"]
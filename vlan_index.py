@@ -0,0 +1,164 @@
+import re
+from typing import Any, Dict, Iterator, List, Mapping, Tuple
+import numpy as np
+
+# --- VLAN Index ---
+# Built per cache generation from distributed port groups (parsed into numeric ranges by the collector), the DVS
+# port group lists and the hosts' standard port groups. Each port group is one entry with its VLAN ranges; VM NICs
+# and hosts are attached to the entries they use. Ranges are kept as start/end arrays, so "what carries VLAN 220"
+# is one vectorized comparison, and a per-VLAN count of carrying port groups (a difference array over 0..4095)
+# answers coverage queries for whole ranges at once.
+VLAN_COUNT = 4096
+STANDARD_TRUNK_VLAN = 4095  # a standard port group with VLAN 4095 passes every VLAN to the guest (VGT)
+_TRUNK_RE = re.compile(r"^Trunk \((?P<ranges>.*)\)$")
+_PVLAN_RE = re.compile(r"^Private VLAN \(Primary: (?P<id>\d+)\)$")
+VLAN_SOURCE_FIELDS = {"VM": {"name", "instance_uuid", "host_name", "network_adapters"}, "Host": {"name", "proxy_switches", "vswitches_standard"}}
+
+def parse_vlan_info(vlan_info: Any) -> Tuple[str, List[List[int]]]:
+    """(mode, ranges) of a port group's vlan_id_info display string, for caches collected before it was stored parsed."""
+    text = str(vlan_info).strip()
+    if text.isdigit(): return ("access" if int(text) else "none"), [[int(text), int(text)]]
+    match = _TRUNK_RE.match(text)
+    if match:
+        ranges = []
+        for part in match["ranges"].split(","):
+            bounds = [b.strip() for b in part.split("-")]
+            if all(b.isdigit() for b in bounds) and len(bounds) in (1, 2): ranges.append([int(bounds[0]), int(bounds[-1])])
+        return "trunk", ranges
+    match = _PVLAN_RE.match(text)
+    if match: return "pvlan", [[int(match["id"]), int(match["id"])]]
+    return "N/A", []
+
+def parse_vlan_range(text: str) -> Tuple[int, int]:
+    """'220' or '100-200' as (start, end). Raises ValueError."""
+    bounds = [b.strip() for b in str(text).split("-")]
+    if len(bounds) not in (1, 2) or not all(b.isdigit() for b in bounds):
+        raise ValueError(text)
+    start, end = int(bounds[0]), int(bounds[-1])
+    if not 0 <= start <= end < VLAN_COUNT: raise ValueError(text)
+    return start, end
+
+def _distributed_vlan(port_group: Dict[str, Any], info_field: str) -> Tuple[str, List[List[int]]]:
+    if port_group.get("vlan_ranges") is not None: return port_group.get("vlan_mode") or "N/A", port_group["vlan_ranges"]
+    return parse_vlan_info(port_group.get(info_field))
+
+def _standard_vlan(vlan_id: Any) -> Tuple[str, List[List[int]]]:
+    if not isinstance(vlan_id, int) or isinstance(vlan_id, bool): return "N/A", []
+    if vlan_id == STANDARD_TRUNK_VLAN: return "trunk", [[0, STANDARD_TRUNK_VLAN - 1]]
+    return ("access" if vlan_id else "none"), [[vlan_id, vlan_id]]
+
+def _iter_hosts(data: Mapping[str, Any]) -> Iterator[Dict[str, Any]]:
+    for dc in (data.get("infrastructure") or {}).get("datacenters", []):
+        for cluster in dc.get("clusters", []): yield from cluster.get("hosts", [])
+        yield from dc.get("standalone_hosts", [])
+
+class VlanIndex:
+    def __init__(self, entries: List[Dict[str, Any]], range_starts: np.ndarray, range_ends: np.ndarray, range_entries: np.ndarray,
+                 carried_count: np.ndarray, hosts_by_dvs: Dict[str, List[str]], vms_by_entry: List[List[Dict[str, Any]]]):
+        self.entries = entries
+        self.range_starts = range_starts
+        self.range_ends = range_ends
+        self.range_entries = range_entries
+        self.carried_count = carried_count  # number of port groups carrying each VLAN id
+        self.hosts_by_dvs = hosts_by_dvs
+        self.vms_by_entry = vms_by_entry
+
+    def _entries_overlapping(self, start: int, end: int) -> List[int]:
+        mask = (self.range_starts <= end) & (self.range_ends >= start)
+        return sorted(set(self.range_entries[mask].tolist()))
+
+    def _entry_hosts(self, entry: Dict[str, Any]) -> List[str]:
+        if entry["kind"] == "standard": return [entry["host_name"]]
+        return self.hosts_by_dvs.get(entry.get("dvswitch_uuid")) or self.hosts_by_dvs.get(entry.get("dvswitch_name")) or []
+
+    def membership(self, vlan_id: int, include_trunks: bool = True) -> Dict[str, Any]:
+        """Port groups carrying vlan_id (access first, then trunks), the hosts they are on and the VM NICs attached to them."""
+        positions = [p for p in self._entries_overlapping(vlan_id, vlan_id) if include_trunks or self.entries[p]["mode"] != "trunk"]
+        positions.sort(key=lambda p: self.entries[p]["mode"] == "trunk")
+        hosts = sorted({host for p in positions for host in self._entry_hosts(self.entries[p])}, key=str)
+        vms = [{**vm, "portgroup": self.entries[p]["name"], "portgroup_mode": self.entries[p]["mode"]} for p in positions for vm in self.vms_by_entry[p]]
+        return {"vlan_id": vlan_id, "portgroups": [{**self.entries[p], "vm_nic_count": len(self.vms_by_entry[p])} for p in positions],
+                "hosts": hosts, "vms": vms}
+
+    def coverage(self, start: int, end: int) -> Dict[str, Any]:
+        """For the VLANs start..end: the trunks carrying all or part of them, and the VLANs no port group carries."""
+        trunks = []
+        for p in self._entries_overlapping(start, end):
+            entry = self.entries[p]
+            if entry["mode"] != "trunk": continue
+            covered = sum(max(0, min(e, end) - max(s, start) + 1) for s, e in entry["vlan_ranges"])
+            trunks.append({**entry, "covered_vlans": covered, "covers_all": covered == end - start + 1})
+        trunks.sort(key=lambda t: -t["covered_vlans"])
+        uncarried = np.flatnonzero(self.carried_count[start:end + 1] == 0) + start
+        return {"start": start, "end": end, "vlan_count": end - start + 1, "carried_vlans": int(end - start + 1 - len(uncarried)),
+                "uncarried_vlans": _compress(uncarried.tolist()), "trunks": trunks}
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """VLANs used by access port groups, with their number of port groups and attached VM NICs."""
+        by_vlan: Dict[int, Dict[str, Any]] = {}
+        for position, entry in enumerate(self.entries):
+            if entry["mode"] == "trunk": continue
+            for start, end in entry["vlan_ranges"]:
+                for vlan_id in range(start, end + 1):
+                    item = by_vlan.setdefault(vlan_id, {"vlan_id": vlan_id, "portgroups": 0, "vm_nics": 0})
+                    item["portgroups"] += 1
+                    item["vm_nics"] += len(self.vms_by_entry[position])
+        return [by_vlan[vlan_id] for vlan_id in sorted(by_vlan)]
+
+def _compress(ids: List[int]) -> List[List[int]]:
+    """Sorted VLAN ids as [start, end] runs."""
+    runs: List[List[int]] = []
+    for vlan_id in ids:
+        if runs and runs[-1][1] == vlan_id - 1: runs[-1][1] = vlan_id
+        else: runs.append([vlan_id, vlan_id])
+    return runs
+
+def build_vlan_index(data: Mapping[str, Any]) -> VlanIndex:
+    entries: List[Dict[str, Any]] = []
+    distributed_by_key: Dict[str, int] = {}
+    standard_by_host: Dict[Tuple[Any, Any], int] = {}
+    for port_group in (data.get("global_networks") or {}).get("distributed_port_groups", []):
+        if port_group.get("key") in distributed_by_key: continue
+        mode, ranges = _distributed_vlan(port_group, "vlan_id_info")
+        distributed_by_key[port_group.get("key")] = len(entries)
+        entries.append({"kind": "distributed", "name": port_group.get("name"), "key": port_group.get("key"), "dvswitch_name": port_group.get("dvswitch_name"),
+                        "dvswitch_uuid": port_group.get("dvswitch_uuid"), "mode": mode, "vlan_ranges": ranges})
+    for dvs in data.get("distributed_virtual_switches") or []:
+        for port_group in dvs.get("port_groups") or []:
+            if port_group.get("key") in distributed_by_key: continue  # already known from the network section
+            mode, ranges = _distributed_vlan(port_group, "vlan_info")
+            distributed_by_key[port_group.get("key")] = len(entries)
+            entries.append({"kind": "distributed", "name": port_group.get("name"), "key": port_group.get("key"), "dvswitch_name": dvs.get("name"),
+                            "dvswitch_uuid": dvs.get("uuid"), "mode": mode, "vlan_ranges": ranges})
+    hosts_by_dvs: Dict[str, List[str]] = {}
+    for host in _iter_hosts(data):
+        for proxy in host.get("proxy_switches") or []:
+            for dvs_id in {proxy.get("dvs_uuid"), proxy.get("dvs_name")} - {None, "N/A"}:
+                hosts_by_dvs.setdefault(dvs_id, []).append(host.get("name"))
+        for vswitch in host.get("vswitches_standard") or []:
+            for port_group in vswitch.get("portgroup_details_on_vswitch") or []:
+                if (host.get("name"), port_group.get("name")) in standard_by_host or "vlan_id" not in port_group: continue
+                mode, ranges = _standard_vlan(port_group.get("vlan_id"))
+                standard_by_host[(host.get("name"), port_group.get("name"))] = len(entries)
+                entries.append({"kind": "standard", "name": port_group.get("name"), "host_name": host.get("name"),
+                                "vswitch_name": port_group.get("vswitch_name") or vswitch.get("name"), "mode": mode, "vlan_ranges": ranges})
+
+    vms_by_entry: List[List[Dict[str, Any]]] = [[] for _ in entries]
+    for vm in data.get("vms") or []:
+        for nic in vm.get("network_adapters") or []:
+            if nic.get("portgroup_key_if_dvs") not in (None, "N/A"): position = distributed_by_key.get(nic["portgroup_key_if_dvs"])
+            else: position = standard_by_host.get((vm.get("host_name"), nic.get("network_name")))
+            if position is None: continue
+            vms_by_entry[position].append({"name": vm.get("name"), "instance_uuid": vm.get("instance_uuid"), "host_name": vm.get("host_name"),
+                                           "adapter": nic.get("label"), "mac_address": nic.get("mac_address")})
+
+    range_starts, range_ends, range_entries = [], [], []
+    for position, entry in enumerate(entries):
+        for start, end in entry["vlan_ranges"]:
+            range_starts.append(start); range_ends.append(end); range_entries.append(position)
+    starts, ends = np.array(range_starts, dtype=np.int64), np.array(range_ends, dtype=np.int64)
+    delta = np.zeros(VLAN_COUNT + 1, dtype=np.int64)
+    valid = (starts >= 0) & (ends < VLAN_COUNT) & (starts <= ends)
+    np.add.at(delta, starts[valid], 1)
+    np.add.at(delta, ends[valid] + 1, -1)
+    return VlanIndex(entries, starts, ends, np.array(range_entries, dtype=np.int64), np.cumsum(delta)[:VLAN_COUNT], hosts_by_dvs, vms_by_entry)
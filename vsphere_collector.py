@@ -7,7 +7,72 @@ from pyVmomi import vim, vmodl
 import traceback
 from datetime import datetime
 import json
+import re
 import socket 
+import threading
+import time
+
+# --- Collection Control ---
+# Time budgets and cooperative cancellation. Collection loops call collection_interrupted() between objects and stop
+# early; the phase is then reported as truncated and its partial data is not installed. A vCenter that stops answering
+# in the middle of a call is bounded by the HTTP timeout of the session instead.
+COLLECTION_TIMEOUT_S = float(os.getenv("VLENS_COLLECTION_TIMEOUT_S", "3600"))  # 0 disables the budget
+PHASE_TIMEOUT_S = float(os.getenv("VLENS_PHASE_TIMEOUT_S", "1800"))
+# Per-phase overrides, e.g. "vms=2400,distributed_virtual_switches=300".
+PHASE_TIMEOUTS = {name.strip(): float(value) for name, value in
+                  (item.split("=", 1) for item in os.getenv("VLENS_PHASE_TIMEOUTS", "").split(",") if "=" in item)}
+VCENTER_HTTP_TIMEOUT_S = float(os.getenv("VLENS_VCENTER_HTTP_TIMEOUT_S", "300"))
+_active_collection = threading.local()
+
+class CollectionControl:
+    """Shared between a collection thread and whoever may cancel it."""
+    def __init__(self, collection_timeout_s=None, phase_timeouts=None):
+        self.cancel_event = threading.Event()
+        self.collection_timeout_s = COLLECTION_TIMEOUT_S if collection_timeout_s is None else collection_timeout_s
+        self.phase_timeouts = {**PHASE_TIMEOUTS, **(phase_timeouts or {})}
+        self.started = time.monotonic()
+        self.phase = None
+        self.phase_deadline = None
+        self.phase_interruption = None  # reason the current phase stopped early
+        self.phase_errors = []
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def start_phase(self, phase):
+        timeout = self.phase_timeouts.get(phase, PHASE_TIMEOUT_S)
+        self.phase, self.phase_deadline = phase, (time.monotonic() + timeout if timeout > 0 else None)
+        self.phase_interruption, self.phase_errors = None, []
+
+    def interruption(self):
+        """'cancelled', 'collection_timeout', 'phase_timeout' or None."""
+        if self.cancel_event.is_set(): return "cancelled"
+        now = time.monotonic()
+        if self.collection_timeout_s > 0 and now - self.started > self.collection_timeout_s: return "collection_timeout"
+        if self.phase_deadline is not None and now > self.phase_deadline: return "phase_timeout"
+        return None
+
+def collection_interrupted():
+    """True when the collection running on this thread must stop; the reason is recorded on its phase."""
+    control = getattr(_active_collection, "control", None)
+    if control is None: return False
+    reason = control.interruption()
+    if reason and not control.phase_interruption: control.phase_interruption = reason
+    return reason is not None
+
+def _collector_error(label, e):
+    """Logs an error swallowed by a collection phase and records it, so the phase is not reported as complete."""
+    print(f"Collector Error ({label}): {e.__class__.__name__} - {e}")
+    control = getattr(_active_collection, "control", None)
+    if control is not None: control.phase_errors.append(f"{label}: {e.__class__.__name__} - {e}")
+
+def collection_outcome(meta):
+    """(status, details) of a collection result: Success, Partial (some phases truncated or failed) or Cancelled,
+    and a summary of the incomplete phases ('' when there are none)."""
+    incomplete = {name: phase for name, phase in (meta.get("phases") or {}).items() if phase["status"] != "completed"}
+    details = ", ".join(f"{name} {phase['status']}" + (f" ({phase['reason']})" if phase.get("reason") else "") for name, phase in incomplete.items())
+    if meta.get("cancelled"): return "Cancelled", details
+    return ("Partial" if incomplete else "Success"), details
 
 # Helper function to safely get attributes
 def safe_get(obj, attr_path, default='N/A'):
@@ -38,10 +103,21 @@ def get_vcenter_details(content):
         "instanceUuid": safe_get(about, 'instanceUuid')
     }
 
-def _get_custom_attributes_for_object(obj_mor, custom_field_defs_map):
+def _prefetch_custom_values(content, obj_type):
+    """Fetches customValue of every object of obj_type with one PropertyCollector retrieval, keyed by str(mor).
+    Returns None if the retrieval fails, so callers fall back to reading each object's property."""
+    try:
+        return {str(mor): props.get("customValue") or [] for mor, props in _retrieve_properties(content, [obj_type], ["customValue"])}
+    except Exception as e:
+        print(f"Warning: bulk custom attribute retrieval for {obj_type.__name__} failed, reading them per object: {e}")
+        return None
+
+def _get_custom_attributes_for_object(obj_mor, custom_field_defs_map, custom_values=None):
     attributes = {}
     custom_values_list = None
-    if hasattr(obj_mor, 'summary') and hasattr(obj_mor.summary, 'customValue') and obj_mor.summary.customValue is not None:
+    if custom_values is not None and str(obj_mor) in custom_values:
+        custom_values_list = custom_values[str(obj_mor)]
+    elif hasattr(obj_mor, 'summary') and hasattr(obj_mor.summary, 'customValue') and obj_mor.summary.customValue is not None:
         custom_values_list = obj_mor.summary.customValue
     elif hasattr(obj_mor, 'customValue') and obj_mor.customValue is not None:
         custom_values_list = obj_mor.customValue
@@ -179,106 +255,150 @@ def _get_host_storage_details(host_mor):
             except Exception as e: print(f"Warning: iSCSI binding query error for {sw_iscsi_hba_dev} on {host_mor.name}: {type(e).__name__}")
     return host_storage_info
 
-def get_infrastructure_overview(content, custom_field_defs_map):
-    infra_data = {"datacenters": []}
-    dc_view = None
+def _get_host_details(host_mor, custom_field_defs_map, include_network=True, include_storage=True, custom_values=None):
+    summary, hardware, config, runtime = safe_get(host_mor, 'summary'), safe_get(host_mor, 'summary.hardware'), safe_get(host_mor, 'summary.config'), safe_get(host_mor, 'summary.runtime')
+    boot_time_obj = safe_get(runtime, 'bootTime', None)
+    host_details = {"name": safe_get(config, 'name'), "mor_id": str(host_mor), "status": safe_get(summary, 'overallStatus'), "power_state": safe_get(runtime, 'powerState'),
+                    "connection_state": safe_get(runtime, 'connectionState'), "maintenance_mode": safe_get(runtime, 'inMaintenanceMode', False),
+                    "boot_time": boot_time_obj.strftime("%Y-%m-%d %H:%M:%S %Z") if isinstance(boot_time_obj, datetime) else 'N/A',
+                    "version_full": safe_get(config, 'product.fullName'), "version_build": safe_get(config, 'product.build'),
+                    "api_version": safe_get(config, 'product.apiVersion'), "vendor": safe_get(hardware, 'vendor'), "model": safe_get(hardware, 'model'),
+                    "uuid_bios": safe_get(hardware, 'uuid'), "cpu_model": safe_get(hardware, 'cpuModel'), "cpu_sockets": safe_get(hardware, 'numCpuPkgs', 0),
+                    "cpu_total_cores": safe_get(hardware, 'numCpuCores', 0), "cpu_threads": safe_get(hardware, 'numCpuThreads', 0),
+                    "cpu_mhz": safe_get(hardware, 'cpuMhz', 0), "memory_gb": round(safe_get(hardware, 'memorySize', 0) / (1024**3), 2)}
+    host_details["cpu_cores_per_socket"] = host_details["cpu_total_cores"] // host_details["cpu_sockets"] if host_details["cpu_sockets"] > 0 else 0
+    if include_network: host_details.update(_get_host_network_details(host_mor))
+    if include_storage: host_details["storage_configuration"] = _get_host_storage_details(host_mor)
+    host_details["custom_attributes"] = _get_custom_attributes_for_object(host_mor, custom_field_defs_map, custom_values)
+    return host_details
+
+def _container_view_objects(content, container, obj_types, recursive=True):
+    view = None
     try:
-        dc_view = content.viewManager.CreateContainerView(content.rootFolder, [vim.Datacenter], False)
-        for dc_mor in dc_view.view:
-            dc_data = {"name": safe_get(dc_mor, 'name'), "overallStatus": safe_get(dc_mor, 'overallStatus'), "clusters": [], "standalone_hosts": []}
-            cluster_view = None
-            try:
-                cluster_view = content.viewManager.CreateContainerView(dc_mor.hostFolder, [vim.ClusterComputeResource], False)
-                cluster_mors = list(cluster_view.view)
-            finally:
-                if cluster_view: cluster_view.Destroy()
-            for cluster_mor in cluster_mors:
-                cluster_details = {"name": safe_get(cluster_mor, 'name'), "overallStatus": safe_get(cluster_mor, 'overallStatus'), "hosts": []}
-                ha_cfg, drs_cfg = safe_get(cluster_mor, 'configurationEx.dasConfig'), safe_get(cluster_mor, 'configurationEx.drsConfig')
-                cluster_details["ha_enabled"] = safe_get(ha_cfg, 'enabled', False) if ha_cfg else 'N/A'
-                cluster_details["ha_admission_control"] = safe_get(ha_cfg, 'admissionControlEnabled', 'N/A') if ha_cfg and cluster_details["ha_enabled"] else 'N/A'
-                cluster_details["ha_vm_restart_priority"] = safe_get(ha_cfg, 'defaultVmSettings.restartPriority', 'N/A') if ha_cfg and cluster_details["ha_enabled"] else 'N/A'
-                cluster_details["drs_enabled"] = safe_get(drs_cfg, 'enabled', False) if drs_cfg else 'N/A'
-                cluster_details["drs_behavior"] = safe_get(drs_cfg, 'defaultVmBehavior', 'N/A') if drs_cfg and cluster_details["drs_enabled"] else 'N/A'
-                if cluster_mor.host:
-                    for host_mor in cluster_mor.host:
-                        summary, hardware, config, runtime = safe_get(host_mor, 'summary'), safe_get(host_mor, 'summary.hardware'), safe_get(host_mor, 'summary.config'), safe_get(host_mor, 'summary.runtime')
-                        boot_time_obj = safe_get(runtime, 'bootTime', None)
-                        host_details = {"name": safe_get(config, 'name'), "status": safe_get(summary, 'overallStatus'), "power_state": safe_get(runtime, 'powerState'),
-                                        "connection_state": safe_get(runtime, 'connectionState'), "maintenance_mode": safe_get(runtime, 'inMaintenanceMode', False),
-                                        "boot_time": boot_time_obj.strftime("%Y-%m-%d %H:%M:%S %Z") if isinstance(boot_time_obj, datetime) else 'N/A',
-                                        "version_full": safe_get(config, 'product.fullName'), "version_build": safe_get(config, 'product.build'),
-                                        "api_version": safe_get(config, 'product.apiVersion'), "vendor": safe_get(hardware, 'vendor'), "model": safe_get(hardware, 'model'),
-                                        "uuid_bios": safe_get(hardware, 'uuid'), "cpu_model": safe_get(hardware, 'cpuModel'), "cpu_sockets": safe_get(hardware, 'numCpuPkgs', 0),
-                                        "cpu_total_cores": safe_get(hardware, 'numCpuCores', 0), "cpu_threads": safe_get(hardware, 'numCpuThreads', 0),
-                                        "cpu_mhz": safe_get(hardware, 'cpuMhz', 0), "memory_gb": round(safe_get(hardware, 'memorySize', 0) / (1024**3), 2)}
-                        host_details["cpu_cores_per_socket"] = host_details["cpu_total_cores"] // host_details["cpu_sockets"] if host_details["cpu_sockets"] > 0 else 0
-                        host_details.update(_get_host_network_details(host_mor))
-                        host_details["storage_configuration"] = _get_host_storage_details(host_mor)
-                        host_details["custom_attributes"] = _get_custom_attributes_for_object(host_mor, custom_field_defs_map)
-                        cluster_details["hosts"].append(host_details)
-                dc_data["clusters"].append(cluster_details)
-            standalone_host_view = None
-            try:
-                standalone_host_view = content.viewManager.CreateContainerView(dc_mor.hostFolder, [vim.HostSystem], True)
-                cluster_host_mors = {h for c in cluster_mors for h in (c.host or [])}
-                for host_mor in standalone_host_view.view:
-                    if host_mor not in cluster_host_mors:
-                        summary, hardware, config, runtime = safe_get(host_mor, 'summary'), safe_get(host_mor, 'summary.hardware'), safe_get(host_mor, 'summary.config'), safe_get(host_mor, 'summary.runtime')
-                        boot_time_obj = safe_get(runtime, 'bootTime', None)
-                        host_details = {"name": safe_get(config, 'name'), "status": safe_get(summary, 'overallStatus'), "power_state": safe_get(runtime, 'powerState'),
-                                        "connection_state": safe_get(runtime, 'connectionState'), "maintenance_mode": safe_get(runtime, 'inMaintenanceMode', False),
-                                        "boot_time": boot_time_obj.strftime("%Y-%m-%d %H:%M:%S %Z") if isinstance(boot_time_obj, datetime) else 'N/A',
-                                        "version_full": safe_get(config, 'product.fullName'), "version_build": safe_get(config, 'product.build'),
-                                        "api_version": safe_get(config, 'product.apiVersion'), "vendor": safe_get(hardware, 'vendor'), "model": safe_get(hardware, 'model'),
-                                        "uuid_bios": safe_get(hardware, 'uuid'), "cpu_model": safe_get(hardware, 'cpuModel'), "cpu_sockets": safe_get(hardware, 'numCpuPkgs', 0),
-                                        "cpu_total_cores": safe_get(hardware, 'numCpuCores', 0), "cpu_threads": safe_get(hardware, 'numCpuThreads', 0),
-                                        "cpu_mhz": safe_get(hardware, 'cpuMhz', 0), "memory_gb": round(safe_get(hardware, 'memorySize', 0) / (1024**3), 2)}
-                        host_details["cpu_cores_per_socket"] = host_details["cpu_total_cores"] // host_details["cpu_sockets"] if host_details["cpu_sockets"] > 0 else 0
-                        host_details.update(_get_host_network_details(host_mor))
-                        host_details["storage_configuration"] = _get_host_storage_details(host_mor)
-                        host_details["custom_attributes"] = _get_custom_attributes_for_object(host_mor, custom_field_defs_map)
-                        dc_data["standalone_hosts"].append(host_details)
-            finally:
-                if standalone_host_view: standalone_host_view.Destroy()
-            infra_data["datacenters"].append(dc_data)
+        view = content.viewManager.CreateContainerView(container, obj_types, recursive)
+        return list(view.view)
     finally:
-        if dc_view: dc_view.Destroy()
+        if view: view.Destroy()
+
+def resolve_collection_scope(content, datacenters=None, clusters=None):
+    """Resolves datacenter/cluster names into [(dc_mor, cluster_mors or None)]. None means the whole inventory."""
+    if not datacenters and not clusters: return None
+    scope = []
+    for dc_mor in _container_view_objects(content, content.rootFolder, [vim.Datacenter], False):
+        if datacenters and safe_get(dc_mor, 'name') not in datacenters: continue
+        if clusters:
+            cluster_mors = [c for c in _container_view_objects(content, dc_mor.hostFolder, [vim.ClusterComputeResource], False)
+                            if safe_get(c, 'name') in clusters]
+            if cluster_mors: scope.append((dc_mor, cluster_mors))
+        else: scope.append((dc_mor, None))
+    if not scope: print(f"Warning: collection scope (datacenters={datacenters}, clusters={clusters}) matched no inventory objects.")
+    return scope
+
+def _iter_scoped_objects(content, obj_types, scope, dc_folder_attr):
+    """Yields (mor, datacenter_name, cluster_name) for every object of obj_types inside the scope.
+    Objects under a cluster are tagged with it; the rest of the datacenter folder is tagged 'N/A'."""
+    if scope is None:
+        scope = [(dc_mor, None) for dc_mor in _container_view_objects(content, content.rootFolder, [vim.Datacenter], False)]
+    for dc_mor, scoped_clusters in scope:
+        dc_name = safe_get(dc_mor, 'name')
+        cluster_mors = scoped_clusters if scoped_clusters is not None else _container_view_objects(content, dc_mor.hostFolder, [vim.ClusterComputeResource], False)
+        seen = set()
+        for cluster_mor in cluster_mors:
+            cluster_name = safe_get(cluster_mor, 'name')
+            for mor in _container_view_objects(content, cluster_mor, obj_types):
+                seen.add(mor)
+                yield mor, dc_name, cluster_name
+        if scoped_clusters is None:
+            for mor in _container_view_objects(content, getattr(dc_mor, dc_folder_attr), obj_types):
+                if mor not in seen: yield mor, dc_name, 'N/A'
+
+def get_infrastructure_overview(content, custom_field_defs_map, scope=None, include_host_network=True, include_host_storage=True):
+    infra_data = {"datacenters": []}
+    host_custom_values = _prefetch_custom_values(content, vim.HostSystem)
+    if scope is None:
+        scope = [(dc_mor, None) for dc_mor in _container_view_objects(content, content.rootFolder, [vim.Datacenter], False)]
+    for dc_mor, scoped_clusters in scope:
+        dc_data = {"name": safe_get(dc_mor, 'name'), "overallStatus": safe_get(dc_mor, 'overallStatus'), "clusters": [], "standalone_hosts": []}
+        cluster_mors = scoped_clusters if scoped_clusters is not None else _container_view_objects(content, dc_mor.hostFolder, [vim.ClusterComputeResource], False)
+        for cluster_mor in cluster_mors:
+            cluster_details = {"name": safe_get(cluster_mor, 'name'), "overallStatus": safe_get(cluster_mor, 'overallStatus'), "hosts": []}
+            ha_cfg, drs_cfg = safe_get(cluster_mor, 'configurationEx.dasConfig'), safe_get(cluster_mor, 'configurationEx.drsConfig')
+            cluster_details["ha_enabled"] = safe_get(ha_cfg, 'enabled', False) if ha_cfg else 'N/A'
+            cluster_details["ha_admission_control"] = safe_get(ha_cfg, 'admissionControlEnabled', 'N/A') if ha_cfg and cluster_details["ha_enabled"] else 'N/A'
+            cluster_details["ha_vm_restart_priority"] = safe_get(ha_cfg, 'defaultVmSettings.restartPriority', 'N/A') if ha_cfg and cluster_details["ha_enabled"] else 'N/A'
+            cluster_details["drs_enabled"] = safe_get(drs_cfg, 'enabled', False) if drs_cfg else 'N/A'
+            cluster_details["drs_behavior"] = safe_get(drs_cfg, 'defaultVmBehavior', 'N/A') if drs_cfg and cluster_details["drs_enabled"] else 'N/A'
+            if cluster_mor.host:
+                for host_mor in cluster_mor.host:
+                    if collection_interrupted(): return infra_data
+                    cluster_details["hosts"].append(_get_host_details(host_mor, custom_field_defs_map, include_host_network, include_host_storage, host_custom_values))
+            dc_data["clusters"].append(cluster_details)
+        if scoped_clusters is None:
+            cluster_host_mors = {h for c in cluster_mors for h in (c.host or [])}
+            for host_mor in _container_view_objects(content, dc_mor.hostFolder, [vim.HostSystem], True):
+                if collection_interrupted(): return infra_data
+                if host_mor not in cluster_host_mors:
+                    dc_data["standalone_hosts"].append(_get_host_details(host_mor, custom_field_defs_map, include_host_network, include_host_storage, host_custom_values))
+        infra_data["datacenters"].append(dc_data)
     return infra_data
 
-def get_datastore_info(content):
+def _iter_scoped_datastores(content, scope):
+    if scope is None:
+        scope = [(dc_mor, None) for dc_mor in _container_view_objects(content, content.rootFolder, [vim.Datacenter], False)]
+    for dc_mor, scoped_clusters in scope:
+        if scoped_clusters is None: ds_mors = _container_view_objects(content, dc_mor.datastoreFolder, [vim.Datastore])
+        else: ds_mors = list(dict.fromkeys(ds for c in scoped_clusters for ds in (c.datastore or [])))
+        for ds_mor in ds_mors: yield ds_mor, safe_get(dc_mor, 'name')
+
+def _get_datastore_details(ds_mor, dc_name='N/A'):
+    summary = ds_mor.summary
+    ds_details = {"name": safe_get(summary, 'name'), "uuid": safe_get(summary, 'datastore.value') if safe_get(summary, 'datastore') else 'N/A', "mor_id": str(ds_mor),
+                  "type": safe_get(summary, 'type'), "capacity_gb": round(safe_get(summary, 'capacity', 0) / (1024**3), 2),
+                  "free_space_gb": round(safe_get(summary, 'freeSpace', 0) / (1024**3), 2),
+                  "accessible": safe_get(summary, 'accessible', False), "url": safe_get(summary, 'url'),
+                  "maintenance_mode": safe_get(summary, 'maintenanceMode'), "mounted_on_hosts": [], "datacenter_name": dc_name}
+    uncommitted = safe_get(summary, 'uncommitted', None)
+    if uncommitted is not None:
+        uncommitted_gb = round(uncommitted / (1024**3), 2)
+        ds_details["uncommitted_gb"] = uncommitted_gb
+        ds_details["provisioned_gb"] = round(ds_details["capacity_gb"] - ds_details["free_space_gb"] + uncommitted_gb, 2)
+    else: ds_details["used_space_gb"] = round(ds_details["capacity_gb"] - ds_details["free_space_gb"], 2)
+    capability = safe_get(ds_mor, 'capability', None)
+    if capability: ds_details["storage_io_control"] = 'Enabled' if getattr(capability, 'storageIORMEnabled', None) else ('Disabled' if getattr(capability, 'storageIORMEnabled', None) is False else 'N/A')
+    if ds_details["type"] == "VMFS":
+        ds_details["vmfs_extents"] = [safe_get(extent, 'diskName') for extent in safe_get(ds_mor, 'info.vmfs.extent', None) or []]
+    if ds_mor.host:
+        for mount_info in ds_mor.host:
+            host_mor = mount_info.key
+            ds_details["mounted_on_hosts"].append({
+                "host_name": safe_get(host_mor, 'name', 'N/A (MOR only)'), "host_mor_id": str(host_mor),
+                "mount_path": safe_get(mount_info, 'mountInfo.path'), "access_mode": "readWrite" if safe_get(mount_info, 'mountInfo.accessMode') == "readWrite" else "readOnly",
+                "accessible_on_host": safe_get(mount_info, 'mountInfo.accessible', False), "mounted_on_host": safe_get(mount_info, 'mountInfo.mounted', False)})
+    return ds_details
+
+def get_datastore_info(content, scope=None):
     datastores_data = []
-    ds_view = None
     try:
-        ds_view = content.viewManager.CreateContainerView(content.rootFolder, [vim.Datastore], True)
-        for ds_mor in ds_view.view:
-            summary = ds_mor.summary
-            ds_details = {"name": safe_get(summary, 'name'), "uuid": safe_get(summary, 'datastore.value') if safe_get(summary, 'datastore') else 'N/A',
-                          "type": safe_get(summary, 'type'), "capacity_gb": round(safe_get(summary, 'capacity', 0) / (1024**3), 2),
-                          "free_space_gb": round(safe_get(summary, 'freeSpace', 0) / (1024**3), 2),
-                          "accessible": safe_get(summary, 'accessible', False), "url": safe_get(summary, 'url'),
-                          "maintenance_mode": safe_get(summary, 'maintenanceMode'), "mounted_on_hosts": []}
-            uncommitted = safe_get(summary, 'uncommitted', None)
-            if uncommitted is not None:
-                uncommitted_gb = round(uncommitted / (1024**3), 2)
-                ds_details["uncommitted_gb"] = uncommitted_gb
-                ds_details["provisioned_gb"] = round(ds_details["capacity_gb"] - ds_details["free_space_gb"] + uncommitted_gb, 2)
-            else: ds_details["used_space_gb"] = round(ds_details["capacity_gb"] - ds_details["free_space_gb"], 2)
-            capability = safe_get(ds_mor, 'capability', None)
-            if capability: ds_details["storage_io_control"] = 'Enabled' if getattr(capability, 'storageIORMEnabled', None) else ('Disabled' if getattr(capability, 'storageIORMEnabled', None) is False else 'N/A')
-            if ds_mor.host:
-                for mount_info in ds_mor.host:
-                    host_mor = mount_info.key
-                    ds_details["mounted_on_hosts"].append({
-                        "host_name": safe_get(host_mor, 'name', 'N/A (MOR only)'), "host_mor_id": str(host_mor),
-                        "mount_path": safe_get(mount_info, 'mountInfo.path'), "access_mode": "readWrite" if safe_get(mount_info, 'mountInfo.accessMode') == "readWrite" else "readOnly",
-                        "accessible_on_host": safe_get(mount_info, 'mountInfo.accessible', False), "mounted_on_host": safe_get(mount_info, 'mountInfo.mounted', False)})
-            datastores_data.append(ds_details)
-    except Exception as e: print(f"Collector Error (Datastores): {e.__class__.__name__} - {e}")
-    finally:
-        if ds_view: ds_view.Destroy()
+        for ds_mor, dc_name in _iter_scoped_datastores(content, scope):
+            if collection_interrupted(): break
+            datastores_data.append(_get_datastore_details(ds_mor, dc_name))
+    except Exception as e: _collector_error("Datastores", e)
     return datastores_data
 
+def _dvs_vlan_details(vlan_setting):
+    """(display string, mode, numeric [start, end] ranges) of a distributed port group VLAN setting."""
+    if isinstance(vlan_setting, vim.dvs.VmwareDistributedVirtualSwitch.VlanIdSpec):
+        vlan_id = safe_get(vlan_setting, 'vlanId', None)
+        if not isinstance(vlan_id, int): return "N/A", "N/A", []
+        return str(vlan_id), "access" if vlan_id else "none", [[vlan_id, vlan_id]]
+    if isinstance(vlan_setting, vim.dvs.VmwareDistributedVirtualSwitch.TrunkVlanSpec):
+        ranges = [[item.start, item.end] for item in safe_get(vlan_setting, 'vlanId', []) if hasattr(item, 'start')]
+        return f"Trunk ({', '.join(f'{start}-{end}' for start, end in ranges)})", "trunk", ranges
+    if isinstance(vlan_setting, vim.dvs.VmwareDistributedVirtualSwitch.PvlanSpec):
+        pvlan_id = safe_get(vlan_setting, 'pvlanId', 'N/A')
+        return f"Private VLAN (Primary: {pvlan_id})", "pvlan", [[pvlan_id, pvlan_id]] if isinstance(pvlan_id, int) else []
+    return "N/A", "N/A", []
+
 def get_network_info(content):
     network_data = {"standard_port_groups_summary": [], "distributed_port_groups": []}
     std_pg_view = None
@@ -287,6 +407,7 @@ def get_network_info(content):
         std_pg_view = content.viewManager.CreateContainerView(content.rootFolder, [vim.Network], True)
         unique_std_pg_names = set()
         for pg_mor in std_pg_view.view:
+            if collection_interrupted(): return network_data
             if isinstance(pg_mor, vim.dvs.DistributedVirtualPortgroup): continue
             pg_name = safe_get(pg_mor, 'name')
             if pg_name not in unique_std_pg_names and pg_name != 'N/A':
@@ -295,14 +416,9 @@ def get_network_info(content):
 
         dv_pg_view = content.viewManager.CreateContainerView(content.rootFolder, [vim.dvs.DistributedVirtualPortgroup], True)
         for dv_pg_mor in dv_pg_view.view:
+            if collection_interrupted(): break
             config, port_config = safe_get(dv_pg_mor, 'config'), safe_get(dv_pg_mor, 'config.defaultPortConfig')
-            vlan_setting = safe_get(port_config, 'vlan')
-            vlan_info = "N/A"
-            if isinstance(vlan_setting, vim.dvs.VmwareDistributedVirtualSwitch.VlanIdSpec): vlan_info = str(safe_get(vlan_setting, 'vlanId', 'N/A'))
-            elif isinstance(vlan_setting, vim.dvs.VmwareDistributedVirtualSwitch.TrunkVlanSpec):
-                ranges = [f"{item.start}-{item.end}" for item in safe_get(vlan_setting, 'vlanId', []) if hasattr(item, 'start')]
-                vlan_info = f"Trunk ({', '.join(ranges)})"
-            elif isinstance(vlan_setting, vim.dvs.VmwareDistributedVirtualSwitch.PvlanSpec): vlan_info = f"Private VLAN (Primary: {safe_get(vlan_setting, 'pvlanId', 'N/A')})"
+            vlan_info, vlan_mode, vlan_ranges = _dvs_vlan_details(safe_get(port_config, 'vlan'))
 
             dvs_mor_from_dpg_config = safe_get(config, 'distributedVirtualSwitch')
             dvs_name, dvs_uuid, dvs_mor_id_str = "N/A", "N/A", "N/A"
@@ -314,102 +430,116 @@ def get_network_info(content):
             network_data["distributed_port_groups"].append({
                 "name": safe_get(dv_pg_mor, 'name'), "key": safe_get(dv_pg_mor, 'key'), "type": "Distributed Port Group",
                 "dvswitch_name": dvs_name, "dvswitch_uuid": dvs_uuid, "dvswitch_mor_id": dvs_mor_id_str,
-                "vlan_id_info": vlan_info, "ports_configured": safe_get(config, 'numPorts', 'N/A'), "description": safe_get(config, 'description')})
-    except Exception as e: print(f"Collector Error (Networks - get_network_info): {e.__class__.__name__} - {e}") # Clarified error source
+                "vlan_id_info": vlan_info, "vlan_mode": vlan_mode, "vlan_ranges": vlan_ranges, "ports_configured": safe_get(config, 'numPorts', 'N/A'), "description": safe_get(config, 'description')})
+    except Exception as e: _collector_error("Networks - get_network_info", e)
     finally:
         if std_pg_view: std_pg_view.Destroy()
         if dv_pg_view: dv_pg_view.Destroy()
     return network_data
 
-def get_vm_info(content, custom_field_defs_map):
+def _get_vm_details(vm_mor, custom_field_defs_map, dc_name='N/A', cluster_name='N/A', custom_values=None):
+    config = safe_get(vm_mor, 'config', None)
+    if safe_get(config, 'template', False): return None
+    summary, guest, runtime, hardware, files = safe_get(vm_mor, 'summary'), safe_get(vm_mor, 'guest'), safe_get(vm_mor, 'runtime'), safe_get(config, 'hardware'), safe_get(config, 'files')
+    cpu_alloc, mem_alloc = safe_get(config, 'cpuAllocation'), safe_get(config, 'memoryAllocation')
+    boot_time_obj = safe_get(runtime, 'bootTime', None)
+    vm_details = {
+        "name": safe_get(config, 'name'), "instance_uuid": safe_get(config, 'instanceUuid'), "mor_id": str(vm_mor),
+        "bios_uuid": safe_get(config, 'uuid'), "vmx_path": safe_get(files, 'vmPathName'),
+        "guest_os_full": safe_get(config, 'guestFullName'), "guest_os_id": safe_get(config, 'guestId'),
+        "vm_version": safe_get(config, 'version'), "tools_status": safe_get(guest, 'toolsStatus'),
+        "tools_version": safe_get(guest, 'toolsVersion'), "tools_running": safe_get(guest, 'toolsRunningStatus'),
+        "power_state": safe_get(runtime, 'powerState'),
+        "boot_time": boot_time_obj.strftime("%Y-%m-%d %H:%M:%S %Z") if isinstance(boot_time_obj, datetime) else 'N/A',
+        "host_name": safe_get(runtime, 'host.name') if safe_get(runtime, 'host') else 'N/A',
+        "host_mor_id": str(safe_get(runtime, 'host')) if safe_get(runtime, 'host') else 'N/A',
+        "vcpus": safe_get(hardware, 'numCPU', 0), "cores_per_socket": safe_get(hardware, 'numCoresPerSocket', 0),
+        "ram_mb": safe_get(hardware, 'memoryMB', 0),
+        "cpu_reservation_mhz": safe_get(cpu_alloc, 'reservation', 0) if cpu_alloc else 0,
+        "cpu_limit_mhz": safe_get(cpu_alloc, 'limit', -1) if cpu_alloc else -1,
+        "cpu_shares": safe_get(cpu_alloc, 'shares.shares', 'N/A') if safe_get(cpu_alloc, 'shares') else 'N/A',
+        "cpu_shares_level": safe_get(cpu_alloc, 'shares.level', 'N/A') if safe_get(cpu_alloc, 'shares') else 'N/A',
+        "mem_reservation_mb": safe_get(mem_alloc, 'reservation', 0) if mem_alloc else 0,
+        "mem_limit_mb": safe_get(mem_alloc, 'limit', -1) if mem_alloc else -1,
+        "mem_shares": safe_get(mem_alloc, 'shares.shares', 'N/A') if safe_get(mem_alloc, 'shares') else 'N/A',
+        "mem_shares_level": safe_get(mem_alloc, 'shares.level', 'N/A') if safe_get(mem_alloc, 'shares') else 'N/A',
+        "disks": [], "network_adapters": [],
+        "custom_attributes": _get_custom_attributes_for_object(vm_mor, custom_field_defs_map, custom_values),
+        "datacenter_name": dc_name, "cluster_name": cluster_name
+    }
+    guest_nics_by_mac = {}
+    if guest and guest.net:
+        for guest_nic in guest.net:
+            if safe_get(guest_nic, 'macAddress'): guest_nics_by_mac.setdefault(guest_nic.macAddress.lower(), guest_nic)
+    if hardware and hardware.device:
+        for dev in hardware.device:
+            if isinstance(dev, vim.vm.device.VirtualDisk):
+                backing, ds_mor, sio = safe_get(dev, 'backing'), safe_get(dev, 'backing.datastore'), safe_get(dev, 'storageIOAllocation')
+                vm_details["disks"].append({"key": safe_get(dev, 'key'), "controller_key": safe_get(dev, 'controllerKey'),
+                                            "label": safe_get(dev, 'deviceInfo.label'), "summary": safe_get(dev, 'deviceInfo.summary'),
+                                            "capacity_gb": round(safe_get(dev, 'capacityInKB', 0) / (1024*1024), 2),
+                                            "datastore_name": safe_get(ds_mor, 'name', 'N/A') if ds_mor else 'N/A', "datastore_mor_id": str(ds_mor) if ds_mor else 'N/A',
+                                            "vmdk_path": safe_get(backing, 'fileName'), "disk_mode": safe_get(backing, 'diskMode'),
+                                            "thin_provisioned": safe_get(backing, 'thinProvisioned', None), "write_through": safe_get(backing, 'writeThrough', None),
+                                            "sioc_shares": safe_get(sio, 'shares.shares', 'N/A') if safe_get(sio, 'shares') else 'N/A',
+                                            "sioc_shares_level": safe_get(sio, 'shares.level', 'N/A') if safe_get(sio, 'shares') else 'N/A',
+                                            "sioc_limit_iops": safe_get(sio, 'limit', -1) if sio else -1})
+            elif isinstance(dev, vim.vm.device.VirtualEthernetCard):
+                backing, connectable = safe_get(dev, 'backing'), safe_get(dev, 'connectable')
+                nic = {"key": safe_get(dev, 'key'), "controller_key": safe_get(dev, 'controllerKey'), "label": safe_get(dev, 'deviceInfo.label'),
+                       "adapter_type": dev.__class__.__name__, "mac_address": safe_get(dev, 'macAddress'), "mac_address_type": safe_get(dev, 'addressType'),
+                       "connected": safe_get(connectable, 'connected', False), "connected_at_poweron": safe_get(connectable, 'startConnected', False),
+                       "network_name": "N/A", "portgroup_key_if_dvs": "N/A", "switch_uuid_if_dvs": "N/A", "guest_ips": [], "guest_ip_addresses": []}
+                if isinstance(backing, vim.vm.device.VirtualEthernetCard.NetworkBackingInfo): nic["network_name"] = safe_get(backing, 'deviceName')
+                elif isinstance(backing, vim.vm.device.VirtualEthernetCard.DistributedVirtualPortBackingInfo):
+                    port = safe_get(backing, 'port')
+                    nic["network_name"] = f"DVPort: {safe_get(port, 'portKey')}"
+                    nic["portgroup_key_if_dvs"], nic["switch_uuid_if_dvs"] = safe_get(port, 'portgroupKey'), safe_get(port, 'switchUuid')
+                guest_nic = guest_nics_by_mac.get(str(nic["mac_address"]).lower())
+                if guest_nic is not None:
+                    nic["guest_net_connected"] = safe_get(guest_nic, 'connected', False)
+                    for ip_addr in safe_get(guest_nic, 'ipConfig.ipAddress', None) or []:
+                        address, prefix, state = safe_get(ip_addr, 'ipAddress'), safe_get(ip_addr, 'prefixLength'), safe_get(ip_addr, 'state')
+                        nic["guest_ip_addresses"].append({"address": address, "prefix": prefix, "state": state, "family": "ipv6" if ":" in str(address) else "ipv4"})
+                        nic["guest_ips"].append(f"{address} (Prefix: {prefix}, State: {state})")
+                vm_details["network_adapters"].append(nic)
+    return vm_details
+
+def get_vm_info(content, custom_field_defs_map, scope=None):
     vms_data = []
-    vm_view = None
     try:
-        vm_view = content.viewManager.CreateContainerView(content.rootFolder, [vim.VirtualMachine], True)
-        for vm_mor in vm_view.view:
-            config = safe_get(vm_mor, 'config', None)
-            if safe_get(config, 'template', False): continue
-            summary, guest, runtime, hardware, files = safe_get(vm_mor, 'summary'), safe_get(vm_mor, 'guest'), safe_get(vm_mor, 'runtime'), safe_get(config, 'hardware'), safe_get(config, 'files')
-            cpu_alloc, mem_alloc = safe_get(config, 'cpuAllocation'), safe_get(config, 'memoryAllocation')
-            boot_time_obj = safe_get(runtime, 'bootTime', None)
-            vm_details = {
-                "name": safe_get(config, 'name'), "instance_uuid": safe_get(config, 'instanceUuid'),
-                "bios_uuid": safe_get(config, 'uuid'), "vmx_path": safe_get(files, 'vmPathName'),
-                "guest_os_full": safe_get(config, 'guestFullName'), "guest_os_id": safe_get(config, 'guestId'),
-                "vm_version": safe_get(config, 'version'), "tools_status": safe_get(guest, 'toolsStatus'),
-                "tools_version": safe_get(guest, 'toolsVersion'), "tools_running": safe_get(guest, 'toolsRunningStatus'),
-                "power_state": safe_get(runtime, 'powerState'),
-                "boot_time": boot_time_obj.strftime("%Y-%m-%d %H:%M:%S %Z") if isinstance(boot_time_obj, datetime) else 'N/A',
-                "host_name": safe_get(runtime, 'host.name') if safe_get(runtime, 'host') else 'N/A',
-                "host_mor_id": str(safe_get(runtime, 'host')) if safe_get(runtime, 'host') else 'N/A',
-                "vcpus": safe_get(hardware, 'numCPU', 0), "cores_per_socket": safe_get(hardware, 'numCoresPerSocket', 0),
-                "ram_mb": safe_get(hardware, 'memoryMB', 0),
-                "cpu_reservation_mhz": safe_get(cpu_alloc, 'reservation', 0) if cpu_alloc else 0,
-                "cpu_limit_mhz": safe_get(cpu_alloc, 'limit', -1) if cpu_alloc else -1,
-                "cpu_shares": safe_get(cpu_alloc, 'shares.shares', 'N/A') if safe_get(cpu_alloc, 'shares') else 'N/A',
-                "cpu_shares_level": safe_get(cpu_alloc, 'shares.level', 'N/A') if safe_get(cpu_alloc, 'shares') else 'N/A',
-                "mem_reservation_mb": safe_get(mem_alloc, 'reservation', 0) if mem_alloc else 0,
-                "mem_limit_mb": safe_get(mem_alloc, 'limit', -1) if mem_alloc else -1,
-                "mem_shares": safe_get(mem_alloc, 'shares.shares', 'N/A') if safe_get(mem_alloc, 'shares') else 'N/A',
-                "mem_shares_level": safe_get(mem_alloc, 'shares.level', 'N/A') if safe_get(mem_alloc, 'shares') else 'N/A',
-                "disks": [], "network_adapters": [],
-                "custom_attributes": _get_custom_attributes_for_object(vm_mor, custom_field_defs_map)
-            }
-            if hardware and hardware.device:
-                for dev in hardware.device:
-                    if isinstance(dev, vim.vm.device.VirtualDisk):
-                        backing, ds_mor, sio = safe_get(dev, 'backing'), safe_get(dev, 'backing.datastore'), safe_get(dev, 'storageIOAllocation')
-                        vm_details["disks"].append({"key": safe_get(dev, 'key'), "controller_key": safe_get(dev, 'controllerKey'),
-                                                    "label": safe_get(dev, 'deviceInfo.label'), "summary": safe_get(dev, 'deviceInfo.summary'),
-                                                    "capacity_gb": round(safe_get(dev, 'capacityInKB', 0) / (1024*1024), 2),
-                                                    "datastore_name": safe_get(ds_mor, 'name', 'N/A') if ds_mor else 'N/A', "datastore_mor_id": str(ds_mor) if ds_mor else 'N/A',
-                                                    "vmdk_path": safe_get(backing, 'fileName'), "disk_mode": safe_get(backing, 'diskMode'),
-                                                    "thin_provisioned": safe_get(backing, 'thinProvisioned', None), "write_through": safe_get(backing, 'writeThrough', None),
-                                                    "sioc_shares": safe_get(sio, 'shares.shares', 'N/A') if safe_get(sio, 'shares') else 'N/A',
-                                                    "sioc_shares_level": safe_get(sio, 'shares.level', 'N/A') if safe_get(sio, 'shares') else 'N/A',
-                                                    "sioc_limit_iops": safe_get(sio, 'limit', -1) if sio else -1})
-                    elif isinstance(dev, vim.vm.device.VirtualEthernetCard):
-                        backing, connectable = safe_get(dev, 'backing'), safe_get(dev, 'connectable')
-                        nic = {"key": safe_get(dev, 'key'), "controller_key": safe_get(dev, 'controllerKey'), "label": safe_get(dev, 'deviceInfo.label'),
-                               "adapter_type": dev.__class__.__name__, "mac_address": safe_get(dev, 'macAddress'), "mac_address_type": safe_get(dev, 'addressType'),
-                               "connected": safe_get(connectable, 'connected', False), "connected_at_poweron": safe_get(connectable, 'startConnected', False),
-                               "network_name": "N/A", "portgroup_key_if_dvs": "N/A", "switch_uuid_if_dvs": "N/A", "guest_ips": []}
-                        if isinstance(backing, vim.vm.device.VirtualEthernetCard.NetworkBackingInfo): nic["network_name"] = safe_get(backing, 'deviceName')
-                        elif isinstance(backing, vim.vm.device.VirtualEthernetCard.DistributedVirtualPortBackingInfo):
-                            port = safe_get(backing, 'port')
-                            nic["network_name"] = f"DVPort: {safe_get(port, 'portKey')}"
-                            nic["portgroup_key_if_dvs"], nic["switch_uuid_if_dvs"] = safe_get(port, 'portgroupKey'), safe_get(port, 'switchUuid')
-                        if guest and guest.net:
-                            for guest_nic in guest.net:
-                                if safe_get(guest_nic, 'macAddress') == nic["mac_address"]:
-                                    nic["guest_net_connected"] = safe_get(guest_nic, 'connected', False)
-                                    if safe_get(guest_nic, 'ipConfig.ipAddress'):
-                                        for ip_addr in guest_nic.ipConfig.ipAddress: nic["guest_ips"].append(f"{safe_get(ip_addr, 'ipAddress')} (Prefix: {safe_get(ip_addr, 'prefixLength')}, State: {safe_get(ip_addr, 'state')})")
-                                    break
-                        vm_details["network_adapters"].append(nic)
-            vms_data.append(vm_details)
-    except Exception as e: print(f"Collector Error (VMs): {e.__class__.__name__} - {e}")
-    finally:
-        if vm_view: vm_view.Destroy()
+        vm_custom_values = _prefetch_custom_values(content, vim.VirtualMachine)
+        for vm_mor, dc_name, cluster_name in _iter_scoped_objects(content, [vim.VirtualMachine], scope, 'vmFolder'):
+            if collection_interrupted(): break
+            vm_details = _get_vm_details(vm_mor, custom_field_defs_map, dc_name, cluster_name, vm_custom_values)
+            if vm_details is not None: vms_data.append(vm_details)
+    except Exception as e: _collector_error("VMs", e)
     return vms_data
 
-def get_resource_pool_details(content):
+RESOURCE_POOL_PROPERTIES = ["name", "parent", "config", "overallStatus", "vm", "resourcePool"]
+
+def get_resource_pool_details(content, scope=None):
+    """Pool properties and the names they reference (VMs, child pools, parents) come from bulk PropertyCollector
+    retrievals; parents, children and member VMs are also linked by MOR id so the hierarchy can be rebuilt without names."""
     resource_pools_data = []
-    rp_view = None
     try:
-        container = content.rootFolder
-        view_type = [vim.ResourcePool]
-        recursive = True
-        rp_view = content.viewManager.CreateContainerView(container, view_type, recursive)
-        for rp_mor in rp_view.view:
-            config_info = safe_get(rp_mor, 'config', None)
+        pool_props = {str(mor): props for mor, props in _retrieve_properties(content, [vim.ResourcePool], RESOURCE_POOL_PROPERTIES)}
+        names = {str(mor): props.get("name") for mor, props in _retrieve_properties(content, [vim.VirtualMachine, vim.ComputeResource], ["name"])}
+        names.update({mor_key: props.get("name") for mor_key, props in pool_props.items()})
+        for rp_mor, dc_name, cluster_name in _iter_scoped_objects(content, [vim.ResourcePool], scope, 'hostFolder'):
+            if collection_interrupted(): break
+            props = pool_props.get(str(rp_mor))
+            if props is None: props = {prop: safe_get(rp_mor, prop, None) for prop in RESOURCE_POOL_PROPERTIES}  # created since the retrieval
+            config_info = props.get("config")
             cpu_alloc = safe_get(config_info, 'cpuAllocation', None)
             mem_alloc = safe_get(config_info, 'memoryAllocation', None)
+            parent = props.get("parent")
             parent_name = "N/A"; parent_type = "N/A"
-            if rp_mor.parent: parent_name, parent_type = safe_get(rp_mor.parent, 'name', str(rp_mor.parent)), rp_mor.parent.__class__.__name__
+            if parent: parent_name, parent_type = names.get(str(parent)) or safe_get(parent, 'name', str(parent)), parent.__class__.__name__
+            vm_mors, child_mors = props.get("vm") or [], props.get("resourcePool") or []
             rp_details = {
-                "name": safe_get(rp_mor, 'name'), "mor_id": str(rp_mor), "overall_status": safe_get(rp_mor, 'overallStatus'),
-                "parent_name": parent_name, "parent_type": parent_type, "parent_mor_id": str(rp_mor.parent) if rp_mor.parent else "N/A",
+                "name": props.get("name"), "mor_id": str(rp_mor), "overall_status": props.get("overallStatus") or 'N/A',
+                "parent_name": parent_name, "parent_type": parent_type, "parent_mor_id": str(parent) if parent else "N/A",
                 "config_name": safe_get(config_info, 'name'), "config_entity": str(safe_get(config_info, 'entity')) if safe_get(config_info, 'entity') else "N/A",
                 "cpu_reservation_mhz": safe_get(cpu_alloc, 'reservation', 0) if cpu_alloc else 0,
                 "cpu_expandable_reservation": safe_get(cpu_alloc, 'expandableReservation', False) if cpu_alloc else False,
@@ -421,12 +551,13 @@ def get_resource_pool_details(content):
                 "mem_limit_mb": safe_get(mem_alloc, 'limit', -1) if mem_alloc else -1,
                 "mem_shares_level": safe_get(mem_alloc, 'shares.level', 'N/A') if safe_get(mem_alloc, 'shares') else 'N/A',
                 "mem_shares_value": safe_get(mem_alloc, 'shares.shares', 0) if safe_get(mem_alloc, 'shares') else 0,
-                "vms_in_pool": [vm.name for vm in safe_get(rp_mor, 'vm', []) if hasattr(vm, 'name')],
-                "child_resource_pools": [crp.name for crp in safe_get(rp_mor, 'resourcePool', []) if hasattr(crp, 'name')]}
+                "vms_in_pool": [names[str(vm)] for vm in vm_mors if names.get(str(vm))],
+                "vm_mor_ids": [str(vm) for vm in vm_mors],
+                "child_resource_pools": [names[str(crp)] for crp in child_mors if names.get(str(crp))],
+                "child_resource_pool_mor_ids": [str(crp) for crp in child_mors],
+                "datacenter_name": dc_name, "cluster_name": cluster_name}
             resource_pools_data.append(rp_details)
-    except Exception as e: print(f"Collector Error (Resource Pools): {e.__class__.__name__} - {e}")
-    finally:
-        if rp_view: rp_view.Destroy()
+    except Exception as e: _collector_error("Resource Pools", e)
     return resource_pools_data
 
 def get_custom_attribute_definitions(content):
@@ -440,12 +571,13 @@ def get_custom_attribute_definitions(content):
             defs_map[field_def.key] = definition
     return definitions_list, defs_map
 
-def get_dvs_details(content):
+def get_dvs_details(content, include_health_check=True):
     dvs_data = []
     dvs_view = None
     try:
         dvs_view = content.viewManager.CreateContainerView(content.rootFolder, [vim.DistributedVirtualSwitch], True)
         for dvs_mor in dvs_view.view:
+            if collection_interrupted(): break
             config, summary, capability = safe_get(dvs_mor, 'config'), safe_get(dvs_mor, 'summary'), safe_get(dvs_mor, 'capability')
             net_res_mgmt, pvlan_cfg, lacp_grps = safe_get(config, 'networkResourceManagementConfig'), safe_get(config, 'pvlanConfig', []), safe_get(config, 'lacpGroupConfig', [])
             dvs_detail = {
@@ -483,7 +615,7 @@ def get_dvs_details(content):
                     dvs_detail["default_port_config"]["security_policy"]["forged_transmits"] = safe_get(sec_pol, 'forgedTransmits.value') if safe_get(sec_pol, 'forgedTransmits') != 'N/A' else None
             ldp_cfg = safe_get(config, 'linkDiscoveryProtocolConfig')
             if ldp_cfg != 'N/A': dvs_detail["link_discovery_protocol"], dvs_detail["link_discovery_operation"] = safe_get(ldp_cfg, 'protocol'), safe_get(ldp_cfg, 'operation')
-            if dvs_detail["health_check_supported"]:
+            if include_health_check and dvs_detail["health_check_supported"]:
                 hc_list = safe_get(config, 'healthCheckConfig', [])
                 if isinstance(hc_list, list):
                     for hc in hc_list:
@@ -508,25 +640,168 @@ def get_dvs_details(content):
                         dvs_ref_from_dpg = safe_get(dpg_config_local, 'distributedVirtualSwitch')
                         # Correction: Ensure dvs_ref_from_dpg is an object before comparing with dvs_mor
                         if dvs_ref_from_dpg != 'N/A' and not isinstance(dvs_ref_from_dpg, str) and dvs_ref_from_dpg == dvs_mor:
-                            vlan_s = safe_get(dpg_config_local, 'defaultPortConfig.vlan')
-                            v_info = "N/A"
-                            if isinstance(vlan_s, vim.dvs.VmwareDistributedVirtualSwitch.VlanIdSpec): v_info = str(safe_get(vlan_s, 'vlanId', 'N/A'))
-                            elif isinstance(vlan_s, vim.dvs.VmwareDistributedVirtualSwitch.TrunkVlanSpec):
-                                r = [f"{i.start}-{i.end}" for i in safe_get(vlan_s, 'vlanId', []) if hasattr(i, 'start')]
-                                v_info = f"Trunk ({', '.join(r)})"
+                            v_info, v_mode, v_ranges = _dvs_vlan_details(safe_get(dpg_config_local, 'defaultPortConfig.vlan'))
                             dvs_detail["port_groups"].append({"name": safe_get(dpg_mor_local, 'name'), "key": safe_get(dpg_mor_local, 'key'),
                                                               "num_ports": safe_get(dpg_config_local, 'numPorts'),
-                                                              "type": safe_get(dpg_config_local, 'type'), "vlan_info": v_info,
+                                                              "type": safe_get(dpg_config_local, 'type'), "vlan_info": v_info, "vlan_mode": v_mode, "vlan_ranges": v_ranges,
                                                               "description": safe_get(dpg_config_local, 'description')})
             finally:
                 if dpg_view: dpg_view.Destroy()
             dvs_data.append(dvs_detail)
-    except Exception as e: print(f"Collector Error (DVS): {e.__class__.__name__} - {e}")
+    except Exception as e: _collector_error("DVS", e)
     finally:
         if dvs_view: dvs_view.Destroy()
     return dvs_data
 
-def main():
+def _retrieve_properties(content, obj_types, path_set, container=None):
+    """Fetches path_set for every object of obj_types under container with a single PropertyCollector retrieval."""
+    view = content.viewManager.CreateContainerView(container or content.rootFolder, obj_types, True)
+    try:
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(name="traverseView", path="view", skip=False, type=vim.view.ContainerView)
+        obj_spec = vmodl.query.PropertyCollector.ObjectSpec(obj=view, skip=True, selectSet=[traversal_spec])
+        prop_specs = [vmodl.query.PropertyCollector.PropertySpec(type=t, pathSet=list(path_set), all=False) for t in obj_types]
+        filter_spec = vmodl.query.PropertyCollector.FilterSpec(objectSet=[obj_spec], propSet=prop_specs)
+        property_collector = content.propertyCollector
+        results = []
+        retrieved = property_collector.RetrievePropertiesEx([filter_spec], vmodl.query.PropertyCollector.RetrieveOptions())
+        while retrieved:
+            for obj_content in retrieved.objects:
+                results.append((obj_content.obj, {prop.name: prop.val for prop in (obj_content.propSet or [])}))
+            if not retrieved.token: break
+            retrieved = property_collector.ContinueRetrievePropertiesEx(retrieved.token)
+        return results
+    finally:
+        view.Destroy()
+
+# --- Targeted Single-Object Refresh ---
+_persistent_session = {"si": None}
+_persistent_session_lock = threading.Lock()
+SINGLE_OBJECT_TYPES = {"vm": vim.VirtualMachine, "host": vim.HostSystem, "datastore": vim.Datastore}
+
+def _connect_vcenter():
+    load_dotenv()
+    vcenter_host, vcenter_user, vcenter_password = os.getenv("VCENTER_HOST"), os.getenv("VCENTER_USER"), os.getenv("VCENTER_PASSWORD")
+    if not all([vcenter_host, vcenter_user, vcenter_password]):
+        raise RuntimeError("VCENTER_HOST, VCENTER_USER, or VCENTER_PASSWORD not found in .env")
+    context = ssl._create_unverified_context() if hasattr(ssl, "_create_unverified_context") else None
+    return connect.SmartConnect(host=vcenter_host, user=vcenter_user, pwd=vcenter_password, port=443, sslContext=context,
+                                httpConnectionTimeout=VCENTER_HTTP_TIMEOUT_S or None)
+
+def get_persistent_service_instance():
+    """Returns a long-lived vCenter session for targeted refreshes, reconnecting when it has expired.
+    Reusing the session avoids paying the login round trips on every single-object refresh."""
+    with _persistent_session_lock:
+        si = _persistent_session["si"]
+        if si is not None:
+            try:
+                if si.content.sessionManager.currentSession: return si
+            except Exception: pass
+        si = _connect_vcenter()
+        _persistent_session["si"] = si
+        return si
+
+def close_persistent_service_instance():
+    """Logs out the session of get_persistent_service_instance, if one is open. Called on shutdown, so vCenter does not
+    keep the session until it times out."""
+    with _persistent_session_lock:
+        si, _persistent_session["si"] = _persistent_session["si"], None
+    if si is None: return
+    try:
+        connect.Disconnect(si)
+    except Exception as e:
+        print(f"Warning: Failed to disconnect the persistent vCenter session: {e}")
+
+def parse_mor_id(value):
+    """Accepts 'vm-42' or the collector's str(mor) form "'vim.VirtualMachine:vm-42'" and returns 'vm-42'."""
+    if not value or value == 'N/A': return None
+    return str(value).strip("'").split(":")[-1]
+
+def _get_placement_names(host_mor):
+    """Returns (datacenter_name, cluster_name) of a host by walking up its parents."""
+    dc_name, cluster_name = 'N/A', 'N/A'
+    parent = safe_get(host_mor, 'parent', None)
+    while parent is not None:
+        if isinstance(parent, vim.ClusterComputeResource): cluster_name = safe_get(parent, 'name')
+        elif isinstance(parent, vim.Datacenter):
+            dc_name = safe_get(parent, 'name')
+            break
+        parent = safe_get(parent, 'parent', None)
+    return dc_name, cluster_name
+
+def _find_single_object(si, object_type, identifier, mor_id=None):
+    content = si.content
+    vim_type = SINGLE_OBJECT_TYPES[object_type]
+    looks_like_mor = str(identifier).startswith("'vim.") or re.fullmatch(r"(vm|host|datastore)-\d+", str(identifier))
+    moid = parse_mor_id(mor_id) or (parse_mor_id(identifier) if looks_like_mor else None)
+    if moid:
+        obj_mor = vim_type(moid, si._stub)
+        try:
+            obj_mor.name
+            return obj_mor
+        except vmodl.fault.ManagedObjectNotFound:
+            if mor_id: return None
+    if object_type == "vm":
+        obj_mor = content.searchIndex.FindByUuid(None, identifier, True, True)
+        if obj_mor: return obj_mor
+    elif object_type == "host":
+        obj_mor = content.searchIndex.FindByDnsName(None, identifier, False)
+        if obj_mor: return obj_mor
+    return next((mor for mor, props in _retrieve_properties(content, [vim_type], ["name"]) if props.get("name") == identifier), None)
+
+def refresh_single_object(object_type, identifier, mor_id=None):
+    """Re-fetches one VM, host or datastore with the same extraction logic as the full collection.
+    Returns the rebuilt record, or None if the object no longer exists in vCenter."""
+    if object_type not in SINGLE_OBJECT_TYPES: raise ValueError(f"Unsupported object type '{object_type}'")
+    si = get_persistent_service_instance()
+    obj_mor = _find_single_object(si, object_type, identifier, mor_id)
+    if obj_mor is None: return None
+    if object_type == "vm":
+        _, custom_attr_defs_map = get_custom_attribute_definitions(si.content)
+        host_mor = safe_get(obj_mor, 'runtime.host', None)
+        dc_name, cluster_name = _get_placement_names(host_mor) if host_mor else ('N/A', 'N/A')
+        return _get_vm_details(obj_mor, custom_attr_defs_map, dc_name, cluster_name)
+    if object_type == "host":
+        _, custom_attr_defs_map = get_custom_attribute_definitions(si.content)
+        return _get_host_details(obj_mor, custom_attr_defs_map)
+    dc_name = 'N/A'
+    parent = safe_get(obj_mor, 'parent', None)
+    while parent is not None and not isinstance(parent, vim.Datacenter): parent = safe_get(parent, 'parent', None)
+    if parent is not None: dc_name = safe_get(parent, 'name')
+    return _get_datastore_details(obj_mor, dc_name)
+
+# --- Collection Profiles ---
+# vcenter_details and custom_attribute_definitions are cheap and always collected.
+# Datacenter/cluster scoping applies to SCOPED_SECTIONS; network sections are inventory-wide.
+SCOPED_SECTIONS = ("infrastructure", "datastores", "vms", "resource_pools")
+HOST_NETWORK_KEYS = ("physical_nics", "vswitches_standard", "vmkernel_adapters", "proxy_switches")
+HOST_STORAGE_KEYS = ("storage_configuration",)
+COLLECTION_PROFILES = {
+    "full": {"sections": ("infrastructure", "datastores", "global_networks", "vms", "resource_pools", "distributed_virtual_switches"),
+             "host_network": True, "host_storage": True, "dvs_health_check": True},
+    "vms-only": {"sections": ("vms",), "host_network": False, "host_storage": False, "dvs_health_check": False},
+    "placement": {"sections": ("infrastructure", "vms", "resource_pools"), "host_network": False, "host_storage": False, "dvs_health_check": False},
+    "storage": {"sections": ("infrastructure", "datastores"), "host_network": False, "host_storage": True, "dvs_health_check": False},
+    "network": {"sections": ("infrastructure", "global_networks", "distributed_virtual_switches"), "host_network": True, "host_storage": False, "dvs_health_check": True},
+}
+
+def _count_items(section_data):
+    if isinstance(section_data, list): return len(section_data)
+    if isinstance(section_data, dict): return sum(len(v) for v in section_data.values() if isinstance(v, list))
+    return 0
+
+def _report_progress(progress_callback, phase, state, index, total, **details):
+    """Forwards a phase lifecycle event to the caller; a failing callback never interrupts the collection."""
+    if not progress_callback: return
+    try: progress_callback({"phase": phase, "state": state, "index": index, "total": total, **details})
+    except Exception as e: print(f"Warning: progress callback failed: {e.__class__.__name__} - {e}")
+
+def main(profile="full", datacenters=None, clusters=None, progress_callback=None, control=None):
+    if profile not in COLLECTION_PROFILES:
+        print(f"Error: unknown collection profile '{profile}'. Available: {', '.join(COLLECTION_PROFILES)}")
+        return None, None
+    profile_config = COLLECTION_PROFILES[profile]
+    sections = profile_config["sections"]
+    control = control or CollectionControl()
     load_dotenv()
     vcenter_host = os.getenv("VCENTER_HOST")
     vcenter_user = os.getenv("VCENTER_USER")
@@ -557,9 +832,17 @@ def main():
     all_collected_data = {}
     try:
         print(f"\nConnecting to {vcenter_host} as {vcenter_user}...")
-        si = connect.SmartConnect(host=vcenter_host, user=vcenter_user, pwd=vcenter_password, port=443, sslContext=context)
+        si = connect.SmartConnect(host=vcenter_host, user=vcenter_user, pwd=vcenter_password, port=443, sslContext=context,
+                                  httpConnectionTimeout=VCENTER_HTTP_TIMEOUT_S or None)
         print("Successfully connected!")
         content = si.content
+        scope = resolve_collection_scope(content, datacenters, clusters)
+        omitted_host_keys = (list(HOST_NETWORK_KEYS) if not profile_config["host_network"] else []) + (list(HOST_STORAGE_KEYS) if not profile_config["host_storage"] else [])
+        all_collected_data["collection_meta"] = {
+            "profile": profile, "sections": ["vcenter_details", "custom_attribute_definitions"] + list(sections),
+            "scope": {"datacenters": list(datacenters or []), "clusters": list(clusters or [])} if scope is not None else None,
+            "omitted_host_keys": omitted_host_keys if "infrastructure" in sections else []}
+        print(f"Collection profile: {profile}" + (f" (scope: datacenters={datacenters or 'all'}, clusters={clusters or 'all'})" if scope is not None else ""))
 
         print("Collecting vCenter details...")
         all_collected_data["vcenter_details"] = get_vcenter_details(content)
@@ -568,23 +851,41 @@ def main():
         custom_attr_defs_list, custom_attr_defs_map = get_custom_attribute_definitions(content)
         all_collected_data["custom_attribute_definitions"] = custom_attr_defs_list
 
-        print("Collecting infrastructure overview (DCs, Clusters, Hosts with Network, Storage & Custom Attributes)...")
-        all_collected_data["infrastructure"] = get_infrastructure_overview(content, custom_attr_defs_map)
-
-        print("Collecting datastore information...")
-        all_collected_data["datastores"] = get_datastore_info(content)
-
-        print("Collecting global network information (DPGs, SPG summary)...")
-        all_collected_data["global_networks"] = get_network_info(content)
-
-        print("Collecting virtual machine information (with Custom Attributes)...")
-        all_collected_data["vms"] = get_vm_info(content, custom_attr_defs_map)
-
-        print("Collecting Resource Pool details...")
-        all_collected_data["resource_pools"] = get_resource_pool_details(content)
-
-        print("Collecting Distributed Virtual Switch details...")
-        all_collected_data["distributed_virtual_switches"] = get_dvs_details(content)
+        phase_plan = [
+            ("infrastructure", "Collecting infrastructure overview (DCs, Clusters, Hosts with Network, Storage & Custom Attributes)...",
+             lambda: get_infrastructure_overview(content, custom_attr_defs_map, scope, profile_config["host_network"], profile_config["host_storage"])),
+            ("datastores", "Collecting datastore information...", lambda: get_datastore_info(content, scope)),
+            ("global_networks", "Collecting global network information (DPGs, SPG summary)...", lambda: get_network_info(content)),
+            ("vms", "Collecting virtual machine information (with Custom Attributes)...", lambda: get_vm_info(content, custom_attr_defs_map, scope)),
+            ("resource_pools", "Collecting Resource Pool details...", lambda: get_resource_pool_details(content, scope)),
+            ("distributed_virtual_switches", "Collecting Distributed Virtual Switch details...", lambda: get_dvs_details(content, profile_config["dvs_health_check"])),
+        ]
+        phases = [phase for phase in phase_plan if phase[0] in sections]
+        phase_results = {}
+        _active_collection.control = control
+        for index, (section, message, collect_section) in enumerate(phases, start=1):
+            control.start_phase(section)
+            reason = control.interruption()
+            if reason:
+                phase_results[section] = {"status": "skipped", "reason": reason}
+                _report_progress(progress_callback, section, "skipped", index, len(phases), reason=reason)
+                continue
+            print(message)
+            _report_progress(progress_callback, section, "started", index, len(phases))
+            phase_start = time.monotonic()
+            section_data = collect_section()
+            phase_status = "truncated" if control.phase_interruption else ("failed" if control.phase_errors else "completed")
+            phase_results[section] = {"status": phase_status, "reason": control.phase_interruption, "items": _count_items(section_data),
+                                      "duration_s": round(time.monotonic() - phase_start, 2), "errors": control.phase_errors}
+            # Only complete sections replace cached data: the others keep their previous (older, but whole) content.
+            if phase_status == "completed": all_collected_data[section] = section_data
+            else: print(f"Warning: phase '{section}' {phase_status}" + (f" ({control.phase_interruption})" if control.phase_interruption else "") + ", its data is discarded.")
+            _report_progress(progress_callback, section, phase_status, index, len(phases),
+                             **{k: v for k, v in phase_results[section].items() if k != "status"})
+        meta = all_collected_data["collection_meta"]
+        meta["sections"] = [s for s in meta["sections"] if s not in phase_results or phase_results[s]["status"] == "completed"]
+        meta["phases"] = phase_results
+        meta["cancelled"] = control.cancel_event.is_set()
 
         print("\nWARNING: Tag collection requires vSphere Automation SDK or REST calls, not fully implemented with pyVmomi alone.")
 
@@ -603,6 +904,7 @@ def main():
         print(f"Collector Unexpected Error: {e.__class__.__name__} - {e}")
         traceback.print_exc()
     finally:
+        _active_collection.control = None
         if si:
             print("\nDisconnecting from vCenter Server...")
             connect.Disconnect(si)